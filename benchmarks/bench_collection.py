@@ -0,0 +1,103 @@
+"""
+Benchmark: building a blog with a very large number of posts.
+
+Generates N synthetic posts, then measures in a fresh process the full
+first build, a no-op rebuild and a rebuild after adding one post, along
+with peak memory. Post bodies are only read when a post is rendered and
+listings are generated from the on-disk index, so peak memory should stay
+roughly flat as N grows, and adding a post should re-render a handful of
+outputs rather than the whole collection.
+
+Usage:
+    python benchmarks/bench_collection.py --posts 1000 10000 100000
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+TAGS = ["news", "guides", "releases", "events", "tips"]
+
+
+def _write_post(directory: str, i: int) -> str:
+    day = date(2000, 1, 1) + timedelta(days=i // 10)
+    path = os.path.join(directory, f"{day.isoformat()}-post-{i}.html")
+    with open(path, "w") as f:
+        f.write(f"---\ntitle: Post number {i}\ntags: {TAGS[i % len(TAGS)]}, {TAGS[(i // 7) % len(TAGS)]}\n---\n")
+        f.write("".join(f"<p>Paragraph {n} of post {i}, with some filler text.</p>\n" for n in range(20)))
+    return path
+
+
+def _child(posts: int) -> None:
+    """Build one site in this process and print timings and peak memory as JSON."""
+    from bot_core.builder import WebsiteBuilder
+
+    with tempfile.TemporaryDirectory() as root:
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(root, "shared"))
+        builder = WebsiteBuilder(root)
+        site = builder.create_website("blog.example", {"title": "Benchmark Co", "blog": {"per_page": 20}})
+        posts_dir = os.path.join(site, "content", "blog")
+        os.makedirs(posts_dir)
+        for i in range(posts):
+            _write_post(posts_dir, i)
+
+        started = time.perf_counter()
+        builder.build()
+        full = time.perf_counter() - started
+
+        started = time.perf_counter()
+        builder.rebuild([])
+        noop = time.perf_counter() - started
+
+        new_post = _write_post(posts_dir, posts)
+        started = time.perf_counter()
+        report = builder.rebuild([new_post])
+        incremental = time.perf_counter() - started
+
+    print(json.dumps({
+        "posts": posts,
+        "full_s": full,
+        "noop_s": noop,
+        "add_post_s": incremental,
+        "add_post_rendered": report["collections"]["blog"]["rendered"],
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }))
+
+
+def run(posts: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--posts", str(posts)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--posts", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.posts[0])
+        return
+
+    print(f"{'posts':>8} {'full s':>8} {'no-op s':>8} {'+1 post s':>10} {'rendered':>9} {'peak RSS MB':>12}")
+    for posts in args.posts:
+        r = run(posts)
+        print(f"{posts:>8} {r['full_s']:>8.1f} {r['noop_s']:>8.2f} {r['add_post_s']:>10.2f} "
+              f"{r['add_post_rendered']:>9} {r['peak_rss_mb']:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: build time of a multi-language site relative to a single-language one.
+
+Every page is rendered once per language (plus the default language at the
+root), so an N-language build renders N+1 times as many pages. Asset
+syncing, fingerprinting and template compilation are shared, and language
+variants render in parallel workers, so the build should cost well below
+N times a single-language build.
+
+Usage:
+    python benchmarks/bench_i18n.py --languages 4 --runs 5
+"""
+
+import argparse
+import copy
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+LANGUAGES = ["sv", "en", "de", "fr", "fi", "no", "da", "es"]
+
+SITE_CONFIG = {
+    "title": "Benchmark Co",
+    "components": ["services", "about", "contact"],
+    "variables": {
+        "company_name": "Benchmark Co",
+        "company_description": "Synthetic site used for language benchmarks",
+        "hero_title": "Fast builds",
+        "hero_description": "Measuring per-language render cost",
+        "services": [{"name": f"Service {i}", "link": "/services/"} for i in range(12)],
+        "stats": [{"title": "Sites", "value": "100+", "description": "Built"}]
+    }
+}
+
+
+def _config(languages):
+    config = copy.deepcopy(SITE_CONFIG)
+    if languages:
+        config["languages"] = languages
+        config["default_language"] = languages[0]
+        config["variables"]["translations"] = {
+            lang: {"hero_title": f"Fast builds ({lang})"} for lang in languages
+        }
+    return config
+
+
+def _time_builds(builder, domain, config, runs):
+    builder.create_website(domain, config)
+    builder.build()  # warm-up: sync files, compile templates, write outputs
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        builder.build()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def run(languages: int, runs: int) -> dict:
+    from bot_core.builder import WebsiteBuilder
+
+    with tempfile.TemporaryDirectory() as root:
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(root, "shared"))
+        builder = WebsiteBuilder(root)
+        single = _time_builds(builder, "single.example", _config([]), runs)
+        multi = _time_builds(builder, "multi.example", _config(LANGUAGES[:languages]), runs)
+
+    return {
+        "languages": languages,
+        "runs": runs,
+        "single_median_ms": single * 1000,
+        "multi_median_ms": multi * 1000,
+        "ratio": multi / single
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--languages", type=int, default=4)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    result = run(args.languages, args.runs)
+    print(f"single language:        {result['single_median_ms']:.2f} ms")
+    print(f"{result['languages']} languages:            {result['multi_median_ms']:.2f} ms")
+    print(f"cost relative to single: {result['ratio']:.2f}x (linear would be {result['languages']}x+)")
+
+if __name__ == "__main__":
+    main()
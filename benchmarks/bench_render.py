@@ -0,0 +1,91 @@
+"""
+Benchmark: cold-start vs warm-cache page rendering for the business template.
+
+Each run happens in a fresh Python process (like a batch build worker), so
+the only thing that survives between runs is the on-disk bytecode cache.
+
+Usage:
+    python benchmarks/bench_render.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+import json, sys, time
+from bot_core.builder import WebsiteBuilder
+builder = WebsiteBuilder(sys.argv[1])
+builder.current_site = sys.argv[2]
+started = time.perf_counter()
+builder.build()
+print(json.dumps({"seconds": time.perf_counter() - started}))
+"""
+
+SITE_CONFIG = {
+    "title": "Benchmark Co",
+    "components": ["services", "about", "contact"],
+    "variables": {
+        "company_name": "Benchmark Co",
+        "company_description": "Synthetic site used for render benchmarks",
+        "hero_title": "Fast builds",
+        "hero_description": "Measuring template compile cost",
+        "services": [{"name": f"Service {i}", "link": "/services/"} for i in range(12)],
+        "stats": [{"title": "Sites", "value": "100+", "description": "Built"}]
+    }
+}
+
+
+def _time_build(root: str, site_path: str) -> float:
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    output = subprocess.run(
+        [sys.executable, "-c", WORKER, root, site_path],
+        check=True, capture_output=True, text=True, env=env
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])["seconds"]
+
+
+def run(runs: int) -> dict:
+    from bot_core.builder import WebsiteBuilder
+
+    with tempfile.TemporaryDirectory() as root:
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(root, "shared"))
+        builder = WebsiteBuilder(root)
+        site_path = builder.create_website("bench.example", SITE_CONFIG)
+        cache_dir = builder.template_cache_dir
+
+        cold = []
+        for _ in range(runs):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            cold.append(_time_build(root, site_path))
+
+        _time_build(root, site_path)  # populate the cache
+        warm = [_time_build(root, site_path) for _ in range(runs)]
+
+    return {
+        "runs": runs,
+        "cold_median_ms": statistics.median(cold) * 1000,
+        "warm_median_ms": statistics.median(warm) * 1000,
+        "speedup": statistics.median(cold) / statistics.median(warm)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    result = run(args.runs)
+    print(f"cold start (empty bytecode cache): {result['cold_median_ms']:.2f} ms")
+    print(f"warm cache:                        {result['warm_median_ms']:.2f} ms")
+    print(f"speedup:                           {result['speedup']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark: peak builder memory for very large pages, string vs streamed rendering.
+
+A synthetic listing page is fed by a generator content section with a
+growing number of items. Each build runs in a fresh process and reports
+its peak resident set size. Rendering to strings holds every page (and
+each filtered copy of it) in memory, so peak memory grows with the page;
+streamed rendering writes chunks to disk as they are produced and should
+stay roughly flat.
+
+Usage:
+    python benchmarks/bench_stream.py --items 10000 100000 400000
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+LISTING_PAGE = (
+    '{% extends "base.html" %}{% block content %}'
+    '<ul class="listing">{% for chunk in products %}{{ chunk }}{% endfor %}</ul>'
+    '{% endblock %}'
+)
+
+
+def _products(count):
+    def provider(config, page):
+        for i in range(count):
+            yield (f'<li class="product"><a href="/products/{i}/">Product {i}</a>'
+                   f'<p>Description of product number {i}, in stock.</p></li>')
+    return provider
+
+
+def _child(mode: str, items: int) -> None:
+    """Build one site in this process and print its peak memory as JSON."""
+    from bot_core.builder import WebsiteBuilder
+
+    with tempfile.TemporaryDirectory() as root:
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(root, "shared"))
+        with open(os.path.join(root, "shared", "templates", "business", "pages", "products.html"), "w") as f:
+            f.write(LISTING_PAGE)
+        builder = WebsiteBuilder(root)
+        builder.create_website("stream.example", {"title": "Benchmark Co"})
+        builder.add_content_section("products", _products(items))
+        builder.stream_pages = mode == "stream"
+        builder.render_workers = 1
+
+        started = time.perf_counter()
+        builder.build()
+        elapsed = time.perf_counter() - started
+        size = os.path.getsize(os.path.join(builder.current_site, "public_html", "products", "index.html"))
+
+    print(json.dumps({
+        "mode": mode,
+        "items": items,
+        "page_mb": size / 1e6,
+        "build_s": elapsed,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }))
+
+
+def run(mode: str, items: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", mode, "--items", str(items)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[10000, 100000, 400000])
+    parser.add_argument("--child", choices=["string", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(args.child, args.items[0])
+        return
+
+    print(f"{'items':>8} {'page MB':>8} {'string RSS MB':>14} {'stream RSS MB':>14}")
+    for items in args.items:
+        string = run("string", items)
+        stream = run("stream", items)
+        print(f"{items:>8} {string['page_mb']:>8.1f} {string['peak_rss_mb']:>14.1f} {stream['peak_rss_mb']:>14.1f}")
+
+if __name__ == "__main__":
+    main()
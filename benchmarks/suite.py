@@ -0,0 +1,476 @@
+"""
+Benchmark suite: builder, schema generator (per call and batched), schema
+validator, SEO sentinel, export ingestion, metrics store and uptime monitor
+on synthetic data, with regression checks against a stored baseline.
+
+Each subsystem runs at each size in a fresh process (so peak memory is its
+own) and reports throughput, latency and peak RSS. Runs are repeated and
+the median of each metric is kept. Results are written as JSON; given a
+baseline (an earlier results file), every metric is compared and the
+suite exits non-zero when one regresses past the tolerance. Metrics named
+*_per_s and *_speedup are better when higher, all others (seconds, latencies, memory)
+when lower.
+
+Subsystems whose dependencies are missing (the uptime monitor needs
+requests and dnspython) are reported as skipped.
+
+Usage:
+    python benchmarks/suite.py --sizes small medium --output results.json
+    python benchmarks/suite.py --output baseline.json                       # record a baseline
+    python benchmarks/suite.py --baseline baseline.json --tolerance 0.2     # CI gate
+    python benchmarks/suite.py --baseline baseline.json --tolerance-for builder.full_build_s=0.5
+"""
+
+import argparse
+import http.server
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+
+RESULTS_VERSION = 1
+
+SIZES = {
+    "small": {"pages": 10, "components": 3, "assets": 10, "languages": 1, "rows": 1000, "checks": 50},
+    "medium": {"pages": 50, "components": 5, "assets": 40, "languages": 2, "rows": 10000, "checks": 200},
+    "large": {"pages": 200, "components": 8, "assets": 160, "languages": 4, "rows": 100000, "checks": 1000},
+}
+# Required SchemaBatch speedup over per-entity generation (with a worker per
+# CPU), checked from 10000 catalog rows up
+MIN_SCHEMA_BATCH_SPEEDUP = 10.0
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _latencies(fn: Callable[[int], object], count: int) -> List[float]:
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def bench_builder(size: Dict) -> Dict:
+    """Full build, no-op build and a one-page rebuild of a synthetic site."""
+    from bot_core.builder import WebsiteBuilder
+
+    with tempfile.TemporaryDirectory() as root:
+        config, page_paths = synthetic.make_site(root, size["pages"], size["components"],
+                                                 size["assets"], size["languages"])
+        builder = WebsiteBuilder(root)
+        builder.create_website("bench.example", config)
+
+        started = time.perf_counter()
+        builder.build()
+        full = time.perf_counter() - started
+        outputs = len(builder.last_build_report["pages"])
+
+        started = time.perf_counter()
+        builder.build()
+        noop = time.perf_counter() - started
+
+        with open(page_paths[0], "a") as f:
+            f.write("{# edited #}\n")
+        started = time.perf_counter()
+        builder.rebuild([page_paths[0]])
+        rebuild = time.perf_counter() - started
+
+    return {
+        "full_build_s": full,
+        "noop_build_s": noop,
+        "rebuild_page_s": rebuild,
+        "pages_per_s": outputs / full,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def bench_schema(size: Dict) -> Dict:
+    """Per-page schema set: business, service, FAQ and aggregate rating, serialized."""
+    from bot_core.seo.schema_generator import SchemaGenerator
+
+    generator = SchemaGenerator()
+    address = {"street": "1 Main St", "city": "Stockholm", "region": "AB", "postal_code": "111 22", "country": "SE"}
+    questions = [{"question": f"Question {n}?", "answer": f"Answer number {n}."} for n in range(8)]
+
+    def page_schemas(i: int) -> str:
+        schemas = [
+            generator.generate_local_business(f"Business {i}", address, {"latitude": 59.3, "longitude": 18.0},
+                                              "+46 8 123 456", opening_hours=["Mo-Fr 08:00-17:00"]),
+            generator.generate_service(f"Service {i}", "Synthetic service", f"Business {i}", price="100"),
+            generator.generate_faq(questions),
+            generator.generate_review_aggregate(f"Business {i}", 4.6, 120 + i)
+        ]
+        for schema in schemas:
+            generator.validate_schema(schema)
+        return "".join(generator.to_script_tag(schema) for schema in schemas)
+
+    samples = _latencies(page_schemas, size["rows"])
+    return {
+        "pages_per_s": len(samples) / sum(samples),
+        "p50_us": _percentile(samples, 0.5) * 1e6,
+        "p95_us": _percentile(samples, 0.95) * 1e6,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def bench_schema_batch(size: Dict) -> Dict:
+    """
+    Catalog JSON-LD: one generate_* + to_script_tag per entity vs. SchemaBatch
+    @graph pages, in this process and with a worker per CPU.
+    """
+    from bot_core.seo.schema_batch import SchemaBatch
+    from bot_core.seo.schema_generator import SchemaGenerator
+
+    specs = synthetic.catalog(size["rows"])
+    generator = SchemaGenerator()
+
+    started = time.perf_counter()
+    for spec in specs:
+        fields = {k: v for k, v in spec.items() if k != "type"}
+        generator.to_script_tag(getattr(generator, f"generate_{spec['type']}")(**fields))
+    per_call = time.perf_counter() - started
+
+    started = time.perf_counter()
+    tags = list(SchemaBatch(generator, page_size=500, max_workers=1).script_tags(specs))
+    batch = time.perf_counter() - started
+
+    started = time.perf_counter()
+    parallel_tags = list(SchemaBatch(generator, page_size=500).script_tags(specs))
+    parallel = time.perf_counter() - started
+
+    if parallel_tags != tags:
+        raise ValueError("SchemaBatch worker output differs from in-process output")
+    if size["rows"] >= 10000 and per_call / parallel < MIN_SCHEMA_BATCH_SPEEDUP:
+        raise ValueError(f"SchemaBatch is only {per_call / parallel:.1f}x faster than per-entity generation "
+                         f"with {os.cpu_count()} CPU(s) ({per_call / batch:.1f}x in one process; "
+                         f"expected at least {MIN_SCHEMA_BATCH_SPEEDUP}x)")
+
+    return {
+        "per_call_entities_per_s": len(specs) / per_call,
+        "batch_entities_per_s": len(specs) / batch,
+        "batch_speedup": per_call / batch,
+        "parallel_entities_per_s": len(specs) / parallel,
+        "parallel_speedup": per_call / parallel,
+        "batch_pages": len(tags),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def bench_schema_validate(size: Dict) -> Dict:
+    """SchemaValidator over generated catalog markup, one document per entity."""
+    from bot_core.seo.schema_generator import SchemaGenerator
+    from bot_core.seo.schema_validator import SchemaValidator
+
+    generator = SchemaGenerator()
+    documents = [getattr(generator, f"generate_{spec['type']}")(**{k: v for k, v in spec.items() if k != "type"})
+                 for spec in synthetic.catalog(size["rows"])]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        started = time.perf_counter()
+        SchemaValidator(cache_dir=cache_dir)
+        compile_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        validator = SchemaValidator(cache_dir=cache_dir)
+        load_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    errors = sum(len(validator.validate(document)) for document in documents)
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise ValueError(f"Synthetic catalog produced {errors} schema errors")
+
+    return {
+        "entities_per_s": len(documents) / elapsed,
+        "compile_ms": compile_ms,
+        "cached_load_ms": load_ms,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def bench_sentinel(size: Dict) -> Dict:
+    """SEOSentinel.analyze_and_act over Search Console, review and content datasets, row by row and columnar."""
+    from bot_core.seo import columnar
+    from bot_core.seo.sentinel import SEOSentinel
+
+    data = synthetic.site_data(size["rows"])
+    with tempfile.TemporaryDirectory() as root:
+        # The sentinel logs to logs/ relative to the working directory
+        os.makedirs(os.path.join(root, "logs"))
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            sentinel = SEOSentinel(os.path.join(root, "missing.json"), columnar_mode=False)
+            samples = _latencies(lambda i: sentinel.analyze_and_act(data), 3)
+            columnar_samples = None
+            if columnar.available():
+                sentinel = SEOSentinel(os.path.join(root, "missing.json"), columnar_mode=True)
+                columnar_samples = _latencies(lambda i: sentinel.analyze_and_act(data), 3)
+        finally:
+            os.chdir(cwd)
+    rows = len(data["search_console"]["pages"]) + len(data["reviews"]["recent"]) + len(data["content"]["pages"])
+    results = {
+        "analyze_s": statistics.median(samples),
+        "rows_per_s": rows / statistics.median(samples),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+    if columnar_samples:
+        results["columnar_analyze_s"] = statistics.median(columnar_samples)
+        results["columnar_rows_per_s"] = rows / statistics.median(columnar_samples)
+    return results
+
+
+def bench_ingest(size: Dict) -> Dict:
+    """Streaming aggregation of a gzipped Search Console page/query export (10 rows per page)."""
+    from bot_core.seo.ingest import ingest
+
+    rows = size["rows"] * 10
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "gsc.csv.gz")
+        synthetic.search_console_export(path, rows)
+        started = time.perf_counter()
+        aggregate = ingest({"search_console": [path]}, max_workers=1)
+        elapsed = time.perf_counter() - started
+    return {
+        "ingest_s": elapsed,
+        "rows_per_s": rows / elapsed,
+        "pages": len(aggregate.search),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def bench_metrics_store(size: Dict) -> Dict:
+    """Three years of daily traffic for rows/100 URLs: write, then a per-site anomaly scan."""
+    from bot_core.monitoring.metrics_store import MetricsStore
+
+    urls = max(size["rows"] // 100, 1)
+    days = 3 * 365
+    start = time.time() - days * 86400
+    rng = random.Random(0)
+    samples = [("bench.example", f"/page-{u}/", "traffic", start + d * 86400,
+                (100 if d % 7 < 5 else 40) * rng.uniform(0.9, 1.1))
+               for u in range(urls) for d in range(days)]
+    with tempfile.TemporaryDirectory() as root:
+        store = MetricsStore(root)
+        started = time.perf_counter()
+        store.append_many(samples)
+        write_s = time.perf_counter() - started
+        started = time.perf_counter()
+        store.scan("bench.example", "traffic")
+        scan_s = time.perf_counter() - started
+    return {
+        "write_samples_per_s": len(samples) / write_s,
+        "scan_ms": scan_s * 1000,
+        "scan_ms_per_series": scan_s * 1000 / urls,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def bench_uptime(size: Dict) -> Dict:
+    """HTTP checks against a local server, and status aggregation over synthetic results."""
+    try:
+        from bot_core.monitoring.uptime import UptimeMonitor
+    except ImportError as e:
+        return {"skipped": f"missing dependency: {e.name}"}
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, "logs"))
+        cwd = os.getcwd()
+        os.chdir(root)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            monitor = UptimeMonitor()
+            # Only the HTTP check runs offline; TLS and DNS need a real domain
+            monitor.checks = {"http": True, "https": False, "ssl": False, "dns": False}
+            domain = f"127.0.0.1:{server.server_address[1]}"
+            check_samples = _latencies(lambda i: monitor.check_site(domain), size["checks"])
+        finally:
+            server.shutdown()
+            server.server_close()
+            os.chdir(cwd)
+
+    results = synthetic.uptime_results(size["rows"])
+    started = time.perf_counter()
+    for checks in results:
+        monitor._determine_status(checks)
+    aggregate = time.perf_counter() - started
+    return {
+        "checks_per_s": len(check_samples) / sum(check_samples),
+        "check_p50_ms": _percentile(check_samples, 0.5) * 1000,
+        "check_p95_ms": _percentile(check_samples, 0.95) * 1000,
+        "statuses_per_s": len(results) / aggregate,
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+SUBSYSTEMS = {
+    "builder": bench_builder,
+    "ingest": bench_ingest,
+    "metrics_store": bench_metrics_store,
+    "schema": bench_schema,
+    "schema_batch": bench_schema_batch,
+    "schema_validate": bench_schema_validate,
+    "sentinel": bench_sentinel,
+    "uptime": bench_uptime,
+}
+
+
+def run_one(subsystem: str, size: str) -> Dict:
+    child = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", subsystem, size],
+        capture_output=True, text=True
+    )
+    if child.returncode:
+        # The last line of the traceback says which check failed
+        reason = (child.stderr.strip().splitlines() or [f"exit status {child.returncode}"])[-1]
+        raise ValueError(f"{subsystem}/{size} failed: {reason}")
+    return json.loads(child.stdout.strip().splitlines()[-1])
+
+
+def run(subsystems: List[str], sizes: List[str], repeat: int) -> Dict:
+    """Run every subsystem at every size; returns a results document."""
+    results = {}
+    for subsystem in subsystems:
+        for size in sizes:
+            runs = [run_one(subsystem, size) for _ in range(repeat)]
+            key = f"{subsystem}/{size}"
+            if "skipped" in runs[0]:
+                results[key] = {"skipped": runs[0]["skipped"]}
+            else:
+                results[key] = {"metrics": {metric: statistics.median(r[metric] for r in runs) for metric in runs[0]}}
+            print(f"  {key}: {results[key].get('skipped') or _format_metrics(results[key]['metrics'])}",
+                  file=sys.stderr)
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "repeat": repeat,
+        "sizes": {size: SIZES[size] for size in sizes},
+        "results": results
+    }
+
+
+def _format_metrics(metrics: Dict) -> str:
+    return ", ".join(f"{name}={value:.4g}" for name, value in metrics.items())
+
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith(("_per_s", "_speedup"))
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float, overrides: Dict[str, float]) -> List[Dict]:
+    """
+    Compare each metric present in both documents. A metric regresses when
+    it is worse than the baseline by more than its tolerance (a fraction
+    of the baseline value). overrides map "subsystem.metric" or "metric"
+    to a tolerance.
+    """
+    rows = []
+    for key, result in sorted(current["results"].items()):
+        base = baseline.get("results", {}).get(key, {})
+        if "metrics" not in result or "metrics" not in base:
+            continue
+        subsystem = key.split("/", 1)[0]
+        for metric, value in result["metrics"].items():
+            if metric not in base["metrics"]:
+                continue
+            reference = base["metrics"][metric]
+            allowed = overrides.get(f"{subsystem}.{metric}", overrides.get(metric, tolerance))
+            change = (value - reference) / reference if reference else 0.0
+            worse = -change if higher_is_better(metric) else change
+            rows.append({"key": key, "metric": metric, "baseline": reference, "current": value,
+                         "change": change, "tolerance": allowed, "regressed": worse > allowed})
+    return rows
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    lines = [f"{'benchmark':<18} {'metric':<18} {'baseline':>12} {'current':>12} {'change':>8}  status"]
+    for row in rows:
+        status = f"REGRESSED (>{row['tolerance']:.0%})" if row["regressed"] else "ok"
+        lines.append(f"{row['key']:<18} {row['metric']:<18} {row['baseline']:>12.4g} {row['current']:>12.4g} "
+                     f"{row['change']:>+8.1%}  {status}")
+    return "\n".join(lines)
+
+
+def _parse_overrides(values: List[str]) -> Dict[str, float]:
+    overrides = {}
+    for value in values:
+        name, _, tolerance = value.partition("=")
+        if not tolerance:
+            raise ValueError(f"Expected METRIC=TOLERANCE, got {value!r}")
+        overrides[name] = float(tolerance)
+    return overrides
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subsystems", nargs="+", choices=list(SUBSYSTEMS), default=list(SUBSYSTEMS))
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark (the median is kept)")
+    parser.add_argument("--output", default=None, help="Write results JSON here")
+    parser.add_argument("--baseline", default=None, help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed regression as a fraction of the baseline (default 0.25)")
+    parser.add_argument("--tolerance-for", nargs="*", default=[], metavar="METRIC=TOL",
+                        help="Per-metric tolerances, e.g. builder.full_build_s=0.5 or peak_rss_mb=0.1")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        subsystem, size = args.child
+        print(json.dumps(SUBSYSTEMS[subsystem](SIZES[size])))
+        return
+
+    overrides = _parse_overrides(args.tolerance_for)
+    current = run(args.subsystems, args.sizes, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=4)
+        print(f"Results written to {args.output}")
+
+    if not args.baseline:
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != current["machine"]:
+        print("Warning: baseline was recorded on a different machine or Python", file=sys.stderr)
+    rows = compare(current, baseline, args.tolerance, overrides)
+    print(format_comparison(rows))
+    regressions = [row for row in rows if row["regressed"]]
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed past tolerance")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
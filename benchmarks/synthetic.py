@@ -0,0 +1,224 @@
+"""
+Synthetic inputs for the benchmark suite.
+
+Sites are generated from the business template with N extra pages, each
+including M generated components, K shared assets (CSS and JS, linked
+from the pages) and L languages. Search Console, review, content and
+uptime datasets are generated in the shapes SEOSentinel and
+UptimeMonitor consume, Search Console exports as the gzipped page/query
+CSV the UI downloads, and catalogs in the spec shape SchemaBatch reads.
+Everything is seeded, so a given size always
+produces the same data.
+"""
+
+import gzip
+import os
+import random
+import shutil
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LANGUAGES = ["en", "sv", "de", "fr", "fi", "no", "da", "es"]
+
+WORDS = ("build site page local service quality fast review search team price offer "
+         "contact support garden repair design clean modern trusted city family").split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_site(root: str, pages: int, components: int, assets: int, languages: int,
+              seed: int = 0) -> Tuple[Dict, List[str]]:
+    """
+    Lay out shared/ under root with a synthetic business template.
+
+    Returns the site config to pass to create_website and the page template
+    paths written (for incremental rebuild measurements).
+    """
+    rng = random.Random(seed)
+    shared = os.path.join(root, "shared")
+    shutil.copytree(os.path.join(REPO_ROOT, "shared"), shared, dirs_exist_ok=True)
+    template_dir = os.path.join(shared, "templates", "business")
+
+    for j in range(components):
+        with open(os.path.join(template_dir, "components", f"synthetic-{j}.html"), "w") as f:
+            f.write(
+                f'<section id="synthetic-{j}" class="section-padding synthetic-{j}">\n'
+                f'  <h2 class="text-2xl font-bold">{_text(rng, 4)}</h2>\n'
+                '  <ul class="grid md:grid-cols-3 gap-4">\n'
+                '  {% for service in services %}<li class="card"><a href="{{ service.link }}">'
+                '{{ service.name }}</a></li>{% endfor %}\n'
+                '  </ul>\n'
+                f'  <p class="text-base">{_text(rng, 60)}</p>\n'
+                '</section>\n'
+            )
+
+    asset_urls = []
+    for k in range(assets):
+        kind = "css" if k % 2 == 0 else "js"
+        directory = os.path.join(shared, "assets", kind)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"synthetic-{k}.{kind}"), "w") as f:
+            if kind == "css":
+                f.write("".join(f".synthetic-{j} .rule-{k}-{n} {{ margin: {n}px; color: #{k % 256:02x}{n:04x}; }}\n"
+                                for j in range(max(components, 1)) for n in range(20)))
+            else:
+                f.write("".join(f"function synthetic_{k}_{n}(el) {{ el.classList.add('rule-{k}-{n}'); }}\n"
+                                for n in range(40)))
+        asset_urls.append(f"/assets/{kind}/synthetic-{k}.{kind}")
+
+    page_paths = []
+    for i in range(pages):
+        includes = "".join(f'    {{% include "components/synthetic-{(i + j) % components}.html" %}}\n'
+                           for j in range(components))
+        links = "".join(
+            f'    <link rel="stylesheet" href="{url}">\n' if url.endswith(".css") else
+            f'    <script src="{url}" defer></script>\n'
+            for url in asset_urls[i % max(len(asset_urls), 1):][:4]
+        )
+        path = os.path.join(template_dir, "pages", f"page-{i:04d}.html")
+        with open(path, "w") as f:
+            f.write(
+                '{% extends "base.html" %}\n'
+                f"{{% set page_title = 'Page {i}' %}}\n"
+                "{% block content %}\n"
+                f"{links}"
+                f'    <article class="prose"><p>{_text(rng, 120)}</p></article>\n'
+                f"{includes}"
+                "{% endblock %}\n"
+            )
+        page_paths.append(path)
+
+    config = {
+        "title": "Synthetic Co",
+        "domain": "bench.example",
+        "components": ["services", "about", "contact"],
+        "variables": {
+            "company_name": "Synthetic Co",
+            "company_description": _text(rng, 12),
+            "hero_title": _text(rng, 4),
+            "hero_description": _text(rng, 16),
+            "services": [{"name": f"Service {s}", "link": "/services/"} for s in range(12)],
+            "stats": [{"title": "Sites", "value": "100+", "description": "Built"}]
+        }
+    }
+    if languages > 1:
+        langs = LANGUAGES[:languages]
+        config["languages"] = langs
+        config["default_language"] = langs[0]
+        config["variables"]["translations"] = {lang: {"hero_title": f"{_text(rng, 4)} ({lang})"} for lang in langs}
+    return config, page_paths
+
+
+def search_console(rows: int, seed: int = 0) -> Dict:
+    """Per-page Search Console rows (clicks, impressions, CTR %, position)."""
+    rng = random.Random(seed)
+    pages = []
+    for i in range(rows):
+        impressions = rng.randint(10, 50000)
+        clicks = int(impressions * rng.uniform(0.001, 0.12))
+        pages.append({
+            "url": f"https://bench.example/page-{i}/",
+            "clicks": clicks,
+            "impressions": impressions,
+            "ctr": round(100 * clicks / impressions, 2),
+            "position": round(rng.uniform(1, 60), 1)
+        })
+    return {"pages": pages}
+
+
+def search_console_export(path: str, rows: int, queries_per_page: int = 10, seed: int = 0) -> int:
+    """Write a gzipped Search Console page/query CSV export; returns its size in bytes."""
+    rng = random.Random(seed)
+    with gzip.open(path, 'wt', encoding='utf-8', newline='', compresslevel=1) as f:
+        f.write("Top pages,Query,Clicks,Impressions,CTR,Position\n")
+        for i in range(rows):
+            impressions = rng.randint(10, 50000)
+            clicks = int(impressions * rng.uniform(0.001, 0.12))
+            f.write(f"https://bench.example/page-{i // queries_per_page}/,{_text(rng, 3)},"
+                    f"{clicks},{impressions},{100 * clicks / impressions:.2f}%,{rng.uniform(1, 60):.1f}\n")
+    return os.path.getsize(path)
+
+
+def reviews(count: int, seed: int = 0) -> Dict:
+    """Recent reviews, a share of them unanswered."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    recent = []
+    for i in range(count):
+        rating = rng.choice([1, 2, 3, 4, 5, 5, 5, 4])
+        recent.append({
+            "author": f"Customer {i}",
+            "rating": rating,
+            "text": _text(rng, 30),
+            "date": (now - timedelta(hours=rng.uniform(0, 24 * 30))).isoformat(),
+            "response": _text(rng, 12) if rng.random() < 0.8 else None
+        })
+    return {"recent": recent}
+
+
+def content(pages: int, seed: int = 0) -> Dict:
+    """Content inventory rows (freshness, length, keyword density)."""
+    rng = random.Random(seed)
+    today = datetime.now()
+    return {"pages": [{
+        "url": f"https://bench.example/page-{i}/",
+        "last_updated": (today - timedelta(days=rng.randint(0, 400))).date().isoformat(),
+        "word_count": rng.randint(200, 3000),
+        "keyword_density": round(rng.uniform(0.3, 2.0), 2)
+    } for i in range(pages)]}
+
+
+def site_data(rows: int, seed: int = 0) -> Dict:
+    """A full SEOSentinel input: traffic, Search Console, reviews and content."""
+    return {
+        "traffic": {"current": 9000, "previous": 10000},
+        "search_console": search_console(rows, seed),
+        "reviews": reviews(max(rows // 10, 1), seed),
+        "content": content(rows, seed)
+    }
+
+
+def uptime_results(count: int, seed: int = 0) -> List[Dict]:
+    """Check results in UptimeMonitor.check_site's 'checks' shape."""
+    rng = random.Random(seed)
+    results = []
+    for _ in range(count):
+        checks = {}
+        for name in ("http", "https", "ssl", "dns"):
+            roll = rng.random()
+            status = "ok" if roll < 0.95 else ("warning" if roll < 0.98 else "error")
+            checks[name] = {"status": status, "response_time": round(rng.uniform(0.05, 2.0), 3)}
+        results.append(checks)
+    return results
+
+
+def catalog(count: int, seed: int = 0) -> List[Dict]:
+    """Product, service and location specs, sharing brands, providers and addresses."""
+    rng = random.Random(seed)
+    providers = [f"Provider {n}" for n in range(20)]
+    brands = [f"Brand {n}" for n in range(50)]
+    cities = [("Stockholm", 59.33, 18.07), ("Malmö", 55.6, 13.0), ("Göteborg", 57.71, 11.97)]
+    specs = []
+    for i in range(count):
+        kind = rng.random()
+        if kind < 0.6:
+            specs.append({"type": "product", "name": f"Product {i}", "description": _text(rng, 12),
+                          "sku": f"SKU-{i:07d}", "brand": rng.choice(brands),
+                          "url": f"https://bench.example/products/{i}/",
+                          "price": f"{rng.randint(5, 500)}.00", "currency": "SEK", "availability": "InStock"})
+        elif kind < 0.9:
+            specs.append({"type": "service", "name": f"Service {i}", "description": _text(rng, 12),
+                          "provider": rng.choice(providers), "area_served": rng.choice(cities)[0],
+                          "price": f"{rng.randint(100, 2000)}", "currency": "SEK"})
+        else:
+            city, latitude, longitude = rng.choice(cities)
+            specs.append({"type": "local_business", "business_name": rng.choice(providers),
+                          "address": {"street": "1 Main St", "city": city, "region": "SE",
+                                      "postal_code": "111 22", "country": "SE"},
+                          "geo": {"latitude": latitude, "longitude": longitude},
+                          "telephone": "+46 8 123 456", "opening_hours": ["Mo-Fr 08:00-17:00"]})
+    return specs
@@ -0,0 +1,18 @@
+"""
+Build Module: Incremental build pipeline helpers for WebsiteBuilder.
+Tracks copied and rendered files so repeat builds only touch what changed.
+"""
+
+from .manifest import BuildManifest
+from .blobstore import BlobStore
+from .batch import build_sites
+from .depgraph import DependencyGraph
+from .site_config import SiteConfigSession
+
+__all__ = [
+    'BuildManifest',
+    'BlobStore',
+    'build_sites',
+    'DependencyGraph',
+    'SiteConfigSession'
+]
@@ -0,0 +1,251 @@
+"""
+Asset stage: content fingerprinting and precompressed outputs.
+
+Assets under ``public_html/assets`` get a ``name.<hash>.ext`` twin that can
+be served with far-future cache headers, rendered HTML is rewritten to
+reference those names, and every text output gets ``.gz`` / ``.br``
+siblings at maximum compression for nginx ``gzip_static`` / ``brotli_static``.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from bot_core.monitoring.tracing import traced
+
+from .fsutil import file_digest, write_json_if_changed
+from .manifest import BuildManifest
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+ASSET_MANIFEST_NAME = "asset_manifest.json"
+FINGERPRINT_PREFIXES = ("assets/css/", "assets/js/", "assets/images/")
+FINGERPRINT_LENGTH = 10
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".mjs", ".svg", ".json", ".xml", ".txt", ".map"}
+MIN_COMPRESS_SIZE = 256
+COMPRESS_CHUNK_SIZE = 1024 * 1024
+
+# (encoding, file suffix, level)
+ENCODINGS = [("gzip", ".gz", 9), ("br", ".br", 11)]
+
+URL_ATTRIBUTE = re.compile(r'''(?P<attr>\b(?:href|src|content|data-src)\s*=\s*)(?P<q>["'])(?P<url>[^"']+)(?P=q)''')
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprinted_name(key: str, digest: str) -> str:
+    """assets/css/base.css -> assets/css/base.<hash>.css"""
+    stem, ext = os.path.splitext(key)
+    return f"{stem}.{digest[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def _compress_file(src: str, dst: str, encoding: str, level: int) -> None:
+    """Compress src into dst in chunks, so large pages never sit in memory whole."""
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        if encoding == "gzip":
+            # mtime=0 keeps the output deterministic
+            with gzip.GzipFile(filename="", mode="wb", fileobj=fout, compresslevel=level, mtime=0) as gz:
+                shutil.copyfileobj(fin, gz, COMPRESS_CHUNK_SIZE)
+            return
+        compressor = brotli.Compressor(quality=level)
+        for chunk in iter(lambda: fin.read(COMPRESS_CHUNK_SIZE), b""):
+            fout.write(compressor.process(chunk))
+        fout.write(compressor.finish())
+
+
+class AssetPipeline:
+    def __init__(self, manifest: BuildManifest, asset_manifest_path: str,
+                 max_workers: Optional[int] = None):
+        """
+        Args:
+            manifest: The site's build manifest (also decides where files go)
+            asset_manifest_path: Where to write the deploy-facing asset manifest
+            max_workers: Threads used for compression (zlib and brotli release the GIL)
+        """
+        self.manifest = manifest
+        self.asset_manifest_path = asset_manifest_path
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.url_map: Dict[str, str] = {}
+        # page output -> asset URLs the page references
+        self.references: Dict[str, Set[str]] = {}
+        self.encodings = [e for e in ENCODINGS if e[0] != "br" or brotli is not None]
+        if brotli is None:
+            logger.info("brotli is not installed; only .gz files will be precompressed")
+
+    @traced()
+    def fingerprint(self) -> Dict[str, str]:
+        """
+        Give every copied asset a content-hashed twin.
+
+        Returns the URL map (/assets/css/base.css -> /assets/css/base.<hash>.css)
+        used to rewrite HTML. The original files stay in place for references
+        that are not rewritten (e.g. URLs built in JavaScript).
+        """
+        self.url_map = {}
+        for key, entry in list(self.manifest.files.items()):
+            if "source" not in entry or not key.startswith(FINGERPRINT_PREFIXES):
+                continue
+            target = fingerprinted_name(key, entry["hash"])
+            if self.manifest.is_current(target, entry["hash"]):
+                self.manifest.keep(target, fingerprint_of=key)
+            else:
+                self.manifest.link_output(target, entry["source"], entry["hash"], fingerprint_of=key)
+            self.url_map["/" + key] = "/" + target
+        return self.url_map
+
+    def load_url_map(self) -> Dict[str, str]:
+        """Return the URL map from the last written asset manifest."""
+        try:
+            with open(self.asset_manifest_path, 'r') as f:
+                return json.load(f).get("assets", {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def rewrite_html(self, html: str, page: Optional[Dict] = None) -> str:
+        """Point asset references in a rendered page at their fingerprinted names."""
+        if not self.url_map:
+            return html
+        referenced = self.references.setdefault(page["output"], set()) if page else set()
+
+        def replace(match):
+            path, sep, suffix = _split_url(match.group("url"))
+            relative = not path.startswith("/")
+            prefix = "./" if path.startswith("./") else ""
+            url = "/" + path[len(prefix):] if relative else path
+            target = self.url_map.get(url)
+            if target is None:
+                return match.group(0)
+            referenced.add(url)
+            if relative:
+                target = prefix + target[1:]
+            q = match.group("q")
+            return f"{match.group('attr')}{q}{target}{sep}{suffix}{q}"
+
+        return URL_ATTRIBUTE.sub(replace, html)
+
+    @traced()
+    def precompress(self, keys: Optional[Iterable[str]] = None) -> Dict:
+        """
+        Write .gz/.br siblings for every compressible output (or only for keys).
+
+        Compressed variants are keyed by the source hash, so an unchanged file
+        is never recompressed, and with a blob store a variant produced for one
+        site is linked into every other site that ships the same file. Each
+        variant is stored under its own content hash; the key is kept as its
+        cache_key.
+        """
+        jobs: List[Tuple[str, str, str, str, int]] = []
+        report = {"compressed": [], "reused": 0}
+        store = self.manifest.store
+
+        if keys is None:
+            candidates = list(self.manifest.files.items())
+        else:
+            candidates = [(key, self.manifest.files[key]) for key in keys if key in self.manifest.files]
+
+        for key, entry in candidates:
+            if "compressed_from" in entry or entry.get("size", 0) < MIN_COMPRESS_SIZE:
+                continue
+            if os.path.splitext(key)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            for encoding, suffix, level in self.encodings:
+                variant_key = key + suffix
+                cache_key = self._variant_key(entry["hash"], encoding, level)
+                if self.manifest.is_current(variant_key, cache_key, field="cache_key"):
+                    self.manifest.keep(variant_key, compressed_from=key, encoding=encoding)
+                    report["reused"] += 1
+                    continue
+                digest = store.resolve(cache_key) if store is not None else None
+                if digest is not None:
+                    store.materialize(digest, self.manifest.path_for(variant_key))
+                    self._record_variant(variant_key, digest, cache_key, key, encoding)
+                    report["reused"] += 1
+                else:
+                    jobs.append((key, variant_key, cache_key, encoding, level))
+
+        if jobs:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results = pool.map(self._compress_job, jobs)
+                for (key, variant_key, cache_key, encoding, _), (tmp_path, digest) in zip(jobs, results):
+                    try:
+                        self.manifest.link_output(variant_key, tmp_path, digest, cache_key=cache_key,
+                                                  compressed_from=key, encoding=encoding)
+                    finally:
+                        os.unlink(tmp_path)
+                    if store is not None:
+                        store.alias(cache_key, digest)
+                    report["compressed"].append(variant_key)
+
+        return report
+
+    def _compress_job(self, job: Tuple[str, str, str, str, int]) -> Tuple[str, str]:
+        """Compress one output into a temporary file; returns its path and content hash."""
+        key, variant_key, _, encoding, level = job
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.manifest.path_for(variant_key)),
+                                        prefix='.tmp-')
+        os.close(fd)
+        try:
+            _compress_file(self.manifest.path_for(key), tmp_path, encoding, level)
+            return tmp_path, file_digest(tmp_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _record_variant(self, variant_key: str, digest: str, cache_key: str, key: str, encoding: str) -> None:
+        st = os.stat(self.manifest.path_for(variant_key))
+        self.manifest.record(variant_key, {
+            "hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            "cache_key": cache_key, "compressed_from": key, "encoding": encoding
+        })
+
+    @staticmethod
+    def _variant_key(source_hash: str, encoding: str, level: int) -> str:
+        return hashlib.sha256(f"{source_hash}:{encoding}:{level}".encode("ascii")).hexdigest()
+
+    @traced()
+    def write_asset_manifest(self) -> Dict:
+        """
+        Write the deploy-facing asset manifest.
+
+        ``assets`` maps logical URLs to fingerprinted URLs; ``files`` lists
+        every output with its hash, whether it is safe to cache forever,
+        and its precompressed variants.
+        """
+        files = {}
+        for key, entry in sorted(self.manifest.files.items()):
+            if "compressed_from" in entry:
+                continue
+            files[key] = {
+                "hash": entry["hash"],
+                "size": entry["size"],
+                "immutable": any(kind in entry for kind in ("fingerprint_of", "purged_from", "image_of")),
+                "encodings": {}
+            }
+        for key, entry in self.manifest.files.items():
+            parent = files.get(entry.get("compressed_from"))
+            if parent is not None:
+                parent["encodings"][entry["encoding"]] = {"path": key, "size": entry["size"]}
+
+        data = {"version": 1, "assets": dict(sorted(self.url_map.items())), "files": files}
+        write_json_if_changed(self.asset_manifest_path, data)
+        return data
+
+
+def _split_url(url: str) -> Tuple[str, str, str]:
+    """Split off a query string or fragment: 'a.css?v=1' -> ('a.css', '?', 'v=1')."""
+    for sep in ("?", "#"):
+        if sep in url:
+            path, suffix = url.split(sep, 1)
+            return path, sep, suffix
+    return url, "", ""
+
@@ -0,0 +1,151 @@
+"""
+Batch builder: rebuilds many sites across a bounded process pool.
+"""
+
+import glob
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Union
+
+DEFAULT_TEMPLATE = "business"
+
+
+def discover_site_configs(websites_dir: str) -> List[str]:
+    """Return every websites/*/config/site_config.json path, sorted."""
+    pattern = os.path.join(websites_dir, "*", "config", "site_config.json")
+    return sorted(glob.glob(pattern))
+
+
+def load_site_job(config_path: str) -> Dict:
+    """
+    Turn a config file into a build job.
+
+    Accepts either a stored site_config.json (which carries its own domain)
+    or a job file of the form {"domain": ..., "config": {...}, "template": ...}.
+    """
+    with open(config_path, 'r') as f:
+        data = json.load(f)
+
+    if "config" in data and isinstance(data["config"], dict):
+        config = data["config"]
+        domain = data.get("domain") or config.get("domain")
+        template = data.get("template") or config.get("template", DEFAULT_TEMPLATE)
+    else:
+        config = data
+        domain = data.get("domain")
+        template = data.get("template", DEFAULT_TEMPLATE)
+
+    if not domain:
+        # websites/<domain>/config/site_config.json
+        domain = os.path.basename(os.path.dirname(os.path.dirname(os.path.abspath(config_path))))
+
+    return {"domain": domain, "config": config, "template": template}
+
+
+def _build_site(job: Dict, root_dir: Optional[str]) -> Dict:
+    """Build a single site. Runs inside a worker process and never raises."""
+    from bot_core.builder import WebsiteBuilder
+
+    started = time.perf_counter()
+    result = {"domain": job["domain"], "pid": os.getpid()}
+    try:
+        builder = WebsiteBuilder(root_dir)
+        builder.create_website(job["domain"], dict(job["config"]), job.get("template", DEFAULT_TEMPLATE))
+        result["site_path"] = builder.build()
+        sync = builder.last_sync_report or {}
+        result["changes"] = {
+            "added": len(sync.get("added", [])),
+            "updated": len(sync.get("updated", [])),
+            "removed": len(sync.get("removed", [])),
+            "unchanged": sync.get("unchanged", 0)
+        }
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["duration"] = time.perf_counter() - started
+    return result
+
+
+def build_sites(
+    sites: Optional[List[Union[Dict, str]]] = None,
+    max_workers: Optional[int] = None,
+    root_dir: Optional[str] = None
+) -> Dict:
+    """
+    Build several sites in parallel.
+
+    Args:
+        sites: Build jobs ({"domain", "config", "template"}) or config file
+            paths. Defaults to every site found under websites/.
+        max_workers: Upper bound on worker processes (defaults to CPU count)
+        root_dir: Project root passed through to each WebsiteBuilder
+
+    Returns:
+        A report with one result per site (in input order) plus totals.
+        A failing site is recorded as an error and does not stop the others.
+    """
+    if root_dir is None:
+        root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if sites is None:
+        sites = discover_site_configs(os.path.join(root_dir, "websites"))
+
+    jobs = []
+    results: List[Optional[Dict]] = []
+    for site in sites:
+        try:
+            jobs.append(load_site_job(site) if isinstance(site, str) else site)
+            results.append(None)
+        except Exception as e:
+            jobs.append(None)
+            results.append({"domain": str(site), "status": "error",
+                            "error": f"{type(e).__name__}: {e}", "duration": 0.0})
+
+    pending = [i for i, job in enumerate(jobs) if job is not None]
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(pending) or 1))
+
+    started = time.perf_counter()
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_build_site, jobs[i], root_dir): i for i in pending}
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # The worker itself died (e.g. killed or out of memory)
+                    results[index] = {"domain": jobs[index]["domain"], "status": "error",
+                                      "error": f"{type(e).__name__}: {e}", "duration": 0.0}
+    wall_time = time.perf_counter() - started
+
+    succeeded = sum(1 for r in results if r["status"] == "ok")
+    return {
+        "sites": results,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded,
+        "workers": workers,
+        "wall_time": wall_time,
+        "cpu_time": sum(r.get("duration", 0.0) for r in results)
+    }
+
+
+def format_report(report: Dict) -> str:
+    """Render a batch report as a plain-text table."""
+    lines = [f"{'domain':<40} {'status':<7} {'seconds':>8}  changes"]
+    for result in report["sites"]:
+        changes = result.get("changes")
+        summary = (
+            f"+{changes['added']} ~{changes['updated']} -{changes['removed']} ={changes['unchanged']}"
+            if changes else result.get("error", "")
+        )
+        lines.append(f"{result['domain']:<40} {result['status']:<7} {result['duration']:>8.3f}  {summary}")
+    lines.append(
+        f"{report['succeeded']}/{report['total']} sites built in {report['wall_time']:.3f}s "
+        f"with {report['workers']} workers (sum of site times {report['cpu_time']:.3f}s)"
+    )
+    return "\n".join(lines)
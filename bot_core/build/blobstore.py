@@ -0,0 +1,297 @@
+"""
+Content-addressed blob store for files shared between sites.
+
+Each unique file is stored once under ``objects/<aa>/<rest of sha256>`` and
+site trees point at it through hardlinks (or reflinks), so hundreds of sites
+built from the same shared assets share a single copy on disk and in the
+page cache. Copies are only made when a link is impossible, e.g. across
+filesystems, and then with copy_file_range so the data never passes
+through user space.
+
+Derived files whose content is only known after producing them (compressed
+variants, image derivatives) are still stored under their content hash. A
+cache key for how they were made (source hash and settings) is mapped to
+that hash under ``keys/``, so other builds find them without redoing the work.
+"""
+
+import errno
+import glob
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+from .fsutil import file_digest
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# ioctl(dest_fd, FICLONE, src_fd) from linux/fs.h
+FICLONE = 0x40049409
+
+STRATEGIES = ("hardlink", "reflink", "copy")
+
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    def __init__(self, root: str, prefer: str = "hardlink"):
+        """
+        Open (or create) a blob store.
+
+        Args:
+            root: Store directory; must be on the same filesystem as the site
+                trees for links to work
+            prefer: "hardlink" (shares inode and page cache) or "reflink"
+                (copy-on-write clone, safe against in-place edits)
+        """
+        if prefer not in STRATEGIES[:2]:
+            raise ValueError(f"Unknown link strategy: {prefer}")
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.keys_dir = os.path.join(root, "keys")
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.keys_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.strategies = (prefer,) + tuple(s for s in STRATEGIES if s != prefer)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def contains(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def put(self, src: str, digest: Optional[str] = None) -> str:
+        """Add a file to the store (no-op if its content is already there)."""
+        digest = digest or file_digest(src)
+        blob = self.path_for(digest)
+        if os.path.exists(blob):
+            return digest
+
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        os.close(fd)
+        try:
+            shutil.copy2(src, tmp_path)
+            # Blobs are shared by many sites; discourage in-place edits
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, blob)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    def put_bytes(self, data: bytes, digest: Optional[str] = None) -> str:
+        """Add generated bytes to the store (digest is their sha256, computed if not given)."""
+        digest = digest or hashlib.sha256(data).hexdigest()
+        blob = self.path_for(digest)
+        if os.path.exists(blob):
+            return digest
+
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, blob)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return digest
+
+    def _key_path(self, key: str) -> str:
+        return os.path.join(self.keys_dir, key[:2], key[2:])
+
+    def alias(self, key: str, digest: str) -> None:
+        """Record that the work identified by key produced the blob digest."""
+        path = self._key_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(digest)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def resolve(self, key: str) -> Optional[str]:
+        """Digest of the blob recorded for key, or None if there is none (any more)."""
+        try:
+            with open(self._key_path(key)) as f:
+                digest = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return digest if digest and self.contains(digest) else None
+
+    def is_linked(self, path: str, digest: str) -> bool:
+        """True if path is a hardlink to the blob for digest."""
+        try:
+            return os.path.samefile(path, self.path_for(digest))
+        except FileNotFoundError:
+            return False
+
+    def verify(self, digest: str) -> bool:
+        """Re-hash a blob, dropping it if its content no longer matches."""
+        blob = self.path_for(digest)
+        if not os.path.exists(blob):
+            return False
+        if file_digest(blob) == digest:
+            return True
+        logger.warning("Blob %s was modified in place; discarding it", digest)
+        os.unlink(blob)
+        return False
+
+    def materialize(self, digest: str, dst: str) -> str:
+        """
+        Place the blob at dst, atomically replacing whatever is there.
+
+        Returns the strategy that worked: "hardlink", "reflink" or "copy".
+        """
+        blob = self.path_for(digest)
+        directory = os.path.dirname(dst)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = os.path.join(directory, f".tmp-{digest[:16]}-{os.getpid()}")
+
+        for strategy in self.strategies:
+            if os.path.lexists(tmp_path):
+                os.unlink(tmp_path)
+            try:
+                if strategy == "hardlink":
+                    os.link(blob, tmp_path)
+                elif strategy == "reflink":
+                    _reflink(blob, tmp_path)
+                else:
+                    _kernel_copy(blob, tmp_path)
+                os.replace(tmp_path, dst)
+                return strategy
+            except OSError as e:
+                if strategy == "copy":
+                    if os.path.lexists(tmp_path):
+                        os.unlink(tmp_path)
+                    raise
+                if e.errno == errno.EXDEV:
+                    # Neither links nor clones can cross filesystems
+                    return self._copy_into(blob, tmp_path, dst)
+        raise AssertionError("unreachable")
+
+    def _copy_into(self, blob: str, tmp_path: str, dst: str) -> str:
+        if os.path.lexists(tmp_path):
+            os.unlink(tmp_path)
+        try:
+            _kernel_copy(blob, tmp_path)
+            os.replace(tmp_path, dst)
+        except BaseException:
+            if os.path.lexists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return "copy"
+
+    def digests(self) -> Iterator[str]:
+        """Yield the digest of every stored blob."""
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for rest in os.listdir(prefix_dir):
+                yield prefix + rest
+
+    def gc(self, referenced: Iterable[str], grace_seconds: float = 300,
+           dry_run: bool = False) -> Dict:
+        """
+        Delete blobs that no manifest references.
+
+        Blobs (and abandoned temp files) younger than grace_seconds are kept so
+        a build running concurrently does not lose files it just stored. Cache
+        keys whose blob is gone are dropped.
+        """
+        keep = set(referenced)
+        cutoff = time.time() - grace_seconds
+        result = {"kept": 0, "removed": 0, "freed_bytes": 0, "keys_removed": 0}
+
+        for digest in list(self.digests()):
+            blob = self.path_for(digest)
+            st = os.stat(blob)
+            if digest in keep or st.st_ctime > cutoff:
+                result["kept"] += 1
+                continue
+            result["removed"] += 1
+            result["freed_bytes"] += st.st_size
+            if not dry_run:
+                os.unlink(blob)
+                try:
+                    os.rmdir(os.path.dirname(blob))
+                except OSError:
+                    pass
+
+        for prefix in os.listdir(self.keys_dir):
+            for rest in os.listdir(os.path.join(self.keys_dir, prefix)):
+                if self.resolve(prefix + rest) is None:
+                    result["keys_removed"] += 1
+                    if not dry_run:
+                        os.unlink(self._key_path(prefix + rest))
+
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            if os.stat(path).st_mtime < cutoff and not dry_run:
+                os.unlink(path)
+
+        return result
+
+
+def referenced_digests(websites_dir: str) -> Set[str]:
+    """Collect every content hash recorded in the sites' build manifests."""
+    digests = set()
+    pattern = os.path.join(websites_dir, "*", "config", "build_manifest.json")
+    for manifest_path in glob.glob(pattern):
+        with open(manifest_path, 'r') as f:
+            files = json.load(f).get("files", {})
+        digests.update(entry["hash"] for entry in files.values() if "hash" in entry)
+    return digests
+
+
+def _reflink(src: str, dst: str) -> None:
+    """Clone src into a new file dst sharing its extents (btrfs, xfs, ...)."""
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflinks are not supported on this platform")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError:
+            fdst.close()
+            os.unlink(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def _kernel_copy(src: str, dst: str) -> None:
+    """Copy src to dst with copy_file_range, falling back to a buffered copy."""
+    with open(src, 'rb', buffering=0) as fsrc, open(dst, 'wb', buffering=0) as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+        copy_file_range = getattr(os, "copy_file_range", None)
+        try:
+            while copy_file_range and copied < size:
+                count = copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                if count == 0:
+                    break
+                copied += count
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+        if copied < size:
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            shutil.copyfileobj(fsrc, fdst)
+    shutil.copystat(src, dst)
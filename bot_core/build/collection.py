@@ -0,0 +1,638 @@
+"""
+Collections: posts kept as files, indexed on disk and rendered lazily.
+
+A collection (the blog component) is a directory of post files, each
+starting with a front-matter block:
+
+    ---
+    title: Launching our new service
+    date: 2024-05-01
+    tags: news, services
+    ---
+    <p>Post body...</p>
+
+Front-matter is indexed into an SQLite database in the site's config/
+directory, and only files whose size or mtime changed are read again. A
+post's body is loaded only when that post is rendered. Archive, tag and
+feed pages are generated from the index page by page, so memory use does
+not grow with the number of posts.
+
+Every output stores a signature of what went into it (post hashes, page
+links, templates, site config). Outputs whose signature is unchanged are
+not rendered again. Archive pages are numbered from the oldest post, so a
+new post changes the newest pages only instead of shifting every page.
+"""
+
+import hashlib
+import html
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from bot_core.monitoring.tracing import traced
+
+from .css import html_tokens
+from .manifest import BuildManifest
+
+try:
+    import markdown
+except ImportError:  # optional dependency
+    markdown = None
+
+INDEX_NAME = "collections.db"
+POST_EXTENSIONS = {".html", ".md"}
+FRONT_MATTER = "---"
+SUMMARY_LENGTH = 200
+
+# Bump when the index schema or signature inputs change
+INDEX_VERSION = 1
+
+DATE_PREFIX = re.compile(r"^(\d{4}-\d{2}-\d{2})-")
+TAG = re.compile(r"<[^>]+>")
+
+logger = logging.getLogger(__name__)
+
+
+def slugify(text: str) -> str:
+    """Lowercase URL segment for a title or tag (e.g. 'Hello, World' -> 'hello-world')."""
+    return re.sub(r"[^\w]+", "-", text.lower(), flags=re.UNICODE).strip("-") or "post"
+
+
+def parse_front_matter(text: str) -> Tuple[Dict[str, object], str]:
+    """
+    Split a post into its front-matter fields and body.
+
+    Fields are ``key: value`` lines; ``tags`` is a comma separated list
+    (optionally in [brackets]) and ``draft`` a boolean. Files without a
+    front-matter block are all body.
+    """
+    lines = text.split("\n")
+    if not lines or lines[0].strip() != FRONT_MATTER:
+        return {}, text
+    meta: Dict[str, object] = {}
+    for number, line in enumerate(lines[1:], start=1):
+        if line.strip() == FRONT_MATTER:
+            return meta, "\n".join(lines[number + 1:])
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        key, sep, value = line.partition(":")
+        if not sep:
+            raise ValueError(f"Invalid front-matter line {number + 1}: {line!r}")
+        key, value = key.strip().lower(), value.strip().strip("\"'")
+        if key == "tags":
+            meta[key] = [tag.strip().strip("\"'") for tag in value.strip("[]").split(",") if tag.strip()]
+        elif key == "draft":
+            meta[key] = value.lower() in ("true", "yes", "1")
+        else:
+            meta[key] = value
+    raise ValueError("Front-matter block is not closed")
+
+
+def render_body(body: str, extension: str) -> str:
+    """Post body as HTML. Markdown needs the optional markdown package."""
+    if extension != ".md":
+        return body
+    if markdown is not None:
+        return markdown.markdown(body)
+    # Without markdown, keep paragraphs and escape everything else
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", body) if p.strip()]
+    return "\n".join(f"<p>{html.escape(p)}</p>" for p in paragraphs)
+
+
+def _parse_date(value: str, source: str) -> str:
+    """Normalize a front-matter date to a sortable ISO string."""
+    for parse in (date.fromisoformat, datetime.fromisoformat):
+        try:
+            return parse(value).isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"{source}: invalid date {value!r} (expected YYYY-MM-DD)")
+
+
+class Post:
+    """One indexed post. The body is read from disk on first access."""
+
+    __slots__ = ("source", "slug", "title", "date", "tags", "summary", "hash", "url", "_body")
+
+    def __init__(self, source: str, slug: str, title: str, date: str, tags: List[str],
+                 summary: str, hash: str, url: str):
+        self.source = source
+        self.slug = slug
+        self.title = title
+        self.date = date
+        self.tags = tags
+        self.summary = summary
+        self.hash = hash
+        self.url = url
+        self._body: Optional[str] = None
+
+    @property
+    def body(self) -> str:
+        if self._body is None:
+            with open(self.source, 'r', encoding='utf-8') as f:
+                _, body = parse_front_matter(f.read())
+            self._body = render_body(body, os.path.splitext(self.source)[1])
+        return self._body
+
+
+class CollectionIndex:
+    """On-disk index of every collection of a site, plus output signatures."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite database file, e.g. <site>/config/collections.db
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self._migrate()
+
+    @classmethod
+    def for_site(cls, site_path: str) -> "CollectionIndex":
+        return cls(os.path.join(site_path, "config", INDEX_NAME))
+
+    def _migrate(self) -> None:
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_VERSION:
+            self.db.executescript("""
+                DROP TABLE IF EXISTS posts;
+                DROP TABLE IF EXISTS post_tags;
+                DROP TABLE IF EXISTS outputs;
+                DROP TABLE IF EXISTS state;
+            """)
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS posts (
+                collection TEXT NOT NULL,
+                source TEXT NOT NULL,
+                slug TEXT NOT NULL,
+                title TEXT NOT NULL,
+                date TEXT NOT NULL,
+                tags TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                tokens TEXT NOT NULL,
+                draft INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                hash TEXT NOT NULL,
+                PRIMARY KEY (collection, source)
+            );
+            CREATE INDEX IF NOT EXISTS posts_by_date ON posts (collection, draft, date, slug);
+            CREATE TABLE IF NOT EXISTS post_tags (
+                collection TEXT NOT NULL,
+                tag TEXT NOT NULL,
+                source TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS post_tags_by_tag ON post_tags (collection, tag);
+            CREATE INDEX IF NOT EXISTS post_tags_by_source ON post_tags (collection, source);
+            CREATE TABLE IF NOT EXISTS outputs (
+                collection TEXT NOT NULL,
+                key TEXT NOT NULL,
+                signature TEXT NOT NULL,
+                run INTEGER NOT NULL,
+                PRIMARY KEY (collection, key)
+            );
+            CREATE TABLE IF NOT EXISTS state (
+                collection TEXT PRIMARY KEY,
+                salt TEXT NOT NULL
+            );
+            PRAGMA user_version = {INDEX_VERSION};
+        """)
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class Collection:
+    def __init__(
+        self,
+        name: str,
+        manifest: BuildManifest,
+        index: CollectionIndex,
+        source_dir: str,
+        per_page: int = 10,
+        feed_items: int = 20,
+        title: Optional[str] = None
+    ):
+        """
+        Args:
+            name: Collection name; also its URL prefix and template directory
+                (e.g. "blog" -> /blog/ and blog/post.html, blog/list.html)
+            manifest: The site's build manifest
+            index: The site's collection index
+            source_dir: Directory holding the post files
+            per_page: Posts per archive and tag page
+            feed_items: Newest posts included in the Atom feed
+            title: Heading of the collection pages (defaults to the name)
+        """
+        if per_page < 1:
+            raise ValueError("per_page must be at least 1")
+        self.name = name
+        self.manifest = manifest
+        self.index = index
+        self.db = index.db
+        self.source_dir = source_dir
+        self.per_page = per_page
+        self.feed_items = feed_items
+        self.title = title or name.replace("-", " ").title()
+        # Set when refresh() added, changed or removed posts
+        self.dirty = False
+        self.report = {"posts": 0, "indexed": 0, "rendered": 0}
+        self.written: List[str] = []
+        self.removed: List[str] = []
+
+    # Indexing
+
+    @traced()
+    def refresh(self, paths: Optional[Iterable[str]] = None) -> int:
+        """
+        Bring the index in line with the post files.
+
+        With paths, only those files are checked (e.g. from a file watcher);
+        otherwise the whole source directory is scanned. Returns the number
+        of posts added, changed or removed.
+        """
+        changes = 0
+        if paths is None:
+            seen: Set[str] = set()
+            for source in self._post_files():
+                seen.add(source)
+                changes += self._refresh_file(source)
+            stale = [source for (source,) in self.db.execute(
+                "SELECT source FROM posts WHERE collection = ?", (self.name,)
+            ) if source not in seen]
+        else:
+            stale = []
+            for path in paths:
+                source = os.path.abspath(path)
+                if os.path.splitext(source)[1] not in POST_EXTENSIONS:
+                    continue
+                if os.path.isfile(source):
+                    changes += self._refresh_file(source)
+                else:
+                    stale.append(source)
+        for source in stale:
+            changes += self._forget(source)
+        self.db.commit()
+
+        self.report["indexed"] += changes
+        self.report["posts"] = self._count(None)
+        self.dirty = self.dirty or changes > 0
+        return changes
+
+    def _post_files(self) -> Iterator[str]:
+        for root, _, names in os.walk(self.source_dir):
+            for name in names:
+                if os.path.splitext(name)[1] in POST_EXTENSIONS and not name.startswith("."):
+                    yield os.path.join(root, name)
+
+    def _refresh_file(self, source: str) -> int:
+        st = os.stat(source)
+        row = self.db.execute(
+            "SELECT mtime_ns, size FROM posts WHERE collection = ? AND source = ?", (self.name, source)
+        ).fetchone()
+        if row == (st.st_mtime_ns, st.st_size):
+            return 0
+
+        with open(source, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            meta, body = parse_front_matter(data.decode("utf-8"))
+        except ValueError as e:
+            raise ValueError(f"{source}: {e}") from None
+
+        stem = os.path.splitext(os.path.basename(source))[0]
+        prefix = DATE_PREFIX.match(stem)
+        slug = slugify(str(meta.get("slug") or (stem[prefix.end():] if prefix else stem)))
+        raw_date = meta.get("date") or (prefix.group(1) if prefix else None)
+        if not raw_date:
+            raise ValueError(f"{source}: no date in front-matter or file name")
+        body_html = render_body(body, os.path.splitext(source)[1])
+        summary = str(meta.get("summary") or meta.get("description") or "")
+        if not summary:
+            text = " ".join(html.unescape(TAG.sub(" ", body_html)).split())
+            summary = text if len(text) <= SUMMARY_LENGTH else text[:SUMMARY_LENGTH].rsplit(" ", 1)[0] + "…"
+        tags = list(dict.fromkeys(meta.get("tags") or []))
+
+        duplicate = self.db.execute(
+            "SELECT source FROM posts WHERE collection = ? AND slug = ? AND source != ?",
+            (self.name, slug, source)
+        ).fetchone()
+        if duplicate:
+            raise ValueError(f"{source}: slug {slug!r} is already used by {duplicate[0]}")
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO posts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (self.name, source, slug, str(meta.get("title") or stem.replace("-", " ").title()),
+             _parse_date(str(raw_date), source), json.dumps(tags), summary,
+             " ".join(sorted(html_tokens(body_html))), int(bool(meta.get("draft"))),
+             st.st_mtime_ns, st.st_size, digest)
+        )
+        self.db.execute("DELETE FROM post_tags WHERE collection = ? AND source = ?", (self.name, source))
+        self.db.executemany(
+            "INSERT INTO post_tags VALUES (?, ?, ?)", [(self.name, tag, source) for tag in tags]
+        )
+        return 1
+
+    def _forget(self, source: str) -> int:
+        cursor = self.db.execute("DELETE FROM posts WHERE collection = ? AND source = ?", (self.name, source))
+        self.db.execute("DELETE FROM post_tags WHERE collection = ? AND source = ?", (self.name, source))
+        return cursor.rowcount
+
+    def used_tokens(self) -> Set[str]:
+        """Class names and ids used by post bodies, for the CSS purge."""
+        tokens: Set[str] = set()
+        for (row,) in self.db.execute("SELECT tokens FROM posts WHERE collection = ? AND draft = 0", (self.name,)):
+            tokens.update(row.split())
+        return tokens
+
+    # Queries
+
+    def _post(self, row) -> Post:
+        source, slug, title, date_, tags, summary, digest = row
+        return Post(source, slug, title, date_, json.loads(tags), summary, digest, self.post_url(slug))
+
+    _COLUMNS = "p.source, p.slug, p.title, p.date, p.tags, p.summary, p.hash"
+
+    def posts(self, newest_first: bool = False, limit: Optional[int] = None) -> Iterator[Post]:
+        """Published posts in date order, read from the index as they are consumed."""
+        order = "DESC" if newest_first else "ASC"
+        query = (f"SELECT {self._COLUMNS} FROM posts p WHERE p.collection = ? AND p.draft = 0 "
+                 f"ORDER BY p.date {order}, p.slug {order}")
+        params: Tuple = (self.name,)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        # A dedicated cursor, so rendering can query the index meanwhile
+        for row in self.db.cursor().execute(query, params):
+            yield self._post(row)
+
+    def tagged(self, tag: str, newest_first: bool = False, limit: Optional[int] = None) -> Iterator[Post]:
+        order = "DESC" if newest_first else "ASC"
+        query = (f"SELECT {self._COLUMNS} FROM post_tags t JOIN posts p "
+                 f"ON p.collection = t.collection AND p.source = t.source "
+                 f"WHERE t.collection = ? AND t.tag = ? AND p.draft = 0 "
+                 f"ORDER BY p.date {order}, p.slug {order}")
+        params: Tuple = (self.name, tag)
+        if limit is not None:
+            query += " LIMIT ?"
+            params += (limit,)
+        for row in self.db.cursor().execute(query, params):
+            yield self._post(row)
+
+    def tags(self) -> List[Tuple[str, int]]:
+        """(tag, published post count), alphabetically."""
+        return self.db.execute(
+            "SELECT t.tag, COUNT(*) FROM post_tags t JOIN posts p "
+            "ON p.collection = t.collection AND p.source = t.source "
+            "WHERE t.collection = ? AND p.draft = 0 GROUP BY t.tag ORDER BY t.tag",
+            (self.name,)
+        ).fetchall()
+
+    # URLs
+
+    def post_url(self, slug: str) -> str:
+        return f"/{self.name}/{slug}/"
+
+    def archive_url(self, number: Optional[int] = None, tag: Optional[str] = None) -> str:
+        """URL of an archive page; None is the front page showing the newest posts."""
+        base = f"/{self.name}/" if tag is None else f"/{self.name}/tags/{slugify(tag)}/"
+        return base if number is None else f"{base}page/{number}/"
+
+    @staticmethod
+    def _output(url: str) -> str:
+        return url.lstrip("/") + "index.html"
+
+    # Rendering
+
+    @traced()
+    def render(
+        self,
+        render_template: Callable[[str, Dict], str],
+        context: Dict,
+        salt: str,
+        filters: Optional[List] = None,
+        scanners: Optional[List] = None,
+        target_dir: Optional[str] = None,
+        origin: str = ""
+    ) -> List[str]:
+        """
+        Render every post, archive, tag and feed page whose inputs changed.
+
+        Args:
+            render_template: Callable rendering a template name with a context
+            context: Site-wide template variables for collection pages
+            salt: Digest of everything besides the posts that affects the
+                output (site config, templates, asset URLs)
+            filters: Page filters, as for regular pages
+            scanners: Page scanners, called on each rendered page before filtering
+            target_dir: The site's public_html
+            origin: Absolute site URL for the feed
+
+        Returns:
+            The manifest keys that were written. Outputs no longer produced
+            are removed.
+        """
+        salt = hashlib.sha256(f"{INDEX_VERSION}:{self.per_page}:{self.feed_items}:{salt}".encode()).hexdigest()
+        stored = self.db.execute("SELECT salt FROM state WHERE collection = ?", (self.name,)).fetchone()
+        if not self.dirty and stored and stored[0] == salt and self._outputs_present():
+            return []
+
+        self._run = time.time_ns()
+        self._salt = salt
+        self._context = context
+        self._render_template = render_template
+        self._filters = filters or []
+        self._scanners = scanners or []
+        self._target_dir = target_dir
+        self.written = []
+        self.removed = []
+
+        for post in self.posts():
+            self._emit(self._output(post.url), [post.hash],
+                       lambda post=post: self._page(f"{self.name}/post.html", post.url, {
+                           "post": post,
+                           "post_tags": [{"name": tag, "url": self.archive_url(tag=tag)} for tag in post.tags],
+                           "page_title": post.title,
+                           "page_description": post.summary
+                       }))
+
+        self._archive(None)
+        tags = self.tags()
+        for tag, _ in tags:
+            self._archive(tag)
+        # Every listing links to the tags page, so it is written even when empty
+        url = f"/{self.name}/tags/"
+        self._emit(self._output(url), [json.dumps(tags)], lambda: self._page(
+            f"{self.name}/tags.html", url, {"tags": [
+                {"name": tag, "count": count, "url": self.archive_url(tag=tag)} for tag, count in tags
+            ], "page_title": self.title}
+        ))
+
+        feed = list(self.posts(newest_first=True, limit=self.feed_items))
+        self._emit(f"{self.name}/feed.xml", [origin] + [post.hash for post in feed],
+                   lambda: self._feed(feed, origin), html_page=False)
+
+        self.removed = self._remove_stale()
+        self.db.execute("INSERT OR REPLACE INTO state VALUES (?, ?)", (self.name, salt))
+        self.db.commit()
+        self.dirty = False
+        logger.info("Collection %s: rendered %d output(s), removed %d", self.name, len(self.written), len(self.removed))
+        return self.written
+
+    def _archive(self, tag: Optional[str]) -> None:
+        """
+        Emit the numbered archive pages of all posts (or of one tag) and the
+        front page showing the newest ones.
+
+        Pages are numbered from the oldest post and filled one at a time, so
+        only per_page posts are held in memory. Page n links to n - 1 (older)
+        and n + 1 (newer); the last page's newer link is the front page.
+        A single page of posts has no archive, only the front page.
+        """
+        total = self._count(tag)
+        pages = -(-total // self.per_page)
+        chunk: List[Post] = []
+        number = 0
+        # When every post fits on the front page there is nothing to archive
+        archived = (self.posts() if tag is None else self.tagged(tag)) if pages > 1 else ()
+        for post in archived:
+            chunk.append(post)
+            if len(chunk) == self.per_page:
+                number += 1
+                self._archive_page(number, pages, chunk, tag)
+                chunk = []
+        if chunk:
+            self._archive_page(number + 1, pages, chunk, tag)
+
+        newest = self.posts(newest_first=True, limit=self.per_page) if tag is None \
+            else self.tagged(tag, newest_first=True, limit=self.per_page)
+        front = list(newest)
+        older = None
+        if total > len(front):
+            # The page holding the newest post not shown on the front page
+            older = self.archive_url((total - len(front) - 1) // self.per_page + 1, tag)
+        url = self.archive_url(tag=tag)
+        self._emit(self._output(url), [older or ""] + [post.hash for post in front],
+                   lambda: self._listing(url, front, tag, newer=None, older=older))
+
+    def _count(self, tag: Optional[str]) -> int:
+        if tag is None:
+            return self.db.execute(
+                "SELECT COUNT(*) FROM posts WHERE collection = ? AND draft = 0", (self.name,)
+            ).fetchone()[0]
+        return self.db.execute(
+            "SELECT COUNT(*) FROM post_tags t JOIN posts p ON p.collection = t.collection AND p.source = t.source "
+            "WHERE t.collection = ? AND t.tag = ? AND p.draft = 0", (self.name, tag)
+        ).fetchone()[0]
+
+    def _archive_page(self, number: int, pages: int, chunk: List[Post], tag: Optional[str]) -> None:
+        newer = self.archive_url(number + 1, tag) if number < pages else self.archive_url(tag=tag)
+        older = self.archive_url(number - 1, tag) if number > 1 else None
+        url = self.archive_url(number, tag)
+        posts = list(reversed(chunk))
+        self._emit(self._output(url), [newer, older or ""] + [post.hash for post in posts],
+                   lambda: self._listing(url, posts, tag, newer=newer, older=older))
+
+    def _listing(self, url: str, posts: List[Post], tag: Optional[str],
+                 newer: Optional[str], older: Optional[str]) -> str:
+        title = self.title if tag is None else f"{self.title}: {tag}"
+        return self._page(f"{self.name}/list.html", url, {
+            "posts": posts,
+            "tag": tag,
+            "pagination": {"newer": newer, "older": older},
+            "page_title": title
+        })
+
+    def _page(self, template: str, url: str, variables: Dict) -> str:
+        context = {**self._context, **variables}
+        context["page"] = {**self._context.get("page", {}), "name": self.name, "url": url,
+                           "output": self._output(url)}
+        context["collection"] = {"name": self.name, "title": self.title, "url": self.archive_url(),
+                                 "feed": f"/{self.name}/feed.xml", "tags_url": f"/{self.name}/tags/"}
+        page_html = self._render_template(template, context)
+        for scanner in self._scanners:
+            scanner(page_html, context["page"])
+        for page_filter in self._filters:
+            page_html = page_filter(page_html, context["page"])
+        return page_html
+
+    def _feed(self, posts: List[Post], origin: str) -> str:
+        """Atom feed of the newest posts (summaries only, so no bodies are loaded)."""
+        def text(value):
+            return html.escape(str(value), quote=True)
+
+        updated = max((post.date for post in posts), default="1970-01-01")
+        entries = "".join(
+            f"  <entry>\n"
+            f"    <title>{text(post.title)}</title>\n"
+            f"    <link href=\"{text(origin + post.url)}\"/>\n"
+            f"    <id>{text(origin + post.url)}</id>\n"
+            f"    <updated>{_atom_date(post.date)}</updated>\n"
+            f"    <summary>{text(post.summary)}</summary>\n"
+            f"  </entry>\n"
+            for post in posts
+        )
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom">\n'
+            f"  <title>{text(self._context.get('site_title', ''))} - {text(self.title)}</title>\n"
+            f"  <link href=\"{text(origin + self.archive_url())}\"/>\n"
+            f"  <link rel=\"self\" href=\"{text(origin + '/' + self.name + '/feed.xml')}\"/>\n"
+            f"  <id>{text(origin + self.archive_url())}</id>\n"
+            f"  <updated>{_atom_date(updated)}</updated>\n"
+            f"{entries}"
+            "</feed>\n"
+        )
+
+    def _emit(self, key: str, inputs: List[str], produce: Callable[[], str], html_page: bool = True) -> None:
+        """Render and write one output unless its signature is unchanged."""
+        signature = hashlib.sha256("\0".join([self._salt, key] + inputs).encode("utf-8")).hexdigest()
+        row = self.db.execute(
+            "SELECT signature FROM outputs WHERE collection = ? AND key = ?", (self.name, key)
+        ).fetchone()
+        if not (row and row[0] == signature and self.manifest.get(key)
+                and os.path.exists(self.manifest.path_for(key))):
+            data = produce().encode("utf-8")
+            self.report["rendered"] += 1
+            if self.manifest.write_output(key, data, collection=self.name):
+                self.written.append(key)
+        self.db.execute("INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?)",
+                        (self.name, key, signature, self._run))
+
+    def _outputs_present(self) -> bool:
+        key = self._output(self.archive_url())
+        return self.manifest.get(key) is not None and os.path.exists(self.manifest.path_for(key))
+
+    def _remove_stale(self) -> List[str]:
+        """Delete outputs of deleted posts, tags and pages."""
+        stale = [key for (key,) in self.db.execute(
+            "SELECT key FROM outputs WHERE collection = ? AND run != ?", (self.name, self._run)
+        )]
+        self.manifest.remove_variants(stale)
+        for key in stale:
+            path = self.manifest.path_for(key)
+            if os.path.exists(path):
+                os.unlink(path)
+                try:
+                    # Page directories such as blog/<slug>/ go with their page
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass
+            self.manifest.forget(key)
+        self.db.execute("DELETE FROM outputs WHERE collection = ? AND run != ?", (self.name, self._run))
+        return stale
+
+
+def _atom_date(value: str) -> str:
+    """ISO date or datetime from the index as an RFC 3339 timestamp."""
+    if "T" not in value:
+        return f"{value}T00:00:00Z"
+    return value if value.endswith("Z") or "+" in value[10:] else value + "Z"
@@ -0,0 +1,534 @@
+"""
+CSS stage: unused-rule purge and critical CSS inlining.
+
+Class names and ids are collected from every rendered page, the template
+and component sources, and the site's JavaScript (for classes toggled at
+runtime). Rules whose selectors can never match are dropped from each
+local stylesheet, which is published as a fingerprinted ``purged_from``
+output. The rules needed by the above-the-fold markup (the header and
+hero by default) are inlined into each page's ``<head>`` and the purged
+stylesheet is loaded asynchronously.
+
+Only compiled CSS is processed. A stylesheet that is still preprocessor
+source (Tailwind's @tailwind and @apply directives) is left as it is, with
+its links untouched: its rules are not what the browser applies, so
+purging it or inlining its rules would move nothing off the critical path.
+Inlined CSS is further limited to at-rules browsers implement.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from bot_core.monitoring.tracing import traced
+
+from .assets import fingerprinted_name
+from .fsutil import write_json_if_changed
+from .manifest import BuildManifest
+
+CSS_USAGE_NAME = "css_usage.json"
+CSS_USAGE_VERSION = 1
+
+# Simple selectors (tag, #id or .class) locating above-the-fold markup
+DEFAULT_CRITICAL = ("header", "#hero", ".hero")
+# How much of a streamed page is searched for above-the-fold elements
+FOLD_SIZE = 256 * 1024
+
+# At-rules whose block holds further rules rather than declarations
+NESTING_AT_RULES = {"media", "supports", "layer", "container", "document"}
+# At-rules a browser applies; nothing else is inlined as critical CSS
+BROWSER_AT_RULES = NESTING_AT_RULES | {
+    "font-face", "keyframes", "property", "counter-style", "font-feature-values", "font-palette-values", "page"
+}
+
+COMMENT = re.compile(r"/\*.*?\*/", re.S)
+CLASS_OR_ID = re.compile(r"([.#])((?:\\[0-9a-fA-F]{1,6}\s?|\\.|[\w-])+)")
+CSS_ESCAPE = re.compile(r"\\([0-9a-fA-F]{1,6}\s?|.)", re.S)
+QUOTED = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'")
+ATTRIBUTE_SELECTOR = re.compile(r"(?<!\\)\[[^\]]*(?<!\\)\]")
+PSEUDO_ARGUMENTS = re.compile(r":[\w-]+\((?:[^()]|\([^()]*\))*\)")
+HTML_ATTRIBUTE = re.compile(r"\b(class|id)\s*=\s*(?:\"([^\"]*)\"|'([^']*)')", re.I)
+JS_STRING = re.compile(r"[\"'`]([\w:/\[\]\-. ]+)[\"'`]")
+ANIMATION_NAME = re.compile(r"animation(?:-name)?\s*:\s*([^;}]+)", re.I)
+STYLESHEET_LINK = re.compile(r"<link\b[^>]*\brel\s*=\s*[\"']?stylesheet[\"']?[^>]*>", re.I)
+HREF = re.compile(r"\bhref\s*=\s*[\"']([^\"']+)[\"']", re.I)
+# Tailwind directives, which only exist in uncompiled source
+UNCOMPILED_DIRECTIVE = re.compile(r"@(?:tailwind|apply|screen|variants|responsive|config)\b")
+# One declaration of a rule body, with its ";"
+DECLARATION = re.compile(r"(?:[^;\"']|\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')+;?")
+
+logger = logging.getLogger(__name__)
+
+
+class CssRule(NamedTuple):
+    """
+    One node of a parsed stylesheet.
+
+    kind is "rule" (selector + declarations), "statement" (@import, @charset,
+    ...), "group" (@media/@supports/@layer with nested rules) or "block"
+    (any other at-rule kept verbatim, e.g. @font-face, @keyframes).
+    """
+    kind: str
+    prelude: str
+    body: str = ""
+    children: Tuple["CssRule", ...] = ()
+
+
+def parse_css(text: str) -> List[CssRule]:
+    """Parse a stylesheet into a list of CssRule nodes."""
+    return _parse_block(COMMENT.sub("", text))
+
+
+def _parse_block(text: str) -> List[CssRule]:
+    rules = []
+    i, n = 0, len(text)
+    while i < n:
+        prelude_start = i
+        # Read up to the next top-level '{' or ';', skipping strings
+        while i < n and text[i] not in "{;}":
+            if text[i] in "\"'":
+                i = _skip_string(text, i)
+            else:
+                i += 1
+        prelude = text[prelude_start:i].strip()
+        if i >= n or text[i] == "}":
+            i += 1
+            continue
+        if text[i] == ";":
+            if prelude:
+                rules.append(CssRule("statement", prelude))
+            i += 1
+            continue
+
+        body_start = i + 1
+        i = _matching_brace(text, i)
+        body = text[body_start:i - 1]
+        if not prelude.startswith("@"):
+            rules.append(CssRule("rule", prelude, body.strip()))
+        elif _at_keyword(prelude) in NESTING_AT_RULES:
+            rules.append(CssRule("group", prelude, children=tuple(_parse_block(body))))
+        else:
+            rules.append(CssRule("block", prelude, body.strip()))
+    return rules
+
+
+def _skip_string(text: str, i: int) -> int:
+    quote = text[i]
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == "\\" else 1
+    return i + 1
+
+
+def _matching_brace(text: str, i: int) -> int:
+    """Index just past the '}' closing the '{' at i."""
+    depth = 0
+    while i < len(text):
+        char = text[i]
+        if char in "\"'":
+            i = _skip_string(text, i)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _at_keyword(prelude: str) -> str:
+    match = re.match(r"@(?:-[a-z]+-)?([\w-]+)", prelude)
+    return match.group(1).lower() if match else ""
+
+
+def serialize_css(rules: Iterable[CssRule]) -> str:
+    parts = []
+    for rule in rules:
+        if rule.kind == "statement":
+            parts.append(rule.prelude + ";")
+        elif rule.kind == "group":
+            parts.append(rule.prelude + "{" + serialize_css(rule.children) + "}")
+        else:
+            parts.append(rule.prelude + "{" + rule.body + "}")
+    return "\n".join(parts)
+
+
+def _unescape(name: str) -> str:
+    def replace(match):
+        value = match.group(1)
+        if re.fullmatch(r"[0-9a-fA-F]{1,6}\s?", value):
+            return chr(int(value.strip(), 16))
+        return value
+    return CSS_ESCAPE.sub(replace, name)
+
+
+def selector_tokens(selector: str) -> Set[str]:
+    """
+    Class names and "#ids" a compound selector requires.
+
+    Arguments of functional pseudo-classes (:not(), :is(), ...) and attribute
+    selectors are ignored, so the result errs on the side of keeping rules.
+    """
+    selector = QUOTED.sub("", selector)
+    selector = ATTRIBUTE_SELECTOR.sub("", selector)
+    selector = PSEUDO_ARGUMENTS.sub("", selector)
+    return {("#" if prefix == "#" else "") + _unescape(name) for prefix, name in CLASS_OR_ID.findall(selector)}
+
+
+def split_selectors(prelude: str) -> List[str]:
+    """Split a selector list on top-level commas."""
+    selectors, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == "," and depth == 0:
+            selectors.append(prelude[start:i].strip())
+            start = i + 1
+    selectors.append(prelude[start:].strip())
+    return [s for s in selectors if s]
+
+
+def filter_rules(rules: Iterable[CssRule], used: Set[str], keep_statements: bool = True) -> List[CssRule]:
+    """
+    Keep the selectors whose classes and ids are all in used.
+
+    Rules with no class or id requirement (html, body, *, :root, ...) and
+    at-rule blocks such as @font-face are always kept; @keyframes are
+    decided separately by drop_unused_keyframes. keep_statements controls
+    whether statements like @import survive.
+    """
+    kept = []
+    for rule in rules:
+        if rule.kind == "rule":
+            selectors = [s for s in split_selectors(rule.prelude) if selector_tokens(s) <= used]
+            if selectors:
+                kept.append(rule._replace(prelude=",".join(selectors)))
+        elif rule.kind == "group":
+            children = filter_rules(rule.children, used, keep_statements)
+            if children:
+                kept.append(rule._replace(children=tuple(children)))
+        elif rule.kind == "block" or keep_statements:
+            kept.append(rule)
+    return kept
+
+
+def drop_unused_keyframes(rules: List[CssRule]) -> List[CssRule]:
+    """Remove @keyframes that no remaining declaration animates with."""
+    animated = set()
+
+    def collect(nodes):
+        for node in nodes:
+            if node.kind == "group":
+                collect(node.children)
+            elif node.kind == "rule":
+                for value in ANIMATION_NAME.findall(node.body):
+                    animated.update(re.findall(r"[\w-]+", value))
+
+    def prune(nodes):
+        kept = []
+        for node in nodes:
+            if node.kind == "block" and _at_keyword(node.prelude) == "keyframes":
+                if node.prelude.split(None, 1)[-1].strip() not in animated:
+                    continue
+            elif node.kind == "group":
+                children = prune(node.children)
+                if not children:
+                    continue
+                node = node._replace(children=tuple(children))
+            kept.append(node)
+        return kept
+
+    collect(rules)
+    return prune(rules)
+
+
+def is_uncompiled(text: str) -> bool:
+    """Whether a stylesheet is Tailwind source rather than CSS a browser can apply."""
+    return UNCOMPILED_DIRECTIVE.search(COMMENT.sub("", QUOTED.sub('""', text))) is not None
+
+
+def browser_rules(rules: Iterable[CssRule]) -> List[CssRule]:
+    """
+    Drop what a browser would ignore: at-rules it does not implement and
+    @-directives inside rule bodies (rules left empty go too).
+    """
+    kept = []
+    for rule in rules:
+        if rule.kind == "rule":
+            if "@" in rule.body:
+                # e.g. "@apply px-4;" left in a rule
+                body = "".join(d for d in DECLARATION.findall(rule.body) if not d.lstrip().startswith("@")).strip()
+                if not body:
+                    continue
+                rule = rule._replace(body=body)
+            kept.append(rule)
+        elif _at_keyword(rule.prelude) not in BROWSER_AT_RULES:
+            continue
+        elif rule.kind == "group":
+            children = browser_rules(rule.children)
+            if children:
+                kept.append(rule._replace(children=tuple(children)))
+        else:
+            kept.append(rule)
+    return kept
+
+
+def html_tokens(markup: str) -> Set[str]:
+    """Classes and "#ids" used in HTML (or template source; template syntax is skipped)."""
+    tokens = set()
+    for attribute, double, single in HTML_ATTRIBUTE.findall(markup):
+        for word in (double or single).split():
+            if "{" in word or "}" in word or "%" in word:
+                continue
+            tokens.add(("#" + word) if attribute.lower() == "id" else word)
+    return tokens
+
+
+def script_tokens(source: str) -> Set[str]:
+    """Every word of every short string literal; classes added from JavaScript hide here."""
+    tokens = set()
+    for literal in JS_STRING.findall(source):
+        tokens.update(literal.split())
+    return tokens
+
+
+def find_element(markup: str, selector: str) -> Optional[str]:
+    """Return the outer HTML of the first element matching a simple tag/#id/.class selector."""
+    if selector.startswith("#"):
+        pattern = rf"<([a-zA-Z][\w-]*)\b[^>]*\bid\s*=\s*[\"']{re.escape(selector[1:])}[\"'][^>]*>"
+    elif selector.startswith("."):
+        pattern = rf"<([a-zA-Z][\w-]*)\b[^>]*\bclass\s*=\s*[\"'][^\"']*(?<![\w-]){re.escape(selector[1:])}(?![\w-])[^\"']*[\"'][^>]*>"
+    else:
+        pattern = rf"<({re.escape(selector)})\b[^>]*>"
+    start = re.search(pattern, markup, re.I)
+    if not start:
+        return None
+
+    tag = start.group(1)
+    tags = re.compile(rf"<(/?){re.escape(tag)}\b[^>]*>", re.I)
+    depth = 0
+    for match in tags.finditer(markup, start.start()):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            return markup[start.start():match.end()]
+    return markup[start.start():]
+
+
+class CssPipeline:
+    def __init__(
+        self,
+        manifest: BuildManifest,
+        usage_path: str,
+        source_dirs: Iterable[str] = (),
+        safelist: Iterable[str] = (),
+        critical: Optional[Iterable[str]] = DEFAULT_CRITICAL
+    ):
+        """
+        Args:
+            manifest: The site's build manifest
+            usage_path: Where per-page class usage is kept between builds, so
+                partial rebuilds purge against the whole site
+            source_dirs: Template/component/script directories to scan in addition
+                to the rendered pages
+            safelist: Class names (or "#ids") that must never be purged
+            critical: Simple selectors of above-the-fold elements; None disables
+                critical CSS inlining
+        """
+        self.manifest = manifest
+        self.usage_path = usage_path
+        self.source_dirs = list(source_dirs)
+        self.safelist = set(safelist)
+        self.critical = list(critical) if critical else []
+        self.pages: Dict[str, List[str]] = {}
+        self.previous_urls: Dict[str, str] = {}
+        self.url_map: Dict[str, str] = {}
+        # purged URL -> stylesheet it was purged from
+        self.sources: Dict[str, str] = {}
+        self.report: Dict[str, Dict[str, int]] = {}
+        self.written: List[str] = []
+        self._purged: Optional[Dict[str, List[CssRule]]] = None
+        # Pages scanned / given critical CSS in this run; streamed pages
+        # arrive in several segments
+        self._scanned: Set[str] = set()
+        self._inlined: Dict[str, bool] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.usage_path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == CSS_USAGE_VERSION:
+            self.pages = data.get("pages", {})
+            self.previous_urls = data.get("stylesheets", {})
+
+    def scan(self, html: str, page: Dict) -> None:
+        """
+        Record the classes a freshly rendered page uses (before any rewriting).
+        Repeated calls for the same page add to what it uses.
+        """
+        output = page["output"]
+        tokens = html_tokens(html)
+        if output in self._scanned:
+            tokens.update(self.pages.get(output, ()))
+        self._scanned.add(output)
+        self.pages[output] = sorted(tokens)
+        self._purged = None
+
+    def used_tokens(self) -> Set[str]:
+        used = set(self.safelist)
+        for tokens in self.pages.values():
+            used.update(tokens)
+        for directory in self.source_dirs:
+            for root, _, names in os.walk(directory):
+                for name in names:
+                    ext = os.path.splitext(name)[1]
+                    if ext not in (".html", ".js"):
+                        continue
+                    with open(os.path.join(root, name), 'r', encoding='utf-8', errors='replace') as f:
+                        source = f.read()
+                    used |= html_tokens(source) if ext == ".html" else script_tokens(source)
+        return used
+
+    @traced()
+    def purge(self) -> Dict[str, str]:
+        """
+        Write a purged, fingerprinted copy of every local stylesheet.
+
+        Returns the URL map from each stylesheet's original and fingerprinted
+        URLs to its purged URL. Uncompiled stylesheets are skipped and keep
+        their links.
+        """
+        used = self.used_tokens()
+        self._purged = {}
+        self.url_map = {}
+        self.sources = {}
+        self.written = []
+        for key, entry in list(self.manifest.files.items()):
+            if "source" not in entry or not key.endswith(".css"):
+                continue
+            with open(self.manifest.path_for(key), 'r', encoding='utf-8', errors='replace') as f:
+                text = f.read()
+            if is_uncompiled(text):
+                logger.warning("CSS: %s is uncompiled Tailwind source; compile it to purge and inline it", key)
+                self._remove_stale(key, None)
+                continue
+            rules = parse_css(text)
+            purged = drop_unused_keyframes(filter_rules(rules, used))
+            data = serialize_css(purged).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()
+            target = fingerprinted_name(key, digest)
+
+            if digest == entry["hash"] or self.manifest.is_current(target, digest):
+                # Nothing to purge: the fingerprinted twin already has this content
+                if digest != entry["hash"]:
+                    self.manifest.keep(target, purged_from=key)
+            else:
+                self.manifest.store_output(target, data, digest, purged_from=key)
+                self.written.append(target)
+            self._remove_stale(key, target)
+
+            self._purged[key] = purged
+            self.sources["/" + target] = key
+            for url in ("/" + key, "/" + fingerprinted_name(key, entry["hash"])):
+                self.url_map[url] = "/" + target
+        return self.url_map
+
+    def ensure_purged(self) -> Dict[str, str]:
+        """Purge unless a page filter already did during this build."""
+        if self._purged is None:
+            self.purge()
+        return self.url_map
+
+    def _remove_stale(self, key: str, target: Optional[str]) -> None:
+        for other, entry in list(self.manifest.files.items()):
+            if entry.get("purged_from") == key and other != target:
+                path = self.manifest.path_for(other)
+                if os.path.exists(path):
+                    os.unlink(path)
+                self.manifest.forget(other)
+
+    def rewrite_html(self, html: str, page: Optional[Dict] = None) -> str:
+        """Page filter: inline critical CSS and load purged stylesheets asynchronously."""
+        self.ensure_purged()
+
+        links = []
+        for match in STYLESHEET_LINK.finditer(html):
+            href = HREF.search(match.group(0))
+            if href and href.group(1).split("?")[0] in self.url_map:
+                links.append((match, href.group(1).split("?")[0]))
+        if not links:
+            return html
+
+        sheets = [(url, self.sources[self.url_map[url]]) for _, url in links]
+
+        output = page["output"] if page is not None else None
+        critical_css = ""
+        if self.critical and output not in self._inlined:
+            # A streamed page is seen in segments; its fold lives near the top of the file
+            fold_html = html
+            if page is not None and page.get("spool"):
+                with open(page["spool"], 'r', encoding='utf-8') as f:
+                    fold_html = f.read(FOLD_SIZE)
+            critical_css = self._critical_css(fold_html, [key for _, key in sheets])
+            if output is not None:
+                self._inlined[output] = bool(critical_css)
+        deferred_load = bool(critical_css) or self._inlined.get(output, False)
+
+        # Replace from the end so match offsets stay valid
+        for (match, url), (_, source_key) in reversed(list(zip(links, sheets))):
+            target = self.url_map[url]
+            if deferred_load:
+                replacement = (
+                    f'<link rel="preload" href="{target}" as="style" '
+                    f'onload="this.onload=null;this.rel=\'stylesheet\'">'
+                    f'<noscript><link rel="stylesheet" href="{target}"></noscript>'
+                )
+            else:
+                replacement = match.group(0).replace(url, target)
+            html = html[:match.start()] + replacement + html[match.end():]
+
+        if critical_css:
+            index = html.find("</head>")
+            first_link = links[0][0].start()
+            insert_at = first_link if index < 0 or first_link < index else index
+            html = html[:insert_at] + f"<style data-critical>{critical_css}</style>\n    " + html[insert_at:]
+
+        if page is not None:
+            report = self.report.setdefault(output, {"before": 0, "critical": 0, "deferred": 0})
+            report["before"] += sum(self.manifest.get(key)["size"] for _, key in sheets)
+            report["deferred"] += sum(len(serialize_css(self._purged[key]).encode("utf-8")) for _, key in sheets)
+            report["critical"] += len(critical_css.encode("utf-8"))
+        return html
+
+    def _critical_css(self, html: str, source_keys: List[str]) -> str:
+        fold = [find_element(html, selector) for selector in self.critical]
+        tokens = set(self.safelist)
+        for fragment in fold:
+            if fragment:
+                tokens |= html_tokens(fragment)
+        parts = []
+        for key in source_keys:
+            rules = browser_rules(filter_rules(self._purged.get(key, []), tokens, keep_statements=False))
+            parts.append(serialize_css(drop_unused_keyframes(rules)))
+        return "\n".join(part for part in parts if part)
+
+    @traced()
+    def save(self, outputs: Optional[Iterable[str]] = None) -> bool:
+        """Persist page usage, forgetting pages not in outputs (when given)."""
+        if outputs is not None:
+            outputs = set(outputs)
+            self.pages = {page: tokens for page, tokens in self.pages.items() if page in outputs}
+        return write_json_if_changed(self.usage_path, {
+            "version": CSS_USAGE_VERSION,
+            "stylesheets": dict(sorted(self.url_map.items())),
+            "pages": dict(sorted(self.pages.items()))
+        })
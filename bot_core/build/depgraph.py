@@ -0,0 +1,194 @@
+"""
+Dependency graph between site sources and rendered pages.
+
+For every output page the graph records the templates it is built from
+(extends/includes/imports, followed transitively), the context variables
+those templates read, and the asset URLs the page references. Given a set
+of changed templates, config keys or assets it answers which pages need to
+be re-rendered.
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+from jinja2 import Environment, meta
+
+from bot_core.monitoring.tracing import traced
+
+from .fsutil import write_json_if_changed
+
+GRAPH_NAME = "dependency_graph.json"
+GRAPH_VERSION = 1
+
+# Context names the renderer derives from config keys other than their own
+DERIVED_NAMES = {
+    "site_title": ("title", "variables.company_name"),
+    "nav_links": ("nav_links",),
+    "navigation_links": ("nav_links",)
+}
+
+
+class TemplateAnalyzer:
+    def __init__(self, env: Environment):
+        """Statically analyzes templates of one environment, memoized by source."""
+        self.env = env
+        self._cache: Dict[str, Dict] = {}
+
+    def analyze(self, name: str) -> Dict:
+        """
+        Return the templates (including name itself) and variables a template depends on.
+
+        ``dynamic`` is True when some include/extends target is computed at
+        render time, in which case the page must be treated as depending on
+        every template.
+        """
+        templates: Set[str] = set()
+        variables: Set[str] = set()
+        dynamic = False
+        stack = [name]
+        while stack:
+            current = stack.pop()
+            if current in templates:
+                continue
+            templates.add(current)
+            info = self._direct(current)
+            variables.update(info["variables"])
+            dynamic = dynamic or info["dynamic"]
+            stack.extend(info["references"])
+        return {"templates": templates, "variables": variables, "dynamic": dynamic}
+
+    def _direct(self, name: str) -> Dict:
+        source, _, _ = self.env.loader.get_source(self.env, name)
+        checksum = hashlib.sha1(source.encode("utf-8")).hexdigest()
+        cached = self._cache.get(name)
+        if cached and cached["checksum"] == checksum:
+            return cached
+
+        ast = self.env.parse(source)
+        references = list(meta.find_referenced_templates(ast))
+        info = {
+            "checksum": checksum,
+            "references": [ref for ref in references if ref is not None],
+            "dynamic": any(ref is None for ref in references),
+            "variables": meta.find_undeclared_variables(ast)
+        }
+        self._cache[name] = info
+        return info
+
+
+def config_key_hashes(site_config: Dict) -> Dict[str, str]:
+    """Hash every top-level config key, and every key under ``variables`` separately."""
+    hashes = {}
+    for key, value in site_config.items():
+        if key == "variables" and isinstance(value, dict):
+            for name, item in value.items():
+                hashes[f"variables.{name}"] = _value_hash(item)
+        else:
+            hashes[key] = _value_hash(value)
+    return hashes
+
+
+def diff_config(old: Dict[str, str], new: Dict[str, str]) -> Set[str]:
+    """Return the config keys whose hash differs between two snapshots."""
+    return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+
+
+def context_names_for_keys(keys: Iterable[str]) -> Optional[Set[str]]:
+    """
+    Map changed config keys (e.g. "variables.hero_title", "theme.colors.primary")
+    to the template context names they feed. Returns None when a key feeds
+    everything (the whole ``variables`` block).
+    """
+    names = set()
+    for key in keys:
+        parts = key.split(".")
+        if parts[0] == "variables":
+            if len(parts) == 1 or parts[1] == "translations":
+                # Translations can override any variable
+                return None
+            names.add(parts[1])
+        else:
+            names.add(parts[0])
+        for derived, sources in DERIVED_NAMES.items():
+            if any(key == source or key.startswith(source + ".") or source.startswith(key + ".")
+                   for source in sources):
+                names.add(derived)
+    return names
+
+
+def _value_hash(value) -> str:
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class DependencyGraph:
+    def __init__(self, path: str):
+        """Load (or start) the dependency graph stored at path."""
+        self.path = path
+        self.pages: Dict[str, Dict] = {}
+        self.config: Dict[str, str] = {}
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == GRAPH_VERSION:
+                self.pages = data.get("pages", {})
+                self.config = data.get("config", {})
+        except (FileNotFoundError, ValueError):
+            pass
+
+    @classmethod
+    def for_site(cls, site_path: str) -> "DependencyGraph":
+        return cls(os.path.join(site_path, "config", GRAPH_NAME))
+
+    def record_page(self, output: str, page_name: str, analysis: Dict, assets: Iterable[str]) -> None:
+        self.pages[output] = {
+            "page": page_name,
+            "templates": sorted(analysis["templates"]),
+            "variables": sorted(analysis["variables"]),
+            "dynamic": analysis["dynamic"],
+            "assets": sorted(assets)
+        }
+
+    def page_names(self) -> Set[str]:
+        return {node["page"] for node in self.pages.values()}
+
+    def affected_pages(
+        self,
+        templates: Iterable[str] = (),
+        names: Optional[Iterable[str]] = (),
+        assets: Iterable[str] = ()
+    ) -> Set[str]:
+        """
+        Return the page names affected by changed templates, context names or asset URLs.
+
+        ``names=None`` means every context variable may have changed.
+        """
+        templates = set(templates)
+        assets = set(assets)
+        every_name = names is None
+        names = set() if names is None else set(names)
+
+        affected = set()
+        for node in self.pages.values():
+            if (
+                (templates and (node["dynamic"] or templates.intersection(node["templates"])))
+                or (every_name and node["variables"])
+                or names.intersection(node["variables"])
+                or assets.intersection(node["assets"])
+            ):
+                affected.add(node["page"])
+        return affected
+
+    @traced()
+    def save(self) -> bool:
+        return write_json_if_changed(self.path, {
+            "version": GRAPH_VERSION,
+            "config": dict(sorted(self.config.items())),
+            "pages": dict(sorted(self.pages.items()))
+        })
+
+    def outputs_for(self, page_names: Iterable[str]) -> List[str]:
+        wanted = set(page_names)
+        return sorted(output for output, node in self.pages.items() if node["page"] in wanted)
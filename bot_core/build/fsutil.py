@@ -0,0 +1,55 @@
+"""
+Filesystem helpers shared by the build pipeline.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from typing import Any
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """Return the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def atomic_write_bytes(path: str, data: bytes, mode: int = 0o644) -> None:
+    """Write data to path via a temp file in the same directory and a rename."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_json(path: str, data: Any, indent: int = 4) -> None:
+    """Serialize data as JSON and write it atomically."""
+    payload = json.dumps(data, indent=indent, ensure_ascii=False)
+    atomic_write_bytes(path, payload.encode('utf-8'))
+
+
+def write_json_if_changed(path: str, data: Any, indent: int = 4) -> bool:
+    """Atomically write JSON unless the file already holds identical content."""
+    payload = json.dumps(data, indent=indent, ensure_ascii=False).encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == payload:
+                return False
+    except FileNotFoundError:
+        pass
+    atomic_write_bytes(path, payload)
+    return True
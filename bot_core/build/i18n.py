@@ -0,0 +1,115 @@
+"""
+Multi-language support: localizing site content and laying out language variants.
+
+Languages come from the site config (``languages`` / ``default_language``)
+or from the site's config/content_spec.json (``company_info.languages``).
+Any object carrying a ``translations`` block keyed by language is
+collapsed to the fields of the requested language, falling back to the
+default language. Each language is rendered under ``/<lang>/``; the
+default language is also rendered at the site root.
+"""
+
+import html
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+CONTENT_SPEC_NAME = "content_spec.json"
+X_DEFAULT = "x-default"
+
+
+def load_content_spec(site_path: str) -> Dict:
+    """Return the site's content spec, or {} if it has none."""
+    try:
+        with open(os.path.join(site_path, "config", CONTENT_SPEC_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def site_languages(site_config: Dict, content_spec: Optional[Dict] = None) -> Tuple[List[str], Optional[str]]:
+    """
+    Return (languages, default language) for a site.
+
+    An empty list means the site is single-language and is rendered as before.
+    """
+    sources = [site_config]
+    if content_spec:
+        sources += [content_spec.get("company_info", {}), content_spec]
+    for source in sources:
+        languages = source.get("languages")
+        if languages:
+            default = source.get("default_language") or languages[0]
+            if default not in languages:
+                languages = [default] + list(languages)
+            return list(languages), default
+    return [], None
+
+
+def _is_translation_block(value) -> bool:
+    return isinstance(value, dict) and bool(value) and all(isinstance(v, dict) for v in value.values())
+
+
+def localize(value, lang: str, fallback: Optional[str] = None):
+    """Recursively collapse ``translations`` blocks to the fields of one language."""
+    if isinstance(value, list):
+        return [localize(item, lang, fallback) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    translations = value.get("translations")
+    if not _is_translation_block(translations):
+        return {key: localize(item, lang, fallback) for key, item in value.items()}
+
+    result = {key: localize(item, lang, fallback) for key, item in value.items() if key != "translations"}
+    chosen = translations.get(lang)
+    if chosen is None and fallback is not None:
+        chosen = translations.get(fallback)
+    result.update(localize(chosen or {}, lang, fallback))
+    return result
+
+
+def localized_config(site_config: Dict, content_spec: Dict, lang: str, default: str) -> Dict:
+    """Site config for one language, with the localized content spec as ``content``."""
+    config = localize(site_config, lang, default)
+    if content_spec:
+        config["content"] = localize(content_spec, lang, default)
+    return config
+
+
+def base_url(site_config: Dict) -> str:
+    """Absolute origin used for hreflang links ('' keeps them root-relative)."""
+    if site_config.get("base_url"):
+        return site_config["base_url"].rstrip("/")
+    domain = site_config.get("domain", "")
+    return f"https://{domain}" if "." in domain else ""
+
+
+def alternate_links(url: str, languages: List[str], default: str, origin: str = "") -> List[Dict[str, str]]:
+    """
+    hreflang alternates for a page, given its language-neutral URL (e.g. "/about/").
+
+    The x-default alternate points at the root rendering of the default language.
+    """
+    links = [{"hreflang": lang, "href": f"{origin}/{lang}{url}"} for lang in languages]
+    links.append({"hreflang": X_DEFAULT, "href": f"{origin}{url}"})
+    return links
+
+
+def hreflang_tags(alternates: List[Dict[str, str]]) -> str:
+    return "\n".join(
+        f'<link rel="alternate" hreflang="{html.escape(link["hreflang"])}" href="{html.escape(link["href"])}">'
+        for link in alternates
+    )
+
+
+def inject_alternates(page_html: str, page: Dict) -> str:
+    """Page filter: add the page's hreflang links before </head>."""
+    alternates = page.get("alternates")
+    if not alternates or 'hreflang="' in page_html:
+        return page_html
+    tags = hreflang_tags(alternates) + "\n"
+    index = page_html.find("</head>")
+    if index < 0:
+        return page_html
+    return page_html[:index] + tags + page_html[index:]
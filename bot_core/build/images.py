@@ -0,0 +1,251 @@
+"""
+Image stage: responsive derivatives and <picture> markup.
+
+Every local image referenced by an ``<img>`` in a rendered page gets
+width-bucketed AVIF, WebP and JPEG (or PNG, for images with transparency)
+derivatives, and the tag is rewritten into a ``<picture>`` with
+``srcset``/``sizes`` and explicit dimensions. Derivatives live in the blob
+store under their content hash, found through a key made of the source hash
+and the transform parameters, so an image is encoded once no matter how
+many builds or sites use it.
+Encoding runs in a process pool. Requires Pillow; without it the stage is
+skipped.
+"""
+
+import hashlib
+import html
+import logging
+import os
+import re
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from bot_core.monitoring.tracing import traced
+
+from .blobstore import BlobStore
+from .manifest import BuildManifest
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # optional dependency
+    Image = None
+
+WIDTHS = (320, 640, 960, 1280, 1920)
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+# (format, file extension, MIME type, quality), best first; the last one is the <img> fallback
+FORMATS = [("AVIF", ".avif", "image/avif", 50), ("WEBP", ".webp", "image/webp", 75)]
+JPEG = ("JPEG", ".jpg", "image/jpeg", 80)
+PNG = ("PNG", ".png", "image/png", None)
+
+# Bump when encoder settings change so old derivatives are not reused
+TRANSFORM_VERSION = 1
+
+IMG_TAG = re.compile(r"<img\b[^>]*>", re.I)
+PICTURE = re.compile(r"<picture\b.*?</picture>", re.I | re.S)
+ATTRIBUTE = re.compile(r"([\w:-]+)(\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]+)))?")
+
+logger = logging.getLogger(__name__)
+
+
+def derivative_key(source_hash: str, width: int, fmt: str, quality: Optional[int]) -> str:
+    """Blob store cache key of a derivative (see BlobStore.alias)."""
+    payload = f"{source_hash}:{width}:{fmt}:{quality}:{TRANSFORM_VERSION}"
+    return hashlib.sha256(payload.encode("ascii")).hexdigest()
+
+
+def bucket_widths(source_width: int, widths=WIDTHS) -> List[int]:
+    """Widths to produce for a source: every bucket below it, plus its own (capped) width."""
+    largest = min(source_width, widths[-1])
+    return sorted({w for w in widths if w < largest} | {largest})
+
+
+def _has_alpha(image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+
+
+def _encode(job: Tuple[str, str, List[Tuple[int, str, Optional[int], str]]]) -> int:
+    """Decode one source and encode all its missing derivatives into the store. Runs in a worker."""
+    source, store_root, variants = job
+    store = BlobStore(store_root)
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert("RGBA" if _has_alpha(original) else "RGB")
+        for width, fmt, quality, key in variants:
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            options = {"optimize": True} if fmt in ("JPEG", "PNG") else {}
+            if quality is not None:
+                options["quality"] = quality
+            buffer = BytesIO()
+            resized.save(buffer, fmt, **options)
+            store.alias(key, store.put_bytes(buffer.getvalue()))
+    return len(variants)
+
+
+class ImagePipeline:
+    def __init__(self, manifest: BuildManifest, store: BlobStore,
+                 widths=WIDTHS, max_workers: Optional[int] = None):
+        """
+        Args:
+            manifest: The site's build manifest
+            store: Blob store holding encoded derivatives (the derivative cache)
+            widths: Width buckets in pixels
+            max_workers: Encoder processes (defaults to one per CPU)
+        """
+        self.manifest = manifest
+        self.store = store
+        self.widths = tuple(sorted(widths))
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.formats = [f for f in FORMATS if Image is not None and features.check(f[0].lower())]
+        self.referenced: Set[str] = set()
+        # source key -> {"width", "height", "variants": {mime: [(url, width)]}, "fallback": url}
+        self.images: Dict[str, Dict] = {}
+        self.encoded = 0
+        self._processed = False
+
+    @staticmethod
+    def available() -> bool:
+        return Image is not None
+
+    def _source_key(self, url: str) -> Optional[str]:
+        """Map an image URL (original or fingerprinted) to the manifest key of its source."""
+        if not url.startswith("/") or url.startswith("//"):
+            return None
+        key = url.split("?")[0].split("#")[0].lstrip("/")
+        entry = self.manifest.get(key)
+        if entry is None:
+            return None
+        key = entry.get("fingerprint_of", key)
+        entry = self.manifest.get(key)
+        if not entry or "source" not in entry or os.path.splitext(key)[1].lower() not in IMAGE_EXTENSIONS:
+            return None
+        return key
+
+    def scan(self, page_html: str, page: Dict) -> None:
+        """Collect the images a rendered page references."""
+        for tag in IMG_TAG.findall(page_html):
+            attributes = _parse_attributes(tag)
+            key = self._source_key(attributes.get("src") or "")
+            if key:
+                self.referenced.add(key)
+        self._processed = False
+
+    @traced()
+    def process(self) -> Dict[str, Dict]:
+        """Encode missing derivatives (in parallel) and place all of them in the site."""
+        jobs = []
+        plans = {}
+        for key in sorted(self.referenced - set(self.images)):
+            source = self.manifest.path_for(key)
+            source_hash = self.manifest.get(key)["hash"]
+            with Image.open(source) as image:
+                width, height = image.size
+                if _exif_rotated(image):
+                    width, height = height, width
+                fallback = PNG if _has_alpha(image) else JPEG
+            plan = []
+            for w in bucket_widths(width, self.widths):
+                for fmt, ext, mime, quality in self.formats + [fallback]:
+                    cache_key = derivative_key(source_hash, w, fmt, quality)
+                    plan.append((w, fmt, ext, mime, quality, cache_key))
+            plans[key] = (width, height, fallback, plan)
+            missing = [(w, fmt, q, k) for w, fmt, _, _, q, k in plan if self.store.resolve(k) is None]
+            if missing:
+                jobs.append((source, self.store.root, missing))
+
+        if jobs:
+            workers = min(self.max_workers, len(jobs))
+            if workers <= 1:
+                self.encoded += sum(map(_encode, jobs))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    self.encoded += sum(pool.map(_encode, jobs))
+            logger.info("Encoded %d image derivative(s) for %d image(s)", self.encoded, len(jobs))
+
+        for key, (width, height, fallback, plan) in plans.items():
+            source_hash = self.manifest.get(key)["hash"]
+            stem = os.path.splitext(key)[0]
+            variants: Dict[str, List[Tuple[str, int]]] = {}
+            for w, fmt, ext, mime, _, cache_key in plan:
+                target = f"{stem}-{w}w.{cache_key[:10]}{ext}"
+                if self.manifest.is_current(target, cache_key, field="cache_key"):
+                    self.manifest.keep(target, image_of=key, source_hash=source_hash)
+                else:
+                    digest = self.store.resolve(cache_key)
+                    self.store.materialize(digest, self.manifest.path_for(target))
+                    st = os.stat(self.manifest.path_for(target))
+                    self.manifest.record(target, {
+                        "hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                        "cache_key": cache_key, "image_of": key, "source_hash": source_hash
+                    })
+                variants.setdefault(mime, []).append(("/" + target, w))
+            self.images[key] = {
+                "width": width,
+                "height": height,
+                "variants": variants,
+                "fallback": fallback[2]
+            }
+        self._processed = True
+        return self.images
+
+    def rewrite_html(self, page_html: str, page: Optional[Dict] = None) -> str:
+        """Page filter: turn <img> tags of processed images into responsive <picture> elements."""
+        if not self._processed:
+            self.process()
+
+        # Leave images already wrapped in <picture> alone
+        protected = [(m.start(), m.end()) for m in PICTURE.finditer(page_html)]
+
+        def replace(match):
+            if any(start <= match.start() < end for start, end in protected):
+                return match.group(0)
+            attributes = _parse_attributes(match.group(0))
+            if "srcset" in attributes:
+                return match.group(0)
+            key = self._source_key(attributes.get("src") or "")
+            info = self.images.get(key) if key else None
+            return self._picture(attributes, info) if info else match.group(0)
+
+        return IMG_TAG.sub(replace, page_html)
+
+    def _picture(self, attributes: Dict[str, str], info: Dict) -> str:
+        largest = max(w for variants in info["variants"].values() for _, w in variants)
+        sizes = attributes.pop("sizes", None) or f"(max-width: {largest}px) 100vw, {largest}px"
+        fallback = info["variants"][info["fallback"]]
+
+        sources = []
+        for fmt, ext, mime, _ in self.formats:
+            srcset = ", ".join(f"{url} {w}w" for url, w in info["variants"].get(mime, []))
+            sources.append(f'<source type="{mime}" srcset="{srcset}" sizes="{html.escape(sizes)}">')
+
+        attributes["src"] = fallback[-1][0]
+        attributes["srcset"] = ", ".join(f"{url} {w}w" for url, w in fallback)
+        attributes["sizes"] = sizes
+        # Dimensions of the largest derivative keep the aspect ratio without upscaling
+        attributes.setdefault("width", str(largest))
+        attributes.setdefault("height", str(max(1, round(info["height"] * largest / info["width"]))))
+        attributes.setdefault("decoding", "async")
+        img = "<img " + " ".join(
+            name if value is None else f'{name}="{html.escape(value)}"'
+            for name, value in attributes.items()
+        ) + ">"
+        return "<picture>" + "".join(sources) + img + "</picture>"
+
+
+def _parse_attributes(tag: str) -> Dict[str, Optional[str]]:
+    """Attributes of an <img> tag, in order, with entities decoded (None for bare attributes)."""
+    body = re.sub(r"^<img\b|/?>$", "", tag, flags=re.I)
+    attributes = {}
+    for name, assignment, double, single, bare in ATTRIBUTE.findall(body):
+        attributes[name.lower()] = html.unescape(double or single or bare) if assignment else None
+    return attributes
+
+
+def _exif_rotated(image) -> bool:
+    """True if the EXIF orientation swaps width and height."""
+    try:
+        return image.getexif().get(0x0112) in (5, 6, 7, 8)
+    except Exception:
+        return False
@@ -0,0 +1,357 @@
+"""
+Link check stage: verify a built site's HTML under public_html.
+
+Every HTML file is scanned (in parallel worker processes) for its links,
+element ids, tag balance and embedded JSON-LD. The scan of each page is
+cached in config/linkcheck.json by content hash, so a re-check only scans
+pages that changed. Links are then resolved against the full set of files
+and ids, reporting:
+
+- broken internal hrefs/srcs (missing files or missing #anchors)
+- orphaned pages (no other page links to them)
+- duplicate ids within a page
+- unclosed and stray tags
+- JSON-LD that doesn't parse or isn't valid schema.org markup
+
+The scanner is a regex tokenizer rather than a full HTML parser, which
+keeps it fast enough for sites with tens of thousands of pages.
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote, urljoin, urlsplit
+
+from bot_core.monitoring.tracing import traced
+from bot_core.seo.schema_validator import default_validator
+
+from .fsutil import file_digest, write_json_if_changed
+from .manifest import BuildManifest
+
+LINKCHECK_STATE_NAME = "linkcheck.json"
+LINKCHECK_STATE_VERSION = 3
+
+# Pages scanned per worker task
+CHUNK_PAGES = 200
+
+VOID_ELEMENTS = frozenset((
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+    "param", "source", "track", "wbr"
+))
+# Elements whose end tag HTML allows to be left out; never reported as unclosed
+OPTIONAL_END = frozenset((
+    "html", "head", "body", "p", "li", "dt", "dd", "option", "optgroup", "tr", "td",
+    "th", "thead", "tbody", "tfoot", "colgroup", "rb", "rt", "rtc", "rp"
+))
+
+LINK_ATTRS = {
+    "a": ("href",),
+    "link": ("href",),
+    "img": ("src", "srcset"),
+    "source": ("src", "srcset"),
+    "script": ("src",),
+    "iframe": ("src",),
+    "video": ("src", "poster"),
+    "audio": ("src",)
+}
+# Links that never point at a file of this site
+EXTERNAL_SCHEMES = ("mailto:", "tel:", "javascript:", "data:", "sms:")
+# Fragments browsers handle without a matching id
+IMPLICIT_ANCHORS = frozenset(("", "top"))
+
+RAW_TEXT = frozenset(("script", "style", "textarea", "title"))
+
+# A comment, or an open or close tag (groups: close slash, name, attributes)
+_TAG = re.compile(r"<(?:!--.*?--|(/?)([a-zA-Z][a-zA-Z0-9:-]*)([^>]*))>", re.S)
+_ATTR = re.compile(r"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>"']+)))?""")
+
+logger = logging.getLogger(__name__)
+
+
+def _attrs(source: str) -> Dict[str, str]:
+    return {m.group(1).lower(): m.group(2) if m.group(2) is not None else (m.group(3) or m.group(4) or "")
+            for m in _ATTR.finditer(source)}
+
+
+def _check_jsonld(body: str) -> List[str]:
+    """Problems with one application/ld+json block."""
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        return [f"invalid JSON-LD: {e}"]
+    return [f"JSON-LD {error['path']}: {error['message']}" for error in default_validator().validate(data)]
+
+
+def _line(text: str, offset: int) -> int:
+    return text.count("\n", 0, offset) + 1
+
+
+def scan_html(text: str) -> Dict:
+    """
+    Scan one page. Returns its distinct links as [url, line of first use],
+    its ids, and the duplicate-id, markup and JSON-LD problems found as
+    [line, message].
+    """
+    links: Dict[str, int] = {}
+    ids, duplicates, markup, jsonld = [], [], [], []
+    seen_ids = set()
+    # Open elements as (tag, offset)
+    stack: List[Tuple[str, int]] = []
+    # Line numbers of links are counted forward from the previous link
+    line, counted = 1, 0
+
+    # Inside a raw-text element (script, style, ...) tags are text until its end tag
+    raw, raw_start, raw_attrs = None, 0, {}
+
+    for match in _TAG.finditer(text):
+        close, name, source = match.groups()
+        if name is None:
+            continue  # comment
+        tag = name.lower()
+        if raw is not None:
+            if close and tag == raw:
+                if raw == "script" and raw_attrs.get("type", "").lower() == "application/ld+json":
+                    for problem in _check_jsonld(text[raw_start:match.start()]):
+                        jsonld.append([_line(text, raw_start), problem])
+                raw = None
+            continue
+
+        if close:
+            if stack and stack[-1][0] == tag:
+                stack.pop()
+            elif any(open_tag == tag for open_tag, _ in stack):
+                while stack[-1][0] != tag:
+                    open_tag, opened = stack.pop()
+                    if open_tag not in OPTIONAL_END:
+                        markup.append([_line(text, opened), f"<{open_tag}> is not closed before </{tag}>"])
+                stack.pop()
+            elif tag not in VOID_ELEMENTS and tag not in OPTIONAL_END:
+                markup.append([_line(text, match.start()), f"stray </{tag}>"])
+            continue
+
+        urls = LINK_ATTRS.get(tag, ())
+        attrs = _attrs(source) if urls or "id=" in source or "type=" in source else {}
+        anchor = attrs.get("id") or (attrs.get("name") if tag == "a" else None)
+        if anchor:
+            if anchor in seen_ids and "id" in attrs:
+                duplicates.append([_line(text, match.start()), anchor])
+            seen_ids.add(anchor)
+            ids.append(anchor)
+        for attr in urls:
+            value = attrs.get(attr)
+            if not value:
+                continue
+            line += text.count("\n", counted, match.start())
+            counted = match.start()
+            for url in ([c.strip().split(" ")[0] for c in value.split(",")] if attr == "srcset" else [value.strip()]):
+                if url and url not in links:
+                    links[url] = line
+
+        if tag in RAW_TEXT:
+            raw, raw_start, raw_attrs = tag, match.end(), attrs
+        elif tag not in VOID_ELEMENTS and not source.endswith("/"):
+            stack.append((tag, match.start()))
+
+    if raw is not None:
+        markup.append([_line(text, raw_start), f"<{raw}> is not closed"])
+    for open_tag, opened in stack:
+        if open_tag not in OPTIONAL_END:
+            markup.append([_line(text, opened), f"<{open_tag}> is not closed"])
+    return {"links": [[url, line] for url, line in links.items()], "ids": ids,
+            "duplicate_ids": duplicates, "markup": markup, "jsonld": jsonld}
+
+
+def _scan_files(public_dir: str, keys: List[str]) -> List[Tuple[str, Dict]]:
+    """Worker entry point: scan a chunk of pages."""
+    results = []
+    for key in keys:
+        with open(os.path.join(public_dir, key), 'r', encoding='utf-8', errors='replace') as f:
+            results.append((key, scan_html(f.read())))
+    return results
+
+
+class LinkChecker:
+    def __init__(
+        self,
+        manifest: BuildManifest,
+        state_path: str,
+        origin: str = "",
+        ignore: Iterable[str] = (),
+        entry_points: Iterable[str] = ("index.html", "404.html"),
+        exclude: Iterable[str] = ("components/",),
+        max_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            manifest: The site's build manifest (its root is the public_html dir)
+            state_path: Where page scans are cached by content hash
+            origin: Absolute site origin; absolute links to it are checked too
+            ignore: URL path prefixes that aren't files (e.g. "/api/")
+            entry_points: Pages that need no inbound link
+            exclude: Path prefixes of HTML files that aren't pages (component partials)
+            max_workers: Scanner processes (defaults to one per CPU)
+        """
+        self.manifest = manifest
+        self.public_dir = manifest.root
+        self.state_path = state_path
+        self.origin = origin.rstrip("/")
+        self.ignore = list(ignore)
+        self.entry_points = set(entry_points)
+        self.exclude = tuple(exclude)
+        self.max_workers = max_workers
+        self.scans: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.state_path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == LINKCHECK_STATE_VERSION:
+            self.scans = data.get("pages", {})
+
+    def _files(self) -> Tuple[set, List[str]]:
+        """Every file under public_html (as keys) and the HTML pages among them."""
+        files = set()
+        pending = [("", self.public_dir)]
+        while pending:
+            prefix, directory = pending.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append((prefix + entry.name + "/", entry.path))
+                    else:
+                        files.add(prefix + entry.name)
+        pages = [key for key in files if key.endswith((".html", ".htm")) and not key.startswith(self.exclude)]
+        return files, sorted(pages)
+
+    def _digest(self, key: str) -> str:
+        entry = self.manifest.get(key)
+        if entry and "hash" in entry:
+            return entry["hash"]
+        return file_digest(self.manifest.path_for(key))
+
+    def _scan(self, pages: List[str]) -> int:
+        """Scan pages whose content changed since their cached scan; returns how many."""
+        digests = {key: self._digest(key) for key in pages}
+        pending = [key for key in pages if (self.scans.get(key) or {}).get("hash") != digests[key]]
+        chunks = [pending[i:i + CHUNK_PAGES] for i in range(0, len(pending), CHUNK_PAGES)]
+        workers = min(self.max_workers or os.cpu_count() or 1, len(chunks))
+        if workers > 1:
+            context = None
+            if "fork" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                results = [r for chunk in pool.map(_scan_files, [self.public_dir] * len(chunks), chunks) for r in chunk]
+        else:
+            results = _scan_files(self.public_dir, pending)
+        for key, scan in results:
+            self.scans[key] = {"hash": digests[key], **scan}
+        self.scans = {key: self.scans[key] for key in pages}
+        return len(pending)
+
+    def _resolve(self, page: str, url: str, files: set) -> Optional[Tuple[Optional[str], str]]:
+        """
+        (target file key, fragment) of a link, with None as the key when the
+        target doesn't exist; None for links outside the site.
+        """
+        if self.origin and url.startswith(self.origin + "/"):
+            url = url[len(self.origin):]
+        if url.startswith(EXTERNAL_SCHEMES) or url.startswith("//"):
+            return None
+        if url.startswith("/") and "/." not in url:
+            # Site-absolute links (nearly all of them) need no joining
+            path, _, fragment = url.partition("#")
+            path = path.partition("?")[0]
+        else:
+            parts = urlsplit(urljoin("/" + page, url))
+            if parts.scheme or parts.netloc:
+                return None
+            path, fragment = parts.path, parts.fragment
+        path = unquote(path)
+        if any(path.startswith(prefix) for prefix in self.ignore):
+            return None
+        key = path.lstrip("/")
+        if key == "" or key.endswith("/"):
+            key += "index.html"
+        if key not in files:
+            key = key + "/index.html" if key + "/index.html" in files else None
+        return key, fragment
+
+    @traced()
+    def check(self) -> Dict:
+        """Scan changed pages and resolve every link. Returns the report."""
+        files, pages = self._files()
+        scanned = self._scan(pages)
+        ids = {key: set(scan["ids"]) for key, scan in self.scans.items()}
+
+        broken, inbound = [], set()
+        # Most links (navigation, assets) repeat on every page, so each is resolved once
+        resolved: Dict[Tuple[str, str], Optional[Tuple[Optional[str], str]]] = {}
+        for page, scan in self.scans.items():
+            directory = page.rpartition("/")[0]
+            for url, line in scan["links"]:
+                if url.startswith("#"):
+                    target, fragment = page, url[1:]
+                else:
+                    relative = not url.startswith("/") and ":" not in url.partition("/")[0]
+                    cache_key = (directory, url) if relative else ("", url)
+                    if cache_key not in resolved:
+                        resolved[cache_key] = self._resolve(page, url, files)
+                    if resolved[cache_key] is None:
+                        continue
+                    target, fragment = resolved[cache_key]
+                if target is None:
+                    broken.append({"page": page, "line": line, "url": url, "reason": "missing file"})
+                    continue
+                if target != page:
+                    inbound.add(target)
+                if fragment not in IMPLICIT_ANCHORS and target in ids and fragment not in ids[target]:
+                    broken.append({"page": page, "line": line, "url": url, "reason": "missing anchor"})
+
+        report = {
+            "pages": len(pages),
+            "scanned": scanned,
+            "broken": broken,
+            "orphans": [page for page in pages if page not in inbound and page not in self.entry_points],
+            "duplicate_ids": [{"page": page, "line": line, "id": anchor}
+                              for page, scan in self.scans.items() for line, anchor in scan["duplicate_ids"]],
+            "markup": [{"page": page, "line": line, "message": message}
+                       for page, scan in self.scans.items() for line, message in scan["markup"]],
+            "jsonld": [{"page": page, "line": line, "message": message}
+                       for page, scan in self.scans.items() for line, message in scan["jsonld"]]
+        }
+        report["problems"] = sum(len(report[kind]) for kind in
+                                 ("broken", "orphans", "duplicate_ids", "markup", "jsonld"))
+        write_json_if_changed(self.state_path, {
+            "version": LINKCHECK_STATE_VERSION,
+            "pages": self.scans
+        }, indent=None)
+        logger.info("Link check: %d page(s), %d scanned, %d problem(s)", len(pages), scanned, report["problems"])
+        return report
+
+
+def format_report(report: Dict, limit: int = 50) -> str:
+    """Human-readable summary of a link check report."""
+    lines = [f"Checked {report['pages']} page(s) ({report['scanned']} scanned): {report['problems']} problem(s)"]
+    sections = [
+        ("Broken links", [f"{b['page']}:{b['line']}: {b['url']} ({b['reason']})" for b in report["broken"]]),
+        ("Orphaned pages", report["orphans"]),
+        ("Duplicate ids", [f"{d['page']}:{d['line']}: #{d['id']}" for d in report["duplicate_ids"]]),
+        ("Markup", [f"{m['page']}:{m['line']}: {m['message']}" for m in report["markup"]]),
+        ("JSON-LD", [f"{j['page']}:{j['line']}: {j['message']}" for j in report["jsonld"]])
+    ]
+    for title, items in sections:
+        if items:
+            lines.append(f"\n{title} ({len(items)}):")
+            lines += [f"  {item}" for item in items[:limit]]
+            if len(items) > limit:
+                lines.append(f"  ... and {len(items) - limit} more")
+    return "\n".join(lines)
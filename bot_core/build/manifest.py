@@ -0,0 +1,353 @@
+"""
+Content-hash build manifest for incremental site updates.
+
+Every file the builder places under a site's ``public_html`` is recorded
+with its content hash and size, so repeat builds only touch files whose
+source actually changed.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterable, List, Optional
+
+from bot_core.monitoring.tracing import traced
+
+from .blobstore import BlobStore
+from .fsutil import atomic_write_bytes, atomic_write_json, file_digest
+
+MANIFEST_NAME = "build_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def new_report() -> Dict:
+    """Return an empty sync report."""
+    return {'added': [], 'updated': [], 'removed': [], 'unchanged': 0}
+
+
+def merge_reports(target: Dict, report: Dict) -> Dict:
+    """Fold one sync report into another."""
+    for key in ('added', 'updated', 'removed'):
+        target[key].extend(report[key])
+    target['unchanged'] += report['unchanged']
+    return target
+
+
+class BuildManifest:
+    def __init__(self, path: str, root: str, store: Optional[BlobStore] = None):
+        """
+        Load (or start) a manifest.
+
+        Args:
+            path: Location of the manifest JSON file
+            root: Directory the manifest keys are relative to (public_html)
+            store: Blob store to link copied files from (plain copies if None)
+        """
+        self.path = path
+        self.root = root
+        self.store = store
+        self.files: Dict[str, Dict] = {}
+        self._seen = set()
+        self._dirty = False
+        self.load()
+
+    @classmethod
+    def for_site(cls, site_path: str, store: Optional[BlobStore] = None) -> "BuildManifest":
+        """Open the manifest stored under ``<site>/config``."""
+        return cls(
+            os.path.join(site_path, "config", MANIFEST_NAME),
+            os.path.join(site_path, "public_html"),
+            store
+        )
+
+    def load(self) -> None:
+        """Read the manifest from disk, starting empty if missing or corrupt."""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.files = {}
+            return
+
+        if data.get("version") == MANIFEST_VERSION:
+            self.files = data.get("files", {})
+        else:
+            self.files = {}
+
+    @traced()
+    def save(self) -> bool:
+        """Persist the manifest if anything changed. Returns True if written."""
+        if not self._dirty:
+            return False
+        atomic_write_json(self.path, {
+            "version": MANIFEST_VERSION,
+            "files": dict(sorted(self.files.items()))
+        })
+        self._dirty = False
+        return True
+
+    def key_for(self, path: str) -> str:
+        """Return the manifest key (root-relative, '/' separated) for a path."""
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def path_for(self, key: str) -> str:
+        """Return the absolute path of a manifest key."""
+        return os.path.join(self.root, *key.split('/'))
+
+    def get(self, key: str) -> Optional[Dict]:
+        return self.files.get(key)
+
+    def record(self, key: str, entry: Dict) -> None:
+        """Store an entry, marking the manifest dirty only on real changes."""
+        self._seen.add(key)
+        if self.files.get(key) != entry:
+            self.files[key] = entry
+            self._dirty = True
+
+    def forget(self, key: str) -> None:
+        if self.files.pop(key, None) is not None:
+            self._dirty = True
+
+    @traced()
+    def sync_tree(self, src_dir: str, dst_dir: str) -> Dict:
+        """
+        Mirror src_dir into dst_dir, copying only files whose content changed.
+
+        Source files whose size and mtime match the manifest are not re-hashed,
+        destination files that still match their recorded stat are not
+        rewritten, and files previously copied from src_dir that no longer
+        exist there are removed.
+        """
+        report = new_report()
+        src_dir = os.path.abspath(src_dir)
+        dst_prefix = self.key_for(dst_dir).rstrip('/') + '/'
+        seen = set()
+
+        for dirpath, dirnames, filenames in os.walk(src_dir):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                src = os.path.join(dirpath, filename)
+                rel = os.path.relpath(src, src_dir).replace(os.sep, '/')
+                key = dst_prefix + rel
+                seen.add(key)
+                self._sync_file(src, key, report)
+
+        for key, entry in list(self.files.items()):
+            if (key.startswith(dst_prefix) and key not in seen
+                    and entry.get("source", "").startswith(src_dir + os.sep)):
+                self._remove(key, report)
+
+        return report
+
+    def write_output(self, key: str, data: bytes, **meta) -> bool:
+        """
+        Write a generated file unless identical content is already in place.
+
+        Extra keyword arguments are stored on the manifest entry (e.g. the
+        template a page was rendered from). Returns True if the file was written.
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(key)
+        entry = self.files.get(key)
+
+        if entry and entry.get("hash") == digest and self._dst_matches(path, entry):
+            self.record(key, {**entry, **meta})
+            return False
+
+        atomic_write_bytes(path, data)
+        self.record(key, {
+            "hash": digest,
+            "size": len(data),
+            "mtime_ns": os.stat(path).st_mtime_ns,
+            **meta
+        })
+        return True
+
+    def write_stream(self, key: str, chunks: Iterable[bytes], **meta) -> bool:
+        """
+        Like write_output, for content produced in chunks.
+
+        The chunks go straight to a temporary file next to the target while
+        being hashed, so memory use does not depend on the file size.
+        """
+        path = self.path_for(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    hasher.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            entry = self.files.get(key)
+            if entry and entry.get("hash") == digest and self._dst_matches(path, entry):
+                os.unlink(tmp_path)
+                self.record(key, {**entry, **meta})
+                return False
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self.record(key, {"hash": digest, "size": size, "mtime_ns": os.stat(path).st_mtime_ns, **meta})
+        return True
+
+    def is_current(self, key: str, digest: str, field: str = "hash") -> bool:
+        """
+        True if key is recorded with digest and the file on disk is untouched.
+
+        field names the entry field holding digest, e.g. "cache_key" for
+        files derived from another whose content hash is only known later.
+        """
+        entry = self.files.get(key)
+        return bool(entry) and entry.get(field) == digest and self._dst_matches(self.path_for(key), entry)
+
+    def keep(self, key: str, **meta) -> None:
+        """Mark an up-to-date entry as produced by this session."""
+        self.record(key, {**self.files[key], **meta})
+
+    def link_output(self, key: str, src: str, digest: str, **meta) -> None:
+        """Place a copy (or blob link) of src at key, recorded as a generated file."""
+        st = self._place(src, self.path_for(key), digest)
+        self.record(key, {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns, **meta})
+
+    def store_output(self, key: str, data: bytes, digest: str, **meta) -> None:
+        """
+        Write generated bytes at key under a caller-chosen digest.
+
+        With a blob store the bytes are stored once under that digest and
+        linked, so other sites producing the same digest reuse them.
+        """
+        if self.store is None:
+            atomic_write_bytes(self.path_for(key), data)
+        else:
+            self.store.put_bytes(data, digest)
+            self.store.materialize(digest, self.path_for(key))
+        st = os.stat(self.path_for(key))
+        self.record(key, {"hash": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns, **meta})
+
+    @traced()
+    def prune_unseen(self, kind: str = "source") -> Dict:
+        """
+        Remove files of one kind that nothing in this session touched.
+
+        ``kind`` is the entry field identifying who produced the file:
+        "source" for copied files, "template" for rendered pages,
+        "fingerprint_of", "purged_from", "image_of" and "compressed_from"
+        for asset, CSS and image stage outputs.
+        """
+        report = new_report()
+        for key, entry in list(self.files.items()):
+            if kind in entry and key not in self._seen:
+                self._remove(key, report)
+        return report
+
+    @traced()
+    def prune_orphans(self) -> Dict:
+        """
+        Remove derived files whose parent is gone or has new content.
+
+        Used by partial rebuilds, where prune_unseen cannot be used because
+        most files are deliberately left untouched.
+        """
+        report = new_report()
+        for key, entry in list(self.files.items()):
+            parent = self.files.get(entry.get("fingerprint_of", ""))
+            if "fingerprint_of" in entry and (parent is None or parent["hash"] != entry["hash"]):
+                self._remove(key, report)
+            elif "purged_from" in entry and entry["purged_from"] not in self.files:
+                self._remove(key, report)
+            elif "image_of" in entry:
+                parent = self.files.get(entry["image_of"])
+                if parent is None or parent["hash"] != entry["source_hash"]:
+                    self._remove(key, report)
+        # Second pass, so variants of fingerprints removed above go too
+        for key, entry in list(self.files.items()):
+            if "compressed_from" in entry and entry["compressed_from"] not in self.files:
+                self._remove(key, report)
+        return report
+
+    def remove_variants(self, keys: Iterable[str]) -> Dict:
+        """Remove the compressed siblings of the given outputs."""
+        parents = set(keys)
+        report = new_report()
+        for key, entry in list(self.files.items()):
+            if entry.get("compressed_from") in parents:
+                self._remove(key, report)
+        return report
+
+    def _sync_file(self, src: str, key: str, report: Dict) -> None:
+        src_stat = os.stat(src)
+        entry = self.files.get(key)
+
+        if (entry and entry.get("source") == src
+                and entry.get("source_mtime_ns") == src_stat.st_mtime_ns
+                and entry.get("size") == src_stat.st_size):
+            digest = entry["hash"]
+        else:
+            digest = file_digest(src)
+
+        dst = self.path_for(key)
+        if entry and entry.get("hash") == digest and self._dst_matches(dst, entry):
+            entry = {**entry, "source": src, "source_mtime_ns": src_stat.st_mtime_ns}
+            self.record(key, entry)
+            report['unchanged'] += 1
+            return
+
+        dst_stat = self._place(src, dst, digest)
+        report['updated' if entry else 'added'].append(key)
+        self.record(key, {
+            "hash": digest,
+            "size": src_stat.st_size,
+            "source": src,
+            "source_mtime_ns": src_stat.st_mtime_ns,
+            "mtime_ns": dst_stat.st_mtime_ns
+        })
+
+    def _place(self, src: str, dst: str, digest: str) -> os.stat_result:
+        """Copy (or link) src over dst atomically and return the new destination stat."""
+        if self.store is not None:
+            if self.store.is_linked(dst, digest):
+                # dst was edited in place, and with it the shared blob
+                self.store.verify(digest)
+            self.store.put(src, digest)
+            self.store.materialize(digest, dst)
+            return os.stat(dst)
+
+        directory = os.path.dirname(dst)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        os.close(fd)
+        try:
+            shutil.copy2(src, tmp_path)
+            os.replace(tmp_path, dst)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return os.stat(dst)
+
+    def _remove(self, key: str, report: Dict) -> None:
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.unlink(path)
+        self.forget(key)
+        report['removed'].append(key)
+
+    @staticmethod
+    def _dst_matches(dst: str, entry: Dict) -> bool:
+        try:
+            st = os.stat(dst)
+        except FileNotFoundError:
+            return False
+        return st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns")
+
+    def keys(self) -> List[str]:
+        return sorted(self.files)
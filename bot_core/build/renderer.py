@@ -0,0 +1,303 @@
+"""
+Page renderer: turns a site template plus site config into HTML pages.
+
+Compiled templates are kept in an on-disk bytecode cache keyed by the
+template source hash, so fresh processes (e.g. batch build workers) load
+compiled code instead of re-parsing every template.
+Independent batches of pages (e.g. the language variants of a site) can
+be rendered in parallel worker processes.
+
+In streaming mode pages are rendered with template streams straight to
+buffered files, and large content can be passed in as ContentSection
+iterables, so memory use does not grow with page size.
+"""
+
+import multiprocessing
+import os
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from hashlib import sha1
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from jinja2.bccache import Bucket
+
+from bot_core.monitoring.tracing import traced
+
+PAGES_DIR = "pages"
+
+# Write buffer for streamed pages, and the size of segments read back from them
+STREAM_BUFFER_SIZE = 256 * 1024
+SEGMENT_SIZE = 64 * 1024
+
+# One environment per (template dir, cache dir) and process, so templates
+# parsed for one site are reused by every other site built in the process.
+_ENVIRONMENTS: Dict[Tuple[str, str], Environment] = {}
+
+
+class HashedBytecodeCache(FileSystemBytecodeCache):
+    """Bytecode cache whose entries are keyed by template name and source hash."""
+
+    def get_bucket(self, environment, name, filename, source) -> Bucket:
+        checksum = self.get_source_checksum(source)
+        key = sha1(f"{name}:{checksum}".encode("utf-8")).hexdigest()
+        bucket = Bucket(environment, key, checksum)
+        self.load_bytecode(bucket)
+        return bucket
+
+
+def get_environment(template_dir: str, cache_dir: Optional[str] = None) -> Environment:
+    """Return the shared Jinja2 environment for a template directory."""
+    key = (os.path.abspath(template_dir), os.path.abspath(cache_dir) if cache_dir else "")
+    env = _ENVIRONMENTS.get(key)
+    if env is None:
+        bytecode_cache = None
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            bytecode_cache = HashedBytecodeCache(cache_dir, "%s.jinja")
+        env = Environment(
+            loader=FileSystemLoader(template_dir),
+            bytecode_cache=bytecode_cache,
+            cache_size=-1
+        )
+        _ENVIRONMENTS[key] = env
+    return env
+
+
+class ContentSection:
+    """
+    Page content produced incrementally instead of as one prebuilt string.
+
+    Wraps an iterable of HTML chunks, or a callable returning one (so the
+    section can be iterated more than once). Templates stream it with
+    ``{% for chunk in section %}{{ chunk }}{% endfor %}``; ``{{ section }}``
+    still works but joins every chunk first.
+    """
+
+    def __init__(self, chunks: Union[Iterable[str], Callable[[], Iterable[str]]]):
+        self._chunks = chunks
+
+    def __iter__(self):
+        chunks = self._chunks() if callable(self._chunks) else self._chunks
+        return iter(chunks)
+
+    def __str__(self) -> str:
+        return "".join(self)
+
+    __html__ = __str__
+
+
+def read_segments(path: str, size: int = SEGMENT_SIZE) -> Iterator:
+    """
+    Read an HTML file back in segments of roughly size characters.
+
+    Segments end right before a '<', so no tag is split between two of
+    them and tag-level rewrites can be applied segment by segment.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        pending = ""
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                break
+            pending += chunk
+            cut = pending.rfind("<")
+            if cut > 0:
+                yield pending[:cut]
+                pending = pending[cut:]
+            elif len(pending) > 4 * size:
+                # No tag in sight; don't let the buffer grow without bound
+                yield pending
+                pending = ""
+        if pending:
+            yield pending
+
+
+def page_output_path(page_name: str) -> str:
+    """Map a page template name to its output path (e.g. about -> about/index.html)."""
+    if page_name == "index":
+        return "index.html"
+    return f"{page_name}/index.html"
+
+
+def page_url(page_name: str) -> str:
+    return "/" if page_name == "index" else f"/{page_name}/"
+
+
+def _prefix_url(url: str, prefix: str) -> str:
+    """Move a root-relative URL under prefix (e.g. /about/ -> /en/about/)."""
+    if not prefix or not url.startswith("/") or url.startswith("//"):
+        return url
+    return prefix + url
+
+
+def _render_batch(template_dir: str, cache_dir: Optional[str], jobs: List[Tuple[str, Dict]]) -> List[str]:
+    """Render a batch of (page name, context) jobs. Runs inside a worker process."""
+    renderer = SiteRenderer(template_dir, cache_dir)
+    return [renderer.render_page(page_name, context) for page_name, context in jobs]
+
+
+def _stream_batch(template_dir: str, cache_dir: Optional[str], jobs: List[Tuple[str, Dict, str]]) -> None:
+    """Stream a batch of (page name, context, path) jobs to files. Runs inside a worker process."""
+    renderer = SiteRenderer(template_dir, cache_dir)
+    for page_name, context, path in jobs:
+        renderer.stream_page(page_name, context, path)
+
+
+def _is_streamed(value) -> bool:
+    """Content sections and iterators can't be sent to worker processes."""
+    return isinstance(value, (ContentSection, Iterator))
+
+
+class SiteRenderer:
+    def __init__(self, template_dir: str, cache_dir: Optional[str] = None):
+        """
+        Renderer for one site template.
+
+        Args:
+            template_dir: Template root, e.g. shared/templates/business
+            cache_dir: Directory for compiled template bytecode (None disables it)
+        """
+        self.template_dir = template_dir
+        self.cache_dir = cache_dir
+        self.env = get_environment(template_dir, cache_dir)
+
+    def list_pages(self) -> List[str]:
+        """Return the page names defined under the template's pages/ directory."""
+        pages_dir = os.path.join(self.template_dir, PAGES_DIR)
+        if not os.path.isdir(pages_dir):
+            return []
+        names = [
+            os.path.splitext(filename)[0]
+            for filename in os.listdir(pages_dir)
+            if filename.endswith(".html")
+        ]
+        # index first, the rest alphabetically
+        return sorted(names, key=lambda name: (name != "index", name))
+
+    def build_context(self, site_config: Dict, page_name: str, pages: List[str],
+                      lang: Optional[str] = None, unlocalized: Iterable[str] = ()) -> Dict:
+        """
+        Assemble the template variables for one page.
+
+        With lang, the page is a language variant rendered under /<lang>/ and
+        its own links point to the same language, except links to the
+        unlocalized pages (rendered once, at the root, e.g. the blog).
+        """
+        variables = site_config.get("variables", {})
+        prefix = f"/{lang}" if lang else ""
+        nav_links = site_config.get("nav_links") or [
+            {"url": page_url(name), "text": name.replace("-", " ").title()}
+            for name in pages if name != "index"
+        ]
+        if prefix:
+            shared = {page_url(name) for name in unlocalized}
+            nav_links = [link if link.get("url") in shared else
+                         {**link, "url": _prefix_url(link.get("url", ""), prefix)} for link in nav_links]
+        output = page_output_path(page_name)
+        return {
+            **site_config,
+            **variables,
+            "site_title": site_config.get("title") or variables.get("company_name") or "New Website",
+            "nav_links": nav_links,
+            "current_year": datetime.now().year,
+            "page": {
+                "name": page_name,
+                "url": prefix + page_url(page_name),
+                "output": f"{lang}/{output}" if lang else output,
+                "lang": lang
+            }
+        }
+
+    def render_page(self, page_name: str, context: Dict) -> str:
+        template = self.env.get_template(f"{PAGES_DIR}/{page_name}.html")
+        return template.render(**context)
+
+    def stream_page(self, page_name: str, context: Dict, path: str,
+                    buffer_size: int = STREAM_BUFFER_SIZE) -> None:
+        """Render a page chunk by chunk straight into a buffered file."""
+        template = self.env.get_template(f"{PAGES_DIR}/{page_name}.html")
+        stream = template.stream(**context)
+        # Hand chunks to the file in groups rather than one write per template node
+        stream.enable_buffering(64)
+        with open(path, 'w', encoding='utf-8', buffering=buffer_size) as f:
+            stream.dump(f)
+
+    @traced()
+    def stream_batches(self, batches: List[List[Tuple[str, Dict, str]]],
+                       max_workers: Optional[int] = None) -> None:
+        """
+        Stream batches of (page name, context, path) jobs to files, one worker
+        process per batch. Batches carrying content sections or iterators are
+        rendered in this process, since those can't be sent to a worker.
+        """
+        max_workers = min(max_workers or os.cpu_count() or 1, len(batches))
+        parallel = []
+        if max_workers > 1:
+            parallel = [
+                batch for batch in batches
+                if not any(_is_streamed(v) for _, context, _ in batch for v in context.values())
+            ]
+        if len(parallel) < 2:
+            parallel = []
+        in_process = [batch for batch in batches if not any(batch is p for p in parallel)]
+
+        if not parallel:
+            for batch in in_process:
+                for page_name, context, path in batch:
+                    self.stream_page(page_name, context, path)
+            return
+
+        for name in {name for batch in parallel for name, _, _ in batch}:
+            self.env.get_template(f"{PAGES_DIR}/{name}.html")
+        mp_context = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            mp_context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as pool:
+            futures = [pool.submit(_stream_batch, self.template_dir, self.cache_dir, batch)
+                       for batch in parallel]
+            # Batches that must stay here render while the workers run
+            for batch in in_process:
+                for page_name, context, path in batch:
+                    self.stream_page(page_name, context, path)
+            for future in futures:
+                future.result()
+
+    @traced()
+    def render_batches(self, batches: List[List[Tuple[str, Dict]]],
+                       max_workers: Optional[int] = None) -> List[List[str]]:
+        """
+        Render batches of (page name, context) jobs, one worker process per batch.
+
+        Page templates are compiled in this process first; forked workers
+        inherit the compiled templates, and others load them from the
+        bytecode cache, so no batch parses a template again. With a single
+        batch or worker, or when contexts carry content sections, everything
+        is rendered here.
+        """
+        max_workers = min(max_workers or os.cpu_count() or 1, len(batches))
+        if max_workers <= 1 or any(_is_streamed(v) for batch in batches
+                                   for _, context in batch for v in context.values()):
+            return [[self.render_page(name, context) for name, context in batch] for batch in batches]
+
+        for name in {name for batch in batches for name, _ in batch}:
+            self.env.get_template(f"{PAGES_DIR}/{name}.html")
+        context = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            futures = [
+                pool.submit(_render_batch, self.template_dir, self.cache_dir, batch)
+                for batch in batches
+            ]
+            return [future.result() for future in futures]
+
+    def render_site(self, site_config: Dict) -> Dict[str, str]:
+        """Render every page. Returns {output path: html}."""
+        pages = self.list_pages()
+        outputs = {}
+        for page_name in pages:
+            context = self.build_context(site_config, page_name, pages)
+            outputs[page_output_path(page_name)] = self.render_page(page_name, context)
+        return outputs
@@ -0,0 +1,186 @@
+"""
+Transactional editing of a site's config/site_config.json.
+
+A session holds an exclusive lock on the site config for its lifetime,
+keeps the parsed config in memory while changes are applied, validates
+once and commits with a single atomic write, skipping the write entirely
+when nothing changed.
+"""
+
+import copy
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from .fsutil import atomic_write_bytes
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+SITE_CONFIG_NAME = "site_config.json"
+
+
+def serialize_config(config: Dict) -> bytes:
+    return json.dumps(config, indent=4, ensure_ascii=False).encode("utf-8")
+
+
+def validate_site_config(config: Dict) -> List[str]:
+    """Return a list of problems with a site config (empty if valid)."""
+    errors = []
+    theme = config.get("theme")
+    if theme is not None and not isinstance(theme, (dict, str)):
+        errors.append("theme must be an object or a theme name")
+    if isinstance(theme, dict):
+        for section in ("colors", "fonts"):
+            if section in theme and not isinstance(theme[section], dict):
+                errors.append(f"theme.{section} must be an object")
+            for name, value in (theme.get(section) or {}).items():
+                if not isinstance(value, str):
+                    errors.append(f"theme.{section}.{name} must be a string")
+    if "variables" in config and not isinstance(config["variables"], dict):
+        errors.append("variables must be an object")
+    components = config.get("components")
+    if components is not None and not isinstance(components, (list, dict)):
+        errors.append("components must be a list or an object")
+    schemas = config.get("schemas")
+    if schemas is not None:
+        if not isinstance(schemas, list):
+            errors.append("schemas must be a list")
+        else:
+            for index, schema in enumerate(schemas):
+                if not isinstance(schema, dict) or "type" not in schema:
+                    errors.append(f"schemas[{index}] must be an object with a type")
+    if "domain" in config and not isinstance(config["domain"], str):
+        errors.append("domain must be a string")
+    return errors
+
+
+class SiteConfigSession:
+    def __init__(self, path: str, lock_timeout: float = 30.0):
+        """
+        Args:
+            path: Path to the site's site_config.json (may not exist yet)
+            lock_timeout: Seconds to wait for another process's session to finish
+        """
+        self.path = path
+        # Hidden, so watchers and syncs ignore it
+        self.lock_path = os.path.join(os.path.dirname(path), "." + os.path.basename(path) + ".lock")
+        self.lock_timeout = lock_timeout
+        self.config: Dict = {}
+        self.committed = False
+        self._original: Optional[bytes] = None
+        self._lock_fd: Optional[int] = None
+
+    @classmethod
+    def for_site(cls, site_path: str, **kwargs) -> "SiteConfigSession":
+        return cls(os.path.join(site_path, "config", SITE_CONFIG_NAME), **kwargs)
+
+    def __enter__(self) -> "SiteConfigSession":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.close()
+
+    def open(self) -> Dict:
+        """Acquire the lock and load the config."""
+        self._acquire_lock()
+        try:
+            with open(self.path, 'rb') as f:
+                self._original = f.read()
+            self.config = json.loads(self._original)
+        except FileNotFoundError:
+            self._original = None
+            self.config = {}
+        return self.config
+
+    def close(self) -> None:
+        """Release the lock without writing anything."""
+        if self._lock_fd is not None:
+            if fcntl is not None:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _acquire_lock(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is None:
+            return
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    os.close(self._lock_fd)
+                    self._lock_fd = None
+                    raise TimeoutError(f"Timed out waiting for lock on {self.path}")
+                time.sleep(0.01)
+
+    # Changes
+
+    def replace(self, config: Dict) -> None:
+        self.config = config
+
+    def merge(self, values: Dict) -> None:
+        """Shallow-merge top-level keys."""
+        self.config.update(values)
+
+    def update_theme(self, colors: Optional[Dict[str, str]] = None,
+                     fonts: Optional[Dict[str, str]] = None) -> None:
+        theme = self.config.get("theme")
+        if not isinstance(theme, dict):
+            # A bare theme name ("light") becomes the theme's mode
+            theme = {"mode": theme} if theme else {}
+            self.config["theme"] = theme
+        theme.setdefault("colors", {}).update(colors or {})
+        theme.setdefault("fonts", {}).update(fonts or {})
+
+    def set_content(self, content: Dict[str, Any]) -> None:
+        self.config.setdefault("variables", {}).update(content)
+
+    def set_components(self, components: Iterable[str]) -> None:
+        self.config["components"] = list(components)
+
+    def add_schemas(self, schemas: Iterable[Dict]) -> None:
+        """Record schema specs, replacing earlier ones with the same type and name."""
+        existing = self.config.setdefault("schemas", [])
+        for schema in schemas:
+            identity = (schema.get("type"), schema.get("name") or schema.get("business_name"))
+            existing[:] = [
+                s for s in existing
+                if (s.get("type"), s.get("name") or s.get("business_name")) != identity
+            ]
+            existing.append(copy.deepcopy(schema))
+
+    # Commit
+
+    @property
+    def changed(self) -> bool:
+        return serialize_config(self.config) != self._original
+
+    def validate(self) -> None:
+        errors = validate_site_config(self.config)
+        if errors:
+            raise ValueError("Invalid site config: " + "; ".join(errors))
+
+    def commit(self) -> bool:
+        """Validate and write the config if it changed. Returns True if written."""
+        self.validate()
+        payload = serialize_config(self.config)
+        if payload == self._original:
+            self.committed = False
+            return False
+        atomic_write_bytes(self.path, payload)
+        self._original = payload
+        self.committed = True
+        return True
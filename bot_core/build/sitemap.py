@@ -0,0 +1,271 @@
+"""
+Sitemap stage: sitemap.xml (sharded when large) and robots.txt from the build output.
+
+Every rendered page in the build manifest becomes a <url> entry. The XML
+is generated as a stream and written through the manifest, so memory use
+does not depend on the sitemap size and unchanged files are not rewritten.
+Past 50,000 URLs or 50 MB (the protocol limits), sitemap.xml turns into a
+sitemap index pointing at gzip-compressed shards. Pages are assigned to
+shards by a hash of their path, so adding or removing a page only changes
+its own shard (and the index).
+
+``lastmod`` is the date a page's content hash last changed, kept in
+config/sitemap.json, so rebuilding unchanged pages keeps their dates (and
+their shards) stable. Multi-language sites get xhtml:link hreflang
+alternates on every page.
+"""
+
+import hashlib
+import html
+import json
+import logging
+import os
+import zlib
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bot_core.monitoring.tracing import traced
+
+from .fsutil import write_json_if_changed
+from .i18n import alternate_links
+from .manifest import BuildManifest
+from .renderer import PAGES_DIR, page_url
+
+SITEMAP_NAME = "sitemap.xml"
+SITEMAP_STATE_NAME = "sitemap.json"
+SITEMAP_STATE_VERSION = 1
+ROBOTS_NAME = "robots.txt"
+
+# Protocol limits per sitemap file (the byte limit applies uncompressed)
+MAX_URLS = 50000
+MAX_BYTES = 50 * 1024 * 1024
+
+URLSET_OPEN = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+               'xmlns:xhtml="http://www.w3.org/1999/xhtml">\n')
+URLSET_CLOSE = '</urlset>\n'
+INDEX_OPEN = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+              '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+INDEX_CLOSE = '</sitemapindex>\n'
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    return html.escape(value, quote=True)
+
+
+class SitemapPipeline:
+    def __init__(
+        self,
+        manifest: BuildManifest,
+        state_path: str,
+        origin: str,
+        languages: Iterable[str] = (),
+        default_language: Optional[str] = None,
+        exclude: Iterable[str] = (),
+        max_urls: int = MAX_URLS,
+        max_bytes: int = MAX_BYTES
+    ):
+        """
+        Args:
+            manifest: The site's build manifest
+            state_path: Where each page's hash and lastmod date are kept between builds
+            origin: Absolute site origin, e.g. https://example.com
+            languages: Site languages (empty for single-language sites)
+            default_language: Language rendered at the site root
+            exclude: URL path prefixes to leave out (e.g. "/thanks/")
+            max_urls: URLs per sitemap file before sharding
+            max_bytes: Uncompressed bytes per sitemap file before sharding
+        """
+        self.manifest = manifest
+        self.state_path = state_path
+        self.origin = origin.rstrip("/")
+        self.languages = list(languages)
+        self.default_language = default_language
+        self.exclude = list(exclude)
+        self.max_urls = max_urls
+        self.max_bytes = max_bytes
+        self.pages: Dict[str, List[str]] = {}
+        self.shards = 0
+        self.written: List[str] = []
+        self.removed: List[str] = []
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.state_path, 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        if data.get("version") == SITEMAP_STATE_VERSION:
+            self.pages = data.get("pages", {})
+            self.shards = data.get("shards", 0)
+
+    def _page_keys(self) -> List[str]:
+        """Manifest keys of rendered HTML pages, in URL order."""
+        keys = []
+        for key, entry in self.manifest.files.items():
+            if not key.endswith("index.html") or ("template" not in entry and "collection" not in entry):
+                continue
+            path = "/" + key[:-len("index.html")]
+            if not any(path.startswith(prefix) for prefix in self.exclude):
+                keys.append(key)
+        return sorted(keys)
+
+    def _lastmod(self, key: str, today: str) -> str:
+        digest = self.manifest.get(key)["hash"]
+        known = self.pages.get(key)
+        if known and known[0] == digest:
+            return known[1]
+        self.pages[key] = [digest, today]
+        return today
+
+    def _url_entries(self, keys: List[str]) -> Iterator[Tuple[str, str]]:
+        """(<url> element, lastmod) for each page key."""
+        today = date.today().isoformat()
+        for key in keys:
+            lastmod = self._lastmod(key, today)
+            parts = [f"  <url>\n    <loc>{_escape(self.origin + '/' + key[:-len('index.html')])}</loc>\n"
+                     f"    <lastmod>{lastmod}</lastmod>\n"]
+            template = self.manifest.get(key).get("template", "")
+            if self.languages and template.startswith(PAGES_DIR + "/"):
+                # Every language variant of a page lists all of them
+                name = template[len(PAGES_DIR) + 1:-len(".html")]
+                for link in alternate_links(page_url(name), self.languages, self.default_language, self.origin):
+                    parts.append(f'    <xhtml:link rel="alternate" hreflang="{_escape(link["hreflang"])}" '
+                                 f'href="{_escape(link["href"])}"/>\n')
+            parts.append("  </url>\n")
+            yield "".join(parts), lastmod
+
+    @traced()
+    def write(self) -> List[str]:
+        """
+        Write sitemap.xml (and shards when needed); returns the keys written.
+        Stale shards from earlier builds are removed.
+        """
+        keys = self._page_keys()
+        # A first pass sizes the sitemap without keeping it, to choose the layout
+        sizes = [len(entry.encode("utf-8")) for entry, _ in self._url_entries(keys)]
+        produced = []
+        if len(keys) <= self.max_urls and len(URLSET_OPEN) + len(URLSET_CLOSE) + sum(sizes) <= self.max_bytes:
+            self.shards = 0
+            self._write(SITEMAP_NAME, self._urlset(self._url_entries(keys)), "urlset")
+            produced.append(SITEMAP_NAME)
+        else:
+            shards = []
+            for number, shard_keys in enumerate(self._split(keys, sizes), 1):
+                if not shard_keys:
+                    continue
+                name = f"sitemap-{number}.xml.gz"
+                self._write(name, _gzip(self._urlset(self._url_entries(shard_keys))), "shard")
+                # A shard changes when any page in it does, so its lastmod is its newest page's
+                shards.append((name, max(self.pages[key][1] for key in shard_keys)))
+            self._write(SITEMAP_NAME, self._index(shards), "index")
+            produced += [name for name, _ in shards] + [SITEMAP_NAME]
+
+        self._remove_except(produced)
+        self.pages = {key: self.pages[key] for key in keys if key in self.pages}
+        write_json_if_changed(self.state_path, {
+            "version": SITEMAP_STATE_VERSION,
+            "pages": self.pages,
+            "shards": self.shards
+        })
+        logger.info("Sitemap: %d URL(s) in %d file(s)", len(keys), len(produced))
+        return self.written
+
+    def _split(self, keys: List[str], sizes: List[int]) -> List[List[str]]:
+        """
+        Group page keys (in order) into self.shards shards by a hash of the key.
+
+        The shard count is a power of two kept between builds: it doubles
+        while a shard would break the limits and halves when the pages would
+        fit in a quarter of the shards, so it rarely changes (and when it
+        does, each shard splits in two or pairs merge).
+        """
+        buckets = [int.from_bytes(hashlib.sha1(key.encode("utf-8")).digest()[:8], "big") for key in keys]
+        overhead = len(URLSET_OPEN) + len(URLSET_CLOSE)
+        total = sum(sizes)
+        count = max(self.shards, 2)
+        while (count > 2 and len(keys) * 4 <= count * self.max_urls
+               and total * 4 <= count * (self.max_bytes - overhead)):
+            count //= 2
+        while True:
+            urls = [0] * count
+            size = [overhead] * count
+            for bucket, length in zip(buckets, sizes):
+                urls[bucket % count] += 1
+                size[bucket % count] += length
+            # A page too large for any file still gets a shard of its own
+            if all(u <= self.max_urls and (b <= self.max_bytes or u <= 1) for u, b in zip(urls, size)):
+                break
+            count *= 2
+        self.shards = count
+        shards: List[List[str]] = [[] for _ in range(count)]
+        for key, bucket in zip(keys, buckets):
+            shards[bucket % count].append(key)
+        return shards
+
+    def clear(self) -> None:
+        """Remove the sitemap files of earlier builds (when the sitemap is turned off)."""
+        self._remove_except([])
+
+    def _remove_except(self, produced: List[str]) -> None:
+        for key, entry in list(self.manifest.files.items()):
+            if entry.get("sitemap") in ("urlset", "shard", "index") and key not in produced:
+                path = self.manifest.path_for(key)
+                if os.path.exists(path):
+                    os.unlink(path)
+                self.manifest.forget(key)
+                self.removed.append(key)
+
+    def _write(self, key: str, chunks: Iterator[str], kind: str) -> None:
+        encoded = (chunk if isinstance(chunk, bytes) else chunk.encode("utf-8") for chunk in chunks)
+        if self.manifest.write_stream(key, encoded, sitemap=kind):
+            self.written.append(key)
+
+    def _urlset(self, entries: Iterator[Tuple[str, str]]) -> Iterator[str]:
+        yield URLSET_OPEN
+        yield from (entry for entry, _ in entries)
+        yield URLSET_CLOSE
+
+    def _index(self, shards: List[Tuple[str, str]]) -> Iterator[str]:
+        yield INDEX_OPEN
+        for name, lastmod in shards:
+            yield (f"  <sitemap>\n    <loc>{_escape(self.origin + '/' + name)}</loc>\n"
+                   f"    <lastmod>{lastmod}</lastmod>\n  </sitemap>\n")
+        yield INDEX_CLOSE
+
+    def robots(self, disallow: Iterable[str] = (), sitemap: bool = True, enabled: bool = True) -> bool:
+        """
+        Write robots.txt pointing crawlers at the sitemap, unless the site
+        ships its own (a disabled one is removed). Returns True if written.
+        """
+        entry = self.manifest.get(ROBOTS_NAME)
+        if entry and "source" in entry:
+            return False
+        if not enabled:
+            if entry:
+                os.unlink(self.manifest.path_for(ROBOTS_NAME))
+                self.manifest.forget(ROBOTS_NAME)
+                self.removed.append(ROBOTS_NAME)
+            return False
+        lines = ["User-agent: *"]
+        lines += [f"Disallow: {path}" for path in disallow] or ["Allow: /"]
+        if sitemap and self.origin:
+            lines += ["", f"Sitemap: {self.origin}/{SITEMAP_NAME}"]
+        written = self.manifest.write_output(ROBOTS_NAME, ("\n".join(lines) + "\n").encode("utf-8"),
+                                             sitemap="robots")
+        if written:
+            self.written.append(ROBOTS_NAME)
+        return written
+
+
+def _gzip(chunks: Iterator[str]) -> Iterator[bytes]:
+    """Deterministic gzip (no timestamp or file name), so equal shards compress to equal bytes."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,340 @@
+"""
+Watch mode: file watching, debounced incremental rebuilds and live reload.
+
+Changes are picked up with inotify where available (Linux, via libc) and
+by polling file mtimes elsewhere. Bursts of events (editors writing temp
+files, saving several files at once) are coalesced into one rebuild, and
+connected browsers are told to reload over Server-Sent Events.
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import queue
+import select
+import struct
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+LIVERELOAD_PATH = "/__livereload"
+LIVERELOAD_SNIPPET = (
+    "<script>new EventSource('" + LIVERELOAD_PATH + "')"
+    ".addEventListener('reload', function () { location.reload(); });</script>"
+)
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+logger = logging.getLogger(__name__)
+
+
+def is_ignored(path: str) -> bool:
+    """Skip editor swap/backup files and our own temp files."""
+    name = os.path.basename(path)
+    return name.startswith(".") or name.endswith("~") or name.endswith(".swp")
+
+
+class PollingWatcher:
+    def __init__(self, paths: Iterable[str], interval: float = 0.1):
+        """Detects changes by comparing (mtime, size) snapshots of the watched trees."""
+        self.paths = [os.path.abspath(p) for p in paths]
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self) -> Dict[str, tuple]:
+        snapshot = {}
+        for root in self.paths:
+            if os.path.isfile(root):
+                files = [root]
+            else:
+                files = (os.path.join(d, f) for d, _, names in os.walk(root) for f in names)
+            for path in files:
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self, timeout: float) -> Set[str]:
+        """Wait up to timeout and return the paths that changed."""
+        time.sleep(min(timeout, self.interval))
+        current = self._scan()
+        changed = {
+            path for path in set(current) | set(self._snapshot)
+            if current.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = current
+        return {path for path in changed if not is_ignored(path)}
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    def __init__(self, paths: Iterable[str]):
+        """Linux inotify watcher; watches directories recursively, adding new ones as they appear."""
+        libc_name = ctypes.util.find_library("c")
+        if not libc_name:
+            raise OSError("libc not found")
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: Dict[int, str] = {}
+        self._trees: Set[str] = set()
+        # Directories watched only on behalf of individual files
+        self._files: Dict[str, Set[str]] = {}
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.isfile(path):
+                # Watch the parent directory and filter for the file
+                self._files.setdefault(os.path.dirname(path), set()).add(path)
+                self._add(os.path.dirname(path))
+            elif os.path.isdir(path):
+                self._add_tree(path)
+
+    def _add(self, directory: str) -> None:
+        if directory in self._dirs.values():
+            return
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            logger.warning("Could not watch %s (errno %s)", directory, ctypes.get_errno())
+            return
+        self._dirs[wd] = directory
+
+    def _add_tree(self, root: str) -> None:
+        for directory, _, _ in os.walk(root):
+            self._trees.add(directory)
+            self._add(directory)
+
+    def poll(self, timeout: float) -> Set[str]:
+        """Wait up to timeout for events and return the paths they concern."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0").decode("utf-8", "replace")
+            offset += length
+
+            directory = self._dirs.get(wd)
+            if directory is None:
+                continue
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self._add_tree(path)
+            if directory not in self._trees and path not in self._files.get(directory, ()):
+                continue
+            if name and not is_ignored(path):
+                changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def create_watcher(paths: Iterable[str], polling: bool = False):
+    """Return an inotify watcher, or a polling one if inotify is unavailable or not wanted."""
+    paths = list(paths)
+    if not polling:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as e:
+            logger.info("inotify unavailable (%s); falling back to polling", e)
+    return PollingWatcher(paths)
+
+
+def debounced_changes(watcher, debounce: float = 0.05,
+                      stop: Optional[threading.Event] = None) -> Iterator[Set[str]]:
+    """
+    Yield sets of changed paths, each emitted once no new event has arrived for
+    ``debounce`` seconds.
+    """
+    pending: Set[str] = set()
+    while stop is None or not stop.is_set():
+        changed = watcher.poll(debounce if pending else 0.5)
+        if changed:
+            pending |= changed
+            continue
+        if pending:
+            yield pending
+            pending = set()
+
+
+class LiveReloadHub:
+    def __init__(self):
+        """Fan-out of reload events to connected SSE clients."""
+        self._clients: List[queue.Queue] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        client = queue.Queue()
+        with self._lock:
+            self._clients.append(client)
+        return client
+
+    def unsubscribe(self, client: queue.Queue) -> None:
+        with self._lock:
+            if client in self._clients:
+                self._clients.remove(client)
+
+    def broadcast(self, event: str = "reload", data: str = "") -> int:
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.put((event, data))
+        return len(clients)
+
+
+def make_handler(public_dir: str, hub: LiveReloadHub):
+    """Build a request handler serving public_dir with the live-reload snippet injected."""
+
+    class DevRequestHandler(SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=public_dir, **kwargs)
+
+        def log_message(self, format, *args):
+            logger.debug(format, *args)
+
+        def end_headers(self):
+            self.send_header("Cache-Control", "no-store")
+            super().end_headers()
+
+        def do_GET(self):
+            if self.path == LIVERELOAD_PATH:
+                return self._stream_events()
+            url_path = urlsplit(self.path).path
+            path = self.translate_path(url_path)
+            if os.path.isdir(path):
+                path = os.path.join(path, "index.html")
+            if url_path.endswith(("/", ".html")) and path.endswith(".html") and os.path.isfile(path):
+                return self._send_html(path)
+            return super().do_GET()
+
+        def _send_html(self, path: str):
+            with open(path, 'rb') as f:
+                body = f.read()
+            snippet = LIVERELOAD_SNIPPET.encode("utf-8")
+            index = body.rfind(b"</body>")
+            body = body[:index] + snippet + body[index:] if index >= 0 else body + snippet
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream_events(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "keep-alive")
+            self.end_headers()
+            client = hub.subscribe()
+            try:
+                while True:
+                    try:
+                        event, data = client.get(timeout=15)
+                        message = f"event: {event}\ndata: {data}\n\n"
+                    except queue.Empty:
+                        message = ": ping\n\n"
+                    self.wfile.write(message.encode("utf-8"))
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                hub.unsubscribe(client)
+
+    return DevRequestHandler
+
+
+class DevServer:
+    def __init__(
+        self,
+        public_dir: str,
+        watch_paths: Iterable[str],
+        on_change: Callable[[Set[str]], Optional[Dict]],
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        debounce: float = 0.05,
+        polling: bool = False
+    ):
+        """
+        Serve public_dir, rebuild through on_change when watched files change,
+        then tell connected browsers to reload.
+        """
+        self.hub = LiveReloadHub()
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(public_dir, self.hub))
+        self.httpd.daemon_threads = True
+        self.watcher = create_watcher(watch_paths, polling)
+        self.on_change = on_change
+        self.debounce = debounce
+        self.stop_event = threading.Event()
+        self._server_thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> None:
+        """Start serving in a background thread."""
+        self._server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._server_thread.start()
+
+    def run(self) -> None:
+        """Serve and rebuild until stop() is called (or Ctrl+C)."""
+        self.start()
+        logger.info("Serving %s", self.url)
+        try:
+            for changed in debounced_changes(self.watcher, self.debounce, self.stop_event):
+                started = time.perf_counter()
+                try:
+                    report = self.on_change(changed)
+                except Exception:
+                    logger.exception("Rebuild failed for %s", sorted(changed))
+                    continue
+                clients = self.hub.broadcast("reload")
+                logger.info(
+                    "Rebuilt %d page(s) in %.1f ms, notified %d client(s)",
+                    len((report or {}).get("rendered", [])),
+                    (time.perf_counter() - started) * 1000, clients
+                )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.watcher.close()
@@ -3,20 +3,69 @@ Core website builder implementation.
 """
 
 import os
+import html
 import json
+import logging
+import copy
+import hashlib
 import shutil
-from typing import Dict, List, Optional
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Set
 from pathlib import Path
 from datetime import datetime
 from jinja2 import Environment, FileSystemLoader
 
+from bot_core.build.assets import ASSET_MANIFEST_NAME, AssetPipeline
+from bot_core.build.collection import Collection, CollectionIndex
+from bot_core.build.css import CSS_USAGE_NAME, DEFAULT_CRITICAL, CssPipeline
+from bot_core.build.images import ImagePipeline
+from bot_core.build.blobstore import BlobStore, referenced_digests
+from bot_core.build.fsutil import file_digest
+from bot_core.build.linkcheck import LINKCHECK_STATE_NAME, LinkChecker
+from bot_core.build.manifest import BuildManifest, merge_reports, new_report
+from bot_core.build.depgraph import (
+    GRAPH_NAME,
+    DependencyGraph,
+    TemplateAnalyzer,
+    config_key_hashes,
+    context_names_for_keys,
+    diff_config
+)
+from bot_core.build.i18n import (
+    CONTENT_SPEC_NAME,
+    alternate_links,
+    base_url,
+    inject_alternates,
+    load_content_spec,
+    localized_config,
+    site_languages
+)
+from bot_core.build.renderer import (
+    PAGES_DIR,
+    ContentSection,
+    HashedBytecodeCache,
+    SiteRenderer,
+    page_url,
+    read_segments
+)
+from bot_core.build.site_config import SiteConfigSession
+from bot_core.build.sitemap import SITEMAP_STATE_NAME, SitemapPipeline
+from bot_core.monitoring.tracing import traced, tracing
+
+logger = logging.getLogger(__name__)
+
+
 class WebsiteBuilder:
-    def __init__(self):
+    def __init__(self, root_dir: Optional[str] = None):
         """
         Initialize WebsiteBuilder with proper directory structure.
+        
+        Args:
+            root_dir: Project root holding websites/ and shared/ (defaults to the repo root)
         """
         # Core directories
-        self.root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.root_dir = root_dir or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.websites_dir = os.path.join(self.root_dir, "websites")
         self.shared_dir = os.path.join(self.root_dir, "shared")
         
@@ -26,6 +75,10 @@ class WebsiteBuilder:
         self.assets_dir = os.path.join(self.shared_dir, "assets")
         self.scripts_dir = os.path.join(self.shared_dir, "scripts")
         
+        # Compiled template bytecode, shared by every builder process
+        self.cache_dir = os.path.join(self.root_dir, ".cache")
+        self.template_cache_dir = os.path.join(self.cache_dir, "jinja")
+        
         # Create all necessary directories
         for dir_path in [
             self.websites_dir,
@@ -37,9 +90,31 @@ class WebsiteBuilder:
         ]:
             os.makedirs(dir_path, exist_ok=True)
         
+        # Deduplicated storage for files copied into site trees. It lives
+        # inside websites/ so site files can be hardlinked to it.
+        self.blob_store = BlobStore(os.path.join(self.websites_dir, ".blobstore"))
+        
         self.current_site = None
-        self.env = Environment(loader=FileSystemLoader(str(self.templates_dir)))
+        self.manifest = None
+        self.last_sync_report = None
+        self.last_build_report = None
+        self._analyzers = {}
+        self._config_session = None
+        # Worker processes for rendering language variants (None = one per CPU)
+        self.render_workers = None
+        # Stream pages to disk instead of rendering them to strings (also
+        # enabled per site by {"render": {"stream": true}})
+        self.stream_pages = False
+        self.content_sections = {}
+        # Top spans of the last profile() block, as a text table
+        self.last_profile = None
+        os.makedirs(self.template_cache_dir, exist_ok=True)
+        self.env = Environment(
+            loader=FileSystemLoader(str(self.templates_dir)),
+            bytecode_cache=HashedBytecodeCache(self.template_cache_dir, "%s.jinja")
+        )
 
+    @traced()
     def create_website(
         self,
         domain: str,
@@ -79,136 +154,824 @@ class WebsiteBuilder:
         template_config_path = os.path.join(self.templates_dir, template, "config.json")
         with open(template_config_path, 'r') as f:
             template_config = json.load(f)
+        
+        # Copy components and shared assets, skipping files that are unchanged
+        self.manifest = BuildManifest.for_site(site_path, self.blob_store)
+        self._sync_site_files(template, template_config, config.get("components", []), public_path)
+        
+        # Generate and save site configuration in one atomic write
+        with self.edit_config(site_path) as session:
+            session.replace({
+                **template_config,
+                **config,
+                "domain": domain,
+                "template": template,
+                "creation_date": session.config.get("creation_date", str(datetime.now()))
+            })
+            
+        self.current_site = site_path
+        return site_path
+    
+    def open_website(self, domain: str) -> str:
+        """Make an existing website the active one."""
+        site_path = os.path.join(self.websites_dir, domain)
+        if not os.path.exists(os.path.join(site_path, "config/site_config.json")):
+            raise ValueError(f"No website found for {domain}. Call create_website first.")
+        self.current_site = site_path
+        self.manifest = None
+        return site_path
+    
+    @traced()
+    def _sync_site_files(self, template: str, template_config: Dict, components: List, public_path: str) -> Dict:
+        """Bring the site's copied components and assets in line with the shared sources."""
+        # Track copied files so unchanged ones are skipped on rebuilds
+        self.last_sync_report = new_report()
             
         # Copy required components from shared components
         for component in template_config["components"]["required"]:
             self._copy_component(template, component, public_path)
             
         # Copy optional components if specified
-        for component in config.get("components", []):
+        for component in components:
             if component in template_config["components"]["optional"]:
                 self._copy_component(template, component, public_path)
         
         # Copy shared assets
         self._copy_shared_assets(public_path)
         
-        # Generate site configuration
-        site_config = {
-            **template_config,
-            **config,
-            "domain": domain,
-            "creation_date": str(datetime.now())
-        }
-        
-        # Save site configuration
-        config_path = os.path.join(site_path, "config/site_config.json")
-        with open(config_path, 'w') as f:
-            json.dump(site_config, f, indent=4)
-            
-        self.current_site = site_path
-        return site_path
+        # Drop files from components or assets that are no longer used
+        merge_reports(self.last_sync_report, self.manifest.prune_unseen())
+        self.manifest.save()
+        return self.last_sync_report
     
     def _copy_component(self, template: str, component: str, site_path: str):
-        """Copy a component from shared components to site directory."""
+        """Link a component from shared components into the site directory."""
         src = os.path.join(self.components_dir, template, component)
         dst = os.path.join(site_path, "components", component)
         
         if os.path.exists(src):
-            shutil.copytree(src, dst, dirs_exist_ok=True)
+            self._sync_dir(src, dst)
     
     def _copy_shared_assets(self, public_path: str):
-        """Copy shared assets to the website's public directory."""
+        """Link shared assets into the website's public directory."""
         for asset_type in ['css', 'js', 'images']:
             src = os.path.join(self.assets_dir, asset_type)
             dst = os.path.join(public_path, 'assets', asset_type)
             if os.path.exists(src):
-                shutil.copytree(src, dst, dirs_exist_ok=True)
+                self._sync_dir(src, dst)
     
-    def customize_theme(self, colors: Dict[str, str], fonts: Dict[str, str]):
-        """Customize theme colors and fonts."""
-        if not self.current_site:
+    def _sync_dir(self, src: str, dst: str):
+        """Copy a directory through the build manifest, or in full if there is none."""
+        if self.manifest is None:
+            shutil.copytree(src, dst, dirs_exist_ok=True)
+            return
+        report = self.manifest.sync_tree(src, dst)
+        if self.last_sync_report is not None:
+            merge_reports(self.last_sync_report, report)
+    
+    @traced()
+    def collect_garbage(self, grace_seconds: float = 300, dry_run: bool = False) -> Dict:
+        """Remove blobs that no site's build manifest references any more."""
+        return self.blob_store.gc(
+            referenced_digests(self.websites_dir),
+            grace_seconds=grace_seconds,
+            dry_run=dry_run
+        )
+    
+    @contextmanager
+    def profile(self, trace_path: Optional[str] = None, top: int = 20):
+        """
+        Trace builder calls made inside the block, per stage.
+        
+        Each stage (sync, render, css, images, precompress, ...) is recorded
+        with its wall and CPU time, bytes read and written and peak memory.
+        On exit the top spans are left in last_profile as a text table.
+        
+        Args:
+            trace_path: Also write the trace here as Chrome trace JSON (Perfetto)
+            top: Number of spans in the summary
+        """
+        with tracing() as tracer:
+            try:
+                yield tracer
+            finally:
+                self.last_profile = tracer.summary(top)
+                if trace_path:
+                    tracer.write_chrome_trace(trace_path)
+    
+    @contextmanager
+    def edit_config(self, site_path: Optional[str] = None):
+        """
+        Batch changes to a site's configuration into one validated, atomic write.
+        
+        customize_theme, set_content and add_seo_schemas called inside the
+        block apply to the same in-memory config; nothing is written if the
+        block raises or leaves the config unchanged. The site is locked for
+        the duration of the block so concurrent builder processes serialize.
+        
+        Args:
+            site_path: Site to edit (defaults to the active website)
+        """
+        site_path = site_path or self.current_site
+        if not site_path:
             raise ValueError("No active website. Call create_website first.")
-            
-        config_path = os.path.join(self.current_site, "config.json")
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-            
-        config["theme"]["colors"].update(colors)
-        config["theme"]["fonts"].update(fonts)
         
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=4)
+        session = self._config_session
+        if session is not None and session.path == SiteConfigSession.for_site(site_path).path:
+            # Nested edit of the same site joins the outer batch
+            yield session
+            return
+        
+        outer = session
+        with SiteConfigSession.for_site(site_path) as session:
+            self._config_session = session
+            try:
+                yield session
+            finally:
+                self._config_session = outer
+    
+    def customize_theme(self, colors: Dict[str, str], fonts: Dict[str, str]):
+        """Customize theme colors and fonts."""
+        with self.edit_config() as session:
+            session.update_theme(colors, fonts)
     
     def set_content(self, content: Dict[str, str]):
         """Set website content variables."""
-        if not self.current_site:
-            raise ValueError("No active website. Call create_website first.")
-            
-        config_path = os.path.join(self.current_site, "config.json")
-        with open(config_path, 'r') as f:
-            config = json.load(f)
-            
-        config["variables"].update(content)
-        
-        with open(config_path, 'w') as f:
-            json.dump(config, f, indent=4)
+        with self.edit_config() as session:
+            session.set_content(content)
+    
+    def set_components(self, components: List[str]):
+        """Set the optional components used by the website."""
+        with self.edit_config() as session:
+            session.set_components(components)
     
+    @traced()
     def add_seo_schemas(self, schemas: List[Dict]):
         """Add SEO schema markup to the website."""
         if not self.current_site:
             raise ValueError("No active website. Call create_website first.")
             
+        from bot_core.seo.schema_batch import SchemaBatch
         from bot_core.seo.schema_generator import SchemaGenerator
+        from bot_core.seo.schema_validator import default_validator, format_errors
         generator = SchemaGenerator()
         
-        # Generate and save schemas
+        # Invalid markup is rejected before anything is recorded or written;
+        # types and properties the bundled vocabulary lacks are only warned about
+        for schema in schemas:
+            make = getattr(generator, f"generate_{schema.get('type')}", None)
+            if make is None:
+                continue
+            warnings: List[Dict] = []
+            errors = default_validator().validate(make(**{k: v for k, v in schema.items() if k != "type"}),
+                                                  warnings=warnings)
+            if errors:
+                raise ValueError(f"Invalid {schema['type']} schema: {format_errors(errors)}")
+            if warnings:
+                logger.warning("%s schema: %s", schema["type"], format_errors(warnings))
+        
+        # Keep the schema specs in the site config so rebuilds can regenerate them
+        with self.edit_config() as session:
+            session.add_schemas(schemas)
+            recorded = copy.deepcopy(session.config["schemas"])
+        
+        # Generate and save schemas, one file per type; several schemas of
+        # a type (e.g. two services) share it as one @graph
         schema_dir = os.path.join(self.current_site, "schemas")
         os.makedirs(schema_dir, exist_ok=True)
         
-        for schema in schemas:
-            schema_type = schema.pop("type")
-            if hasattr(generator, f"generate_{schema_type}"):
+        by_type: Dict[str, List[Dict]] = {}
+        for schema in recorded:
+            if hasattr(generator, f"generate_{schema['type']}"):
+                by_type.setdefault(schema["type"], []).append(schema)
+        
+        for schema_type, specs in by_type.items():
+            if len(specs) == 1:
+                schema = {k: v for k, v in specs[0].items() if k != "type"}
                 generated = getattr(generator, f"generate_{schema_type}")(**schema)
                 script_tag = generator.to_script_tag(generated)
-                
-                with open(os.path.join(schema_dir, f"{schema_type}.html"), 'w') as f:
-                    f.write(script_tag)
+            else:
+                script_tag = next(SchemaBatch(generator, page_size=len(specs)).script_tags(specs))
+            
+            with open(os.path.join(schema_dir, f"{schema_type}.html"), 'w') as f:
+                f.write(script_tag)
     
+    def add_content_section(self, name: str, provider: Callable[[Dict, Dict], Iterable[str]]):
+        """
+        Supply a template variable as a stream of HTML chunks.
+
+        provider(config, page) is called each time the page renders and
+        returns an iterable (e.g. a generator) of chunks, so a large section
+        such as a product listing never has to exist as one string. The
+        section replaces any config value of the same name.
+        """
+        self.content_sections[name] = provider
+
+    @traced()
     def build(self) -> str:
         """Build the final website."""
         if not self.current_site:
             raise ValueError("No active website. Call create_website first.")
-            
-        # Here we would:
-        # 1. Process all templates
-        # 2. Inject content
-        # 3. Optimize assets
-        # 4. Generate final HTML
         
+        site_config = self._load_site_config()
+        if self.manifest is None:
+            self.manifest = BuildManifest.for_site(self.current_site, self.blob_store)
+        graph = DependencyGraph.for_site(self.current_site)
+        graph.pages = {}
+        
+        public_path = os.path.join(self.current_site, "public_html")
+        
+        # Fingerprint assets first so rendered pages can reference the hashed names
+        assets = self._asset_pipeline()
+        assets.fingerprint()
+        
+        collections = self._collections(site_config)
+        for collection in collections:
+            collection.refresh()
+        
+        # Responsive images and the CSS purge need every page rendered first
+        images = self._image_pipeline(site_config)
+        css = self._css_pipeline(site_config, collections)
+        stages = [stage for stage in (images, css) if stage]
+        filters = [assets.rewrite_html] + [stage.rewrite_html for stage in stages]
+        written = self._process_templates(
+            public_path, site_config,
+            filters=filters,
+            scanners=[stage.scan for stage in stages],
+            graph=graph, assets=assets
+        )
+        written += self._render_collections(collections, site_config, filters, assets, images, css)
+        
+        # Pages no longer produced by the template are removed
+        removed = self.manifest.prune_unseen("template")["removed"]
+        removed += self.manifest.prune_unseen("fingerprint_of")["removed"]
+        if css:
+            css.ensure_purged()
+            css.save(graph.pages)
+        removed += self.manifest.prune_unseen("purged_from")["removed"]
+        removed += self.manifest.prune_unseen("image_of")["removed"]
+        
+        sitemap = self._write_sitemap(site_config)
+        written += sitemap["written"]
+        removed += sitemap["removed"]
+        
+        compression = assets.precompress()
+        removed += self.manifest.prune_unseen("compressed_from")["removed"]
+        assets.write_asset_manifest()
+        self.manifest.save()
+        
+        graph.config = config_key_hashes(site_config)
+        graph.save()
+        
+        self.last_build_report = {
+            "pages": sorted(k for k, e in self.manifest.files.items() if "template" in e),
+            "written": written,
+            "removed": removed,
+            "compressed": compression["compressed"],
+            "css": css.report if css else {},
+            "images_encoded": images.encoded if images else 0,
+            "collections": {collection.name: collection.report for collection in collections}
+        }
+        if (site_config.get("linkcheck") or {}).get("enabled"):
+            self.last_build_report["linkcheck"] = self.check_links()
         return self.current_site
-
-    def _process_templates(self, target_dir, site_config):
-        """Process and render template files"""
-        template_vars = {
-            "site_title": site_config.get("title", "New Website"),
-            "primary_color": site_config.get("primary_color", "#007bff"),
-            "secondary_color": site_config.get("secondary_color", "#6c757d"),
-            "text_color": site_config.get("text_color", "#333333"),
-            "current_year": datetime.now().year,
-            "navigation_links": self._generate_nav_links(site_config.get("nav_links", [])),
-            "main_content": site_config.get("main_content", "<h2>Welcome to your new website!</h2>")
+    
+    @traced()
+    def rebuild(self, changed: Iterable[str], compress: bool = True) -> Dict:
+        """
+        Re-render only the outputs affected by a set of changes.
+        
+        Args:
+            changed: Changed source files (paths containing a '/', absolute or
+                relative to the project root) and/or dotted site config keys
+                such as 'variables.hero_title' or 'theme.colors.primary'
+            compress: Refresh .gz/.br siblings of touched outputs. When False
+                (watch mode) stale siblings are removed instead.
+        
+        Returns:
+            The build report; 'rendered' lists the pages that were re-rendered.
+        """
+        if not self.current_site:
+            raise ValueError("No active website. Call create_website first.")
+        
+        graph = DependencyGraph.for_site(self.current_site)
+        if not graph.pages:
+            self.build()
+            return self.last_build_report
+        
+        site_config = self._load_site_config()
+        template = site_config.get("template", "business")
+        renderer = self._get_renderer(template)
+        template_root = renderer.template_dir
+        config_path = os.path.join(self.current_site, "config", "site_config.json")
+        content_spec_path = os.path.join(self.current_site, "config", CONTENT_SPEC_NAME)
+        
+        changed_templates = set()
+        changed_keys = set()
+        changed_posts = []
+        sync_needed = False
+        for item in changed:
+            if "/" not in item and os.sep not in item:
+                changed_keys.add(item)
+                continue
+            path = os.path.abspath(os.path.join(self.root_dir, item))
+            if _is_within(path, template_root):
+                changed_templates.add(os.path.relpath(path, template_root).replace(os.sep, "/"))
+            elif _is_within(path, self.components_dir) or _is_within(path, self.assets_dir):
+                sync_needed = True
+            elif path == config_path:
+                changed_keys |= diff_config(graph.config, config_key_hashes(site_config))
+                sync_needed = sync_needed or "components" in changed_keys
+            elif path == content_spec_path:
+                # Translations feed every page and may add or drop languages
+                self.build()
+                return self.last_build_report
+            else:
+                changed_posts.append(path)
+        
+        # Adding or removing a page changes navigation everywhere, and
+        # changing the languages changes the set of outputs
+        if (set(renderer.list_pages()) != graph.page_names()
+                or changed_keys & {"languages", "default_language", "domain", "base_url", "blog"}):
+            self.build()
+            return self.last_build_report
+        
+        if self.manifest is None:
+            self.manifest = BuildManifest.for_site(self.current_site, self.blob_store)
+        
+        # So does turning the blog on or off
+        enabled = set(self._collection_options(site_config))
+        if enabled != {name for name in ("blog",) if self.manifest.get(f"{name}/index.html")}:
+            self.build()
+            return self.last_build_report
+        collections = self._collections(site_config)
+        for collection in collections:
+            posts = [path for path in changed_posts if _is_within(path, collection.source_dir)]
+            if posts:
+                collection.refresh(posts)
+        
+        synced = new_report()
+        if sync_needed:
+            with open(os.path.join(template_root, "config.json"), 'r') as f:
+                template_config = json.load(f)
+            components = site_config.get("components", [])
+            synced = self._sync_site_files(template, template_config,
+                                           components if isinstance(components, list) else [],
+                                           os.path.join(self.current_site, "public_html"))
+        
+        assets = self._asset_pipeline()
+        old_urls = dict(assets.load_url_map())
+        assets.fingerprint()
+        changed_urls = {url for url in set(old_urls) | set(assets.url_map)
+                        if old_urls.get(url) != assets.url_map.get(url)}
+        
+        pages = graph.affected_pages(
+            templates=changed_templates,
+            names=context_names_for_keys(changed_keys),
+            assets=changed_urls
+        )
+        images = self._image_pipeline(site_config)
+        css = self._css_pipeline(site_config, collections)
+        stages = [stage for stage in (images, css) if stage]
+        filters = [assets.rewrite_html] + [stage.rewrite_html for stage in stages]
+        scanners = [stage.scan for stage in stages]
+        public_path = os.path.join(self.current_site, "public_html")
+        written = self._process_templates(public_path, site_config, filters=filters, scanners=scanners,
+                                          graph=graph, assets=assets, only=pages)
+        if css:
+            # New classes change the purged stylesheet, which every page links to
+            if css.ensure_purged() != css.previous_urls:
+                rest = graph.page_names() - pages
+                written += self._process_templates(public_path, site_config, filters=filters,
+                                                   scanners=scanners, graph=graph, assets=assets,
+                                                   only=rest)
+                pages |= rest
+            css.save(graph.pages)
+        written += self._render_collections(collections, site_config, filters, assets, images, css)
+        
+        removed = self.manifest.prune_orphans()["removed"]
+        if any(key.endswith(".html") for key in written + removed):
+            sitemap = self._write_sitemap(site_config)
+            written += sitemap["written"]
+            removed += sitemap["removed"]
+        touched = written + synced["added"] + synced["updated"] + [
+            key for key, entry in self.manifest.files.items()
+            if entry.get("fingerprint_of") in synced["added"] + synced["updated"]
+        ] + (css.written if css else [])
+        if compress:
+            compression = assets.precompress(touched)
+        else:
+            compression = {"compressed": []}
+            removed += self.manifest.remove_variants(touched)["removed"]
+        assets.write_asset_manifest()
+        self.manifest.save()
+        
+        graph.config = config_key_hashes(site_config)
+        graph.save()
+        
+        self.last_build_report = {
+            "pages": sorted(graph.pages),
+            "rendered": graph.outputs_for(pages),
+            "written": written,
+            "removed": removed + synced["removed"],
+            "compressed": compression["compressed"],
+            "css": css.report if css else {},
+            "images_encoded": images.encoded if images else 0,
+            "collections": {collection.name: collection.report for collection in collections}
         }
+        return self.last_build_report
+    
+    def watch(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        debounce: float = 0.05,
+        polling: bool = False
+    ) -> None:
+        """
+        Serve the active site with live reload and rebuild it as sources change.
+        
+        Watches shared templates, components and assets plus the site's
+        config/site_config.json and collection posts. Bursts of events are
+        coalesced for ``debounce`` seconds, only affected pages are re-rendered, and
+        connected browsers reload over Server-Sent Events. Precompression is
+        skipped while watching; run build() before deploying. Blocks until
+        interrupted.
+        """
+        if not self.current_site:
+            raise ValueError("No active website. Call create_website first.")
+        from bot_core.build.watch import DevServer
+        
+        if not os.path.exists(os.path.join(self.current_site, "config", GRAPH_NAME)):
+            self.build()
+        
+        server = DevServer(
+            os.path.join(self.current_site, "public_html"),
+            [
+                self.templates_dir,
+                self.components_dir,
+                self.assets_dir,
+                os.path.join(self.current_site, "config", "site_config.json"),
+                os.path.join(self.current_site, "config", CONTENT_SPEC_NAME)
+            ] + [
+                path for path in (self._collection_dir(name, options)
+                                  for name, options in self._collection_options(self._load_site_config()).items())
+                if os.path.isdir(path)
+            ],
+            lambda changed: self.rebuild(sorted(changed), compress=False),
+            host=host,
+            port=port,
+            debounce=debounce,
+            polling=polling
+        )
+        logger.info("Serving %s at %s (Ctrl+C to stop)", self.current_site, server.url)
+        server.run()
+    
+    def _asset_pipeline(self) -> AssetPipeline:
+        return AssetPipeline(
+            self.manifest,
+            os.path.join(self.current_site, "config", ASSET_MANIFEST_NAME)
+        )
+    
+    def _image_pipeline(self, site_config: Dict) -> Optional[ImagePipeline]:
+        """
+        Image stage for the active site, configured by the optional "images"
+        block: {"responsive": true, "widths": [320, 640, ...]}. Needs Pillow.
+        """
+        options = site_config.get("images") or {}
+        if options.get("responsive", True) is False or not ImagePipeline.available():
+            return None
+        widths = options.get("widths")
+        return ImagePipeline(self.manifest, self.blob_store, **({"widths": widths} if widths else {}))
+    
+    def _css_pipeline(self, site_config: Dict, collections: Iterable[Collection] = ()) -> Optional[CssPipeline]:
+        """
+        CSS stage for the active site, configured by the optional "css" block:
+        {"purge": true, "safelist": [...], "critical": ["header", "#hero"]}.
+        Classes used in collection posts are kept, since posts are not
+        re-rendered (and so not scanned) on every build.
+        """
+        options = site_config.get("css") or {}
+        if options.get("purge", True) is False:
+            return None
+        public_path = os.path.join(self.current_site, "public_html")
+        return CssPipeline(
+            self.manifest,
+            os.path.join(self.current_site, "config", CSS_USAGE_NAME),
+            source_dirs=[
+                os.path.join(self.templates_dir, site_config.get("template", "business")),
+                os.path.join(public_path, "components"),
+                os.path.join(public_path, "assets", "js")
+            ],
+            safelist=[*options.get("safelist", []),
+                      *(token for collection in collections for token in collection.used_tokens())],
+            critical=options.get("critical", DEFAULT_CRITICAL)
+        )
+    
+    @traced()
+    def _write_sitemap(self, site_config: Dict) -> Dict:
+        """
+        Write sitemap.xml and robots.txt for the active site. Configured by the
+        optional "sitemap" block ({"enabled": true, "exclude": ["/thanks/"]})
+        and "robots" block ({"disallow": ["/admin/"]}, or false for none).
+        A sitemap needs an absolute origin (the domain or base_url).
+        """
+        options = site_config.get("sitemap") or {}
+        robots = site_config.get("robots", {})
+        languages, default = site_languages(site_config, load_content_spec(self.current_site))
+        origin = base_url(site_config)
+        sitemap = SitemapPipeline(
+            self.manifest,
+            os.path.join(self.current_site, "config", SITEMAP_STATE_NAME),
+            origin,
+            languages=languages,
+            default_language=default,
+            exclude=options.get("exclude", [])
+        )
+        enabled = options.get("enabled", True) and bool(origin)
+        if enabled:
+            sitemap.write()
+        else:
+            sitemap.clear()
+        sitemap.robots(
+            disallow=(robots or {}).get("disallow", []),
+            sitemap=enabled,
+            enabled=robots is not False
+        )
+        return {"written": sitemap.written, "removed": sitemap.removed}
+    
+    def check_links(self, max_workers: Optional[int] = None) -> Dict:
+        """
+        Verify the active site's built HTML: broken internal links and assets,
+        orphaned pages, duplicate ids, unclosed tags and invalid JSON-LD.
+        Configured by the optional "linkcheck" block ({"enabled": true,
+        "ignore": ["/api/"], "exclude": ["components/"], "entry_points":
+        ["index.html", "landing/index.html"]});
+        with "enabled", build() runs it and adds the report as "linkcheck".
+        Only pages changed since the last check are re-scanned.
+        """
+        if not self.current_site:
+            raise ValueError("No active website. Call create_website first.")
+        site_config = self._load_site_config()
+        if self.manifest is None:
+            self.manifest = BuildManifest.for_site(self.current_site, self.blob_store)
+        options = site_config.get("linkcheck") or {}
+        checker = LinkChecker(
+            self.manifest,
+            os.path.join(self.current_site, "config", LINKCHECK_STATE_NAME),
+            origin=base_url(site_config),
+            ignore=options.get("ignore", []),
+            entry_points=options.get("entry_points", ["index.html", "404.html"]),
+            exclude=options.get("exclude", ["components/"]),
+            max_workers=max_workers or self.render_workers
+        )
+        return checker.check()
+    
+    @staticmethod
+    def _collection_options(site_config: Dict) -> Dict[str, Dict]:
+        """
+        Enabled collections and their options. The blog is enabled by listing
+        "blog" in components or by a "blog" block: {"path": "content/blog",
+        "per_page": 10, "feed_items": 20, "title": "Blog"}.
+        """
+        options = site_config.get("blog")
+        components = site_config.get("components")
+        if options is False or (options is None and "blog" not in (components if isinstance(components, list) else [])):
+            return {}
+        return {"blog": options if isinstance(options, dict) else {}}
+    
+    def _collection_dir(self, name: str, options: Dict) -> str:
+        return os.path.join(self.current_site, options.get("path", os.path.join("content", name)))
+    
+    def _collections(self, site_config: Dict) -> List[Collection]:
+        collections = []
+        for name, options in self._collection_options(site_config).items():
+            collections.append(Collection(
+                name,
+                self.manifest,
+                CollectionIndex.for_site(self.current_site),
+                self._collection_dir(name, options),
+                per_page=options.get("per_page", 10),
+                feed_items=options.get("feed_items", 20),
+                title=options.get("title")
+            ))
+        return collections
+    
+    @traced()
+    def _render_collections(self, collections, site_config, filters, assets, images, css) -> List[str]:
+        """Render the outputs of each collection whose posts or surroundings changed."""
+        if not collections:
+            return []
+        renderer = self._get_renderer(site_config.get("template", "business"))
+        content_spec = load_content_spec(self.current_site)
+        languages, default = site_languages(site_config, content_spec)
+        # Collections are rendered in the default language only
+        config = localized_config(site_config, content_spec, default, default) if languages else site_config
+        nav_pages = renderer.list_pages() + list(self._collection_options(site_config))
         
-        # Render HTML template
-        template = self.env.get_template("index.html")
-        rendered = template.render(**template_vars)
+        # Everything besides the posts that shows up in collection pages
+        salt = hashlib.sha256()
+        salt.update(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+        for root, _, names in sorted(os.walk(renderer.template_dir)):
+            for name in sorted(names):
+                salt.update(f"{name}:{file_digest(os.path.join(root, name))}".encode("utf-8"))
+        salt.update(json.dumps([assets.url_map, css.ensure_purged() if css else {}], sort_keys=True).encode("utf-8"))
         
-        with open(target_dir / "index.html", "w") as f:
-            f.write(rendered)
+        written = []
+        public_path = os.path.join(self.current_site, "public_html")
+        for collection in collections:
+            context = renderer.build_context(config, collection.name, nav_pages)
+            if languages:
+                context["lang"] = default
+            written += collection.render(
+                lambda name, context: renderer.env.get_template(name).render(**context),
+                context,
+                salt.hexdigest(),
+                filters=filters,
+                scanners=[images.scan] if images else [],
+                target_dir=public_path,
+                origin=base_url(site_config)
+            )
+            collection.index.close()
+        return written
+    
+    def _load_site_config(self) -> Dict:
+        """Read the active site's stored configuration."""
+        session = self._config_session
+        if session is not None and session.path == SiteConfigSession.for_site(self.current_site).path:
+            # Building inside edit_config() sees the pending changes
+            return copy.deepcopy(session.config)
+        config_path = os.path.join(self.current_site, "config/site_config.json")
+        with open(config_path, 'r') as f:
+            return json.load(f)
+    
+    def _get_renderer(self, template: str) -> SiteRenderer:
+        return SiteRenderer(os.path.join(self.templates_dir, template), self.template_cache_dir)
+
+    @traced()
+    def _process_templates(
+        self,
+        target_dir,
+        site_config,
+        filters: Optional[List] = None,
+        graph: Optional[DependencyGraph] = None,
+        assets: Optional[AssetPipeline] = None,
+        only: Optional[Set[str]] = None,
+        scanners: Optional[List] = None
+    ) -> List[str]:
+        """
+        Render the pages of the site template into target_dir.
+        
+        Multi-language sites (see bot_core.build.i18n) get every page once
+        per language under /<lang>/, plus the default language at the root,
+        each with hreflang alternates. Language variants are rendered in
+        parallel worker processes.
+        
+        Every rendered page is first shown to each scanner (a callable taking
+        the HTML and the page info), then passed through filters (callables
+        taking the same and returning new HTML) before it is written, so
+        filters can rely on what the scanners saw across all pages.
+        When a dependency graph is given, each page's dependencies are
+        recorded in it. ``only`` restricts rendering to those page names.
+        Returns the manifest keys of pages that were actually written.
+        
+        With streaming enabled, pages are rendered to spool files and read
+        back in tag-aligned segments, so scanners and filters see each page
+        in pieces and no page is ever held in memory whole.
+        """
+        renderer = self._get_renderer(site_config.get("template", "business"))
+        all_pages = renderer.list_pages()
+        pages = [name for name in all_pages if only is None or name in only]
+        # Collections (the blog) get a navigation link like any page, but
+        # are rendered once for all languages
+        collection_names = list(self._collection_options(site_config))
+        nav_pages = all_pages + [name for name in collection_names if name not in all_pages]
+        
+        content_spec = load_content_spec(self.current_site) if self.current_site else {}
+        languages, default = site_languages(site_config, content_spec)
+        if languages:
+            variants = [(None, localized_config(site_config, content_spec, default, default))]
+            variants += [(lang, localized_config(site_config, content_spec, lang, default))
+                         for lang in languages]
+        else:
+            variants = [(None, site_config)]
+        origin = base_url(site_config)
+        
+        batches = []
+        for lang, config in variants:
+            # Variables understood by the basic_site layout
+            legacy_vars = {
+                "primary_color": config.get("primary_color", "#007bff"),
+                "secondary_color": config.get("secondary_color", "#6c757d"),
+                "text_color": config.get("text_color", "#333333"),
+                "navigation_links": self._generate_nav_links(config.get("nav_links", [])),
+                "main_content": config.get("main_content", "<h2>Welcome to your new website!</h2>")
+            }
+            batch = []
+            for page_name in pages:
+                template_vars = {**legacy_vars, **renderer.build_context(
+                    config, page_name, nav_pages, lang=lang, unlocalized=collection_names)}
+                if languages:
+                    template_vars["lang"] = lang or default
+                    template_vars["languages"] = languages
+                    template_vars["page"]["alternates"] = alternate_links(
+                        page_url(page_name), languages, default, origin
+                    )
+                for name, provider in self.content_sections.items():
+                    template_vars[name] = ContentSection(
+                        lambda provider=provider, config=config, page=template_vars["page"]: provider(config, page)
+                    )
+                batch.append((page_name, template_vars))
+            batches.append(batch)
+        
+        stream = self.stream_pages or (site_config.get("render") or {}).get("stream", False)
+        if not stream:
+            results = renderer.render_batches(batches, self.render_workers)
+            for scanner in scanners or []:
+                for batch, rendered_pages in zip(batches, results):
+                    for (_, template_vars), rendered in zip(batch, rendered_pages):
+                        scanner(rendered, template_vars["page"])
+            jobs = [
+                (page_name, template_vars, [rendered])
+                for batch, rendered_pages in zip(batches, results)
+                for (page_name, template_vars), rendered in zip(batch, rendered_pages)
+            ]
+            return self._write_pages(renderer, jobs, target_dir, filters, graph, assets, stream=False)
+        
+        # Spool files live in the site directory so they share its filesystem
+        spool_dir = tempfile.mkdtemp(prefix=".spool-", dir=self.current_site or target_dir)
+        try:
+            stream_batches = [
+                [(page_name, template_vars, os.path.join(spool_dir, f"{b}-{i}.html"))
+                 for i, (page_name, template_vars) in enumerate(batch)]
+                for b, batch in enumerate(batches)
+            ]
+            renderer.stream_batches(stream_batches, self.render_workers)
+            jobs = []
+            for batch in stream_batches:
+                for page_name, template_vars, path in batch:
+                    template_vars["page"]["spool"] = path
+                    jobs.append((page_name, template_vars, read_segments(path)))
+            for scanner in scanners or []:
+                for _, template_vars, path in (job for batch in stream_batches for job in batch):
+                    for segment in read_segments(path):
+                        scanner(segment, template_vars["page"])
+            return self._write_pages(renderer, jobs, target_dir, filters, graph, assets, stream=True)
+        finally:
+            shutil.rmtree(spool_dir, ignore_errors=True)
+    
+    @traced()
+    def _write_pages(self, renderer, jobs, target_dir, filters, graph, assets, stream) -> List[str]:
+        """Filter and write (page name, context, HTML segments) jobs; see _process_templates."""
+        analyzer = self._get_analyzer(renderer)
+        written = []
+        # Language variants share templates, so analyze each page once
+        analyses = {}
+        for page_name, template_vars, segments in jobs:
+            page = template_vars["page"]
+            
+            def filtered(segment):
+                segment = inject_alternates(segment, page)
+                for page_filter in filters or []:
+                    segment = page_filter(segment, page)
+                return segment.encode("utf-8")
+            
+            output = page["output"]
+            template_name = f"{PAGES_DIR}/{page_name}.html"
+            key = self.manifest.key_for(os.path.join(target_dir, output))
+            if stream:
+                changed = self.manifest.write_stream(key, map(filtered, segments), template=template_name)
+            else:
+                changed = self.manifest.write_output(key, b"".join(map(filtered, segments)),
+                                                     template=template_name)
+            if changed:
+                written.append(key)
+            
+            if graph is not None:
+                if template_name not in analyses:
+                    analyses[template_name] = analyzer.analyze(template_name)
+                references = assets.references.get(output, ()) if assets else ()
+                graph.record_page(key, page_name, analyses[template_name], references)
+        
+        return written
+    
+    def _get_analyzer(self, renderer: SiteRenderer) -> TemplateAnalyzer:
+        analyzer = self._analyzers.get(renderer.template_dir)
+        if analyzer is None:
+            analyzer = self._analyzers[renderer.template_dir] = TemplateAnalyzer(renderer.env)
+        return analyzer
 
     def _generate_nav_links(self, links):
         """Generate HTML for navigation links"""
         if not links:
             return "<a href='#'>Home</a>"
             
-        return " ".join(f"<a href='{link['url']}'>{link['text']}</a>" for link in links) 
\ No newline at end of file
+        return " ".join(
+            f"<a href='{html.escape(link.get('url') or '#', quote=True)}'>{html.escape(str(link.get('text', '')))}</a>"
+            for link in links
+        )
+
+
+def _is_within(path: str, directory: str) -> bool:
+    """True if path lies inside directory."""
+    return os.path.commonpath([path, os.path.abspath(directory)]) == os.path.abspath(directory)
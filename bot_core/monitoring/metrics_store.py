@@ -0,0 +1,349 @@
+"""
+Append-only time-series store for per-site and per-URL metrics.
+
+Each series (site, optional URL, metric such as traffic, ctr, position or
+response_time) lives in its own directory under the store root:
+
+    series/<aa>/<key hash>/
+        raw.bin      (timestamp, value) pairs as little-endian doubles, in write order
+        daily.bin    header, then one fixed-width row per UTC day
+        weekly.bin   header, then one row per Monday-to-Sunday UTC week
+
+A rollup row is (sum, count, min, max) and sits at a fixed offset from
+the series' first day or week, so writing a sample updates its day and
+week in place and reading a window is a slice of a memory-mapped file.
+Anomaly detection reads a few dozen rows whatever the series' length:
+
+    store = MetricsStore("data/metrics")
+    store.append("example.com", "traffic", 1520, timestamp=time.time())
+    result = store.anomaly("example.com", "traffic")
+    if result and result["anomalous"]:
+        ...
+
+The baseline for a day is the same weekday over the previous weeks, so a
+quiet Sunday is compared with other Sundays rather than with Friday. By
+default the day checked is the last complete one: today's samples are
+still arriving, and a partial day's total would always read as a drop. One
+writer at a time is assumed per store (appends hold a lock file).
+"""
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+SERIES_DIR = "series"
+INDEX_NAME = "series.jsonl"
+
+_RAW = struct.Struct("<dd")
+_ROW = struct.Struct("<dddd")
+# Magic, format version, first day (or week) of the series
+_HEADER = struct.Struct("<4sIq")
+_MAGIC = b"WBTS"
+FORMAT_VERSION = 1
+
+# Metrics whose daily value is the day's total; the others average their samples
+SUMMED_METRICS = frozenset(("traffic", "sessions", "clicks", "impressions", "pageviews"))
+# Weeks of same-weekday history the seasonal baseline uses
+BASELINE_WEEKS = 8
+MIN_BASELINE = 3
+Z_THRESHOLD = 3.0
+
+_EPOCH = date(1970, 1, 1)
+
+
+def _day(timestamp: float) -> int:
+    return int(timestamp // 86400)
+
+
+def _week(day: int) -> int:
+    # Day 0 (1970-01-01) was a Thursday; weeks start on Monday
+    return (day + 3) // 7
+
+
+def series_key(site: str, metric: str, url: Optional[str] = None) -> str:
+    return hashlib.sha1(f"{site}\0{url or ''}\0{metric}".encode("utf-8")).hexdigest()[:20]
+
+
+class _Rollup:
+    """One rollup file: a header and a row per period from the first one on."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _first(self, fd: int) -> Optional[int]:
+        header = os.pread(fd, _HEADER.size, 0)
+        if len(header) < _HEADER.size:
+            return None
+        magic, version, first = _HEADER.unpack(header)
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} rollup file")
+        return first
+
+    def add(self, samples: Dict[int, List[float]]) -> None:
+        """Fold values into their periods' rows."""
+        # Not O_APPEND: Linux would append every pwrite regardless of its offset
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            first = self._first(fd)
+            if first is None:
+                first = min(samples)
+                os.pwrite(fd, _HEADER.pack(_MAGIC, FORMAT_VERSION, first), 0)
+            if min(samples) < first:
+                raise ValueError(f"{self.path}: samples before the series' first period")
+            size = os.fstat(fd).st_size
+            for period in sorted(samples):
+                values = samples[period]
+                offset = _HEADER.size + (period - first) * _ROW.size
+                total, count, low, high = 0.0, 0.0, math.inf, -math.inf
+                if offset + _ROW.size <= size:
+                    row = _ROW.unpack(os.pread(fd, _ROW.size, offset))
+                    if row[1]:
+                        total, count, low, high = row
+                elif offset > size:
+                    # Periods without samples stay zero rows (count 0)
+                    os.pwrite(fd, bytes(offset - size), size)
+                total += math.fsum(values)
+                count += len(values)
+                low = min(low, min(values))
+                high = max(high, max(values))
+                os.pwrite(fd, _ROW.pack(total, count, low, high), offset)
+                size = max(size, offset + _ROW.size)
+        finally:
+            os.close(fd)
+
+    def last(self) -> Optional[int]:
+        """The latest period with samples (rows are only ever added up to it)."""
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            first = self._first(f.fileno())
+            count = (os.fstat(f.fileno()).st_size - _HEADER.size) // _ROW.size
+        return None if first is None or count <= 0 else first + count - 1
+
+    def rows(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[int, List[Tuple]]:
+        """
+        Rows for periods start..end (inclusive), clipped to what is stored.
+        Returns the period of the first row and the rows.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return 0, []
+        with f:
+            first = self._first(f.fileno())
+            size = os.fstat(f.fileno()).st_size
+            if first is None or size <= _HEADER.size:
+                return 0, []
+            count = (size - _HEADER.size) // _ROW.size
+            lo = 0 if start is None else max(start - first, 0)
+            hi = count if end is None else min(end - first + 1, count)
+            if lo >= hi:
+                return max(first + lo, first), []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                rows = list(_ROW.iter_unpack(m[_HEADER.size + lo * _ROW.size:_HEADER.size + hi * _ROW.size]))
+        return first + lo, rows
+
+
+class MetricsStore:
+    def __init__(self, root: str):
+        """
+        Open (or create) a metrics store.
+
+        Args:
+            root: Store directory
+        """
+        self.root = root
+        os.makedirs(os.path.join(root, SERIES_DIR), exist_ok=True)
+        self._known = None
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.root, "lock"), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _dir(self, key: str) -> str:
+        return os.path.join(self.root, SERIES_DIR, key[:2], key)
+
+    def series(self) -> List[Dict]:
+        """Every series in the store: {"site", "url", "metric", "key"}."""
+        try:
+            with open(os.path.join(self.root, INDEX_NAME), 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def append(self, site: str, metric: str, value: float, timestamp: Optional[float] = None,
+               url: Optional[str] = None) -> None:
+        """Record one sample (timestamp in epoch seconds, now by default)."""
+        self.append_many([(site, url, metric, time.time() if timestamp is None else timestamp, value)])
+
+    def append_many(self, samples: Iterable[Tuple[str, Optional[str], str, float, float]]) -> int:
+        """
+        Record (site, url, metric, timestamp, value) samples, grouped so each
+        series' files are written once. A series' rollups start at the day
+        of its first sample; load history oldest first.
+
+        Returns:
+            Number of samples written
+        """
+        grouped: Dict[Tuple[str, Optional[str], str], List[Tuple[float, float]]] = {}
+        for site, url, metric, timestamp, value in samples:
+            grouped.setdefault((site, url, metric), []).append((float(timestamp), float(value)))
+
+        with self._locked():
+            if self._known is None:
+                self._known = {entry["key"] for entry in self.series()}
+            for (site, url, metric), points in grouped.items():
+                key = series_key(site, metric, url)
+                directory = self._dir(key)
+                days: Dict[int, List[float]] = {}
+                for timestamp, value in points:
+                    days.setdefault(_day(timestamp), []).append(value)
+                weeks: Dict[int, List[float]] = {}
+                for day, values in days.items():
+                    weeks.setdefault(_week(day), []).extend(values)
+
+                if key not in self._known:
+                    os.makedirs(directory, exist_ok=True)
+                _Rollup(os.path.join(directory, "daily.bin")).add(days)
+                _Rollup(os.path.join(directory, "weekly.bin")).add(weeks)
+                with open(os.path.join(directory, "raw.bin"), 'ab') as f:
+                    f.write(b"".join(_RAW.pack(timestamp, value) for timestamp, value in points))
+                if key not in self._known:
+                    with open(os.path.join(self.root, INDEX_NAME), 'a', encoding='utf-8') as f:
+                        f.write(json.dumps({"site": site, "url": url, "metric": metric, "key": key}) + "\n")
+                    self._known.add(key)
+        return sum(len(points) for points in grouped.values())
+
+    def raw(self, site: str, metric: str, url: Optional[str] = None,
+            start: Optional[float] = None, end: Optional[float] = None) -> List[Tuple[float, float]]:
+        """Samples as written, optionally limited to start <= timestamp < end."""
+        path = os.path.join(self._dir(series_key(site, metric, url)), "raw.bin")
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return []
+        with f:
+            if os.fstat(f.fileno()).st_size < _RAW.size:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                samples = list(_RAW.iter_unpack(m[:len(m) - len(m) % _RAW.size]))
+        return [(t, v) for t, v in samples
+                if (start is None or t >= start) and (end is None or t < end)]
+
+    def _rollup(self, site: str, metric: str, url: Optional[str], name: str) -> _Rollup:
+        return _Rollup(os.path.join(self._dir(series_key(site, metric, url)), name))
+
+    def daily(self, site: str, metric: str, url: Optional[str] = None,
+              start: Optional[date] = None, end: Optional[date] = None) -> List[Dict]:
+        """Per-day rollups from start to end (inclusive), skipping days without samples."""
+        first, rows = self._rollup(site, metric, url, "daily.bin").rows(
+            None if start is None else (start - _EPOCH).days,
+            None if end is None else (end - _EPOCH).days)
+        return [_summary(_EPOCH + timedelta(days=first + i), row, metric) for i, row in enumerate(rows) if row[1]]
+
+    def weekly(self, site: str, metric: str, url: Optional[str] = None,
+               start: Optional[date] = None, end: Optional[date] = None) -> List[Dict]:
+        """Per-week rollups (keyed by the week's Monday) for the weeks containing start to end."""
+        first, rows = self._rollup(site, metric, url, "weekly.bin").rows(
+            None if start is None else _week((start - _EPOCH).days),
+            None if end is None else _week((end - _EPOCH).days))
+        return [_summary(_EPOCH + timedelta(days=(first + i) * 7 - 3), row, metric)
+                for i, row in enumerate(rows) if row[1]]
+
+    def last_day(self, site: str, metric: str, url: Optional[str] = None) -> Optional[date]:
+        """The latest day the series has samples for."""
+        last = self._rollup(site, metric, url, "daily.bin").last()
+        return None if last is None else _EPOCH + timedelta(days=last)
+
+    def anomaly(self, site: str, metric: str, url: Optional[str] = None, day: Optional[date] = None,
+                weeks: int = BASELINE_WEEKS, threshold: float = Z_THRESHOLD) -> Optional[Dict]:
+        """
+        Compare a day with the same weekday over the previous weeks.
+
+        Args:
+            day: The day to check; by default the series' latest day before
+                today (UTC), since today is not complete yet
+
+        Returns:
+            {"day", "value", "baseline", "stdev", "z", "anomalous"}, or None
+            without the day or MIN_BASELINE weeks of history
+        """
+        rollup = self._rollup(site, metric, url, "daily.bin")
+        if day is None:
+            last = rollup.last()
+            if last is None:
+                return None
+            target = min(last, _day(time.time()) - 1)
+        else:
+            target = (day - _EPOCH).days
+        # Only the rows of the window are read, however long the series
+        first, rows = rollup.rows(target - 7 * weeks, target)
+        window = {first + i: row for i, row in enumerate(rows)}
+
+        current = window.get(target)
+        if not current or not current[1]:
+            return None
+        history = [_value(window[d], metric) for d in range(target - 7 * weeks, target, 7)
+                   if d in window and window[d][1]]
+        if len(history) < MIN_BASELINE:
+            return None
+
+        value = _value(current, metric)
+        baseline = math.fsum(history) / len(history)
+        stdev = math.sqrt(math.fsum((v - baseline) ** 2 for v in history) / (len(history) - 1))
+        # A perfectly flat history would make any change infinitely unusual
+        stdev = max(stdev, abs(baseline) * 0.01, 1e-9)
+        z = (value - baseline) / stdev
+        return {
+            "day": (_EPOCH + timedelta(days=target)).isoformat(),
+            "value": value,
+            "baseline": baseline,
+            "stdev": stdev,
+            "z": z,
+            "anomalous": abs(z) >= threshold
+        }
+
+    def scan(self, site: str, metric: str, threshold: float = Z_THRESHOLD,
+             weeks: int = BASELINE_WEEKS) -> List[Dict]:
+        """Anomalies of a metric across the site's series (site-wide and per URL), largest |z| first."""
+        found = []
+        for entry in self.series():
+            if entry["site"] != site or entry["metric"] != metric:
+                continue
+            result = self.anomaly(site, metric, entry["url"], weeks=weeks, threshold=threshold)
+            if result and result["anomalous"]:
+                found.append(dict(result, url=entry["url"]))
+        return sorted(found, key=lambda r: -abs(r["z"]))
+
+
+def _value(row: Tuple, metric: str) -> float:
+    total, count = row[0], row[1]
+    return total if metric in SUMMED_METRICS else total / count
+
+
+def _summary(day: date, row: Tuple, metric: str) -> Dict:
+    total, count, low, high = row
+    return {"date": day.isoformat(), "value": _value(row, metric), "sum": total,
+            "count": int(count), "min": low, "max": high}
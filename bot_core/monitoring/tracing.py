@@ -0,0 +1,300 @@
+"""
+Span tracing for builds.
+
+Each span records wall time, CPU time (this process plus worker processes
+reaped during the span), bytes read and written, and peak RSS. A trace can
+be written as Chrome trace-event JSON (open it in Perfetto or
+chrome://tracing) and summarized as a plain-text table of the slowest spans.
+
+Tracing is off unless a Tracer is active (see ``tracing()``). While it is
+off, ``span()`` hands back one shared no-op context manager and ``traced``
+functions call straight through, so instrumented code costs a global
+lookup per span. While it is on, each span costs a few syscalls, so spans
+belong on stage-level functions, not per-page or per-entity calls.
+
+    with tracing() as tracer:
+        builder.build()
+    tracer.write_chrome_trace("build.trace.json")
+    print(tracer.summary(top=15))
+"""
+
+import functools
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# The active tracer; None means tracing is off
+_active: Optional["Tracer"] = None
+
+_PROC_IO = "/proc/self/io"
+_PROC_STATUS = "/proc/self/status"
+_CLEAR_REFS = "/proc/self/clear_refs"
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, category: str = "build", **args):
+    """Context manager timing a block as a span of the active tracer (a no-op when off)."""
+    tracer = _active
+    if tracer is None:
+        return _NOOP
+    return tracer.span(name, category, **args)
+
+
+def traced(name: Optional[str] = None, category: str = "build"):
+    """Decorator recording each call of a function as a span."""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tracer = _active
+            if tracer is None:
+                return fn(*args, **kwargs)
+            with tracer.span(span_name, category):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def tracing(tracer: Optional["Tracer"] = None) -> Iterator["Tracer"]:
+    """Activate a tracer (a new one by default) for the duration of the block."""
+    global _active
+    tracer = tracer or Tracer()
+    previous, _active = _active, tracer
+    try:
+        yield tracer
+    finally:
+        _active = previous
+
+
+def active_tracer() -> Optional["Tracer"]:
+    return _active
+
+
+def _io_counters() -> Dict[str, int]:
+    """Bytes read/written by this process so far, including page-cache hits."""
+    try:
+        with open(_PROC_IO, 'rb') as f:
+            fields = dict(line.split(b":", 1) for line in f.read().splitlines() if b":" in line)
+        return {"read": int(fields[b"rchar"]), "written": int(fields[b"wchar"])}
+    except (OSError, KeyError, ValueError):
+        # No /proc: fall back to block counts (512-byte units)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        return {"read": usage.ru_inblock * 512, "written": usage.ru_oublock * 512}
+
+
+class _PeakRss:
+    """
+    Peak RSS sampled at span boundaries.
+
+    By default this is the process high-water mark (ru_maxrss), so a span's
+    peak is the largest RSS seen by the time it ends. With reset=True the
+    kernel's mark is cleared (clear_refs) after each sample and the peak seen
+    between boundaries is folded into every open span instead; that resets
+    VmHWM for the whole process, so only use it when nothing else measures it.
+    """
+
+    def __init__(self, reset: bool = False):
+        self.resettable = reset and os.path.exists(_CLEAR_REFS) and self._reset()
+
+    @staticmethod
+    def _reset() -> bool:
+        try:
+            with open(_CLEAR_REFS, 'w') as f:
+                f.write("5")
+            return True
+        except OSError:
+            return False
+
+    def sample(self) -> int:
+        """Peak RSS in bytes (since the previous sample when resetting)."""
+        if self.resettable:
+            try:
+                with open(_PROC_STATUS, 'rb') as f:
+                    for line in f:
+                        if line.startswith(b"VmHWM:"):
+                            peak = int(line.split()[1]) * 1024
+                            self._reset()
+                            return peak
+            except (OSError, ValueError):
+                pass
+        # ru_maxrss is in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Span:
+    __slots__ = ("name", "category", "args", "tid", "depth", "start_ns", "wall_ns", "cpu_ns",
+                 "child_cpu_ns", "read_bytes", "written_bytes", "peak_rss", "_tracer", "_start")
+
+    def __init__(self, tracer: "Tracer", name: str, category: str, args: Dict):
+        self._tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.tid = threading.get_ident()
+        self.depth = 0
+        self.start_ns = 0
+        self.wall_ns = 0
+        self.cpu_ns = 0
+        self.child_cpu_ns = 0
+        self.read_bytes = 0
+        self.written_bytes = 0
+        self.peak_rss = 0
+
+    def set(self, **args) -> None:
+        """Attach extra arguments (shown in the trace viewer)."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self._tracer._enter(self)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self._start = (time.process_time_ns(), children.ru_utime + children.ru_stime, _io_counters())
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_ns = time.perf_counter_ns() - self.start_ns
+        cpu, child_cpu, io = self._start
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self.cpu_ns = time.process_time_ns() - cpu
+        self.child_cpu_ns = int((children.ru_utime + children.ru_stime - child_cpu) * 1e9)
+        now = _io_counters()
+        self.read_bytes = now["read"] - io["read"]
+        self.written_bytes = now["written"] - io["written"]
+        self._tracer._exit(self)
+        return False
+
+
+class Tracer:
+    """
+    Collects spans. Pass reset_peak=True for per-span peak RSS on Linux (see
+    _PeakRss); it clears the kernel high-water mark of the whole process.
+    """
+
+    def __init__(self, reset_peak: bool = False):
+        self.spans: List[Span] = []
+        self.origin_ns = time.perf_counter_ns()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open: List[Span] = []
+        self._peak = _PeakRss(reset_peak)
+
+    def span(self, name: str, category: str = "build", **args) -> Span:
+        return Span(self, name, category, args)
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _fold_peak(self) -> None:
+        peak = self._peak.sample()
+        for open_span in self._open:
+            open_span.peak_rss = max(open_span.peak_rss, peak)
+
+    def _enter(self, span: Span) -> None:
+        stack = self._stack()
+        span.depth = len(stack)
+        stack.append(span)
+        with self._lock:
+            self._fold_peak()
+            self._open.append(span)
+
+    def _exit(self, span: Span) -> None:
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        with self._lock:
+            self._fold_peak()
+            self._open.remove(span)
+            self.spans.append(span)
+
+    def chrome_trace(self) -> Dict:
+        """The trace as a Chrome trace-event object (complete 'X' events, microseconds)."""
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "websitebuilder"}}]
+        for s in sorted(self.spans, key=lambda s: s.start_ns):
+            events.append({
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": (s.start_ns - self.origin_ns) / 1000,
+                "dur": s.wall_ns / 1000,
+                "pid": pid,
+                "tid": s.tid,
+                "args": {
+                    **{k: v if isinstance(v, (int, float, bool, str)) else str(v) for k, v in s.args.items()},
+                    "cpu_ms": round(s.cpu_ns / 1e6, 3),
+                    "worker_cpu_ms": round(s.child_cpu_ns / 1e6, 3),
+                    "read_bytes": s.read_bytes,
+                    "written_bytes": s.written_bytes,
+                    "peak_rss_mb": round(s.peak_rss / 2**20, 1)
+                }
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> str:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def summary(self, top: int = 20) -> str:
+        """
+        Plain-text table of the top spans by wall time. Spans with the same
+        name are aggregated, and self time excludes nested spans.
+        """
+        child_time: Dict[int, int] = {}
+        ordered = sorted(self.spans, key=lambda s: (s.tid, s.start_ns))
+        stack: List[Span] = []
+        for s in ordered:
+            while stack and (stack[-1].tid != s.tid or stack[-1].start_ns + stack[-1].wall_ns <= s.start_ns):
+                stack.pop()
+            if stack:
+                child_time[id(stack[-1])] = child_time.get(id(stack[-1]), 0) + s.wall_ns
+            stack.append(s)
+
+        totals: Dict[str, Dict] = {}
+        for s in self.spans:
+            t = totals.setdefault(s.name, {"calls": 0, "wall": 0, "self": 0, "cpu": 0,
+                                           "read": 0, "written": 0, "peak": 0})
+            t["calls"] += 1
+            t["wall"] += s.wall_ns
+            t["self"] += s.wall_ns - child_time.get(id(s), 0)
+            t["cpu"] += s.cpu_ns + s.child_cpu_ns
+            t["read"] += s.read_bytes
+            t["written"] += s.written_bytes
+            t["peak"] = max(t["peak"], s.peak_rss)
+
+        lines = [f"{'span':<40} {'calls':>6} {'wall ms':>10} {'self ms':>10} {'cpu ms':>10} "
+                 f"{'read KB':>9} {'write KB':>9} {'peak MB':>8}"]
+        for name, t in sorted(totals.items(), key=lambda item: -item[1]["wall"])[:top]:
+            lines.append(
+                f"{name[:40]:<40} {t['calls']:>6} {t['wall'] / 1e6:>10.1f} {t['self'] / 1e6:>10.1f} "
+                f"{t['cpu'] / 1e6:>10.1f} {t['read'] / 1024:>9.0f} {t['written'] / 1024:>9.0f} "
+                f"{t['peak'] / 2**20:>8.1f}"
+            )
+        return "\n".join(lines)
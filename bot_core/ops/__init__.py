@@ -0,0 +1,17 @@
+"""
+Ops Module: Deploying built websites to their hosts and backing them up.
+Ships only what changed since the live release and switches over atomically;
+backups store each distinct chunk of content once.
+"""
+
+from .backup import BackupRepository
+from .deploy import DeployTarget, LocalTarget, deploy, prune_releases, rollback
+
+__all__ = [
+    'BackupRepository',
+    'DeployTarget',
+    'LocalTarget',
+    'deploy',
+    'prune_releases',
+    'rollback'
+]
@@ -0,0 +1,397 @@
+"""
+Deduplicating, incremental backups of a site's files.
+
+A backup repository holds a chunk store (see chunking.py) and one snapshot
+manifest per backup, listing every file with the chunks that make it up.
+Files whose size, mtime and inode match the previous snapshot are not read
+at all; changed files are chunked, and only chunks the store doesn't
+already have are compressed and written, in parallel worker processes.
+A daily backup of a mostly unchanged site therefore takes seconds and adds
+little more than its manifest.
+
+    repo = BackupRepository("/var/backups/websites/example.com")
+    repo.backup({"files": "/var/www/websites/example.com"})
+    repo.prune(keep_daily=7)
+    repo.restore("/tmp/restore", paths=["files/public_html/"])
+
+Pruning deletes snapshots outside the retention policy and then the
+chunks that no remaining snapshot references.
+"""
+
+import fnmatch
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import stat
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bot_core.build.fsutil import atomic_write_bytes
+from bot_core.monitoring.tracing import traced
+
+from .chunking import ChunkStore, restore_chunks, store_files
+from .deploy import _check_key
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+SNAPSHOTS_DIR = "snapshots"
+SNAPSHOT_SUFFIX = ".json.gz"
+# Files per worker task; large files get a task of their own
+BATCH_FILES = 64
+BATCH_BYTES = 32 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class BackupRepository:
+    def __init__(self, root: str, max_workers: Optional[int] = None):
+        """
+        Open (or create) a backup repository.
+
+        Args:
+            root: Repository directory (e.g. /var/backups/websites/example.com)
+            max_workers: Chunking and compression processes (defaults to one per CPU)
+        """
+        self.root = root
+        self.snapshots_dir = os.path.join(root, SNAPSHOTS_DIR)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+        self.store = ChunkStore(root)
+        self.max_workers = max_workers
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the repository lock, so backups and prunes never overlap."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.root, "lock"), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _snapshot_path(self, name: str) -> str:
+        return os.path.join(self.snapshots_dir, name + SNAPSHOT_SUFFIX)
+
+    def snapshots(self) -> List[str]:
+        """Snapshot names, oldest first."""
+        return sorted(name[:-len(SNAPSHOT_SUFFIX)] for name in os.listdir(self.snapshots_dir)
+                      if name.endswith(SNAPSHOT_SUFFIX) and not name.startswith("."))
+
+    def load(self, name: Optional[str] = None) -> Dict:
+        """A snapshot's manifest (the latest by default)."""
+        if name is None:
+            names = self.snapshots()
+            if not names:
+                raise ValueError(f"No snapshots in {self.root}")
+            name = names[-1]
+        try:
+            with gzip.open(self._snapshot_path(name), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"No snapshot {name} in {self.root}") from None
+
+    def _save(self, snapshot: Dict) -> None:
+        payload = json.dumps(snapshot, separators=(",", ":"), ensure_ascii=False).encode('utf-8')
+        atomic_write_bytes(self._snapshot_path(snapshot["name"]), gzip.compress(payload, 6, mtime=0), mode=0o600)
+
+    def list_snapshots(self) -> List[Dict]:
+        """Summary of each snapshot: name, creation time, files and total size."""
+        summaries = []
+        for name in self.snapshots():
+            snapshot = self.load(name)
+            files = [e for e in snapshot["entries"].values() if e["type"] == "file"]
+            summaries.append({"name": name, "created": snapshot["created"], "files": len(files),
+                              "size": sum(e["size"] for e in files)})
+        return summaries
+
+    @traced()
+    def backup(self, sources: Dict[str, str], exclude: Iterable[str] = ()) -> Dict:
+        """
+        Take a snapshot of the given sources.
+
+        Args:
+            sources: Name -> directory or file to back up, e.g.
+                {"files": "/var/www/websites/example.com", "nginx": "/etc/nginx/sites-available/example.com.conf"};
+                names become the top-level directories of the snapshot
+            exclude: Glob patterns of paths (relative to their source) or names to skip
+
+        Returns:
+            Report with the snapshot name, file counts, bytes read and bytes newly stored
+        """
+        started = time.perf_counter()
+        exclude = list(exclude)
+        with self._locked():
+            previous = self.load()["entries"] if self.snapshots() else {}
+            entries, pending = {}, {}
+            for source, path in sources.items():
+                _check_key(source)
+                if not os.path.lexists(path):
+                    raise ValueError(f"Backup source {source} does not exist: {path}")
+                for key, full_path, st in _walk(source, path, exclude):
+                    entry = _entry(st)
+                    if entry["type"] == "symlink":
+                        entry["target"] = os.readlink(full_path)
+                    elif entry["type"] == "file":
+                        old = previous.get(key)
+                        if old and all(old.get(k) == entry[k] for k in ("type", "size", "mtime_ns", "ino")):
+                            entry["chunks"] = old["chunks"]
+                        else:
+                            pending[full_path] = key
+                    entries[key] = entry
+
+            report = {"snapshot": None, "files": 0, "unchanged": 0, "read": 0, "skipped": 0,
+                      "bytes_read": 0, "chunks_new": 0, "bytes_new": 0, "seconds": 0.0}
+            for path, result in self._store(pending, entries):
+                key = pending[path]
+                if result is None:
+                    del entries[key]
+                    report["skipped"] += 1
+                    continue
+                digests, size, new_chunks, new_bytes = result
+                # The entry keeps the stat taken before reading, so a file
+                # modified meanwhile is read again next time
+                entries[key]["chunks"] = digests
+                report["read"] += 1
+                report["bytes_read"] += size
+                report["chunks_new"] += new_chunks
+                report["bytes_new"] += new_bytes
+
+            name = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+            snapshot = {"name": name, "created": datetime.now().isoformat(timespec="seconds"),
+                        "sources": dict(sources), "entries": entries}
+            self._save(snapshot)
+
+        report["snapshot"] = name
+        report["files"] = sum(1 for e in entries.values() if e["type"] == "file")
+        report["unchanged"] = report["files"] - report["read"]
+        report["seconds"] = round(time.perf_counter() - started, 3)
+        logger.info("Backup: snapshot %s, %d of %d files read, %d new chunks (%d bytes)",
+                    name, report["read"], report["files"], report["chunks_new"], report["bytes_new"])
+        return report
+
+    def _store(self, pending: Dict[str, str], entries: Dict[str, Dict]) -> Iterator[Tuple[str, Optional[Tuple]]]:
+        """Chunk the pending files into the store, in worker processes when worth it."""
+        batches, batch, batch_bytes = [], [], 0
+        for path in sorted(pending, key=lambda p: -entries[pending[p]]["size"]):
+            batch.append(path)
+            batch_bytes += entries[pending[path]]["size"]
+            if len(batch) >= BATCH_FILES or batch_bytes >= BATCH_BYTES:
+                batches.append(batch)
+                batch, batch_bytes = [], 0
+        if batch:
+            batches.append(batch)
+
+        workers = min(self.max_workers or os.cpu_count() or 1, len(batches))
+        if workers > 1:
+            context = None
+            if "fork" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("fork")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                for results in pool.map(store_files, [self.store.root] * len(batches), batches):
+                    yield from results
+        else:
+            for batch in batches:
+                yield from store_files(self.store.root, batch)
+
+    @traced()
+    def restore(self, dest: str, snapshot: Optional[str] = None, paths: Iterable[str] = ()) -> Dict:
+        """
+        Restore a snapshot (the latest by default) into dest.
+
+        Args:
+            dest: Directory to restore into; existing files are overwritten
+            snapshot: Snapshot name
+            paths: Restore only these keys or key prefixes (e.g. "files/public_html/")
+
+        Returns:
+            Report with the snapshot name, files restored and their total size
+        """
+        data = self.load(snapshot)
+        wanted = [path.rstrip("/") for path in paths]
+        prefixes = tuple(path + "/" for path in wanted)
+        selected = sorted((key, entry) for key, entry in data["entries"].items()
+                          if not wanted or key in wanted or key.startswith(prefixes))
+        if not selected:
+            raise ValueError(f"Nothing in snapshot {data['name']} matches {wanted}")
+
+        report = {"snapshot": data["name"], "files": 0, "bytes": 0}
+        directories = []
+        for key, entry in selected:
+            target = os.path.join(dest, *_check_key(key).split("/"))
+            if entry["type"] == "dir":
+                os.makedirs(target, exist_ok=True)
+                directories.append((target, entry))
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.lexists(target) and (entry["type"] == "symlink" or os.path.islink(target)):
+                os.unlink(target)
+            if entry["type"] == "symlink":
+                os.symlink(entry["target"], target)
+                continue
+            tmp_path = os.path.join(os.path.dirname(target), f".restore-{os.path.basename(target)}")
+            try:
+                with open(tmp_path, 'wb') as f:
+                    for chunk in restore_chunks(self.store, entry["chunks"]):
+                        f.write(chunk)
+                os.chmod(tmp_path, entry["mode"])
+                os.utime(tmp_path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+                os.replace(tmp_path, target)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            report["files"] += 1
+            report["bytes"] += entry["size"]
+
+        # Directory modes and times last, once nothing more is written into them
+        for target, entry in reversed(directories):
+            os.chmod(target, entry["mode"])
+            os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+        logger.info("Restore: %d files from snapshot %s into %s", report["files"], data["name"], dest)
+        return report
+
+    @traced()
+    def verify(self, snapshot: Optional[str] = None, full: bool = False) -> Dict:
+        """
+        Check that snapshots can be restored.
+
+        Args:
+            snapshot: Snapshot to check (all of them by default)
+            full: Read every chunk back and check its hash, rather than
+                only that it exists
+
+        Returns:
+            Report with the snapshots and chunks checked and the problems found
+        """
+        names = [snapshot] if snapshot else self.snapshots()
+        checked: Dict[str, Optional[str]] = {}
+        problems = []
+        for name in names:
+            for key, entry in sorted(self.load(name)["entries"].items()):
+                for digest in entry.get("chunks", ()):
+                    if digest not in checked:
+                        checked[digest] = self._check_chunk(digest, full)
+                    if checked[digest]:
+                        problems.append(f"{name}: {key}: {checked[digest]}")
+                        break
+        return {"snapshots": len(names), "chunks": len(checked), "problems": problems}
+
+    def _check_chunk(self, digest: str, full: bool) -> Optional[str]:
+        if not full:
+            return None if self.store.contains(digest) else f"chunk {digest} is missing"
+        try:
+            self.store.get(digest, verify=True)
+        except FileNotFoundError:
+            return f"chunk {digest} is missing"
+        except (ValueError, OSError) as e:
+            return str(e)
+        return None
+
+    @traced()
+    def prune(self, keep_daily: int = 7, keep_weekly: int = 0, keep_monthly: int = 0,
+              dry_run: bool = False) -> Dict:
+        """
+        Delete snapshots outside the retention policy, then unreferenced chunks.
+
+        The newest snapshot of each of the last keep_daily days (weeks,
+        months) that have one is kept; the latest snapshot is always kept.
+
+        Returns:
+            Report with the snapshots removed and the chunk garbage collection result
+        """
+        with self._locked():
+            created = {name: datetime.fromisoformat(self.load(name)["created"]) for name in self.snapshots()}
+            keep = _retained(created, keep_daily, keep_weekly, keep_monthly)
+            removed = [name for name in sorted(created) if name not in keep]
+            referenced = set()
+            for name in keep:
+                for entry in self.load(name)["entries"].values():
+                    referenced.update(entry.get("chunks", ()))
+            if not dry_run:
+                for name in removed:
+                    os.unlink(self._snapshot_path(name))
+            # Under the lock no backup is writing, so no grace period is needed
+            gc = self.store.gc(referenced, grace_seconds=0 if fcntl else 300, dry_run=dry_run)
+        logger.info("Prune: removed %d snapshots and %d chunks", len(removed), gc["removed"])
+        return {"kept": sorted(keep), "removed": removed, "chunks": gc}
+
+
+def _retained(created: Dict[str, datetime], daily: int, weekly: int, monthly: int) -> set:
+    """Names of the snapshots a daily/weekly/monthly retention policy keeps."""
+    newest_first = sorted(created, reverse=True)
+    keep = set(newest_first[:1])
+    for count, period in ((daily, lambda d: d.date()),
+                          (weekly, lambda d: d.isocalendar()[:2]),
+                          (monthly, lambda d: (d.year, d.month))):
+        seen = []
+        for name in newest_first:
+            bucket = period(created[name])
+            if bucket in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.append(bucket)
+            keep.add(name)
+    return keep
+
+
+def _entry(st: os.stat_result) -> Dict:
+    if stat.S_ISLNK(st.st_mode):
+        kind = "symlink"
+    elif stat.S_ISDIR(st.st_mode):
+        kind = "dir"
+    else:
+        kind = "file"
+    entry = {"type": kind, "mode": stat.S_IMODE(st.st_mode), "mtime_ns": st.st_mtime_ns}
+    if kind == "file":
+        entry.update(size=st.st_size, ino=st.st_ino)
+    return entry
+
+
+def _excluded(rel: str, name: str, exclude: List[str]) -> bool:
+    return any(fnmatch.fnmatch(rel, pattern) or fnmatch.fnmatch(name, pattern) for pattern in exclude)
+
+
+def _walk(source: str, root: str, exclude: List[str]) -> Iterator[Tuple[str, str, os.stat_result]]:
+    """Yield (snapshot key, path, lstat) for a source and everything under it."""
+    st = os.stat(root)
+    yield source, root, st
+    if not stat.S_ISDIR(st.st_mode):
+        return
+    pending = [("", root)]
+    while pending:
+        prefix, directory = pending.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                rel = prefix + entry.name
+                if _excluded(rel, entry.name, exclude):
+                    continue
+                st = entry.stat(follow_symlinks=False)
+                if not (stat.S_ISREG(st.st_mode) or stat.S_ISDIR(st.st_mode) or stat.S_ISLNK(st.st_mode)):
+                    continue  # sockets, fifos, devices
+                yield f"{source}/{rel}", entry.path, st
+                if stat.S_ISDIR(st.st_mode):
+                    pending.append((rel + "/", entry.path))
+
+
+def format_report(report: Dict) -> str:
+    """Human-readable summary of a backup report."""
+    lines = [
+        f"Snapshot {report['snapshot']}: {report['files']} files, {report['unchanged']} unchanged, "
+        f"{report['read']} read ({report['bytes_read'] / 1024 / 1024:.1f} MB)",
+        f"  {report['chunks_new']} new chunks, {report['bytes_new'] / 1024 / 1024:.1f} MB stored "
+        f"in {report['seconds']:.1f}s"
+    ]
+    if report["skipped"]:
+        lines.append(f"  {report['skipped']} files vanished or were unreadable")
+    return "\n".join(lines)
@@ -0,0 +1,209 @@
+"""
+Content-defined chunking and a compressed, content-addressed chunk store.
+
+Files are cut into variable-size chunks at positions chosen by their
+content rather than their offset, so an insertion near the start of a file
+only changes the chunks around it and the rest deduplicate against the
+previous version. Each byte value is mapped to one pseudo-random bit and a
+chunk ends after a run of set bits; with the runs searched by a regex over
+the translated bytes, the boundaries are found at C speed. As in FastCDC,
+a longer run is required before the average size than after it, which
+keeps chunk sizes close to the average.
+
+Chunks are stored once under ``chunks/<aa>/<sha256 of the chunk>``,
+zlib-compressed unless compression doesn't pay (images, archives).
+"""
+
+import hashlib
+import logging
+import os
+import re
+import time
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bot_core.build.fsutil import atomic_write_bytes
+
+MIN_CHUNK = 16 * 1024
+AVG_CHUNK = 64 * 1024
+MAX_CHUNK = 256 * 1024
+READ_SIZE = 16 * MAX_CHUNK
+
+# Half the byte values, picked by hash, count as set bits. Changing this
+# (or the run lengths) moves every boundary and defeats deduplication
+# against existing chunks.
+_SET = set(sorted(range(256), key=lambda b: hashlib.sha256(bytes([b])).digest())[:128])
+_BITS = bytes(0x31 if b in _SET else 0x30 for b in range(256))
+_STRICT_RUN = 15
+_LOOSE_RUN = 13
+_STRICT = re.compile(b"1{%d}" % _STRICT_RUN)
+_LOOSE = re.compile(b"1{%d}" % _LOOSE_RUN)
+
+COMPRESSED = b"z"
+STORED = b"r"
+COMPRESS_LEVEL = 6
+
+logger = logging.getLogger(__name__)
+
+
+def _cut(bits: bytes, start: int, end: int) -> int:
+    """Offset of the first chunk boundary after start (bits is the translated data)."""
+    end = min(start + MAX_CHUNK, end)
+    if end - start <= MIN_CHUNK:
+        return end
+    normal = min(start + AVG_CHUNK, end)
+    match = (_STRICT.search(bits, start + MIN_CHUNK - _STRICT_RUN, normal)
+             or _LOOSE.search(bits, normal - _LOOSE_RUN, end))
+    return match.end() if match else end
+
+
+def chunk_stream(f: BinaryIO, read_size: int = READ_SIZE) -> Iterator[bytes]:
+    """Yield the content-defined chunks of a file."""
+    buf = b""
+    while True:
+        block = f.read(read_size)
+        buf = buf + block if buf else block
+        bits = buf.translate(_BITS)
+        start = 0
+        # Without more input, a boundary could still move until MAX_CHUNK is buffered
+        while start < len(buf) and (len(buf) - start >= MAX_CHUNK or not block):
+            cut = _cut(bits, start, len(buf))
+            yield buf[start:cut]
+            start = cut
+        buf = buf[start:]
+        if not block:
+            return
+
+
+class ChunkStore:
+    def __init__(self, root: str):
+        """
+        Open (or create) a chunk store.
+
+        Args:
+            root: Store directory
+        """
+        self.root = root
+        self.chunks_dir = os.path.join(root, "chunks")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest[2:])
+
+    def contains(self, digest: str) -> bool:
+        return os.path.exists(self.path_for(digest))
+
+    def put(self, data: bytes) -> Tuple[str, int]:
+        """
+        Store a chunk unless it is already present. Returns its digest and
+        the bytes written (0 for a chunk that was already stored).
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest, 0
+        packed = zlib.compress(data, COMPRESS_LEVEL)
+        payload = COMPRESSED + packed if len(packed) < len(data) * 0.9 else STORED + data
+        # Same content, same name: concurrent writers race harmlessly
+        atomic_write_bytes(path, payload, mode=0o600)
+        return digest, len(payload)
+
+    def get(self, digest: str, verify: bool = False) -> bytes:
+        """Read a chunk back; with verify, check it still hashes to its digest."""
+        with open(self.path_for(digest), 'rb') as f:
+            payload = f.read()
+        kind, body = payload[:1], payload[1:]
+        if kind == COMPRESSED:
+            data = zlib.decompress(body)
+        elif kind == STORED:
+            data = body
+        else:
+            raise ValueError(f"Chunk {digest} has an unknown format")
+        if verify and hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk {digest} is corrupt")
+        return data
+
+    def digests(self) -> Iterator[str]:
+        """Yield the digest of every stored chunk."""
+        for prefix in os.listdir(self.chunks_dir):
+            prefix_dir = os.path.join(self.chunks_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for rest in os.listdir(prefix_dir):
+                if not rest.startswith("."):
+                    yield prefix + rest
+
+    def gc(self, referenced: Iterable[str], grace_seconds: float = 300,
+           dry_run: bool = False) -> Dict:
+        """
+        Delete chunks no snapshot references.
+
+        Chunks younger than grace_seconds are kept so a backup writing
+        chunks for a snapshot it hasn't recorded yet does not lose them.
+        """
+        keep = set(referenced)
+        cutoff = time.time() - grace_seconds
+        result = {"kept": 0, "removed": 0, "freed_bytes": 0}
+
+        for digest in list(self.digests()):
+            path = self.path_for(digest)
+            st = os.stat(path)
+            if digest in keep or st.st_mtime > cutoff:
+                result["kept"] += 1
+                continue
+            result["removed"] += 1
+            result["freed_bytes"] += st.st_size
+            if not dry_run:
+                os.unlink(path)
+                try:
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass
+        return result
+
+
+def store_file(store: ChunkStore, path: str) -> Tuple[List[str], int, int, int]:
+    """
+    Chunk a file into the store. Returns its chunk digests, the bytes read,
+    and the number and stored size of chunks that were new.
+    """
+    digests, size, new_chunks, new_bytes = [], 0, 0, 0
+    with open(path, 'rb') as f:
+        for chunk in chunk_stream(f):
+            digest, written = store.put(chunk)
+            digests.append(digest)
+            size += len(chunk)
+            if written:
+                new_chunks += 1
+                new_bytes += written
+        _drop_cache(f)
+    return digests, size, new_chunks, new_bytes
+
+
+def _drop_cache(f: BinaryIO) -> None:
+    """Keep a one-off read from evicting pages the web server is serving from."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def store_files(root: str, paths: Iterable[str]) -> List[Tuple[str, Optional[Tuple]]]:
+    """Worker entry point: chunk a batch of files into the store at root."""
+    store = ChunkStore(root)
+    results = []
+    for path in paths:
+        try:
+            results.append((path, store_file(store, path)))
+        except (FileNotFoundError, PermissionError) as e:
+            # Deleted or locked down since the scan; the snapshot skips it
+            logger.warning("Backup: skipping %s: %s", path, e)
+            results.append((path, None))
+    return results
+
+
+def restore_chunks(store: ChunkStore, digests: Iterable[str], verify: bool = True) -> Iterator[bytes]:
+    """Yield a file's chunks back from the store."""
+    for digest in digests:
+        yield store.get(digest, verify=verify)
@@ -0,0 +1,145 @@
+"""
+Rolling-checksum file deltas (the rsync algorithm).
+
+The side holding the old copy of a file sends a signature: a weak rolling
+checksum (Adler-32) and a strong hash for each fixed-size block. The side
+holding the new copy slides a window over it looking for blocks the other
+side already has, and sends back a delta of block copies and literal
+bytes. Applying the delta to the old copy rebuilds the new one.
+
+Block checksums at block boundaries are computed with zlib; the window
+only rolls byte by byte (in Python) through regions that changed, and a
+delta gives up in favour of sending the whole file when a long run finds
+no match.
+"""
+
+import hashlib
+import os
+import zlib
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+
+ADLER_MOD = 65521
+MIN_BLOCK_SIZE = 4096
+MAX_BLOCK_SIZE = 64 * 1024
+# Consecutive unmatched blocks after which a delta isn't worth it
+MAX_LITERAL_BLOCKS = 32
+
+# A delta is a list of (offset, length) copies from the old file and literal bytes
+Delta = List[Union[Tuple[int, int], bytes]]
+
+
+def block_size_for(size: int) -> int:
+    """Block size for a file: about a thousand blocks, within bounds."""
+    return max(MIN_BLOCK_SIZE, min(MAX_BLOCK_SIZE, (size // 1000) & ~1023))
+
+
+def _strong(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def signature(f: BinaryIO, block_size: int) -> Dict:
+    """Block checksums of a file: {"block_size", "size", "blocks": {weak: [(strong, offset, length)]}}."""
+    blocks: Dict[int, List[Tuple[bytes, int, int]]] = {}
+    offset = 0
+    while True:
+        block = f.read(block_size)
+        if not block:
+            break
+        blocks.setdefault(zlib.adler32(block), []).append((_strong(block), offset, len(block)))
+        offset += len(block)
+    return {"block_size": block_size, "size": offset, "blocks": blocks}
+
+
+def file_signature(path: str, block_size: Optional[int] = None) -> Dict:
+    with open(path, 'rb') as f:
+        return signature(f, block_size or block_size_for(os.path.getsize(path)))
+
+
+def _match(blocks: Dict, weak: int, data: bytes) -> Optional[Tuple[int, int]]:
+    candidates = blocks.get(weak)
+    if not candidates:
+        return None
+    strong = _strong(data)
+    for candidate, offset, length in candidates:
+        if candidate == strong and length == len(data):
+            return offset, length
+    return None
+
+
+def delta(data: bytes, sig: Dict) -> Optional[Delta]:
+    """
+    Delta turning the file behind sig into data, or None when too little of
+    it matches to be worth sending as a delta.
+    """
+    block_size, blocks = sig["block_size"], sig["blocks"]
+    ops: Delta = []
+    literal_start = pos = 0
+    end = len(data)
+
+    def emit_copy(offset: int, length: int) -> None:
+        if ops and isinstance(ops[-1], tuple) and ops[-1][0] + ops[-1][1] == offset:
+            ops[-1] = (ops[-1][0], ops[-1][1] + length)
+        else:
+            ops.append((offset, length))
+
+    while end - pos >= block_size:
+        window = data[pos:pos + block_size]
+        a = zlib.adler32(window)
+        found = _match(blocks, a, window)
+        if found is None:
+            # Roll the window forward a byte at a time until a block matches
+            b, a = a >> 16, a & 0xFFFF
+            limit = min(end - block_size, pos + MAX_LITERAL_BLOCKS * block_size)
+            while found is None and pos < limit:
+                out, new = data[pos], data[pos + block_size]
+                a = (a - out + new) % ADLER_MOD
+                b = (b - block_size * out + a - 1) % ADLER_MOD
+                pos += 1
+                weak = (b << 16) | a
+                if weak in blocks:
+                    found = _match(blocks, weak, data[pos:pos + block_size])
+            if found is None:
+                if pos >= end - block_size:
+                    pos = end
+                    break
+                return None
+        if pos > literal_start:
+            ops.append(data[literal_start:pos])
+        emit_copy(*found)
+        pos += found[1]
+        literal_start = pos
+
+    # The new file's tail may still end with the old file's short last block
+    last = sig["size"] % block_size
+    if last and end - literal_start >= last:
+        tail = data[end - last:]
+        found = _match(blocks, zlib.adler32(tail), tail)
+        if found is not None:
+            if end - last > literal_start:
+                ops.append(data[literal_start:end - last])
+            emit_copy(*found)
+            literal_start = end
+    if literal_start < end:
+        ops.append(data[literal_start:end])
+    return ops
+
+
+def literal_bytes(ops: Delta) -> int:
+    """Bytes a delta carries as literals (what has to be transferred)."""
+    return sum(len(op) for op in ops if isinstance(op, bytes))
+
+
+def patch(old: BinaryIO, ops: Delta) -> Iterator[bytes]:
+    """Apply a delta to the old file, yielding the new file's bytes."""
+    for op in ops:
+        if isinstance(op, bytes):
+            yield op
+        else:
+            offset, length = op
+            old.seek(offset)
+            while length > 0:
+                chunk = old.read(min(length, 1024 * 1024))
+                if not chunk:
+                    raise ValueError("Delta refers past the end of the old file")
+                length -= len(chunk)
+                yield chunk
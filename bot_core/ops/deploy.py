@@ -0,0 +1,373 @@
+"""
+Delta deployment of a built site's public_html.
+
+Each deploy becomes a release directory on the target. Files whose hash
+matches the live release are reused from it (hardlinked on a local
+target), changed large files are sent as rolling-checksum deltas against
+their previous version, and everything else is sent whole. The release's
+manifest is stored beside it, so the next deploy knows what the target
+already has without reading it back. Once complete, the release goes live
+by replacing the public_html symlink, which is atomic, and old releases
+are pruned.
+
+    target = LocalTarget("/var/www/websites/example.com")
+    report = deploy("websites/example.com", target, keep=5)
+    print(format_report(report))
+
+Targets implement DeployTarget; LocalTarget works on a directory, which
+is enough to deploy on the host itself or to test without a network.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from bot_core.build.fsutil import CHUNK_SIZE, atomic_write_json, file_digest
+from bot_core.build.manifest import BuildManifest
+from bot_core.monitoring.tracing import traced
+
+from .delta import Delta, block_size_for, delta, file_signature, literal_bytes, patch
+
+RELEASES_DIR = "releases"
+LIVE_NAME = "public_html"
+# Files at least this large are sent as deltas when an old version exists
+DELTA_MIN_SIZE = 1024 * 1024
+KEEP_RELEASES = 5
+
+logger = logging.getLogger(__name__)
+
+
+def _check_key(key: str) -> str:
+    parts = key.split("/")
+    if key.startswith("/") or any(part in ("", ".", "..") for part in parts):
+        raise ValueError(f"Unsafe path in manifest: {key!r}")
+    return key
+
+
+def _read_chunks(path: str) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            yield chunk
+
+
+class DeployTarget:
+    """
+    Where a site's releases live. Subclass this for other transports (an
+    SSH host, object storage); deploy() only uses these methods.
+    """
+
+    def releases(self) -> List[str]:
+        """Completed releases, oldest first."""
+        raise NotImplementedError
+
+    def current(self) -> Optional[str]:
+        """The live release, if any."""
+        raise NotImplementedError
+
+    def read_manifest(self, release: str) -> Dict[str, Dict]:
+        """The file entries a release was deployed with ({} if unknown)."""
+        raise NotImplementedError
+
+    def signature(self, release: str, key: str, block_size: int) -> Optional[Dict]:
+        """Block signature of a release's file (see delta.signature), None if missing."""
+        raise NotImplementedError
+
+    def begin(self, release: str) -> None:
+        """Start staging a new release."""
+        raise NotImplementedError
+
+    def reuse(self, release: str, base: str, keys: Iterable[str]) -> None:
+        """Carry unchanged files over from the base release."""
+        raise NotImplementedError
+
+    def put(self, release: str, key: str, chunks: Iterable[bytes]) -> None:
+        """Store a whole file."""
+        raise NotImplementedError
+
+    def apply_delta(self, release: str, base: str, basis: str, key: str, ops: Delta) -> None:
+        """Store a file rebuilt from the base release's basis file and a delta."""
+        raise NotImplementedError
+
+    def commit(self, release: str, files: Dict[str, Dict]) -> None:
+        """Finish staging: record the manifest and make the release complete."""
+        raise NotImplementedError
+
+    def abort(self, release: str) -> None:
+        """Discard a release that failed while staging."""
+        raise NotImplementedError
+
+    def activate(self, release: str) -> None:
+        """Atomically make a completed release the live one."""
+        raise NotImplementedError
+
+    def remove(self, release: str) -> None:
+        """Delete a release that is not live."""
+        raise NotImplementedError
+
+
+class LocalTarget(DeployTarget):
+    def __init__(self, site_dir: str, live_name: str = LIVE_NAME):
+        """
+        Args:
+            site_dir: Site directory on the host (e.g. /var/www/websites/example.com)
+            live_name: Name of the symlink the web server serves from
+        """
+        self.site_dir = site_dir
+        self.releases_dir = os.path.join(site_dir, RELEASES_DIR)
+        self.live = os.path.join(site_dir, live_name)
+
+    def _release_dir(self, release: str) -> str:
+        return os.path.join(self.releases_dir, release)
+
+    def _staging_dir(self, release: str) -> str:
+        return os.path.join(self.releases_dir, f".staging-{release}")
+
+    def _path(self, directory: str, key: str) -> str:
+        return os.path.join(directory, *_check_key(key).split("/"))
+
+    def _manifest_path(self, release: str) -> str:
+        return os.path.join(self.releases_dir, f"{release}.json")
+
+    def releases(self) -> List[str]:
+        try:
+            names = os.listdir(self.releases_dir)
+        except FileNotFoundError:
+            return []
+        return sorted(name for name in names
+                      if not name.startswith(".") and os.path.isdir(self._release_dir(name)))
+
+    def current(self) -> Optional[str]:
+        if not os.path.islink(self.live):
+            return None
+        return os.path.basename(os.readlink(self.live).rstrip("/"))
+
+    def read_manifest(self, release: str) -> Dict[str, Dict]:
+        try:
+            with open(self._manifest_path(release), 'r') as f:
+                return json.load(f).get("files", {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def signature(self, release: str, key: str, block_size: int) -> Optional[Dict]:
+        path = self._path(self._release_dir(release), key)
+        if not os.path.isfile(path):
+            return None
+        return file_signature(path, block_size)
+
+    def begin(self, release: str) -> None:
+        staging = self._staging_dir(release)
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+    def _open_new(self, release: str, key: str):
+        path = self._path(self._staging_dir(release), key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return open(path, 'wb')
+
+    def reuse(self, release: str, base: str, keys: Iterable[str]) -> None:
+        source, staging = self._release_dir(base), self._staging_dir(release)
+        for key in keys:
+            src, dst = self._path(source, key), self._path(staging, key)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            try:
+                # Files are never modified in place, so releases can share them
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+
+    def put(self, release: str, key: str, chunks: Iterable[bytes]) -> None:
+        with self._open_new(release, key) as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    def apply_delta(self, release: str, base: str, basis: str, key: str, ops: Delta) -> None:
+        with open(self._path(self._release_dir(base), basis), 'rb') as old:
+            self.put(release, key, patch(old, ops))
+
+    def commit(self, release: str, files: Dict[str, Dict]) -> None:
+        atomic_write_json(self._manifest_path(release), {"release": release, "files": files}, indent=None)
+        os.rename(self._staging_dir(release), self._release_dir(release))
+
+    def abort(self, release: str) -> None:
+        shutil.rmtree(self._staging_dir(release), ignore_errors=True)
+
+    def activate(self, release: str) -> None:
+        if not os.path.isdir(self._release_dir(release)):
+            raise ValueError(f"No release {release} on the target")
+        if os.path.isdir(self.live) and not os.path.islink(self.live):
+            # First deploy over a plain directory: keep it as a release. This
+            # one switch can't be atomic, since a directory can't be replaced.
+            os.rename(self.live, self._release_dir(datetime.now().strftime("%Y%m%dT%H%M%S%f-initial")))
+        link = f"{self.live}.tmp-{os.getpid()}"
+        if os.path.lexists(link):
+            os.unlink(link)
+        os.symlink(os.path.relpath(self._release_dir(release), os.path.dirname(self.live)), link)
+        os.replace(link, self.live)
+
+    def remove(self, release: str) -> None:
+        if release == self.current():
+            raise ValueError(f"Release {release} is live")
+        shutil.rmtree(self._release_dir(release), ignore_errors=True)
+        if os.path.exists(self._manifest_path(release)):
+            os.unlink(self._manifest_path(release))
+
+
+def _local_files(manifest: BuildManifest) -> Dict[str, Dict]:
+    """The manifest's entries, re-hashing any file changed since it was recorded."""
+    files = {}
+    for key, entry in manifest.files.items():
+        path = manifest.path_for(_check_key(key))
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise ValueError(f"{key} is in the build manifest but missing; rebuild the site first")
+        if st.st_size != entry.get("size") or ("mtime_ns" in entry and st.st_mtime_ns != entry["mtime_ns"]):
+            entry = {**entry, "hash": file_digest(path), "size": st.st_size}
+        files[key] = entry
+    return files
+
+
+def _basis(key: str, entry: Dict, remote: Dict[str, Dict]) -> Optional[str]:
+    """The live file a changed file is most likely an edit of."""
+    if key in remote:
+        return key
+    # A fingerprinted asset changes its name with its content
+    source = entry.get("fingerprint_of")
+    if source:
+        for remote_key, remote_entry in remote.items():
+            if remote_entry.get("fingerprint_of") == source:
+                return remote_key
+    return None
+
+
+def _release_name(files: Dict[str, Dict]) -> str:
+    """Release names sort in deploy order: a timestamp, then a digest of the content."""
+    digest = hashlib.sha256(json.dumps({k: e["hash"] for k, e in sorted(files.items())}).encode()).hexdigest()
+    return f"{datetime.now().strftime('%Y%m%dT%H%M%S%f')}-{digest[:8]}"
+
+
+@traced()
+def deploy(
+    site_path: str,
+    target: DeployTarget,
+    keep: int = KEEP_RELEASES,
+    dry_run: bool = False,
+    manifest: Optional[BuildManifest] = None
+) -> Dict:
+    """
+    Deploy a site's public_html as a new release and make it live.
+
+    Args:
+        site_path: Local site directory (holding config/build_manifest.json)
+        target: Where releases live
+        keep: Releases to keep, the live one included
+        dry_run: Only report what would be sent
+        manifest: The site's build manifest (loaded from site_path if None)
+    """
+    manifest = manifest or BuildManifest.for_site(site_path)
+    if not manifest.files:
+        raise ValueError(f"No build manifest for {site_path}; build the site first")
+    files = _local_files(manifest)
+    previous = target.current()
+    remote = target.read_manifest(previous) if previous else {}
+
+    unchanged = [key for key, entry in files.items() if remote.get(key, {}).get("hash") == entry["hash"]]
+    changed = sorted(set(files) - set(unchanged))
+    report = {
+        "release": None,
+        "previous": previous,
+        "files": len(files),
+        "unchanged": len(unchanged),
+        "uploaded": [],
+        "delta": [],
+        "removed": sorted(set(remote) - set(files)),
+        "bytes_total": sum(entry["size"] for entry in files.values()),
+        "bytes_sent": 0,
+        "pruned": []
+    }
+    if not changed and not report["removed"]:
+        logger.info("Deploy: %s is already live", previous)
+        return report
+    if dry_run:
+        report["uploaded"] = changed
+        report["bytes_sent"] = sum(files[key]["size"] for key in changed)
+        return report
+
+    release = _release_name(files)
+    report["release"] = release
+    target.begin(release)
+    try:
+        if previous:
+            target.reuse(release, previous, unchanged)
+        for key in changed:
+            path = manifest.path_for(key)
+            size = files[key]["size"]
+            basis = _basis(key, files[key], remote) if previous and size >= DELTA_MIN_SIZE else None
+            sig = target.signature(previous, basis, block_size_for(size)) if basis else None
+            if sig is not None:
+                with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    ops = delta(data, sig)
+                # A delta only pays off when most of the file matched
+                if ops is not None and literal_bytes(ops) < size // 2:
+                    target.apply_delta(release, previous, basis, key, ops)
+                    report["delta"].append(key)
+                    report["bytes_sent"] += literal_bytes(ops)
+                    continue
+            target.put(release, key, _read_chunks(path))
+            report["uploaded"].append(key)
+            report["bytes_sent"] += size
+        target.commit(release, files)
+    except BaseException:
+        target.abort(release)
+        raise
+
+    target.activate(release)
+    report["pruned"] = prune_releases(target, keep)
+    logger.info("Deploy: %s is live (%d sent, %d reused)", release, len(changed), len(unchanged))
+    return report
+
+
+def prune_releases(target: DeployTarget, keep: int = KEEP_RELEASES) -> List[str]:
+    """Remove all but the newest releases, never the live one. Returns those removed."""
+    live = target.current()
+    stale = [release for release in target.releases() if release != live]
+    stale = stale[:max(len(stale) - max(keep - 1, 0), 0)]
+    for release in stale:
+        target.remove(release)
+    return stale
+
+
+def rollback(target: DeployTarget, release: Optional[str] = None) -> str:
+    """Make an earlier release live again (by default the one before the live one)."""
+    releases = target.releases()
+    if release is None:
+        live = target.current()
+        earlier = [r for r in releases if live is None or r < live]
+        if not earlier:
+            raise ValueError("No earlier release to roll back to")
+        release = earlier[-1]
+    elif release not in releases:
+        raise ValueError(f"No release {release} on the target")
+    target.activate(release)
+    return release
+
+
+def format_report(report: Dict) -> str:
+    """Human-readable summary of a deploy report."""
+    if report["release"] is None and not report["uploaded"] and not report["removed"]:
+        return f"Nothing to deploy: {report['previous']} is up to date ({report['files']} files)"
+    lines = [
+        f"Release {report['release'] or '(dry run)'}"
+        + (f" (previous {report['previous']})" if report["previous"] else ""),
+        f"  {report['files']} files: {report['unchanged']} unchanged, {len(report['uploaded'])} uploaded, "
+        f"{len(report['delta'])} as deltas, {len(report['removed'])} removed",
+        f"  sent {report['bytes_sent'] / 1024:.1f} KB of {report['bytes_total'] / 1024:.1f} KB"
+    ]
+    if report["pruned"]:
+        lines.append(f"  pruned {', '.join(report['pruned'])}")
+    return "\n".join(lines)
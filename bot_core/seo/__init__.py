@@ -7,6 +7,9 @@ from .automation import SEOAutomation
 from .sentinel import SEOSentinel
 from .cost_governor import SEOCostGovernor
 from .review_manager import ReviewManager
+from .schema_batch import SchemaBatch
+from .schema_validator import SchemaValidator
+from .scheduler import AutomationScheduler
 
 __version__ = "0.1.0"
 
@@ -14,7 +17,10 @@ __all__ = [
     'SEOAutomation',
     'SEOSentinel',
     'SEOCostGovernor',
-    'ReviewManager'
+    'ReviewManager',
+    'SchemaBatch',
+    'SchemaValidator',
+    'AutomationScheduler'
 ]
 
 # Example usage:
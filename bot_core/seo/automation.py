@@ -7,13 +7,32 @@ from typing import Dict, List, Optional
 import logging
 from datetime import datetime
 
+from .ingest import ingest
 from .sentinel import SEOSentinel
 from .cost_governor import SEOCostGovernor
 from .review_manager import ReviewManager
 
 class SEOAutomation:
-    def __init__(self, business_id: str, monthly_budget: float = 5000):
+    # site_data key -> the method fetching it; the fetches are independent
+    SITE_DATA_SOURCES = {
+        'traffic': '_get_traffic_data',
+        'search_console': '_get_search_console_data',
+        'reviews': '_get_review_data',
+        'content': '_get_content_data'
+    }
+
+    def __init__(self, business_id: str, monthly_budget: float = 5000,
+                 exports: Optional[Dict[str, List[str]]] = None):
+        """
+        Args:
+            business_id: Business the reviews belong to
+            monthly_budget: SEO spend limit for the cost governor
+            exports: Search Console, analytics and content export files to
+                analyze, by kind (see seo/ingest.py); kinds without exports
+                use the built-in integrations
+        """
         self.business_id = business_id
+        self.exports = exports or {}
         self.setup_logging()
         
         # Initialize components
@@ -42,30 +61,50 @@ class SEOAutomation:
         self.logger.info("Starting automated SEO tasks")
         self.status['last_check'] = datetime.now()
         
-        results = {
-            'seo_analysis': None,
-            'cost_optimization': None,
-            'review_management': None,
-            'pending_actions': []
-        }
+        results = self._new_results()
         
         # Run SEO analysis
         try:
             site_data = self._collect_site_data()
-            analysis_result = self.sentinel.analyze_and_act(site_data)
-            results['seo_analysis'] = analysis_result
-            
-            # Handle any issues that need attention
-            if analysis_result['status'] == 'escalated':
-                results['pending_actions'].append({
-                    'type': 'seo_issue',
-                    'ticket': analysis_result['ticket']
-                })
+            self._run_analysis(results, site_data)
         except Exception as e:
             self.logger.error(f"Error in SEO analysis: {str(e)}")
             results['seo_analysis'] = {'error': str(e)}
 
         # Check budget and optimize costs
+        self._run_cost_check(results)
+
+        # Process pending reviews
+        try:
+            self._run_reviews(results, self._get_pending_reviews())
+        except Exception as e:
+            self.logger.error(f"Error in review management: {str(e)}")
+            results['review_management'] = {'error': str(e)}
+
+        return results
+
+    # The steps of run_automated_tasks, also driven concurrently by seo/scheduler.py
+
+    def _new_results(self) -> Dict:
+        return {
+            'seo_analysis': None,
+            'cost_optimization': None,
+            'review_management': None,
+            'pending_actions': []
+        }
+
+    def _run_analysis(self, results: Dict, site_data: Dict) -> None:
+        analysis_result = self.sentinel.analyze_and_act(site_data)
+        results['seo_analysis'] = analysis_result
+        
+        # Handle any issues that need attention
+        if analysis_result['status'] == 'escalated':
+            results['pending_actions'].append({
+                'type': 'seo_issue',
+                'ticket': analysis_result['ticket']
+            })
+
+    def _run_cost_check(self, results: Dict) -> None:
         try:
             budget_status = self.cost_governor.get_budget_status()
             if budget_status['status'] == 'over_budget':
@@ -78,41 +117,33 @@ class SEOAutomation:
             self.logger.error(f"Error in cost optimization: {str(e)}")
             results['cost_optimization'] = {'error': str(e)}
 
-        # Process pending reviews
-        try:
-            pending_reviews = self._get_pending_reviews()
-            review_results = []
+    def _run_reviews(self, results: Dict, pending_reviews: List[Dict]) -> None:
+        review_results = []
+        
+        for review in pending_reviews:
+            response = self.review_manager.handle_new_review(review)
+            if response['analysis']['needs_escalation']:
+                results['pending_actions'].append({
+                    'type': 'review_escalation',
+                    'review_id': review.get('id'),
+                    'priority': 'high' if review.get('rating', 5) <= 2 else 'medium'
+                })
+            review_results.append(response)
             
-            for review in pending_reviews:
-                response = self.review_manager.handle_new_review(review)
-                if response['analysis']['needs_escalation']:
-                    results['pending_actions'].append({
-                        'type': 'review_escalation',
-                        'review_id': review.get('id'),
-                        'priority': 'high' if review.get('rating', 5) <= 2 else 'medium'
-                    })
-                review_results.append(response)
-                
-            results['review_management'] = {
-                'processed': len(review_results),
-                'escalated': len([r for r in review_results if r['analysis']['needs_escalation']])
-            }
-        except Exception as e:
-            self.logger.error(f"Error in review management: {str(e)}")
-            results['review_management'] = {'error': str(e)}
-
-        return results
+        results['review_management'] = {
+            'processed': len(review_results),
+            'escalated': len([r for r in review_results if r['analysis']['needs_escalation']])
+        }
 
     def _collect_site_data(self) -> Dict:
         """Collect current site data for analysis"""
         # Implement your site data collection logic here
         # This should gather data from various sources (Analytics, Search Console, etc.)
-        return {
-            'traffic': self._get_traffic_data(),
-            'search_console': self._get_search_console_data(),
-            'reviews': self._get_review_data(),
-            'content': self._get_content_data()
-        }
+        site_data = {key: getattr(self, method)() for key, method in self.SITE_DATA_SOURCES.items()}
+        if self.exports:
+            # Exports are streamed and aggregated per URL, never held as rows
+            site_data.update(ingest(self.exports).site_data())
+        return site_data
 
     def _get_traffic_data(self) -> Dict:
         """Get traffic data from Analytics"""
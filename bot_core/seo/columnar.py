@@ -0,0 +1,138 @@
+"""
+Columnar SEOSentinel analysis for large Search Console and content exports.
+
+The row-by-row checks in SEOSentinel parse a date, call datetime.now() and
+format a message for every page. Here the pages are loaded once into NumPy
+columns (ctr, word_count, keyword_density, last_updated as epoch
+microseconds), each threshold is evaluated as a vectorized mask, and
+issue strings are built only for the pages a mask flags. The issues come
+out exactly as the row-by-row checks write them, in the same order.
+
+    table = PageColumns.from_rows(site_data["content"]["pages"], CONTENT_FIELDS, CONTENT_DATES)
+    issues = content_issues(table, thresholds["content"])
+
+NumPy is optional; available() says whether this module can be used.
+"""
+
+import math
+import warnings
+from datetime import datetime, timedelta
+from operator import itemgetter
+from typing import Dict, List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+# Numeric columns and the value a page without the field gets
+CTR_FIELDS = {"ctr": 0}
+CONTENT_FIELDS = {"word_count": 0, "keyword_density": 0}
+# Date columns (ISO strings, parsed to epoch microseconds) and their defaults
+CONTENT_DATES = {"last_updated": "2000-01-01"}
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _timestamps(values: Sequence[str]):
+    """Epoch microseconds of naive ISO timestamps, as datetime.fromisoformat reads them."""
+    try:
+        with warnings.catch_warnings():
+            # NumPy converts "+02:00" offsets to UTC with a warning, where
+            # fromisoformat gives an aware datetime; leave those to the fallback
+            warnings.simplefilter("error")
+            return np.array(values, dtype="datetime64[us]").astype(np.int64)
+    except (ValueError, TypeError, DeprecationWarning, UserWarning):
+        epoch = datetime(1970, 1, 1)
+        return np.fromiter(((datetime.fromisoformat(v) - epoch) // timedelta(microseconds=1) for v in values),
+                           dtype=np.int64, count=len(values))
+
+
+def _field(pages: Sequence[Dict], name: str, default) -> List:
+    """One field of every page, with default where it is missing."""
+    try:
+        # itemgetter runs in C; most exports have every field on every row
+        return list(map(itemgetter(name), pages))
+    except KeyError:
+        return [page.get(name, default) for page in pages]
+
+
+class PageColumns:
+    def __init__(self, urls: Sequence[str], columns: Dict, rows: Optional[Sequence[Dict]] = None):
+        """
+        Args:
+            urls: Page URLs, one per row
+            columns: Field name -> NumPy array with one value per row
+            rows: The page dicts the columns were read from; issue messages
+                quote their values verbatim (e.g. a CTR of 2 as "2", not "2.0")
+        """
+        if np is None:
+            raise ValueError("Columnar analysis requires numpy")
+        for name, column in columns.items():
+            if len(column) != len(urls):
+                raise ValueError(f"Column {name} has {len(column)} rows, expected {len(urls)}")
+        self.urls = urls
+        self.columns = columns
+        self.rows = rows
+
+    @classmethod
+    def from_rows(cls, pages: Sequence[Dict], fields: Dict, dates: Optional[Dict] = None) -> "PageColumns":
+        """Load page dicts into columns; missing fields take the given defaults."""
+        if np is None:
+            raise ValueError("Columnar analysis requires numpy")
+        columns = {name: np.fromiter(_field(pages, name, default), dtype=np.float64, count=len(pages))
+                   for name, default in fields.items()}
+        for name, default in (dates or {}).items():
+            columns[name] = _timestamps(_field(pages, name, default))
+        return cls(_field(pages, "url", None), columns, rows=pages)
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def values(self, indexes: List[int], name: str, default=0) -> List:
+        """A field of the given rows as the source had it."""
+        if self.rows is not None:
+            rows = self.rows
+            return [rows[index].get(name, default) for index in indexes]
+        return self.columns[name][indexes].tolist()
+
+
+def ctr_issues(table: PageColumns, thresholds: Dict) -> List[str]:
+    """Pages with a CTR outside thresholds["min"]..thresholds["max"]."""
+    ctr = table.columns["ctr"]
+    low = ctr < thresholds["min"]
+    flagged = np.flatnonzero(low | (ctr > thresholds["max"])).tolist()
+    urls = table.urls
+    return [f"{'Low' if is_low else 'Suspicious'} CTR on {urls[index]}: {value}%"
+            for index, is_low, value in zip(flagged, low[flagged].tolist(), table.values(flagged, "ctr"))]
+
+
+# Content issue messages (prefixes of the url) by bit: stale, thin, low
+# and high keyword density; low and high are exclusive
+_CONTENT_MESSAGES = ("Stale content on ", "Thin content on ",
+                     "Low keyword density on ", "High keyword density on ")
+_CONTENT_CODES = tuple(tuple(m for bit, m in enumerate(_CONTENT_MESSAGES) if code >> bit & 1) for code in range(16))
+
+
+def content_issues(table: PageColumns, thresholds: Dict, now: Optional[datetime] = None) -> List[str]:
+    """Stale, thin and keyword-stuffed (or -starved) pages, per page in that order."""
+    now = now or datetime.now()
+    # timedelta.days > freshness holds from whole days of freshness + 1 on
+    cutoff = now - timedelta(days=math.floor(thresholds["freshness"]) + 1)
+    density = table.columns["keyword_density"]
+    codes = (
+        (table.columns["last_updated"] <= (cutoff - datetime(1970, 1, 1)) // timedelta(microseconds=1))
+        | (table.columns["word_count"] < thresholds["min_length"]) << 1
+        | (density < thresholds["keyword_density"]["min"]) << 2
+        | ((density > thresholds["keyword_density"]["max"]) & (density >= thresholds["keyword_density"]["min"])) << 3
+    ).astype(np.uint8)
+
+    flagged = np.flatnonzero(codes)
+    urls = table.urls
+    issues = []
+    for index, code in zip(flagged.tolist(), codes[flagged].tolist()):
+        url = urls[index]
+        issues.extend([message + url for message in _CONTENT_CODES[code]])
+    return issues
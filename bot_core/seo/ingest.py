@@ -0,0 +1,349 @@
+"""
+Streaming ingestion of Search Console, analytics and content exports.
+
+Exports are read in chunks of rows (CSV or JSONL, plain or gzipped) and
+folded into per-URL (and, for analytics, per-day) totals as they stream
+past, so memory grows with the number of distinct pages rather than the
+number of rows. A multi-GB page/query export ends up as one entry per
+page. The totals come out as the structures SEOSentinel.analyze_and_act
+expects:
+
+    aggregate = ingest({
+        "search_console": ["exports/gsc-2024-06.csv.gz", "exports/gsc-2024-07.csv.gz"],
+        "analytics": ["exports/ga4-sessions.jsonl.gz"],
+        "content": ["exports/content-inventory.csv"],
+    })
+    sentinel.analyze_and_act(dict(aggregate.site_data(), reviews=...))
+
+Several files are parsed in parallel worker processes, each into its own
+ExportAggregate, and the partial totals are merged.
+
+Column names are matched case-insensitively, with the spellings of the
+Search Console and Google Analytics UI exports ("Top pages", "CTR" as
+"3.2%", "Landing page", ...) mapped to the sentinel's field names.
+"""
+
+import csv
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bot_core.monitoring.metrics_store import MetricsStore
+from bot_core.monitoring.tracing import traced
+
+from . import columnar
+
+KINDS = ("search_console", "analytics", "content")
+CHUNK_ROWS = 10_000
+# Traffic compares the sessions of the last period against the one before
+TRAFFIC_PERIOD_DAYS = 28
+
+# Export column names (lowercased, spaces as underscores) that differ from the field names
+COLUMN_ALIASES = {
+    "page": "url", "top_pages": "url", "landing_page": "url", "page_path": "url", "pagepath": "url",
+    "address": "url", "top_queries": "query", "day": "date", "views": "pageviews",
+    "screen_page_views": "pageviews", "screenpageviews": "pageviews",
+}
+
+logger = logging.getLogger(__name__)
+
+
+def _column(name: str) -> str:
+    name = name.strip().lower().replace(" ", "_")
+    return COLUMN_ALIASES.get(name, name)
+
+
+def _number(value) -> float:
+    """A count or rate as exports write it: 1234, "1,234", "3.2%" or empty."""
+    if isinstance(value, (int, float)):
+        return value
+    if not value:
+        return 0
+    value = value.strip().rstrip("%").replace(",", "")
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def open_export(path: str):
+    """Open an export for reading as text, decompressing gzip files."""
+    with open(path, 'rb') as f:
+        gzipped = f.read(2) == b"\x1f\x8b"
+    if gzipped:
+        return gzip.open(path, 'rt', encoding='utf-8-sig', newline='')
+    # utf-8-sig drops the byte order mark spreadsheet exports start with
+    return open(path, 'r', encoding='utf-8-sig', newline='')
+
+
+def read_chunks(path: str, chunk_rows: int = CHUNK_ROWS) -> Iterator[List[Dict]]:
+    """
+    Stream an export as lists of at most chunk_rows rows, with normalized
+    field names.
+
+    CSV and JSONL (.jsonl/.ndjson) are read, either optionally gzipped.
+    JSONL rows in the Search Console API's shape ({"keys": [...], "clicks":
+    ...}) take their url from the first key, the page dimension.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    chunk: List[Dict] = []
+    with open_export(path) as f:
+        if name.endswith(".csv"):
+            reader = csv.reader(f)
+            header = [_column(column) for column in next(reader, [])]
+            rows = (dict(zip(header, values)) for values in reader)
+        elif name.endswith((".jsonl", ".ndjson")):
+            rows = _json_rows(f, path)
+        else:
+            raise ValueError(f"Unsupported export format: {path} (expected .csv or .jsonl, optionally .gz)")
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= chunk_rows:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _json_rows(f, path: str) -> Iterator[Dict]:
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"{path}:{number}: invalid JSON: {e}") from None
+        row = {_column(key): value for key, value in raw.items()}
+        if "url" not in row and row.get("keys"):
+            row["url"] = row["keys"][0]
+        yield row
+
+
+class ExportAggregate:
+    def __init__(self, period_days: int = TRAFFIC_PERIOD_DAYS):
+        """
+        Args:
+            period_days: Length of the current and previous traffic periods
+        """
+        self.period_days = period_days
+        # url -> [clicks, impressions, position sum weighted by impressions]
+        self.search: Dict[str, List[float]] = {}
+        # ISO date -> sessions
+        self.sessions: Dict[str, float] = {}
+        # url -> content fields; a later row for a url replaces an earlier one
+        self.content: Dict[str, Dict] = {}
+        self.rows = dict.fromkeys(KINDS, 0)
+
+    def add(self, kind: str, rows: Iterable[Dict]) -> None:
+        """Fold a chunk of export rows of the given kind into the totals."""
+        if kind == "search_console":
+            self._add_search(rows)
+        elif kind == "analytics":
+            self._add_analytics(rows)
+        elif kind == "content":
+            self._add_content(rows)
+        else:
+            raise ValueError(f"Unknown export kind: {kind} (expected one of {', '.join(KINDS)})")
+
+    def _add_search(self, rows: Iterable[Dict]) -> None:
+        search = self.search
+        count = 0
+        for row in rows:
+            count += 1
+            url = row.get("url")
+            if not url:
+                continue
+            impressions = _number(row.get("impressions"))
+            totals = search.get(url)
+            if totals is None:
+                totals = search[url] = [0, 0, 0.0]
+            totals[0] += _number(row.get("clicks"))
+            totals[1] += impressions
+            totals[2] += _number(row.get("position")) * impressions
+        self.rows["search_console"] += count
+
+    def _add_analytics(self, rows: Iterable[Dict]) -> None:
+        sessions = self.sessions
+        count = 0
+        for row in rows:
+            count += 1
+            day = _day(row.get("date"))
+            if day is None:
+                continue
+            value = row.get("sessions")
+            if value is None:
+                value = row.get("users", row.get("pageviews"))
+            sessions[day] = sessions.get(day, 0) + _number(value)
+        self.rows["analytics"] += count
+
+    def _add_content(self, rows: Iterable[Dict]) -> None:
+        content = self.content
+        count = 0
+        for row in rows:
+            count += 1
+            url = row.get("url")
+            if not url:
+                continue
+            page = {}
+            if row.get("last_updated"):
+                page["last_updated"] = row["last_updated"]
+            if row.get("word_count") not in (None, ""):
+                page["word_count"] = int(_number(row["word_count"]))
+            if row.get("keyword_density") not in (None, ""):
+                page["keyword_density"] = _number(row["keyword_density"])
+            content[url] = page
+        self.rows["content"] += count
+
+    def merge(self, other: "ExportAggregate") -> None:
+        """Add another aggregate's totals (e.g. a worker's) into this one."""
+        for url, totals in other.search.items():
+            mine = self.search.get(url)
+            if mine is None:
+                self.search[url] = totals
+            else:
+                for i, value in enumerate(totals):
+                    mine[i] += value
+        for day, value in other.sessions.items():
+            self.sessions[day] = self.sessions.get(day, 0) + value
+        self.content.update(other.content)
+        for kind, count in other.rows.items():
+            self.rows[kind] += count
+
+    def traffic(self) -> Dict:
+        """Sessions of the last period_days up to the newest day, and of the period before."""
+        if not self.sessions:
+            return {}
+        newest = date.fromisoformat(max(self.sessions))
+        current_start = (newest - timedelta(days=self.period_days - 1)).isoformat()
+        previous_start = (newest - timedelta(days=2 * self.period_days - 1)).isoformat()
+        current = previous = 0
+        for day, value in self.sessions.items():
+            if day >= current_start:
+                current += value
+            elif day >= previous_start:
+                previous += value
+        return {"current": current, "previous": previous}
+
+    def record(self, store: MetricsStore, site: str, today: Optional[date] = None) -> int:
+        """
+        Append the daily sessions newer than the store's last day to the
+        site's traffic series, so re-ingesting overlapping exports doesn't
+        count a day twice. Returns the days written.
+
+        The store is append-only, so a day is recorded only once complete:
+        today (UTC by default) and later days are left for a later export.
+        """
+        last = store.last_day(site, "traffic")
+        end = (today or datetime.now(timezone.utc).date()).isoformat()
+        days = sorted(day for day in self.sessions if day < end and (last is None or day > last.isoformat()))
+        # Noon UTC keeps each sample inside its day
+        store.append_many((site, None, "traffic", _timestamp(day) + 43200, self.sessions[day]) for day in days)
+        return len(days)
+
+    def search_pages(self) -> List[Dict]:
+        pages = []
+        for url, (clicks, impressions, weighted_position) in self.search.items():
+            pages.append({
+                "url": url,
+                "clicks": clicks,
+                "impressions": impressions,
+                "ctr": round(100 * clicks / impressions, 2) if impressions else 0,
+                "position": round(weighted_position / impressions, 1) if impressions else 0
+            })
+        return pages
+
+    def content_pages(self) -> List[Dict]:
+        return [dict(page, url=url) for url, page in self.content.items()]
+
+    def site_data(self, as_columns: bool = False) -> Dict:
+        """
+        The traffic, search_console and content structures for
+        SEOSentinel.analyze_and_act, for the kinds that had exports.
+
+        Args:
+            as_columns: Give the page lists as columnar.PageColumns (needs numpy)
+        """
+        data = {}
+        if self.rows["analytics"]:
+            data["traffic"] = self.traffic()
+        if self.rows["search_console"]:
+            pages = self.search_pages()
+            if as_columns:
+                pages = columnar.PageColumns.from_rows(pages, columnar.CTR_FIELDS)
+            data["search_console"] = {"pages": pages}
+        if self.rows["content"]:
+            pages = self.content_pages()
+            if as_columns:
+                pages = columnar.PageColumns.from_rows(pages, columnar.CONTENT_FIELDS, columnar.CONTENT_DATES)
+            data["content"] = {"pages": pages}
+        return data
+
+
+def _timestamp(day: str) -> float:
+    return datetime.combine(date.fromisoformat(day), datetime.min.time(), timezone.utc).timestamp()
+
+
+def _day(value) -> Optional[str]:
+    """ISO date of an export's date cell (2024-06-30, 20240630 or a timestamp)."""
+    if not value:
+        return None
+    value = str(value).strip()
+    if len(value) == 8 and value.isdigit():
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value[:10]
+
+
+def ingest_file(kind: str, path: str, period_days: int = TRAFFIC_PERIOD_DAYS,
+                chunk_rows: int = CHUNK_ROWS) -> ExportAggregate:
+    """Worker entry point: aggregate one export file."""
+    aggregate = ExportAggregate(period_days)
+    for chunk in read_chunks(path, chunk_rows):
+        aggregate.add(kind, chunk)
+    logger.info("Ingest: %s: %d rows", path, aggregate.rows[kind])
+    return aggregate
+
+
+@traced()
+def ingest(
+    exports: Dict[str, Iterable[str]],
+    max_workers: Optional[int] = None,
+    period_days: int = TRAFFIC_PERIOD_DAYS,
+    chunk_rows: int = CHUNK_ROWS
+) -> ExportAggregate:
+    """
+    Aggregate export files, several at a time in worker processes.
+
+    Args:
+        exports: Kind ("search_console", "analytics" or "content") -> export paths
+        max_workers: Parser processes (defaults to one per CPU, at most one per file)
+        period_days: Length of the current and previous traffic periods
+        chunk_rows: Rows read per chunk
+    """
+    tasks: List[Tuple[str, str]] = []
+    for kind, paths in exports.items():
+        if kind not in KINDS:
+            raise ValueError(f"Unknown export kind: {kind} (expected one of {', '.join(KINDS)})")
+        tasks.extend((kind, path) for path in paths)
+
+    total = ExportAggregate(period_days)
+    workers = min(max_workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        context = None
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(ingest_file, kind, path, period_days, chunk_rows) for kind, path in tasks]
+            for future in futures:
+                total.merge(future.result())
+    else:
+        for kind, path in tasks:
+            for chunk in read_chunks(path, chunk_rows):
+                total.add(kind, chunk)
+    logger.info("Ingest: %d files, %d search pages, %d content pages",
+                len(tasks), len(total.search), len(total.content))
+    return total
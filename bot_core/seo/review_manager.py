@@ -11,8 +11,8 @@ from datetime import datetime, timedelta
 class ReviewManager:
     def __init__(self, business_id: str, config_path: str = "config/review_templates.json"):
         self.business_id = business_id
-        self.templates = self._load_templates(config_path)
         self.setup_logging()
+        self.templates = self._load_templates(config_path)
         
         # Default response delays
         self.response_delays = {
@@ -0,0 +1,218 @@
+"""
+Concurrent SEOAutomation runs for many businesses.
+
+SEOAutomation.run_automated_tasks runs one business's steps in order, each
+data fetch blocking the next. AutomationScheduler runs the same steps on
+an asyncio loop:
+
+- within a business, the site-data fetches (traffic, Search Console,
+  reviews, content), the pending-review fetch, export ingestion and the
+  budget check all run at once; the sentinel analysis and review handling
+  start as soon as their inputs are in
+- many businesses run at once, up to max_businesses
+- calls to each data provider are capped by a per-provider limit, so a
+  slow or rate-limited API is never hit by every business at the same time
+
+The blocking SEOAutomation methods run in a thread pool. Export ingestion
+is CPU-bound, so it runs in a process pool the scheduler owns, started
+with forkserver (or spawn) rather than forked from this multi-threaded
+process. Each business
+gets exactly the results dict run_automated_tasks would return, and the
+run reports latency percentiles per stage, plus the time spent waiting on
+each provider's limit.
+
+    scheduler = AutomationScheduler(limits={"search_console": 4, "reviews": 8})
+    run = scheduler.run_all(["biz-1", "biz-2", "biz-3"])
+    run["results"]["biz-1"]["pending_actions"]
+    run["latency"]["fetch_search_console"]["p95_ms"]
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from .automation import SEOAutomation
+from .ingest import ingest
+
+# Provider each data fetch calls out to
+PROVIDERS = {
+    "traffic": "analytics",
+    "search_console": "search_console",
+    "reviews": "reviews",
+    "pending_reviews": "reviews",
+    "content": "content",
+}
+DEFAULT_PROVIDER_LIMIT = 8
+MAX_BUSINESSES = 32
+
+logger = logging.getLogger(__name__)
+
+
+def _stats(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        return ordered[min(int(p * len(ordered)), len(ordered) - 1)] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "max_ms": ordered[-1] * 1000
+    }
+
+
+class AutomationScheduler:
+    def __init__(
+        self,
+        factory: Callable[[str], SEOAutomation] = SEOAutomation,
+        limits: Optional[Dict[str, int]] = None,
+        max_businesses: int = MAX_BUSINESSES,
+        max_threads: Optional[int] = None,
+        ingest_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            factory: Builds the SEOAutomation for a business id
+            limits: Provider ("analytics", "search_console", "reviews",
+                "content") -> concurrent calls; others get DEFAULT_PROVIDER_LIMIT
+            max_businesses: Businesses in flight at once
+            max_threads: Threads for the blocking steps (defaults to enough
+                for every provider to use its full limit)
+            ingest_workers: Processes for export ingestion (defaults to one per CPU)
+        """
+        if max_businesses < 1:
+            raise ValueError("max_businesses must be at least 1")
+        self.factory = factory
+        self.limits = {provider: DEFAULT_PROVIDER_LIMIT for provider in set(PROVIDERS.values())}
+        for provider, limit in (limits or {}).items():
+            if limit < 1:
+                raise ValueError(f"Limit for {provider} must be at least 1")
+            self.limits[provider] = limit
+        self.max_businesses = max_businesses
+        self.max_threads = max_threads or sum(self.limits.values()) + max_businesses
+        self.ingest_workers = ingest_workers or os.cpu_count() or 1
+
+    def run_all(self, businesses: Iterable[Union[str, SEOAutomation]]) -> Dict:
+        """Blocking wrapper around run() for callers without an event loop."""
+        return asyncio.run(self.run(businesses))
+
+    async def run(self, businesses: Iterable[Union[str, SEOAutomation]]) -> Dict:
+        """
+        Run every business's automated tasks.
+
+        Args:
+            businesses: Business ids (built with the factory) or ready SEOAutomation objects
+
+        Returns:
+            {"results": business id -> run_automated_tasks results,
+             "latency": stage -> {count, mean_ms, p50_ms, p95_ms, max_ms},
+             "wall_s": total run time}
+        """
+        automations = [self.factory(b) if isinstance(b, str) else b for b in businesses]
+        ids = [automation.business_id for automation in automations]
+        if len(set(ids)) != len(ids):
+            raise ValueError("Each business can only be scheduled once per run")
+
+        self._providers = {provider: asyncio.Semaphore(limit) for provider, limit in self.limits.items()}
+        self._businesses = asyncio.Semaphore(self.max_businesses)
+        self._timings: Dict[str, List[float]] = {}
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            self._executor = stack.enter_context(
+                ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="seo"))
+            self._ingest_pool = None
+            if any(automation.exports for automation in automations):
+                # Never fork this process: its threads may hold locks the child would inherit
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._ingest_pool = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=self.ingest_workers, mp_context=context))
+            results = await asyncio.gather(*(self._run_business(automation) for automation in automations))
+        wall = time.perf_counter() - started
+        logger.info("Scheduler: %d businesses in %.2fs", len(automations), wall)
+        return {
+            "results": dict(zip(ids, results)),
+            "latency": {stage: _stats(samples) for stage, samples in sorted(self._timings.items())},
+            "wall_s": wall
+        }
+
+    async def _timed(self, stage: str, fn: Callable, *args, executor: Optional[Executor] = None):
+        """Run a blocking call in the pool, recording its duration under stage."""
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor or self._executor, fn, *args)
+        finally:
+            self._timings.setdefault(stage, []).append(time.perf_counter() - started)
+
+    async def _fetch(self, name: str, fn: Callable):
+        provider = PROVIDERS[name]
+        waited = time.perf_counter()
+        async with self._providers[provider]:
+            self._timings.setdefault(f"wait_{provider}", []).append(time.perf_counter() - waited)
+            return await self._timed(f"fetch_{name}", fn)
+
+    async def _site_data(self, automation: SEOAutomation) -> Dict:
+        sources = automation.SITE_DATA_SOURCES
+        keys = list(sources)
+        fetches = [self._fetch(key, getattr(automation, method)) for key, method in sources.items()]
+        if automation.exports:
+            # One process per business; its files are parsed there rather than in a nested pool
+            fetches.append(self._timed("ingest", partial(ingest, automation.exports, max_workers=1),
+                                       executor=self._ingest_pool))
+        # Like _collect_site_data, the first failure fails the analysis
+        values = await asyncio.gather(*fetches)
+        site_data = dict(zip(keys, values))
+        if automation.exports:
+            site_data.update(values[-1].site_data())
+        return site_data
+
+    async def _analysis(self, automation: SEOAutomation, results: Dict) -> None:
+        try:
+            site_data = await self._site_data(automation)
+            await self._timed("analysis", automation._run_analysis, results, site_data)
+        except Exception as e:
+            automation.logger.error(f"Error in SEO analysis: {str(e)}")
+            results['seo_analysis'] = {'error': str(e)}
+
+    async def _reviews(self, automation: SEOAutomation, results: Dict) -> None:
+        try:
+            pending = await self._fetch("pending_reviews", automation._get_pending_reviews)
+            await self._timed("reviews", automation._run_reviews, results, pending)
+        except Exception as e:
+            automation.logger.error(f"Error in review management: {str(e)}")
+            results['review_management'] = {'error': str(e)}
+
+    async def _run_business(self, automation: SEOAutomation) -> Dict:
+        async with self._businesses:
+            started = time.perf_counter()
+            automation.logger.info("Starting automated SEO tasks")
+            automation.status['last_check'] = datetime.now()
+
+            # The steps write their own keys; pending actions are gathered
+            # per step and joined in run_automated_tasks' order afterwards
+            analysis = automation._new_results()
+            costs = automation._new_results()
+            reviews = automation._new_results()
+            await asyncio.gather(
+                self._analysis(automation, analysis),
+                self._timed("cost_check", automation._run_cost_check, costs),
+                self._reviews(automation, reviews),
+            )
+
+            results = automation._new_results()
+            results['seo_analysis'] = analysis['seo_analysis']
+            results['cost_optimization'] = costs['cost_optimization']
+            results['review_management'] = reviews['review_management']
+            results['pending_actions'] = (analysis['pending_actions'] + costs['pending_actions']
+                                          + reviews['pending_actions'])
+            self._timings.setdefault("business", []).append(time.perf_counter() - started)
+            return results
@@ -0,0 +1,451 @@
+"""
+Bulk JSON-LD generation for large product and service catalogs.
+
+SchemaBatch takes a stream of schema specs, the same dicts
+add_seo_schemas() accepts ({"type": "service", "name": ..., ...}), and
+emits one @graph block per page of entities. Each entity comes out as the
+corresponding SchemaGenerator.generate_* call would produce it, minus the
+per-entity @context the graph carries once. The common types are written
+straight to JSON text rather than built as dicts and dumped. Entities of
+the same type and keys are filled into one whole-entity template, built
+once per key shape, so a block of clean text values costs a %-format per
+entity; otherwise fields are serialized one by one, with the sub-objects
+catalogs repeat on every item (provider, address, geo, offer, brand)
+serialized once and reused.
+
+    batch = SchemaBatch(page_size=500)
+    for tag in batch.script_tags(read_records("catalog.csv", schema_type="product")):
+        ...
+
+Specs are read lazily, so a catalog of any size streams through in
+constant memory. A catalog passed as a list (of at least PARALLEL_MIN_SPECS
+specs) is serialized a page block at a time in forked worker processes
+instead, which inherit the list and get only index ranges to serialize.
+"""
+
+import csv
+import json
+import logging
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain, compress, islice, repeat
+from json.encoder import encode_basestring
+from operator import itemgetter
+from typing import Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from bot_core.monitoring.tracing import traced
+
+from .schema_generator import ADDRESS_FIELDS, SchemaGenerator
+
+PAGE_SIZE = 1000
+# Distinct sub-objects kept serialized per kind
+FRAGMENT_CACHE_SIZE = 65536
+# Spec fields that hold lists in CSV input, separated by "|"
+LIST_FIELDS = frozenset(("opening_hours",))
+# Blocks mixing more type/key shapes than this are serialized per entity
+MAX_SHAPES = 16
+# Smaller catalogs are not worth forking workers for
+PARALLEL_MIN_SPECS = 10000
+
+logger = logging.getLogger(__name__)
+
+
+def _json(value) -> str:
+    """JSON text of a value, as json.dumps(ensure_ascii=False) writes it."""
+    if value.__class__ is str:
+        return encode_basestring(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _provider(name: str) -> str:
+    return '{"@type": "LocalBusiness", "name": ' + _json(name) + '}'
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _brand(name: str) -> str:
+    return '{"@type": "Brand", "name": ' + _json(name) + '}'
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _offer(price, currency: str, availability: Optional[str] = None) -> str:
+    fragment = '{"@type": "Offer", "price": ' + _json(price) + ', "priceCurrency": ' + _json(currency)
+    if availability:
+        fragment += ', "availability": ' + _json(f"https://schema.org/{availability}")
+    return fragment + '}'
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _address(*values) -> str:
+    return '{"@type": "PostalAddress"' + "".join(
+        f', "{prop}": ' + _json(value) for (prop, _), value in zip(ADDRESS_FIELDS, values) if value is not None) + '}'
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _geo(latitude, longitude) -> str:
+    return '{"@type": "GeoCoordinates", "latitude": ' + _json(latitude) + ', "longitude": ' + _json(longitude) + '}'
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _json_list(items: Tuple) -> str:
+    return json.dumps(list(items), ensure_ascii=False)
+
+
+# The per-entity strings are encoded inline (encode_basestring when the
+# value is a str) rather than through _json: a call per field is a large
+# share of an entity's cost.
+
+def _service(spec: Dict) -> str:
+    get = spec.get
+    name, description = spec["name"], spec["description"]
+    text = ('{"@type": "Service", "name": '
+            + (encode_basestring(name) if name.__class__ is str else _json(name))
+            + ', "description": '
+            + (encode_basestring(description) if description.__class__ is str else _json(description))
+            + ', "provider": ' + _provider(spec["provider"]))
+    value = get("area_served")
+    if value:
+        text += ', "areaServed": ' + (encode_basestring(value) if value.__class__ is str else _json(value))
+    value = get("price")
+    if value:
+        text += ', "offers": ' + _offer(value, get("currency", "USD"))
+    return text + '}'
+
+
+def _product(spec: Dict) -> str:
+    get = spec.get
+    name = spec["name"]
+    text = '{"@type": "Product", "name": ' + (encode_basestring(name) if name.__class__ is str else _json(name))
+    value = get("description")
+    if value:
+        text += ', "description": ' + (encode_basestring(value) if value.__class__ is str else _json(value))
+    value = get("sku")
+    if value:
+        text += ', "sku": ' + (encode_basestring(value) if value.__class__ is str else _json(value))
+    value = get("brand")
+    if value:
+        text += ', "brand": ' + _brand(value)
+    value = get("image")
+    if value:
+        text += ', "image": ' + (encode_basestring(value) if value.__class__ is str else _json(value))
+    value = get("url")
+    if value:
+        text += ', "url": ' + (encode_basestring(value) if value.__class__ is str else _json(value))
+    value = get("price")
+    if value:
+        text += ', "offers": ' + _offer(value, get("currency", "USD"), get("availability"))
+    return text + '}'
+
+
+def _local_business(spec: Dict) -> str:
+    get = spec.get
+    address, geo = spec["address"], spec["geo"]
+    parts = ['{"@type": ', _json(get("business_type", "LocalBusiness")),
+             ', "name": ', _json(spec["business_name"]),
+             ', "address": ', _address(*(address.get(key) for _, key in ADDRESS_FIELDS)),
+             ', "geo": ', _geo(geo.get("latitude"), geo.get("longitude")),
+             ', "telephone": ', _json(spec["telephone"])]
+    if get("opening_hours"):
+        parts += [', "openingHours": ', _json_list(tuple(spec["opening_hours"]))]
+    if get("image"):
+        parts += [', "image": ', _json(spec["image"])]
+    if get("price_range"):
+        parts += [', "priceRange": ', _json(spec["price_range"])]
+    parts.append('}')
+    return "".join(parts)
+
+
+# Types serialized directly; the rest go through SchemaGenerator
+FAST_PATHS: Dict[str, Callable[[Dict], str]] = {
+    "service": _service,
+    "product": _product,
+    "local_business": _local_business,
+}
+
+
+# Whole-entity templates, per type: the output after "@type" in order, as
+# (spec key, JSON text with the value as %s, spec key it depends on, text
+# when the key is missing). A key of None is literal text. Values are
+# inlined unescaped, so a block is templated only when all of them are
+# non-empty strings that JSON would write as they are.
+TEMPLATE_FIELDS: Dict[str, Tuple[Tuple, ...]] = {
+    "service": (
+        ("name", ', "name": "%s"', None, None),
+        ("description", ', "description": "%s"', None, None),
+        ("provider", ', "provider": {"@type": "LocalBusiness", "name": "%s"}', None, None),
+        ("area_served", ', "areaServed": "%s"', None, ""),
+        ("price", ', "offers": {"@type": "Offer", "price": "%s"', None, ""),
+        ("currency", ', "priceCurrency": "%s"', "price", ', "priceCurrency": "USD"'),
+        (None, '}', "price", None),
+    ),
+    "product": (
+        ("name", ', "name": "%s"', None, None),
+        ("description", ', "description": "%s"', None, ""),
+        ("sku", ', "sku": "%s"', None, ""),
+        ("brand", ', "brand": {"@type": "Brand", "name": "%s"}', None, ""),
+        ("image", ', "image": "%s"', None, ""),
+        ("url", ', "url": "%s"', None, ""),
+        ("price", ', "offers": {"@type": "Offer", "price": "%s"', None, ""),
+        ("currency", ', "priceCurrency": "%s"', "price", ', "priceCurrency": "USD"'),
+        ("availability", ', "availability": "https://schema.org/%s"', "price", ""),
+        (None, '}', "price", None),
+    ),
+}
+TEMPLATE_TYPES = {"service": "Service", "product": "Product"}
+# What encode_basestring escapes (multi-byte UTF-8 never contains these)
+ESCAPED_BYTES = bytes(range(0x20)) + b'"\\'
+
+
+@lru_cache(maxsize=1024)
+def _entity_template(schema_type: str, keys: Tuple[str, ...]) -> Optional[Tuple[str, Callable]]:
+    """Template and row getter for specs of a type with these keys (None if a required key is missing)."""
+    fields = TEMPLATE_FIELDS.get(schema_type)
+    if fields is None:
+        return None
+    present = set(keys)
+    parts = ['{"@type": "' + TEMPLATE_TYPES[schema_type] + '"']
+    used = []
+    for key, text, depends, missing in fields:
+        if depends is not None and depends not in present:
+            continue
+        if key is None:
+            parts.append(text)
+        elif key in present:
+            parts.append(text)
+            used.append(key)
+        elif missing is None:
+            return None
+        else:
+            parts.append(missing)
+    parts.append('}')
+    getter = itemgetter(*used) if len(used) > 1 else (lambda spec, key=used[0]: (spec[key],))
+    return "".join(parts), getter
+
+
+def _templated(schema_type: str, keys: Tuple[str, ...], specs: List[Dict]) -> Optional[List[str]]:
+    """JSON text of specs sharing a type and keys, or None if they can't be templated."""
+    shape = _entity_template(schema_type, keys)
+    if shape is None:
+        return None
+    template, getter = shape
+    rows = list(map(getter, specs))
+    values = list(chain.from_iterable(rows))
+    # Falsy values are left out and other types need json.dumps
+    if not all(values) or set(map(type, values)) != {str}:
+        return None
+    # One pass over all the text for characters JSON escapes
+    try:
+        text = "".join(values).encode()
+    except UnicodeEncodeError:
+        return None
+    if len(text.translate(None, ESCAPED_BYTES)) != len(text):
+        return None
+    return list(map(template.__mod__, rows))
+
+
+# Set in each worker process: the batch and the catalog list it serializes
+_worker_state: Optional[Tuple["SchemaBatch", Sequence[Dict]]] = None
+
+
+def _init_worker(batch: "SchemaBatch", specs: Sequence[Dict]) -> None:
+    global _worker_state
+    _worker_state = (batch, specs)
+
+
+def _graph_range(start: int, stop: int) -> str:
+    batch, specs = _worker_state
+    return batch._graph(batch.entities(specs[start:stop]))
+
+
+class SchemaBatch:
+    def __init__(
+        self,
+        generator: Optional[SchemaGenerator] = None,
+        page_size: int = PAGE_SIZE,
+        page_key: Optional[Callable[[Dict], Hashable]] = None,
+        max_workers: Optional[int] = None
+    ):
+        """
+        Args:
+            generator: Used for schema types without a direct serializer
+            page_size: Maximum entities per @graph block
+            page_key: Starts a new block whenever its value changes between
+                consecutive specs (e.g. the page a product is listed on)
+            max_workers: Worker processes for catalogs passed as a list
+                (defaults to one per CPU; 1 serializes in this process)
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        self.generator = generator or SchemaGenerator()
+        self.page_size = page_size
+        self.page_key = page_key
+        self.max_workers = max_workers
+        self.context = _json(self.generator.base_schema["@context"])
+
+    def entity(self, spec: Dict) -> str:
+        """JSON text of one entity (without @context)."""
+        schema_type = spec.get("type")
+        fast = FAST_PATHS.get(schema_type)
+        if fast is not None:
+            try:
+                return fast(spec)
+            except KeyError as e:
+                raise ValueError(f"{schema_type} spec is missing {e.args[0]}") from None
+        make = getattr(self.generator, f"generate_{schema_type}", None)
+        if make is None:
+            raise ValueError(f"Unknown schema type: {schema_type}")
+        schema = make(**{k: v for k, v in spec.items() if k != "type"})
+        schema.pop("@context", None)
+        return json.dumps(schema, ensure_ascii=False)
+
+    def entities(self, specs: List[Dict]) -> List[str]:
+        """JSON text of each entity, in order; specs sharing a type and keys are templated together."""
+        shapes = list(zip(map(dict.get, specs, repeat("type")), map(tuple, specs)))
+        distinct = set(shapes)
+        if len(distinct) > MAX_SHAPES:
+            return list(map(self.entity, specs))
+        entities: List[str] = [""] * len(specs)
+        for shape in distinct:
+            mask = list(map(shape.__eq__, shapes))
+            indexes = list(compress(range(len(specs)), mask))
+            group = list(compress(specs, mask))
+            texts = _templated(*shape, group) or map(self.entity, group)
+            deque(map(entities.__setitem__, indexes, texts), maxlen=0)
+        return entities
+
+    def _blocks(self, specs: Iterable[Dict]) -> Iterator[List[Dict]]:
+        if self.page_key is None:
+            specs = iter(specs)
+            while True:
+                block = list(islice(specs, self.page_size))
+                if not block:
+                    return
+                yield block
+        block: List[Dict] = []
+        current = None
+        for spec in specs:
+            if block:
+                key = self.page_key(spec)
+                if len(block) >= self.page_size or key != current:
+                    yield block
+                    block = []
+                current = key
+            else:
+                current = self.page_key(spec)
+            block.append(spec)
+        if block:
+            yield block
+
+    def _graph(self, entities: Iterable[str]) -> str:
+        return '{"@context": ' + self.context + ', "@graph": [' + ", ".join(entities) + ']}'
+
+    def _parallel_graphs(self, specs: Sequence[Dict], workers: int) -> Iterator[str]:
+        """graphs() for a list, with page blocks serialized in forked workers."""
+        context = multiprocessing.get_context("fork")
+        # Forked workers inherit the batch and the list; a task is an index range
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(self, specs)) as pool:
+            pending = deque()
+            start = 0
+            for block in self._blocks(specs):
+                pending.append(pool.submit(_graph_range, start, start + len(block)))
+                start += len(block)
+                # Bounded so a slow consumer doesn't hold every graph in memory
+                if len(pending) >= workers * 4:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def graphs(self, specs: Iterable[Dict]) -> Iterator[str]:
+        """Yield one JSON-LD document with an @graph per page of entities."""
+        if isinstance(specs, (list, tuple)) and len(specs) >= PARALLEL_MIN_SPECS:
+            workers = min(self.max_workers or os.cpu_count() or 1, -(-len(specs) // self.page_size))
+            if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+                yield from self._parallel_graphs(specs, workers)
+                return
+        for block in self._blocks(specs):
+            yield self._graph(self.entities(block))
+
+    def script_tags(self, specs: Iterable[Dict]) -> Iterator[str]:
+        """Yield a <script type="application/ld+json"> tag per page of entities."""
+        for graph in self.graphs(specs):
+            # "</" would end the script element early; "<\/" is the same JSON string
+            graph = graph.replace("</", "<\\/")
+            yield f'<script type="application/ld+json">{graph}</script>'
+
+    @traced()
+    def write(self, specs: Iterable[Dict], out_dir: str, prefix: str = "graph") -> Dict:
+        """
+        Write each page's script tag to out_dir/<prefix>-<n>.html.
+
+        Returns:
+            Report with the pages and entities written
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        report = {"pages": 0, "entities": 0, "bytes": 0}
+
+        def counted(items):
+            for spec in items:
+                report["entities"] += 1
+                yield spec
+
+        for tag in self.script_tags(counted(specs)):
+            path = os.path.join(out_dir, f"{prefix}-{report['pages'] + 1:05d}.html")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(tag)
+            report["pages"] += 1
+            report["bytes"] += len(tag)
+        logger.info("Schema batch: %d entities in %d pages", report["entities"], report["pages"])
+        return report
+
+
+def _nest(row: Dict[str, str]) -> Dict:
+    """Turn CSV columns like address.city into nested dicts, dropping empty cells."""
+    spec: Dict = {}
+    for column, value in row.items():
+        if column is None or value is None or value == "":
+            continue
+        *parents, field = column.split(".")
+        target = spec
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        if field in LIST_FIELDS:
+            value = [item.strip() for item in value.split("|")]
+        elif parents == ["geo"]:
+            value = float(value)
+        target[field] = value
+    return spec
+
+
+def read_records(path: str, schema_type: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Stream schema specs from a .jsonl or .csv file.
+
+    CSV columns are spec fields, with dotted names for nested ones
+    (address.city, geo.latitude) and "|" between the items of list fields.
+    Specs without a type get schema_type.
+    """
+    if path.endswith(".csv"):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                spec = _nest(row)
+                if schema_type:
+                    spec.setdefault("type", schema_type)
+                yield spec
+    elif path.endswith((".jsonl", ".ndjson")):
+        with open(path, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    spec = json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{number}: invalid JSON: {e}") from None
+                if schema_type:
+                    spec.setdefault("type", schema_type)
+                yield spec
+    else:
+        raise ValueError(f"Unsupported catalog format: {path} (expected .csv or .jsonl)")
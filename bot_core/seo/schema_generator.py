@@ -7,6 +7,17 @@ import json
 from typing import Dict, List, Optional
 from datetime import datetime
 
+from .schema_validator import default_validator
+
+# PostalAddress property -> address dict key; missing parts are left out
+ADDRESS_FIELDS = (
+    ("streetAddress", "street"),
+    ("addressLocality", "city"),
+    ("addressRegion", "region"),
+    ("postalCode", "postal_code"),
+    ("addressCountry", "country")
+)
+
 class SchemaGenerator:
     def __init__(self):
         self.base_schema = {
@@ -31,11 +42,11 @@ class SchemaGenerator:
             "name": business_name,
             "address": {
                 "@type": "PostalAddress",
-                "streetAddress": address.get("street"),
-                "addressLocality": address.get("city"),
-                "addressRegion": address.get("region"),
-                "postalCode": address.get("postal_code"),
-                "addressCountry": address.get("country")
+                **{
+                    prop: address[key]
+                    for prop, key in ADDRESS_FIELDS
+                    if address.get(key) is not None
+                }
             },
             "geo": {
                 "@type": "GeoCoordinates",
@@ -46,7 +57,7 @@ class SchemaGenerator:
         }
 
         if opening_hours:
-            schema["openingHoursSpecification"] = opening_hours
+            schema["openingHours"] = opening_hours
         if image:
             schema["image"] = image
         if price_range:
@@ -86,6 +97,49 @@ class SchemaGenerator:
 
         return schema
 
+    def generate_product(
+        self,
+        name: str,
+        description: Optional[str] = None,
+        sku: Optional[str] = None,
+        brand: Optional[str] = None,
+        image: Optional[str] = None,
+        url: Optional[str] = None,
+        price: Optional[str] = None,
+        currency: str = "USD",
+        availability: Optional[str] = None
+    ) -> dict:
+        """Generate Product schema markup (availability is e.g. "InStock")."""
+        schema = {
+            **self.base_schema,
+            "@type": "Product",
+            "name": name
+        }
+
+        if description:
+            schema["description"] = description
+        if sku:
+            schema["sku"] = sku
+        if brand:
+            schema["brand"] = {
+                "@type": "Brand",
+                "name": brand
+            }
+        if image:
+            schema["image"] = image
+        if url:
+            schema["url"] = url
+        if price:
+            schema["offers"] = {
+                "@type": "Offer",
+                "price": price,
+                "priceCurrency": currency
+            }
+            if availability:
+                schema["offers"]["availability"] = f"https://schema.org/{availability}"
+
+        return schema
+
     def generate_faq(self, questions: List[Dict[str, str]]) -> dict:
         """Generate FAQ schema markup."""
         schema = {
@@ -132,15 +186,5 @@ class SchemaGenerator:
         return f'<script type="application/ld+json">{json.dumps(schema, ensure_ascii=False)}</script>'
 
     def validate_schema(self, schema: dict) -> bool:
-        """Basic schema validation."""
-        required_fields = {
-            "LocalBusiness": ["name", "address", "telephone"],
-            "Service": ["name", "description", "provider"],
-            "FAQPage": ["mainEntity"],
-        }
-
-        schema_type = schema.get("@type")
-        if not schema_type or schema_type not in required_fields:
-            return False
-
-        return all(field in schema for field in required_fields[schema_type]) 
\ No newline at end of file
+        """Check schema markup against the schema.org vocabulary (see schema_validator)."""
+        return default_validator().is_valid(schema)
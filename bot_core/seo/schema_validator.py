@@ -0,0 +1,517 @@
+"""
+Schema.org validator compiled from a snapshot of the vocabulary.
+
+The vocabulary (data/schemaorg.jsonld, in the format of schema.org's own
+schemaorg-current-https.jsonld release file, which can be dropped in
+instead) is compiled once into per-type tables: each type's ancestors and
+every property it accepts, inherited ones included, with their expected
+value types. The tables are cached on disk keyed by the vocabulary's hash,
+and turned into one checker function per type the first time that type is
+seen. Catalog markup repeats a handful of key sets, so each checker also
+remembers the key sets it has passed: for those, the unknown-property and
+required-property checks are already done and the text values need only
+a type test, leaving the walk for nested objects and typed values.
+
+    validator = SchemaValidator()
+    for error in validator.validate(schema):
+        print(error["path"], error["message"])
+
+Besides the vocabulary's value types, entities are checked against the
+properties rich results need (REQUIRED for top-level entities,
+COMPONENT_REQUIRED wherever the type appears).
+
+The bundled snapshot is a subset of schema.org: the types and properties
+this project emits, plus their hierarchy. A type or property missing from
+it may still be valid schema.org, so by default those are reported as
+warnings ({"path", "message", "severity": "warning"}), the entity's
+nested typed objects are still checked, and only the other findings count
+as errors. With the complete vocabulary, pass strict=True to make them
+errors.
+
+    warnings = []
+    errors = validator.validate(schema, warnings=warnings)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bot_core.build.fsutil import atomic_write_json
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+VOCABULARY_PATH = os.path.join(DATA_DIR, "schemaorg.jsonld")
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "websitebuilder", "schemaorg"
+)
+# Bump when the compiled table layout changes
+COMPILED_VERSION = 1
+
+CONTEXTS = frozenset(("https://schema.org", "https://schema.org/", "http://schema.org", "http://schema.org/"))
+_PREFIXES = ("https://schema.org/", "http://schema.org/", "schema:")
+
+# Alternative sets of properties a top-level entity needs for a rich result;
+# a type inherits the rule of its nearest ancestor that has one
+REQUIRED: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "LocalBusiness": (("name", "address", "telephone"), ("name", "aggregateRating"), ("name", "review")),
+    "Organization": (("name",),),
+    "Service": (("name", "description", "provider"), ("name", "aggregateRating")),
+    "Product": (("name",),),
+    "FAQPage": (("mainEntity",),),
+    "Article": (("headline",),),
+    "Event": (("name", "startDate", "location"),),
+    "BreadcrumbList": (("itemListElement",),),
+}
+# Required wherever the type appears, nested or not
+COMPONENT_REQUIRED: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "Question": (("name", "acceptedAnswer"),),
+    "Answer": (("text",),),
+    "Rating": (("ratingValue",),),
+    "AggregateRating": (("ratingValue", "reviewCount"), ("ratingValue", "ratingCount")),
+    "Offer": (("price",),),
+    "AggregateOffer": (("lowPrice",),),
+    "GeoCoordinates": (("latitude", "longitude"),),
+    "ListItem": (("position",),),
+    "Review": (("author",),),
+}
+
+# Value types checked as JSON scalars, by the base data type they derive from
+DATATYPES = ("Text", "URL", "Number", "Integer", "Float", "Boolean", "Date", "DateTime", "Time")
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}\Z")
+_DATETIME = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?\Z")
+_TIME = re.compile(r"\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?\Z")
+_NUMBER = re.compile(r"[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?\Z")
+_INTEGER = re.compile(r"[+-]?\d+\Z")
+_STR = frozenset((str,))
+# Distinct key sets remembered per type
+SHAPE_CACHE_SIZE = 1024
+
+logger = logging.getLogger(__name__)
+
+# checker(value, path, errors) appends {"path", "message"} dicts to errors
+Checker = Callable[[object, str, List[Dict]], None]
+
+
+def _name(iri: str) -> str:
+    for prefix in _PREFIXES:
+        if iri.startswith(prefix):
+            return iri[len(prefix):]
+    return iri
+
+
+def _ids(value) -> List[str]:
+    if value is None:
+        return []
+    items = value if isinstance(value, list) else [value]
+    return [_name(item["@id"] if isinstance(item, dict) else item) for item in items]
+
+
+def _closure(start: str, edges: Dict[str, List[str]]) -> List[str]:
+    """start and everything reachable from it, nearest first."""
+    seen, order, queue = {start}, [start], deque([start])
+    while queue:
+        for nxt in edges.get(queue.popleft(), ()):
+            if nxt not in seen:
+                seen.add(nxt)
+                order.append(nxt)
+                queue.append(nxt)
+    return order
+
+
+def compile_vocabulary(vocabulary: Dict) -> Dict:
+    """
+    Compile a schema.org JSON-LD vocabulary into validation tables:
+    {"types": {type: {"ancestors", "properties": {name: [range types]}}},
+     "datatypes": {type: base data type}, "enumerations": {type: [members]}}.
+    """
+    nodes = vocabulary.get("@graph", [])
+    parents: Dict[str, List[str]] = {}
+    properties = []
+    typed_members = []
+    for node in nodes:
+        node_types = _ids(node.get("@type"))
+        name = _name(node["@id"])
+        if "rdfs:Class" in node_types:
+            parents[name] = _ids(node.get("rdfs:subClassOf"))
+        elif "rdf:Property" in node_types:
+            properties.append((name, _ids(node.get("schema:domainIncludes")),
+                               _ids(node.get("schema:rangeIncludes"))))
+        else:
+            typed_members.append((name, node_types))
+
+    children: Dict[str, List[str]] = {}
+    for name, supers in parents.items():
+        for parent in supers:
+            children.setdefault(parent, []).append(name)
+    ancestors = {name: _closure(name, parents) for name in parents}
+    descendants = {name: _closure(name, children) for name in parents}
+
+    datatypes = {}
+    for name, chain in ancestors.items():
+        base = next((a for a in chain if a in DATATYPES), None)
+        if base is not None:
+            datatypes[name] = name if name in DATATYPES else base
+
+    enumerations: Dict[str, List[str]] = {}
+    for member, member_types in typed_members:
+        for member_type in member_types:
+            if "Enumeration" in ancestors.get(member_type, ()):
+                enumerations.setdefault(member_type, []).append(member)
+
+    types = {name: {"ancestors": chain, "properties": {}} for name, chain in ancestors.items()
+             if name not in datatypes}
+    for prop, domains, ranges in properties:
+        for domain in domains:
+            for name in descendants.get(domain, ()):
+                if name in types:
+                    accepted = types[name]["properties"].setdefault(prop, [])
+                    accepted.extend(r for r in ranges if r not in accepted)
+    return {"types": types, "datatypes": datatypes, "enumerations": enumerations}
+
+
+class SchemaValidator:
+    def __init__(
+        self,
+        vocabulary_path: str = VOCABULARY_PATH,
+        cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+        strict: bool = False
+    ):
+        """
+        Args:
+            vocabulary_path: schema.org vocabulary in JSON-LD (the bundled snapshot by default)
+            cache_dir: Where compiled tables are cached; None to compile in memory only
+            strict: Report types and properties missing from the vocabulary as
+                errors rather than warnings; for the complete vocabulary only
+        """
+        self.vocabulary_path = vocabulary_path
+        self.cache_dir = cache_dir
+        self.strict = strict
+        self.tables = self._load()
+        self.types = self.tables["types"]
+        self.datatypes = self.tables["datatypes"]
+        self.enumerations = {name: frozenset(members) for name, members in self.tables["enumerations"].items()}
+        self._descendants: Dict[str, frozenset] = {}
+        self._checkers: Dict[Tuple, Checker] = {}
+        self._ranges: Dict[Tuple, Callable] = {}
+        self._names: Dict[str, Tuple[str, ...]] = {}
+
+    def _load(self) -> Dict:
+        with open(self.vocabulary_path, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()[:16]
+        cache_path = None
+        if self.cache_dir:
+            cache_path = os.path.join(self.cache_dir, f"compiled-{digest}-v{COMPILED_VERSION}.json")
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (FileNotFoundError, ValueError):
+                pass
+        tables = compile_vocabulary(json.loads(raw))
+        if cache_path:
+            try:
+                atomic_write_json(cache_path, tables, indent=None)
+            except OSError as e:
+                logger.warning("Schema validator: could not cache compiled vocabulary: %s", e)
+        return tables
+
+    def descendants(self, type_name: str) -> frozenset:
+        """A type and all its subtypes."""
+        found = self._descendants.get(type_name)
+        if found is None:
+            found = frozenset(name for name, table in self.types.items() if type_name in table["ancestors"])
+            self._descendants[type_name] = found
+        return found
+
+    def _rule(self, type_name: str, table: Dict) -> Tuple[Tuple[str, ...], ...]:
+        for ancestor in self.types[type_name]["ancestors"]:
+            if ancestor in table:
+                return table[ancestor]
+        return ()
+
+    def _unknown(self, path: str, message: str, errors: List[Dict]) -> None:
+        """Report a type or property the vocabulary does not have."""
+        if self.strict:
+            errors.append({"path": path, "message": message})
+        else:
+            errors.append({"path": path, "message": message, "severity": "warning"})
+
+    def _check_nested(self, value, path: str, errors: List[Dict]) -> None:
+        """Check the typed objects in a value whose expected types are not known."""
+        if type(value) is list:
+            for index, item in enumerate(value):
+                self._check_nested(item, f"{path}[{index}]", errors)
+        elif type(value) is dict:
+            if "@type" in value:
+                self.validate_entity(value, path, top_level=False, errors=errors)
+            else:
+                for prop, item in value.items():
+                    if prop[0] != "@":
+                        self._check_nested(item, f"{path}.{prop}", errors)
+
+    def _checker(self, type_names: Tuple[str, ...], top_level: bool) -> Checker:
+        """The compiled checker for an entity of the given type(s)."""
+        key = (type_names, top_level)
+        checker = self._checkers.get(key)
+        if checker is not None:
+            return checker
+
+        accepted: Dict[str, List[str]] = {}
+        for type_name in type_names:
+            for prop, ranges in self.types[type_name]["properties"].items():
+                accepted.setdefault(prop, []).extend(ranges)
+        ranges_for = {prop: self._range_checker(tuple(sorted(set(ranges)))) for prop, ranges in accepted.items()}
+        # Any string is a valid value of these
+        text_props = frozenset(prop for prop, ranges in accepted.items() if {"Text", "URL"} & set(ranges))
+        rules = [self._rule(t, COMPONENT_REQUIRED) for t in type_names]
+        if top_level:
+            rules += [self._rule(t, REQUIRED) for t in type_names]
+        rules = [tuple(frozenset(option) for option in rule) for rule in rules if rule]
+        label = "/".join(type_names)
+        validator = self
+        # Key tuple -> (text properties, (property, checker) for the rest),
+        # or None for key sets with unknown or missing properties
+        shapes: Dict[Tuple[str, ...], Optional[Tuple]] = {}
+
+        def shape(keys):
+            known = [k for k in keys if k[0] != "@" and ":" not in k]
+            if any(k not in ranges_for for k in known):
+                return None
+            if any(not any(option <= set(keys) for option in alternatives) for alternatives in rules):
+                return None
+            return (tuple(k for k in known if k in text_props),
+                    tuple((k, ranges_for[k]) for k in known if k not in text_props))
+
+        def full(node, path, errors):
+            get = ranges_for.get
+            for prop, value in node.items():
+                check_value = get(prop)
+                if check_value is None:
+                    if prop[0] != "@" and ":" not in prop:
+                        validator._unknown(f"{path}.{prop}", f"{prop} is not a property of {label}", errors)
+                        if not validator.strict:
+                            validator._check_nested(value, f"{path}.{prop}", errors)
+                elif type(value) is list:
+                    for index, item in enumerate(value):
+                        check_value(item, path, f"{prop}[{index}]", errors)
+                else:
+                    check_value(value, path, prop, errors)
+            keys = node.keys()
+            for alternatives in rules:
+                if not any(keys >= option for option in alternatives):
+                    missing = sorted(min(alternatives, key=lambda option: len(option - keys)) - keys)
+                    noun = "property" if len(missing) == 1 else "properties"
+                    errors.append({"path": path, "message": f"{label} is missing required {noun} {', '.join(missing)}"})
+
+        def check(node, path, errors):
+            keys = tuple(node)
+            known = shapes.get(keys, shapes)
+            if known is shapes:
+                known = shape(keys)
+                if len(shapes) < SHAPE_CACHE_SIZE:
+                    shapes[keys] = known
+            # The common case: a key set seen before, with every text value a string
+            if known is None or not _STR.issuperset(map(type, map(node.__getitem__, known[0]))):
+                full(node, path, errors)
+                return
+            for prop, check_value in known[1]:
+                value = node[prop]
+                if type(value) is list:
+                    for index, item in enumerate(value):
+                        check_value(item, path, f"{prop}[{index}]", errors)
+                else:
+                    check_value(value, path, prop, errors)
+
+        self._checkers[key] = check
+        return check
+
+    def _range_checker(self, ranges: Tuple[str, ...]) -> Callable:
+        """
+        A checker for one value of a property with the given expected types,
+        called as check(value, entity path, property, errors).
+        """
+        checker = self._ranges.get(ranges)
+        if checker is not None:
+            return checker
+
+        kinds = {self.datatypes[r] for r in ranges if r in self.datatypes}
+        members = frozenset().union(*(self.enumerations.get(r, ()) for r in ranges))
+        classes = [r for r in ranges if r in self.types and r not in self.enumerations]
+        allowed = frozenset().union(*(self.descendants(r) for r in classes)) if classes else frozenset()
+        implicit = (classes[0],) if len(classes) == 1 else None
+        text = bool(kinds & {"Text", "URL"})
+        expected = " or ".join(ranges)
+        patterns = [p for kind, p in (("Date", _DATE), ("DateTime", _DATETIME), ("Time", _TIME),
+                                      ("Number", _NUMBER), ("Float", _NUMBER), ("Integer", _INTEGER))
+                    if kind in kinds]
+        numbers = bool(kinds & {"Number", "Float"})
+        integers = numbers or "Integer" in kinds
+        booleans = "Boolean" in kinds
+        validator = self
+        # @type string -> checker, for nested entities of an accepted type
+        nested: Dict[str, Checker] = {}
+
+        def check(value, parent, prop, errors):
+            kind = type(value)
+            if kind is str:
+                if text or any(p.match(value) for p in patterns) or (members and _name(value) in members):
+                    return
+                if booleans and value in ("true", "false"):
+                    return
+                errors.append({"path": f"{parent}.{prop}", "message": f"expected {expected}, got text {value[:40]!r}"})
+            elif kind is dict:
+                path = f"{parent}.{prop}"
+                nested_check = nested.get(value.get("@type")) if nested else None
+                if nested_check is not None:
+                    nested_check(value, path, errors)
+                    return
+                if members and _name(str(value.get("@id", ""))) in members:
+                    return
+                if not allowed:
+                    errors.append({"path": path, "message": f"expected {expected}, got an object"})
+                    return
+                node_types = value.get("@type")
+                if node_types is None:
+                    if "@id" in value and len(value) == 1:
+                        return  # a reference to a node defined elsewhere
+                    if implicit is None:
+                        errors.append({"path": path, "message": f"object without @type (expected {expected})"})
+                        return
+                    node_types = implicit
+                else:
+                    node_types = validator._type_names(node_types, path, errors)
+                    if node_types is None:
+                        if not validator.strict:
+                            validator._check_nested(value, path, errors)
+                        return
+                if not any(t in allowed for t in node_types):
+                    errors.append({"path": path, "message": f"{'/'.join(node_types)} is not a valid {expected}"})
+                    return
+                nested_check = validator._checker(node_types, False)
+                if type(value.get("@type")) is str and not members and len(nested) < SHAPE_CACHE_SIZE:
+                    nested[value["@type"]] = nested_check
+                nested_check(value, path, errors)
+            elif kind is int:
+                if not integers:
+                    errors.append({"path": f"{parent}.{prop}", "message": f"expected {expected}, got a number"})
+            elif kind is float:
+                if not numbers:
+                    errors.append({"path": f"{parent}.{prop}", "message": f"expected {expected}, got a number"})
+            elif kind is bool:
+                if not booleans:
+                    errors.append({"path": f"{parent}.{prop}", "message": f"expected {expected}, got a boolean"})
+            elif value is None:
+                errors.append({"path": f"{parent}.{prop}", "message": "value is null"})
+            else:
+                errors.append({"path": f"{parent}.{prop}", "message": f"expected {expected}, got {kind.__name__}"})
+
+        self._ranges[ranges] = check
+        return check
+
+    def _type_names(self, value, path: str, errors: List[Dict]) -> Optional[Tuple[str, ...]]:
+        if type(value) is str:
+            names = self._names.get(value)
+            if names is not None:
+                return names
+            names = (_name(value),)
+        elif isinstance(value, list) and all(isinstance(v, str) for v in value):
+            names = tuple(_name(v) for v in value)
+        else:
+            names = ()
+        if not names:
+            errors.append({"path": path, "message": "@type must be a type name or a list of them"})
+            return None
+        unknown = [name for name in names if name not in self.types]
+        if unknown:
+            self._unknown(path + ".@type", f"unknown type {', '.join(unknown)}", errors)
+            # Outside strict mode an entity is checked as the types that are known
+            known = tuple(name for name in names if name in self.types)
+            return known if known and not self.strict else None
+        if type(value) is str:
+            self._names[value] = names
+        return names
+
+    def validate_entity(self, entity: Dict, path: str = "$", top_level: bool = True,
+                        errors: Optional[List[Dict]] = None) -> List[Dict]:
+        """Findings for one entity (an object with an @type), warnings included."""
+        errors = [] if errors is None else errors
+        if not isinstance(entity, dict):
+            errors.append({"path": path, "message": "entity is not an object"})
+            return errors
+        if "@type" not in entity:
+            errors.append({"path": path, "message": "entity without @type"})
+            return errors
+        names = self._type_names(entity["@type"], path, errors)
+        if names is not None:
+            self._checker(names, top_level)(entity, path, errors)
+        elif not self.strict:
+            for prop, value in entity.items():
+                if prop[0] != "@":
+                    self._check_nested(value, f"{path}.{prop}", errors)
+        return errors
+
+    def validate(self, document, warnings: Optional[List[Dict]] = None) -> List[Dict]:
+        """
+        Errors for a JSON-LD document: an entity, a list of entities or an
+        object with an @graph. Each error is {"path": JSON path, "message"}.
+
+        Args:
+            document: The parsed JSON-LD
+            warnings: Collects the warnings (see the module docstring), if given
+        """
+        errors: List[Dict] = []
+        if isinstance(document, dict) and "@graph" in document:
+            self._check_context(document, "$", errors)
+            graph = document["@graph"]
+            if not isinstance(graph, list):
+                errors.append({"path": "$.@graph", "message": "@graph must be a list"})
+                return errors
+            for index, entity in enumerate(graph):
+                self.validate_entity(entity, f"$.@graph[{index}]", errors=errors)
+        elif isinstance(document, list):
+            for index, entity in enumerate(document):
+                path = f"$[{index}]"
+                if isinstance(entity, dict):
+                    self._check_context(entity, path, errors)
+                self.validate_entity(entity, path, errors=errors)
+        else:
+            if isinstance(document, dict):
+                self._check_context(document, "$", errors)
+            self.validate_entity(document, errors=errors)
+        return self._split(errors, warnings)
+
+    @staticmethod
+    def _split(found: List[Dict], warnings: Optional[List[Dict]]) -> List[Dict]:
+        """The errors among found, moving the warnings to warnings."""
+        errors = [finding for finding in found if "severity" not in finding]
+        if warnings is not None and len(errors) < len(found):
+            warnings.extend(finding for finding in found if "severity" in finding)
+        return errors
+
+    def _check_context(self, node: Dict, path: str, errors: List[Dict]) -> None:
+        context = node.get("@context")
+        if context is None:
+            errors.append({"path": path, "message": "missing @context"})
+        elif isinstance(context, dict):
+            if context.get("@vocab") not in CONTEXTS:
+                errors.append({"path": path + ".@context", "message": "@context does not use the schema.org vocabulary"})
+        elif context not in CONTEXTS:
+            errors.append({"path": path + ".@context", "message": f"unexpected @context {context!r}"})
+
+    def is_valid(self, document) -> bool:
+        return not self.validate(document)
+
+
+@lru_cache(maxsize=1)
+def default_validator() -> SchemaValidator:
+    """The process-wide validator for the bundled vocabulary."""
+    return SchemaValidator()
+
+
+def format_errors(errors: List[Dict]) -> str:
+    return "; ".join(f"{error['path']}: {error['message']}" for error in errors)
@@ -8,10 +8,34 @@ from typing import Dict, List, Optional
 import json
 import logging
 
+from bot_core.monitoring.metrics_store import MetricsStore
+
+from . import columnar
+
+# Page lists at least this long are analyzed as NumPy columns when NumPy is installed
+COLUMNAR_MIN_ROWS = 5000
+
 class SEOSentinel:
-    def __init__(self, config_path: str = "config/seo_thresholds.json"):
+    def __init__(self, config_path: str = "config/seo_thresholds.json", columnar_mode: Optional[bool] = None,
+                 metrics: Optional[MetricsStore] = None, site: Optional[str] = None):
+        """
+        Args:
+            config_path: JSON file overriding the default thresholds
+            columnar_mode: Analyze CTR and content pages as NumPy columns (see
+                seo/columnar.py); None uses them for long page lists when
+                NumPy is installed
+            metrics: Traffic history; with site, drops are judged against
+                the same weekday of previous weeks instead of current/previous
+            site: The site's name in the metrics store
+        """
+        if columnar_mode and not columnar.available():
+            raise ValueError("columnar_mode requires numpy")
+        self.columnar_mode = columnar_mode
+        self.metrics = metrics
+        self.site = site
         self.thresholds = {
             'traffic_drop': -15,  # Alert if >15% drop
+            'traffic_anomaly_z': 3.0,  # Alert below the weekday baseline by this many stdevs
             'ctr': {'min': 2.5, 'max': 8},
             'reviews': {'response_time': 4},  # hours
             'content': {
@@ -82,6 +106,12 @@ class SEOSentinel:
 
     def _check_traffic_drop(self, traffic_data: Dict) -> bool:
         """Check for significant traffic drops"""
+        if self.metrics is not None and self.site:
+            anomaly = self.metrics.anomaly(self.site, 'traffic', threshold=self.thresholds['traffic_anomaly_z'])
+            # Without a few weeks of history, fall back to current vs. previous
+            if anomaly is not None:
+                return anomaly['anomalous'] and anomaly['z'] < 0
+
         if not traffic_data:
             return False
             
@@ -94,11 +124,24 @@ class SEOSentinel:
         change_percent = ((current - previous) / previous) * 100
         return change_percent <= self.thresholds['traffic_drop']
 
+    def _columnar(self, pages) -> bool:
+        if isinstance(pages, columnar.PageColumns):
+            return True
+        if self.columnar_mode is None:
+            return columnar.available() and len(pages) >= COLUMNAR_MIN_ROWS
+        return self.columnar_mode
+
     def _analyze_ctr(self, search_data: Dict) -> List[str]:
         """Analyze Click-Through Rate issues"""
+        pages = search_data.get('pages', [])
+        if self._columnar(pages):
+            if not isinstance(pages, columnar.PageColumns):
+                pages = columnar.PageColumns.from_rows(pages, columnar.CTR_FIELDS)
+            return columnar.ctr_issues(pages, self.thresholds['ctr'])
+
         issues = []
         
-        for page in search_data.get('pages', []):
+        for page in pages:
             ctr = page.get('ctr', 0)
             if ctr < self.thresholds['ctr']['min']:
                 issues.append(f"Low CTR on {page['url']}: {ctr}%")
@@ -121,9 +164,15 @@ class SEOSentinel:
 
     def _analyze_content(self, content_data: Dict) -> List[str]:
         """Analyze content for SEO issues"""
+        pages = content_data.get('pages', [])
+        if self._columnar(pages):
+            if not isinstance(pages, columnar.PageColumns):
+                pages = columnar.PageColumns.from_rows(pages, columnar.CONTENT_FIELDS, columnar.CONTENT_DATES)
+            return columnar.content_issues(pages, self.thresholds['content'])
+
         issues = []
         
-        for page in content_data.get('pages', []):
+        for page in pages:
             # Check content freshness
             last_updated = datetime.fromisoformat(page.get('last_updated', '2000-01-01'))
             if (datetime.now() - last_updated).days > self.thresholds['content']['freshness']:
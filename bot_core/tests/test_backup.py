@@ -0,0 +1,111 @@
+"""
+Tests for content-defined chunking and deduplicating backups.
+"""
+
+import io
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from bot_core.ops import BackupRepository
+from bot_core.ops.backup import _retained
+from bot_core.ops.chunking import MAX_CHUNK, MIN_CHUNK, chunk_stream
+
+
+class TestChunking(unittest.TestCase):
+    def test_insertion_changes_only_nearby_chunks(self):
+        data = random.Random(0).randbytes(3_000_000)
+        edited = data[:1_000_000] + b"inserted" + data[1_000_000:]
+
+        old = list(chunk_stream(io.BytesIO(data), read_size=100_000))
+        new = list(chunk_stream(io.BytesIO(edited)))
+
+        self.assertEqual(b"".join(old), data)
+        self.assertTrue(all(MIN_CHUNK <= len(c) <= MAX_CHUNK for c in old[:-1]))
+        self.assertLessEqual(len(set(new) - set(old)), 2)
+
+
+class TestBackupRepository(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.site = os.path.join(self.tmp.name, "site")
+        self.repo = BackupRepository(os.path.join(self.tmp.name, "backups"), max_workers=1)
+        self.big = random.Random(1).randbytes(1_000_000)
+        self._write("public_html/index.html", b"<h1>Home</h1>" * 100)
+        self._write("public_html/video.bin", self.big)
+        self._write("config/site_config.json", b'{"title": "Test"}')
+        os.makedirs(os.path.join(self.site, "logs"))
+        os.symlink("public_html/index.html", os.path.join(self.site, "home.html"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, rel, data):
+        path = os.path.join(self.site, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def _read(self, *parts):
+        with open(os.path.join(*parts), 'rb') as f:
+            return f.read()
+
+    def test_unchanged_files_are_not_read_again(self):
+        first = self.repo.backup({"files": self.site})
+        self.assertEqual(first["read"], 3)
+
+        second = self.repo.backup({"files": self.site})
+        self.assertEqual((second["read"], second["unchanged"], second["bytes_new"]), (0, 3, 0))
+
+        self._write("public_html/video.bin", self.big[:500_000] + b"edit" + self.big[500_000:])
+        third = self.repo.backup({"files": self.site})
+        self.assertEqual(third["read"], 1)
+        self.assertLessEqual(third["chunks_new"], 2)
+        self.assertEqual(len(self.repo.snapshots()), 3)
+
+    def test_restore_and_verify(self):
+        first = self.repo.backup({"files": self.site})["snapshot"]
+        self._write("public_html/index.html", b"changed")
+        self.repo.backup({"files": self.site})
+
+        dest = os.path.join(self.tmp.name, "restore")
+        report = self.repo.restore(dest, snapshot=first)
+
+        self.assertEqual(report["files"], 3)
+        self.assertEqual(self._read(dest, "files", "public_html", "video.bin"), self.big)
+        self.assertEqual(os.readlink(os.path.join(dest, "files", "home.html")), "public_html/index.html")
+        self.assertTrue(os.path.isdir(os.path.join(dest, "files", "logs")))
+        self.assertEqual(self.repo.verify(full=True)["problems"], [])
+
+        partial = os.path.join(self.tmp.name, "partial")
+        self.repo.restore(partial, paths=["files/public_html/index.html"])
+        self.assertEqual(os.listdir(os.path.join(partial, "files", "public_html")), ["index.html"])
+        self.assertEqual(self._read(partial, "files", "public_html", "index.html"), b"changed")
+
+        victim = next(self.repo.store.digests())
+        os.unlink(self.repo.store.path_for(victim))
+        self.assertTrue(self.repo.verify()["problems"])
+
+    def test_prune_collects_unreferenced_chunks(self):
+        self.repo.backup({"files": self.site})
+        os.unlink(os.path.join(self.site, "public_html", "video.bin"))
+        self.repo.backup({"files": self.site})
+        chunks = len(list(self.repo.store.digests()))
+
+        report = self.repo.prune(keep_daily=1)
+
+        self.assertEqual(len(report["removed"]), 1)
+        self.assertGreater(report["chunks"]["removed"], 0)
+        self.assertEqual(len(list(self.repo.store.digests())), chunks - report["chunks"]["removed"])
+        self.assertEqual(self.repo.verify(full=True)["problems"], [])
+
+    def test_retention_keeps_newest_per_period(self):
+        start = datetime(2024, 1, 1, 3)
+        created = {f"s{i:02d}": start + timedelta(days=i // 2, hours=i % 2) for i in range(60)}
+
+        keep = _retained(created, daily=3, weekly=3, monthly=0)
+
+        # The last snapshot of each of Jan 30, 29 and 28, and of Sunday Jan 21 for the third week
+        self.assertEqual(sorted(keep), ["s41", "s55", "s57", "s59"])
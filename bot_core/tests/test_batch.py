@@ -0,0 +1,48 @@
+"""
+Tests for the parallel multi-site builder.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from bot_core.build.batch import build_sites, discover_site_configs
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class TestBatchBuild(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_failing_site_does_not_abort_others(self):
+        jobs = [
+            {"domain": "one.example", "config": {"title": "One"}},
+            {"domain": "broken.example", "config": {}, "template": "missing"},
+            {"domain": "two.example", "config": {"title": "Two"}}
+        ]
+
+        report = build_sites(jobs, max_workers=2, root_dir=self.tmp.name)
+
+        self.assertEqual([r["domain"] for r in report["sites"]],
+                         ["one.example", "broken.example", "two.example"])
+        self.assertEqual([r["status"] for r in report["sites"]], ["ok", "error", "ok"])
+        self.assertEqual(report["failed"], 1)
+        self.assertIn("duration", report["sites"][0])
+
+    def test_discovers_built_sites(self):
+        build_sites([{"domain": "one.example", "config": {}}], root_dir=self.tmp.name)
+
+        configs = discover_site_configs(os.path.join(self.tmp.name, "websites"))
+
+        self.assertEqual(len(configs), 1)
+        report = build_sites(configs, root_dir=self.tmp.name)
+        self.assertEqual(report["sites"][0]["domain"], "one.example")
+        self.assertEqual(report["sites"][0]["changes"]["added"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for the content-addressed blob store.
+"""
+
+import os
+import tempfile
+import unittest
+
+from bot_core.build.assets import AssetPipeline
+from bot_core.build.blobstore import BlobStore, referenced_digests
+from bot_core.build.fsutil import file_digest
+from bot_core.build.manifest import BuildManifest
+
+class TestBlobStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.websites = os.path.join(self.tmp.name, "websites")
+        self.store = BlobStore(os.path.join(self.websites, ".blobstore"))
+        self.src = os.path.join(self.tmp.name, "shared")
+        os.makedirs(self.src)
+        self._write("base.css", "body { margin: 0; }")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, text):
+        with open(os.path.join(self.src, name), 'w') as f:
+            f.write(text)
+
+    def _sync(self, domain):
+        site = os.path.join(self.websites, domain)
+        manifest = BuildManifest.for_site(site, self.store)
+        manifest.sync_tree(self.src, os.path.join(site, "public_html", "assets"))
+        manifest.save()
+        return os.path.join(site, "public_html", "assets", "base.css")
+
+    def test_sites_share_one_copy(self):
+        first = self._sync("a.example")
+        second = self._sync("b.example")
+
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(len(list(self.store.digests())), 1)
+
+    def test_gc_removes_unreferenced_blobs(self):
+        self._sync("a.example")
+        self._write("base.css", "body { margin: 1px; }")
+        self._sync("a.example")
+        self.assertEqual(len(list(self.store.digests())), 2)
+
+        result = self.store.gc(referenced_digests(self.websites), grace_seconds=0)
+
+        self.assertEqual(result["removed"], 1)
+        self.assertEqual(len(list(self.store.digests())), 1)
+
+    def test_in_place_edit_does_not_leak_into_store(self):
+        path = self._sync("a.example")
+        with open(path, 'w') as f:
+            f.write("body { margin: 9; }")
+
+        path = self._sync("a.example")
+
+        with open(path) as f:
+            self.assertEqual(f.read(), "body { margin: 0; }")
+
+    def test_compressed_variants_are_stored_by_content(self):
+        self._write("base.css", "body { margin: 0; }\n" * 50)
+        self._sync("a.example")
+        site = os.path.join(self.websites, "a.example")
+        manifest = BuildManifest.for_site(site, self.store)
+        assets = AssetPipeline(manifest, os.path.join(site, "asset_manifest.json"), max_workers=1)
+        assets.precompress()
+        key = "assets/base.css.gz"
+        entry = manifest.get(key)
+        self.assertEqual(file_digest(manifest.path_for(key)), entry["hash"])
+        self.assertEqual(self.store.resolve(entry["cache_key"]), entry["hash"])
+
+        # Compressing again over the linked variant must not discard its blob
+        manifest.forget(key)
+        os.unlink(self.store._key_path(entry["cache_key"]))
+        with self.assertNoLogs("bot_core.build.blobstore", "WARNING"):
+            report = assets.precompress()
+
+        self.assertIn(key, report["compressed"])
+        self.assertTrue(self.store.contains(entry["hash"]))
+        self.assertTrue(self.store.is_linked(manifest.path_for(key), entry["hash"]))
+
+if __name__ == '__main__':
+    unittest.main()
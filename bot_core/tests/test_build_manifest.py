@@ -0,0 +1,75 @@
+"""
+Tests for the content-hash build manifest.
+"""
+
+import os
+import tempfile
+import unittest
+
+from bot_core.build.manifest import BuildManifest
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "src")
+        self.site = os.path.join(self.tmp.name, "site")
+        os.makedirs(os.path.join(self.src, "css"))
+        self._write("css/base.css", "body { color: red; }")
+        self._write("main.js", "console.log(1);")
+        self.dst = os.path.join(self.site, "public_html", "assets")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, rel, text):
+        with open(os.path.join(self.src, rel), 'w') as f:
+            f.write(text)
+
+    def _sync(self):
+        manifest = BuildManifest.for_site(self.site)
+        report = manifest.sync_tree(self.src, self.dst)
+        manifest.save()
+        return report
+
+    def test_first_sync_copies_everything(self):
+        report = self._sync()
+
+        self.assertEqual(sorted(report["added"]), ["assets/css/base.css", "assets/main.js"])
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "css", "base.css")))
+        self.assertTrue(os.path.exists(os.path.join(self.site, "config", "build_manifest.json")))
+
+    def test_unchanged_files_are_not_rewritten(self):
+        self._sync()
+        dst_file = os.path.join(self.dst, "main.js")
+        before = os.stat(dst_file).st_mtime_ns
+
+        report = self._sync()
+
+        self.assertEqual(report["unchanged"], 2)
+        self.assertEqual(report["added"] + report["updated"], [])
+        self.assertEqual(os.stat(dst_file).st_mtime_ns, before)
+
+    def test_changed_and_removed_files(self):
+        self._sync()
+        self._write("main.js", "console.log(2);")
+        os.unlink(os.path.join(self.src, "css", "base.css"))
+
+        report = self._sync()
+
+        self.assertEqual(report["updated"], ["assets/main.js"])
+        self.assertEqual(report["removed"], ["assets/css/base.css"])
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "css", "base.css")))
+        with open(os.path.join(self.dst, "main.js")) as f:
+            self.assertEqual(f.read(), "console.log(2);")
+
+    def test_tampered_destination_is_restored(self):
+        self._sync()
+        with open(os.path.join(self.dst, "main.js"), 'w') as f:
+            f.write("tampered")
+
+        report = self._sync()
+
+        self.assertEqual(report["updated"], ["assets/main.js"])
+
+if __name__ == '__main__':
+    unittest.main()
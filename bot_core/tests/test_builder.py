@@ -0,0 +1,177 @@
+"""
+Tests for the WebsiteBuilder render pipeline.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from bot_core.builder import WebsiteBuilder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class TestWebsiteBuilder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+        self.builder = WebsiteBuilder(self.tmp.name)
+        self.site_config = {
+            "title": "Test Co",
+            "variables": {
+                "company_name": "Test Co",
+                "hero_title": "Hello from the hero",
+                "services": [{"name": "Consulting", "link": "/services/"}]
+            }
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _read(self, *parts):
+        with open(os.path.join(self.site_path, "public_html", *parts)) as f:
+            return f.read()
+
+    def test_build_renders_all_pages(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.build()
+
+        self.assertIn("index.html", self.builder.last_build_report["pages"])
+        self.assertIn("about/index.html", self.builder.last_build_report["pages"])
+        self.assertIn("Hello from the hero", self._read("index.html"))
+        self.assertIn("Consulting", self._read("services", "index.html"))
+
+    def test_rebuild_skips_unchanged_pages(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.build()
+
+        self.builder.build()
+
+        self.assertEqual(self.builder.last_build_report["written"], [])
+
+    def test_compiled_templates_are_cached_on_disk(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.build()
+
+        self.assertTrue(os.listdir(self.builder.template_cache_dir))
+
+    def test_assets_are_fingerprinted_and_precompressed(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.build()
+
+        html = self._read("index.html")
+        self.assertRegex(html, r'href="/assets/css/base\.[0-9a-f]{10}\.css"')
+        self.assertNotIn('href="/assets/css/base.css"', html)
+        self.assertTrue(os.path.exists(os.path.join(self.site_path, "public_html", "index.html.gz")))
+
+        self.builder.build()
+
+        self.assertEqual(self.builder.last_build_report["compressed"], [])
+
+    def test_rebuild_renders_only_affected_pages(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.build()
+        contact = os.path.join(self.tmp.name, "shared", "templates", "business", "components", "contact.html")
+
+        by_key = self.builder.rebuild(["variables.hero_title"])
+        by_template = self.builder.rebuild([contact])
+
+        self.assertEqual(by_key["rendered"], ["index.html"])
+        self.assertEqual(by_template["rendered"], ["contact/index.html", "services/index.html"])
+
+    def test_schemas_of_one_type_share_a_file(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.add_seo_schemas([{"type": "service", "name": "Cleaning", "description": "Offices",
+                                       "provider": "Test Co"}])
+        self.builder.add_seo_schemas([{"type": "service", "name": "Windows", "description": "Glass",
+                                       "provider": "Test Co"}])
+
+        with open(os.path.join(self.site_path, "schemas", "service.html")) as f:
+            tag = f.read()
+        self.assertIn('"@graph"', tag)
+        self.assertIn("Cleaning", tag)
+        self.assertIn("Windows", tag)
+
+    def test_invalid_schema_is_not_recorded(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        business = {"type": "local_business", "business_name": "Test Co", "business_type": "Plumber",
+                    "address": {"street": "1 Road", "city": "Town"}, "geo": {"latitude": 1.0},
+                    "telephone": "+46 8 123 45"}
+
+        with self.assertRaisesRegex(ValueError, r"\$\.geo\.longitude: value is null"):
+            self.builder.add_seo_schemas([business])
+
+        self.assertFalse(os.path.exists(os.path.join(self.site_path, "schemas", "local_business.html")))
+        self.assertNotIn(business, self.builder._load_site_config().get("schemas", []))
+
+    def test_schema_type_outside_bundled_vocabulary_builds(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        # Valid schema.org, but not in the bundled subset of the vocabulary
+        business = {"type": "local_business", "business_name": "Test Co", "business_type": "VeterinaryCare",
+                    "address": {"street": "1 Road", "city": "Town"}, "geo": {"latitude": 1.0, "longitude": 2.0},
+                    "telephone": "+46 8 123 45"}
+
+        with self.assertLogs("bot_core.builder", "WARNING") as logs:
+            self.builder.add_seo_schemas([business])
+
+        self.assertIn("unknown type VeterinaryCare", logs.output[0])
+        with open(os.path.join(self.site_path, "schemas", "local_business.html")) as f:
+            self.assertIn('"VeterinaryCare"', f.read())
+
+    def test_build_renders_every_language(self):
+        self.site_config.update({
+            "languages": ["sv", "en"],
+            "default_language": "sv"
+        })
+        self.site_config["variables"]["translations"] = {
+            "sv": {"hero_title": "Hej"},
+            "en": {"hero_title": "Hello"}
+        }
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.render_workers = 2
+        self.builder.build()
+
+        self.assertIn("Hej", self._read("sv", "index.html"))
+        self.assertIn("Hello", self._read("en", "index.html"))
+        self.assertIn("Hej", self._read("index.html"))
+        about = self._read("en", "about", "index.html")
+        self.assertIn('lang="en"', about)
+        self.assertIn('href="/en/services/"', about)
+        self.assertIn('<link rel="alternate" hreflang="sv" href="https://test.example/sv/about/">', about)
+        self.assertIn('hreflang="x-default" href="https://test.example/about/"', about)
+
+        by_key = self.builder.rebuild(["variables.hero_title"])
+
+        self.assertEqual(by_key["rendered"], ["en/index.html", "index.html", "sv/index.html"])
+
+    def test_streamed_build_matches_string_build(self):
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.build()
+        expected = {page: self._read(page) for page in self.builder.last_build_report["pages"]}
+
+        self.builder.stream_pages = True
+        self.builder.build()
+
+        self.assertEqual(self.builder.last_build_report["written"], [])
+        for page, html in expected.items():
+            self.assertEqual(self._read(page), html)
+
+    def test_content_section_streams_generator_chunks(self):
+        listing = os.path.join(self.tmp.name, "shared", "templates", "business", "pages", "products.html")
+        with open(listing, "w") as f:
+            f.write('{% extends "base.html" %}{% block content %}'
+                    '<ul>{% for chunk in products %}{{ chunk }}{% endfor %}</ul>{% endblock %}')
+        self.site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.add_content_section(
+            "products", lambda config, page: (f"<li>Item {i}</li>" for i in range(5000))
+        )
+        self.builder.stream_pages = True
+        self.builder.build()
+
+        html = self._read("products", "index.html")
+        self.assertEqual(html.count("<li>Item "), 5000)
+        self.assertIn("<li>Item 4999</li></ul>", html)
+        self.assertFalse([name for name in os.listdir(self.site_path) if name.startswith(".spool-")])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Tests for collections (the blog component).
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from bot_core.build.collection import parse_front_matter
+from bot_core.builder import WebsiteBuilder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_fields_and_body(self):
+        meta, body = parse_front_matter("---\ntitle: Hello: World\ntags: [news, Product Launch]\n---\n<p>Hi</p>\n")
+
+        self.assertEqual(meta, {"title": "Hello: World", "tags": ["news", "Product Launch"]})
+        self.assertEqual(body, "<p>Hi</p>\n")
+
+    def test_unclosed_block_is_an_error(self):
+        with self.assertRaises(ValueError):
+            parse_front_matter("---\ntitle: Hello\n<p>Hi</p>\n")
+
+
+class TestBlogCollection(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+        self.builder = WebsiteBuilder(self.tmp.name)
+        self.site_path = self.builder.create_website("test.example", {
+            "title": "Test Co",
+            "blog": {"per_page": 2}
+        })
+        self.posts_dir = os.path.join(self.site_path, "content", "blog")
+        os.makedirs(self.posts_dir)
+        for day in range(1, 6):
+            self._post(day, tags="news" if day % 2 else "news, guides")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _post(self, day, tags="news", body="Body"):
+        path = os.path.join(self.posts_dir, f"2024-01-0{day}-post-{day}.html")
+        with open(path, "w") as f:
+            f.write(f"---\ntitle: Post {day}\ntags: {tags}\n---\n<p class=\"post-lead\">{body} {day}</p>\n")
+        return path
+
+    def _read(self, *parts):
+        with open(os.path.join(self.site_path, "public_html", *parts)) as f:
+            return f.read()
+
+    def test_build_renders_posts_archives_tags_and_feed(self):
+        self.builder.build()
+
+        self.assertIn("Body 3", self._read("blog", "post-3", "index.html"))
+        front = self._read("blog", "index.html")
+        self.assertLess(front.index("Post 5"), front.index("Post 4"))
+        self.assertNotIn("Post 3", front)
+        self.assertIn('href="/blog/page/2/"', front)
+        # Archive pages are numbered from the oldest post
+        self.assertIn("Post 1", self._read("blog", "page", "1", "index.html"))
+        self.assertIn("Post 4", self._read("blog", "tags", "guides", "index.html"))
+        self.assertIn("<id>https://test.example/blog/post-5/</id>", self._read("blog", "feed.xml"))
+        self.assertIn('href="/blog/"', self._read("about", "index.html"))
+        self.assertEqual(self.builder.last_build_report["collections"]["blog"]["posts"], 5)
+
+    def test_blog_without_tags_has_no_broken_links(self):
+        for name in os.listdir(self.posts_dir):
+            os.unlink(os.path.join(self.posts_dir, name))
+        self._post(1, tags="[]")
+
+        self.builder.build()
+        report = self.builder.check_links(max_workers=1)
+
+        self.assertEqual([b for b in report["broken"] if b["page"].startswith("blog/")], [])
+        self.assertIn("No tags yet.", self._read("blog", "tags", "index.html"))
+
+    def test_rebuild_renders_only_new_post_and_listings(self):
+        self.builder.build()
+
+        new = self._post(6)
+        self.builder.rebuild([new])
+
+        written = set(self.builder.last_build_report["written"])
+        self.assertIn("blog/post-6/index.html", written)
+        self.assertIn("blog/index.html", written)
+        self.assertNotIn("blog/post-5/index.html", written)
+        self.assertNotIn("blog/page/1/index.html", written)
+        self.assertEqual(self.builder.last_build_report["rendered"], [])
+
+    def test_deleted_post_is_removed(self):
+        self.builder.build()
+
+        os.unlink(os.path.join(self.posts_dir, "2024-01-05-post-5.html"))
+        self.builder.build()
+
+        self.assertFalse(os.path.exists(os.path.join(self.site_path, "public_html", "blog", "post-5")))
+        self.assertNotIn("Post 5", self._read("blog", "index.html"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""
+Tests for the CSS purge and critical CSS stage.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from bot_core.build.css import (
+    BROWSER_AT_RULES,
+    browser_rules,
+    drop_unused_keyframes,
+    filter_rules,
+    html_tokens,
+    is_uncompiled,
+    parse_css,
+    serialize_css
+)
+from bot_core.builder import WebsiteBuilder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STYLESHEET = r"""
+@import url('https://fonts.example/inter.css');
+html { line-height: 1.5; }
+.btn-primary, .never-used { color: blue; }
+.lg\:flex { display: flex; }
+.w-1\/2 { width: 50%; }
+.stat-value { font-size: 2rem; }
+.unused-thing { animation: spin 1s; }
+@media (min-width: 1024px) { .lg\:hidden { display: none; } .also-unused { margin: 0; } }
+@keyframes spin { from { transform: rotate(0deg); } to { transform: rotate(360deg); } }
+"""
+
+
+class TestCssPurge(unittest.TestCase):
+    def test_filter_rules_keeps_only_used_selectors(self):
+        used = html_tokens('<div class="btn-primary lg:flex w-1/2 lg:hidden">')
+
+        purged = serialize_css(drop_unused_keyframes(filter_rules(parse_css(STYLESHEET), used)))
+
+        self.assertIn("@import", purged)
+        self.assertIn("html{", purged)
+        self.assertIn(".btn-primary{", purged)
+        self.assertIn(r".lg\:flex{", purged)
+        self.assertIn(r".w-1\/2{", purged)
+        self.assertIn(r"@media (min-width: 1024px){.lg\:hidden{", purged)
+        self.assertNotIn("never-used", purged)
+        self.assertNotIn("also-unused", purged)
+        self.assertNotIn("@keyframes", purged)
+
+    def test_browser_rules_drop_source_directives(self):
+        rules = parse_css('.a { @apply px-4; } .b { content: "@apply;"; @apply p-2 } '
+                          '@screen md { .c { margin: 0; } } @media print { .d { @apply hidden; } .e { color: red; } }')
+
+        self.assertEqual(serialize_css(browser_rules(rules)), '.b{content: "@apply;";}\n@media print{.e{color: red;}}')
+        self.assertTrue(is_uncompiled("@tailwind base;\n.a { @apply px-4; }"))
+        self.assertFalse(is_uncompiled(STYLESHEET))
+
+
+class TestBuilderCssStage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+        with open(os.path.join(self.tmp.name, "shared", "assets", "css", "base.css"), "w") as f:
+            f.write(STYLESHEET)
+        self.builder = WebsiteBuilder(self.tmp.name)
+        self.site_path = self.builder.create_website("test.example", {
+            "title": "Test Co",
+            "variables": {"hero_title": "Hi", "stats": [{"title": "Sites", "value": "10"}]}
+        })
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _read(self, *parts):
+        with open(os.path.join(self.site_path, "public_html", *parts)) as f:
+            return f.read()
+
+    def test_build_inlines_critical_css_and_defers_purged_sheet(self):
+        self.builder.build()
+
+        html = self._read("index.html")
+        critical = re.search(r"<style data-critical>(.*?)</style>", html, re.S).group(1)
+        self.assertIn(r".lg\:flex{", critical)
+        self.assertIn(".stat-value{", critical)
+        self.assertNotIn("@import", critical)
+        # Every at-rule left is one browsers apply
+        self.assertLessEqual({name.lower() for name in re.findall(r"@([\w-]+)", critical)}, BROWSER_AT_RULES)
+        href = re.search(r'<link rel="preload" href="(/assets/css/base\.[0-9a-f]{10}\.css)" as="style"', html).group(1)
+        purged = self._read(href.lstrip("/"))
+        self.assertIn(".btn-primary{", purged)
+        self.assertNotIn("unused-thing", purged)
+
+        report = self.builder.last_build_report["css"]["index.html"]
+        self.assertEqual(report["before"], len(STYLESHEET.encode("utf-8")))
+        self.assertLess(report["deferred"], report["before"])
+
+    def test_uncompiled_tailwind_source_is_left_alone(self):
+        # The shipped base.css, before Tailwind compiles it
+        shutil.copy(os.path.join(REPO_ROOT, "shared", "assets", "css", "base.css"),
+                    os.path.join(self.tmp.name, "shared", "assets", "css", "base.css"))
+        self.site_path = self.builder.create_website("source.example", {"title": "Test Co"})
+
+        with self.assertLogs("bot_core.build.css", "WARNING"):
+            self.builder.build()
+
+        html = self._read("index.html")
+        self.assertNotIn("<style data-critical>", html)
+        self.assertNotIn('rel="preload"', html)
+        self.assertRegex(html, r'<link rel="stylesheet" href="/assets/css/base\.[0-9a-f]{10}\.css">')
+
+    def test_rebuild_relinks_every_page_when_purged_sheet_changes(self):
+        self.builder.build()
+        contact = os.path.join(self.tmp.name, "shared", "templates", "business", "components", "contact.html")
+        with open(contact, "a") as f:
+            f.write('<div class="unused-thing"></div>\n')
+
+        report = self.builder.rebuild([contact])
+
+        self.assertEqual(len(report["rendered"]), 4)
+        self.assertIn("unused-thing", self._read(re.search(
+            r'href="/(assets/css/base\.[0-9a-f]{10}\.css)"', self._read("about", "index.html")).group(1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
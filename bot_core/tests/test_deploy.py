@@ -0,0 +1,107 @@
+"""
+Tests for delta deployment to a local release directory.
+"""
+
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from bot_core.build.manifest import BuildManifest
+from bot_core.ops import LocalTarget, deploy, rollback
+from bot_core.ops.delta import delta, literal_bytes, patch, signature
+
+
+class TestDelta(unittest.TestCase):
+    def test_delta_rebuilds_edited_file(self):
+        rng = random.Random(0)
+        old = rng.randbytes(300_000)
+        new = old[:1000] + b"inserted" + old[1000:200_000] + old[210_000:] + b"appended"
+
+        ops = delta(new, signature(io.BytesIO(old), 4096))
+
+        self.assertEqual(b"".join(patch(io.BytesIO(old), ops)), new)
+        self.assertLess(literal_bytes(ops), 20_000)
+
+    def test_unrelated_file_gives_no_delta(self):
+        rng = random.Random(0)
+        old, new = rng.randbytes(300_000), rng.randbytes(300_000)
+        self.assertIsNone(delta(new, signature(io.BytesIO(old), 4096)))
+
+
+class TestDeploy(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.site = os.path.join(self.tmp.name, "site")
+        self.host = os.path.join(self.tmp.name, "host")
+        self.manifest = BuildManifest.for_site(self.site)
+        self.target = LocalTarget(self.host)
+        self.big = random.Random(1).randbytes(2 * 1024 * 1024)
+        self._write("index.html", b"<h1>Home</h1>")
+        self._write("about/index.html", b"<h1>About</h1>")
+        self._write("assets/video.bin", self.big)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, key, data):
+        self.manifest.write_output(key, data, template="pages/x.html")
+        self.manifest.save()
+
+    def _deploy(self, **kwargs):
+        return deploy(self.site, self.target, manifest=self.manifest, **kwargs)
+
+    def _live(self, *parts):
+        with open(os.path.join(self.host, "public_html", *parts), 'rb') as f:
+            return f.read()
+
+    def test_first_deploy_uploads_everything_and_goes_live(self):
+        report = self._deploy()
+
+        self.assertEqual(len(report["uploaded"]), 3)
+        self.assertEqual(self.target.current(), report["release"])
+        self.assertTrue(os.path.islink(os.path.join(self.host, "public_html")))
+        self.assertEqual(self._live("about", "index.html"), b"<h1>About</h1>")
+
+    def test_redeploy_sends_only_changes(self):
+        first = self._deploy()
+        self.assertIsNone(self._deploy()["release"])
+
+        self._write("about/index.html", b"<h1>About us</h1>")
+        self._write("assets/video.bin", self.big[:5000] + b"edit" + self.big[5000:])
+        self.manifest.forget("index.html")
+        os.unlink(self.manifest.path_for("index.html"))
+        report = self._deploy()
+
+        self.assertEqual(report["uploaded"], ["about/index.html"])
+        self.assertEqual(report["delta"], ["assets/video.bin"])
+        self.assertEqual(report["removed"], ["index.html"])
+        self.assertLess(report["bytes_sent"], 200_000)
+        self.assertEqual(self._live("assets", "video.bin"), self.big[:5000] + b"edit" + self.big[5000:])
+        self.assertFalse(os.path.exists(os.path.join(self.host, "public_html", "index.html")))
+        # The earlier release is untouched
+        with open(os.path.join(self.host, "releases", first["release"], "about", "index.html"), 'rb') as f:
+            self.assertEqual(f.read(), b"<h1>About</h1>")
+
+        self.assertEqual(rollback(self.target), first["release"])
+        self.assertEqual(self._live("about", "index.html"), b"<h1>About</h1>")
+
+    def test_old_releases_are_pruned(self):
+        for i in range(4):
+            self._write("index.html", f"<h1>Version {i}</h1>".encode())
+            report = self._deploy(keep=2)
+
+        self.assertEqual(len(self.target.releases()), 2)
+        self.assertEqual(self.target.current(), report["release"])
+        self.assertEqual(len(report["pruned"]), 1)
+
+    def test_plain_public_html_is_replaced_by_first_release(self):
+        os.makedirs(os.path.join(self.host, "public_html"))
+        with open(os.path.join(self.host, "public_html", "old.html"), "w") as f:
+            f.write("old")
+
+        self._deploy()
+
+        self.assertEqual(self._live("index.html"), b"<h1>Home</h1>")
+        self.assertEqual(len(self.target.releases()), 2)
@@ -0,0 +1,82 @@
+"""
+Tests for the responsive image stage.
+"""
+
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from bot_core.build.fsutil import file_digest
+from bot_core.build.images import ImagePipeline, bucket_widths
+from bot_core.builder import WebsiteBuilder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestBucketWidths(unittest.TestCase):
+    def test_buckets_stop_at_source_width(self):
+        self.assertEqual(bucket_widths(1000), [320, 640, 960, 1000])
+        self.assertEqual(bucket_widths(200), [200])
+        self.assertEqual(bucket_widths(4000), [320, 640, 960, 1280, 1920])
+
+
+@unittest.skipUnless(ImagePipeline.available(), "Pillow is not installed")
+class TestImagePipeline(unittest.TestCase):
+    def setUp(self):
+        from PIL import Image
+
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+        images_dir = os.path.join(self.tmp.name, "shared", "assets", "images")
+        os.makedirs(images_dir, exist_ok=True)
+        Image.new("RGB", (1000, 500), (200, 80, 40)).save(os.path.join(images_dir, "hero.jpg"), quality=95)
+        self.builder = WebsiteBuilder(self.tmp.name)
+        self.site_config = {
+            "title": "Test Co",
+            "variables": {"hero_title": "Hi", "hero_image": "/assets/images/hero.jpg", "hero_image_alt": "Hero"}
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_build_rewrites_img_into_picture(self):
+        site_path = self.builder.create_website("test.example", self.site_config)
+        self.builder.build()
+
+        with open(os.path.join(site_path, "public_html", "index.html")) as f:
+            html = f.read()
+        picture = re.search(r"<picture>.*?</picture>", html, re.S).group(0)
+        self.assertIn('type="image/webp"', picture)
+        self.assertIn('width="1000" height="500"', picture)
+        self.assertIn('alt="Hero"', picture)
+        self.assertRegex(picture, r'srcset="/assets/images/hero-320w\.[0-9a-f]{10}\.jpg 320w, ')
+        for url in re.findall(r"(/assets/images/[^\s\"]+)", picture):
+            self.assertTrue(os.path.exists(os.path.join(site_path, "public_html", url.lstrip("/"))), url)
+
+    def test_derivatives_are_encoded_once_across_sites(self):
+        self.builder.create_website("one.example", self.site_config)
+        self.builder.build()
+        self.assertGreater(self.builder.last_build_report["images_encoded"], 0)
+
+        self.builder.create_website("two.example", self.site_config)
+        self.builder.build()
+
+        self.assertEqual(self.builder.last_build_report["images_encoded"], 0)
+
+    def test_derivatives_are_stored_by_content(self):
+        self.builder.create_website("test.example", self.site_config)
+        self.builder.build()
+
+        manifest, store = self.builder.manifest, self.builder.blob_store
+        derivatives = {key: entry for key, entry in manifest.files.items() if "image_of" in entry}
+        self.assertTrue(derivatives)
+        for key, entry in derivatives.items():
+            self.assertEqual(file_digest(manifest.path_for(key)), entry["hash"])
+            self.assertEqual(store.resolve(entry["cache_key"]), entry["hash"])
+            self.assertTrue(store.verify(entry["hash"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests for streaming export ingestion.
+"""
+
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+from bot_core.seo.ingest import ExportAggregate, ingest, read_chunks
+
+
+class TestIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        # Search Console UI export: page/query rows, CTR as a percentage
+        self.gsc_csv = self._write("gsc.csv.gz", (
+            "\ufeffTop pages,Query,Clicks,Impressions,CTR,Position\n"
+            "https://example.com/a/,plumber,30,1000,3%,2.0\n"
+            "https://example.com/a/,plumber malmo,10,1000,1%,4.0\n"
+            "https://example.com/b/,drains,\"1,200\",\"10,000\",12%,1.5\n"
+        ), compress=True)
+        # Search Console API rows, with the page as the first dimension
+        self.gsc_api = self._write("gsc.jsonl", "\n".join(json.dumps(row) for row in [
+            {"keys": ["https://example.com/a/", "emergency plumber"], "clicks": 10, "impressions": 2000,
+             "ctr": 0.005, "position": 7.0},
+        ]) + "\n")
+        self.analytics = self._write("sessions.csv", "Date,Sessions\n" + "".join(
+            f"202406{day:02d},{100 if day > 16 else 150}\n" for day in range(3, 31)))
+        self.content = self._write("content.csv", (
+            "Address,last_updated,word_count,keyword_density\n"
+            "https://example.com/a/,2024-01-01,900,1.0\n"
+            "https://example.com/b/,,,\n"
+        ))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, name, text, compress=False):
+        path = os.path.join(self.tmp.name, name)
+        with (gzip.open if compress else open)(path, 'wt', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def test_rows_are_read_in_chunks(self):
+        chunks = list(read_chunks(self.gsc_csv, chunk_rows=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual(chunks[0][0]["url"], "https://example.com/a/")
+        self.assertEqual(chunks[1][0]["ctr"], "12%")
+
+    def test_site_data_aggregates_per_url(self):
+        aggregate = ingest({"search_console": [self.gsc_csv, self.gsc_api], "analytics": [self.analytics],
+                            "content": [self.content]}, max_workers=1, period_days=14)
+        data = aggregate.site_data()
+
+        self.assertEqual(data["search_console"]["pages"], [
+            {"url": "https://example.com/a/", "clicks": 50, "impressions": 4000, "ctr": 1.25, "position": 5.0},
+            {"url": "https://example.com/b/", "clicks": 1200, "impressions": 10000, "ctr": 12.0, "position": 1.5},
+        ])
+        self.assertEqual(data["traffic"], {"current": 1400, "previous": 2100})
+        self.assertEqual(data["content"]["pages"], [
+            {"url": "https://example.com/a/", "last_updated": "2024-01-01", "word_count": 900,
+             "keyword_density": 1.0},
+            {"url": "https://example.com/b/"},
+        ])
+        self.assertEqual(aggregate.rows, {"search_console": 4, "analytics": 28, "content": 2})
+
+    def test_parallel_ingest_matches_serial(self):
+        exports = {"search_console": [self.gsc_csv, self.gsc_api], "analytics": [self.analytics]}
+
+        serial = ingest(exports, max_workers=1).site_data()
+        parallel = ingest(exports, max_workers=3).site_data()
+
+        self.assertEqual(parallel, serial)
+
+    def test_unknown_kind_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ingest({"backlinks": [self.gsc_csv]})
+        with self.assertRaises(ValueError):
+            ExportAggregate().add("backlinks", [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Tests for the post-build link checker and HTML validator.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from bot_core.build.linkcheck import LinkChecker, scan_html
+from bot_core.build.manifest import BuildManifest
+from bot_core.builder import WebsiteBuilder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestScanHtml(unittest.TestCase):
+    def test_reports_markup_ids_and_jsonld(self):
+        scan = scan_html(
+            '<!DOCTYPE html>\n<div id="a">\n<p id="a">text\n<span>\n</div>\n</section>\n'
+            '<!-- <article> -->\n<script>if (a < b) x("<div>");</script>\n'
+            '<script type="application/ld+json">{"@context": "https://schema.org", "@type": "Service"}</script>\n'
+            '<script type="application/ld+json">{not json</script>\n'
+            '<ul><li><a href="/x/#y">x</a></ul><img src="/a.png" srcset="/a.png 1x, /b.png 2x">'
+        )
+
+        self.assertEqual(scan["duplicate_ids"], [[3, "a"]])
+        self.assertEqual(scan["markup"], [[4, "<span> is not closed before </div>"], [6, "stray </section>"]])
+        self.assertEqual([line for line, _ in scan["jsonld"]], [9, 10])
+        self.assertEqual(scan["jsonld"][0][1], "JSON-LD $: Service is missing required properties aggregateRating, name")
+        self.assertEqual(scan["links"], [["/x/#y", 11], ["/a.png", 11], ["/b.png", 11]])
+
+
+class TestLinkChecker(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"),
+                                      os.path.join(self.tmp.name, "public_html"))
+        self._page("index.html", '<a href="/about/">About</a><a href="/about/#team">Team</a>'
+                                 '<a href="https://example.com/missing/">Self</a><a href="mailto:a@b.c">Mail</a>')
+        self._page("about/index.html", '<h2 id="team">Team</h2><a href="../">Home</a>'
+                                       '<img src="/assets/logo.png"><a href="#staff">Staff</a>')
+        self._page("lost/index.html", '<p>Nobody links here</p>')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _page(self, key, body):
+        self.manifest.write_output(key, f"<html><body>{body}</body></html>".encode(), template="pages/x.html")
+
+    def _check(self):
+        return LinkChecker(self.manifest, os.path.join(self.tmp.name, "linkcheck.json"),
+                           origin="https://example.com", max_workers=1).check()
+
+    def test_reports_broken_links_and_orphans(self):
+        report = self._check()
+
+        broken = {(b["page"], b["url"]): b["reason"] for b in report["broken"]}
+        self.assertEqual(broken, {
+            ("index.html", "https://example.com/missing/"): "missing file",
+            ("about/index.html", "/assets/logo.png"): "missing file",
+            ("about/index.html", "#staff"): "missing anchor"
+        })
+        self.assertEqual(report["orphans"], ["lost/index.html"])
+        self.assertEqual(report["problems"], 4)
+
+    def test_recheck_scans_only_changed_pages(self):
+        self.assertEqual(self._check()["scanned"], 3)
+        self.assertEqual(self._check()["scanned"], 0)
+
+        self._page("about/index.html", '<h2 id="staff">Staff</h2><a href="/lost/">Lost</a>')
+        report = self._check()
+
+        self.assertEqual(report["scanned"], 1)
+        self.assertEqual(report["orphans"], [])
+        self.assertEqual([b["url"] for b in report["broken"]],
+                         ["/about/#team", "https://example.com/missing/"])
+
+
+class TestBuilderLinkCheck(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+        self.builder = WebsiteBuilder(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_built_multilingual_site_with_blog_is_clean(self):
+        site_path = self.builder.create_website("test.example", {
+            "title": "Test Co",
+            "components": ["services", "about", "contact"],
+            "languages": ["en", "sv"],
+            "default_language": "en",
+            "blog": {},
+            "linkcheck": {"enabled": True}
+        })
+        posts = os.path.join(site_path, "content", "blog")
+        os.makedirs(posts)
+        with open(os.path.join(posts, "2024-01-01-hello.html"), "w") as f:
+            f.write("---\ntitle: Hello\ntags: news\n---\n<p>Hi</p>\n")
+
+        self.builder.build()
+
+        report = self.builder.last_build_report["linkcheck"]
+        self.assertGreater(report["pages"], 10)
+        self.assertEqual(report["problems"], 0, report)
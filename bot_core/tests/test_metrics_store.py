@@ -0,0 +1,121 @@
+"""
+Tests for the time-series metrics store and traffic anomaly detection.
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta, timezone
+
+from bot_core.monitoring.metrics_store import MetricsStore
+from bot_core.seo.ingest import ExportAggregate
+from bot_core.seo.sentinel import SEOSentinel
+
+# A Monday
+START = date(2024, 1, 1)
+
+
+def _ts(day: date, hour: int = 12) -> float:
+    return datetime(day.year, day.month, day.day, hour, tzinfo=timezone.utc).timestamp()
+
+
+class TestMetricsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = MetricsStore(os.path.join(self.tmp.name, "metrics"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _traffic(self, days, weekday=1000, weekend=300, site="example.com"):
+        """Daily traffic from START on, quieter at weekends."""
+        self.store.append_many(
+            (site, None, "traffic", _ts(START + timedelta(days=d)), weekday if d % 7 < 5 else weekend)
+            for d in range(days))
+
+    def test_rollups(self):
+        self.store.append("example.com", "ctr", 2.0, timestamp=_ts(START, 1), url="/a/")
+        self.store.append("example.com", "ctr", 4.0, timestamp=_ts(START, 20), url="/a/")
+        # A gap of a day, then the next week
+        self.store.append("example.com", "ctr", 3.0, timestamp=_ts(START + timedelta(days=2)), url="/a/")
+        self.store.append("example.com", "ctr", 5.0, timestamp=_ts(START + timedelta(days=8)), url="/a/")
+
+        daily = self.store.daily("example.com", "ctr", url="/a/", end=START + timedelta(days=2))
+        weekly = self.store.weekly("example.com", "ctr", url="/a/")
+
+        self.assertEqual([(d["date"], d["value"], d["count"], d["min"], d["max"]) for d in daily],
+                         [("2024-01-01", 3.0, 2, 2.0, 4.0), ("2024-01-03", 3.0, 1, 3.0, 3.0)])
+        self.assertEqual([(w["date"], w["value"]) for w in weekly], [("2024-01-01", 3.0), ("2024-01-08", 5.0)])
+        self.assertEqual(len(self.store.raw("example.com", "ctr", url="/a/")), 4)
+        self.assertEqual(self.store.series(), [{"site": "example.com", "url": "/a/", "metric": "ctr",
+                                                "key": self.store.series()[0]["key"]}])
+        with self.assertRaises(ValueError):
+            self.store.append("example.com", "ctr", 1.0, timestamp=_ts(START - timedelta(days=1)), url="/a/")
+
+    def test_weekday_baseline(self):
+        self._traffic(9 * 7)
+
+        # A normal Sunday is low but in line with earlier Sundays
+        sunday = self.store.anomaly("example.com", "traffic")
+        self.assertEqual((sunday["day"], sunday["value"], sunday["anomalous"]), ("2024-03-03", 300, False))
+
+        self.store.append("example.com", "traffic", 300, timestamp=_ts(START + timedelta(weeks=9)))
+        monday = self.store.anomaly("example.com", "traffic")
+        self.assertTrue(monday["anomalous"])
+        self.assertLess(monday["z"], -3)
+        self.assertIsNone(self.store.anomaly("example.com", "traffic", day=START + timedelta(days=7)))
+
+    def test_default_day_skips_the_partial_current_day(self):
+        today = datetime.now(timezone.utc).date()
+        start = today - timedelta(weeks=9)
+        self.store.append_many(("example.com", None, "traffic", _ts(start + timedelta(days=d)), 1000)
+                               for d in range(9 * 7))
+        # The first hour of today's sessions
+        self.store.append("example.com", "traffic", 40, timestamp=_ts(today, 0))
+
+        result = self.store.anomaly("example.com", "traffic")
+
+        self.assertEqual((result["day"], result["anomalous"]), ((today - timedelta(days=1)).isoformat(), False))
+        self.assertTrue(self.store.anomaly("example.com", "traffic", day=today)["anomalous"])
+
+    def test_sentinel_uses_history(self):
+        self._traffic(9 * 7)
+        os.makedirs(os.path.join(self.tmp.name, "logs"))
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        try:
+            sentinel = SEOSentinel("missing.json", metrics=self.store, site="example.com")
+        finally:
+            os.chdir(cwd)
+        # The week-on-week numbers alone would read as a drop
+        self.assertFalse(sentinel._check_traffic_drop({"current": 300, "previous": 1000}))
+
+        self.store.append("example.com", "traffic", 300, timestamp=_ts(START + timedelta(weeks=9)))
+        self.assertTrue(sentinel._check_traffic_drop({}))
+
+    def test_ingested_sessions_are_recorded_once(self):
+        aggregate = ExportAggregate()
+        aggregate.add("analytics", [{"date": "20240101", "sessions": "120"}, {"date": "20240102", "sessions": "80"}])
+
+        self.assertEqual(aggregate.record(self.store, "example.com"), 2)
+        self.assertEqual(aggregate.record(self.store, "example.com"), 0)
+        self.assertEqual([d["value"] for d in self.store.daily("example.com", "traffic")], [120, 80])
+
+    def test_partial_day_is_recorded_once_complete(self):
+        partial = ExportAggregate()
+        partial.add("analytics", [{"date": (START + timedelta(days=d)).isoformat(), "sessions": "1000"}
+                                  for d in range(9 * 7)])
+        today = START + timedelta(weeks=9)
+        partial.add("analytics", [{"date": today.isoformat(), "sessions": "40"}])
+
+        self.assertEqual(partial.record(self.store, "example.com", today=today), 9 * 7)
+        complete = ExportAggregate()
+        complete.add("analytics", [{"date": today.isoformat(), "sessions": "1000"}])
+        self.assertEqual(complete.record(self.store, "example.com", today=today + timedelta(days=1)), 1)
+
+        result = self.store.anomaly("example.com", "traffic", day=today)
+        self.assertEqual((result["value"], result["anomalous"]), (1000, False))
+
+
+if __name__ == '__main__':
+    unittest.main()
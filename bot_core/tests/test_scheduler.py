@@ -0,0 +1,100 @@
+"""
+Tests for the concurrent multi-business SEO automation scheduler.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bot_core.seo.automation import SEOAutomation
+from bot_core.seo.scheduler import AutomationScheduler
+
+DELAY = 0.05
+
+
+class SlowAutomation(SEOAutomation):
+    """Data fetches that block like API calls, counting concurrent Search Console calls."""
+
+    lock = threading.Lock()
+    active = 0
+    peak = 0
+
+    def _get_traffic_data(self):
+        time.sleep(DELAY)
+        return super()._get_traffic_data()
+
+    def _get_search_console_data(self):
+        with self.lock:
+            SlowAutomation.active += 1
+            SlowAutomation.peak = max(SlowAutomation.peak, SlowAutomation.active)
+        time.sleep(DELAY)
+        with self.lock:
+            SlowAutomation.active -= 1
+        return super()._get_search_console_data()
+
+    def _get_content_data(self):
+        time.sleep(DELAY)
+        if self.business_id == "broken":
+            raise ValueError("content API unavailable")
+        return super()._get_content_data()
+
+
+class TestAutomationScheduler(unittest.TestCase):
+    def setUp(self):
+        # The automation components log to logs/ relative to the working directory
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "logs"))
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        SlowAutomation.peak = 0
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_results_match_sequential_runs(self):
+        ids = ["biz-1", "broken"]
+        expected = {business: SlowAutomation(business).run_automated_tasks() for business in ids}
+
+        run = AutomationScheduler(SlowAutomation).run_all(ids)
+
+        self.assertEqual(run["results"], expected)
+        self.assertEqual(run["results"]["broken"]["seo_analysis"], {"error": "content API unavailable"})
+        self.assertEqual(run["latency"]["fetch_content"]["count"], 2)
+        self.assertIn("p95_ms", run["latency"]["analysis"])
+
+    def test_businesses_run_concurrently_within_provider_limits(self):
+        ids = [f"biz-{n}" for n in range(6)]
+
+        run = AutomationScheduler(SlowAutomation, limits={"search_console": 2}).run_all(ids)
+
+        self.assertEqual(len(run["results"]), 6)
+        self.assertEqual(SlowAutomation.peak, 2)
+        # Sequentially: 6 businesses x 4 blocking fetches; here Search Console's limit dominates
+        self.assertLess(run["wall_s"], 6 * 3 * DELAY)
+        self.assertGreater(run["latency"]["wait_search_console"]["max_ms"], 0)
+
+    def test_exports_are_ingested_in_worker_processes(self):
+        with open("sessions.csv", "w") as f:
+            f.write("Date,Sessions\n" + "".join(f"202406{day:02d},{100 if day > 16 else 150}\n" for day in range(3, 31)))
+        exports = {"analytics": [os.path.abspath("sessions.csv")]}
+        ids = ["biz-1", "biz-2"]
+        expected = {business: SEOAutomation(business, exports=exports).run_automated_tasks() for business in ids}
+
+        run = AutomationScheduler(lambda business: SEOAutomation(business, exports=exports),
+                                  ingest_workers=2).run_all(ids)
+
+        self.assertEqual(run["results"], expected)
+        self.assertEqual(run["latency"]["ingest"]["count"], 2)
+
+    def test_invalid_limits_are_rejected(self):
+        with self.assertRaises(ValueError):
+            AutomationScheduler(limits={"reviews": 0})
+        with self.assertRaises(ValueError):
+            AutomationScheduler(SlowAutomation).run_all(["biz-1", "biz-1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
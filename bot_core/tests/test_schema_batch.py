@@ -0,0 +1,108 @@
+"""
+Tests for bulk JSON-LD generation.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from bot_core.seo.schema_batch import PARALLEL_MIN_SPECS, SchemaBatch, read_records
+from bot_core.seo.schema_generator import SchemaGenerator
+
+ADDRESS = {"street": "1 Main St", "city": "Malmö", "region": "M", "postal_code": "211 20", "country": "SE"}
+
+
+class TestSchemaBatch(unittest.TestCase):
+    def setUp(self):
+        self.generator = SchemaGenerator()
+        self.specs = [
+            {"type": "service", "name": "Cleaning", "description": "Office cleaning", "provider": "Acme",
+             "area_served": "Malmö", "price": "100"},
+            {"type": "service", "name": "Windows", "description": "</script> and \"quotes\"", "provider": "Acme"},
+            {"type": "product", "name": "Mop", "sku": "M-1", "brand": "Acme", "price": 19.5,
+             "currency": "SEK", "availability": "InStock"},
+            {"type": "local_business", "business_name": "Acme", "address": ADDRESS,
+             "geo": {"latitude": 55.6, "longitude": 13.0}, "telephone": "+46 40 123",
+             "opening_hours": ["Mo-Fr 08:00-17:00"], "price_range": "$$"},
+            {"type": "faq", "questions": [{"question": "Why?", "answer": "Because."}]}
+        ]
+
+    def _expected(self, spec):
+        schema = getattr(self.generator, f"generate_{spec['type']}")(**{k: v for k, v in spec.items() if k != "type"})
+        del schema["@context"]
+        return schema
+
+    def test_entities_match_generator_output(self):
+        graphs = list(SchemaBatch(self.generator, page_size=2).graphs(self.specs))
+
+        self.assertEqual(len(graphs), 3)
+        documents = [json.loads(graph) for graph in graphs]
+        self.assertTrue(all(doc["@context"] == "https://schema.org" for doc in documents))
+        entities = [entity for doc in documents for entity in doc["@graph"]]
+        self.assertEqual(entities, [self._expected(spec) for spec in self.specs])
+
+    def test_templated_entities_match_generator_output(self):
+        batch = SchemaBatch(self.generator)
+        plain = [{"type": "product", "name": f"Mop {i}", "description": "Wet mop, ö", "brand": "Acme",
+                  "price": "9.00"} for i in range(3)]
+        tricky = [
+            {"type": "product", "name": "Tab\there", "price": "1"},
+            {"type": "product", "name": "Mop", "sku": ""},
+            {"type": "product", "name": "Mop", "sku": "S-1"},
+            {"type": "service", "name": "A", "description": "B", "provider": "C", "price": 5},
+        ]
+        specs = plain + tricky + plain
+
+        entities = batch.entities(specs)
+
+        self.assertEqual(entities, [batch.entity(spec) for spec in specs])
+        self.assertEqual([json.loads(entity) for entity in entities], [self._expected(spec) for spec in specs])
+        with self.assertRaisesRegex(ValueError, "service spec is missing description"):
+            batch.entities([{"type": "service", "name": "A", "provider": "C"}])
+
+    def test_script_tags_cannot_end_early(self):
+        tag = next(SchemaBatch().script_tags(self.specs[1:2]))
+
+        self.assertEqual(tag.count("</script>"), 1)
+        self.assertEqual(json.loads(tag[tag.index(">") + 1:-len("</script>")])["@graph"][0]["description"],
+                         "</script> and \"quotes\"")
+
+    def test_page_key_starts_new_blocks(self):
+        specs = [{"type": "product", "name": f"P{i}", "category": "a" if i < 3 else "b"} for i in range(5)]
+        graphs = SchemaBatch(page_size=10, page_key=lambda spec: spec["category"]).graphs(specs)
+
+        self.assertEqual([len(json.loads(g)["@graph"]) for g in graphs], [3, 2])
+
+    def test_worker_processes_match_in_process_output(self):
+        specs = self.specs * (PARALLEL_MIN_SPECS // len(self.specs))
+
+        serial = list(SchemaBatch(self.generator, page_size=700, max_workers=1).script_tags(specs))
+        parallel = list(SchemaBatch(self.generator, page_size=700, max_workers=2).script_tags(specs))
+
+        self.assertEqual(parallel, serial)
+        with self.assertRaisesRegex(ValueError, "Unknown schema type: spaceship"):
+            list(SchemaBatch(max_workers=2).graphs(specs + [{"type": "spaceship", "name": "X"}]))
+
+    def test_reads_csv_catalog(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "catalog.csv")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("business_name,telephone,address.city,geo.latitude,geo.longitude,opening_hours,image\n"
+                        "Acme,+46 40 123,Malmö,55.6,13.0,Mo-Fr 08:00-17:00|Sa 10:00-14:00,\n")
+
+            spec = next(read_records(path, schema_type="local_business"))
+            report = SchemaBatch().write(read_records(path, schema_type="local_business"), tmp)
+
+        self.assertEqual(spec["geo"], {"latitude": 55.6, "longitude": 13.0})
+        self.assertEqual(spec["opening_hours"], ["Mo-Fr 08:00-17:00", "Sa 10:00-14:00"])
+        self.assertNotIn("image", spec)
+        self.assertEqual((report["pages"], report["entities"]), (1, 1))
+
+    def test_unknown_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            list(SchemaBatch().graphs([{"type": "spaceship", "name": "X"}]))
+
+
+if __name__ == '__main__':
+    unittest.main()
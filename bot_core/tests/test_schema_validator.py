@@ -0,0 +1,124 @@
+"""
+Tests for the compiled schema.org validator.
+"""
+
+import os
+import tempfile
+import unittest
+
+from bot_core.seo.schema_generator import SchemaGenerator
+from bot_core.seo.schema_validator import SchemaValidator, format_errors
+
+
+class TestSchemaValidator(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.validator = SchemaValidator(cache_dir=self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compiled_vocabulary_is_cached(self):
+        cached = os.listdir(self.tmp.name)
+
+        self.assertEqual(len(cached), 1)
+        self.assertEqual(SchemaValidator(cache_dir=self.tmp.name).tables, self.validator.tables)
+
+    def test_subtypes_inherit_properties(self):
+        plumber = {
+            "@context": "https://schema.org",
+            "@type": "Plumber",
+            "name": "Pipes AB",
+            "telephone": "+46 8 123 45",
+            "address": {"@type": "PostalAddress", "addressLocality": "Malmö"},
+            # From Place, LocalBusiness's other parent
+            "geo": {"@type": "GeoCoordinates", "latitude": 55.6, "longitude": 13.0},
+            "openingHours": ["Mo-Fr 08:00-17:00"]
+        }
+
+        self.assertEqual(self.validator.validate(plumber), [])
+        # A Plumber is a valid provider (expected: Organization or Person)
+        provider = {k: v for k, v in plumber.items() if k != "@context"}
+        service = {"@context": "https://schema.org", "@type": "Service", "name": "Drains",
+                   "description": "Unblocking", "provider": provider}
+        self.assertEqual(self.validator.validate(service), [])
+
+    def test_errors_carry_json_paths(self):
+        product = {
+            "@context": "https://schema.org",
+            "@type": "Product",
+            "name": "Chair",
+            "colour": "red",
+            "brand": "Acme",
+            "offers": [{"@type": "Offer", "price": "10", "availability": "https://schema.org/InStock"},
+                       {"@type": "Offer", "availability": "Someday"}]
+        }
+
+        warnings = []
+        errors = self.validator.validate(product, warnings=warnings)
+
+        self.assertEqual(warnings, [{"path": "$.colour", "message": "colour is not a property of Product",
+                                     "severity": "warning"}])
+        self.assertEqual(sorted((e["path"], e["message"]) for e in errors), [
+            ("$.brand", "expected Brand or Organization, got text 'Acme'"),
+            ("$.offers[1]", "Offer is missing required property price"),
+            ("$.offers[1].availability", "expected ItemAvailability, got text 'Someday'"),
+        ])
+        # The key set of a valid entity is remembered; a repeat still reports errors
+        self.assertEqual(self.validator.validate(product), errors)
+
+    def test_graph_and_required_alternatives(self):
+        graph = {"@context": "https://schema.org", "@graph": [
+            {"@type": "Service", "name": "Repairs", "aggregateRating":
+                {"@type": "AggregateRating", "ratingValue": 4.5, "ratingCount": 12}},
+            {"@type": "Service", "name": "Repairs"},
+            {"@type": "Servise", "name": "Typo"}
+        ]}
+
+        errors = self.validator.validate(graph)
+
+        self.assertEqual(format_errors(errors), "$.@graph[1]: Service is missing required property aggregateRating")
+        self.assertEqual(self.validator.validate({"@type": "Product", "name": "x"}),
+                         [{"path": "$", "message": "missing @context"}])
+
+    def test_types_outside_the_snapshot_are_warnings(self):
+        vet = {
+            "@context": "https://schema.org",
+            "@type": "VeterinaryCare",
+            "name": "Pets AB",
+            "aggregateRating": {"@type": "AggregateRating", "ratingValue": 4.5},
+        }
+        site = {"@context": "https://schema.org", "@type": "WebSite", "name": "Pets AB", "url": "https://pets.example",
+                "potentialAction": {"@type": "SearchAction", "target": "https://pets.example/?q={q}"}}
+        warnings = []
+
+        # Typed objects inside an unknown type are still checked
+        self.assertEqual(self.validator.validate(vet, warnings=warnings),
+                         [{"path": "$.aggregateRating", "message": "AggregateRating is missing required property reviewCount"}])
+        self.assertEqual(self.validator.validate(site, warnings=warnings), [])
+        self.assertEqual([(w["path"], w["message"]) for w in warnings], [
+            ("$.@type", "unknown type VeterinaryCare"),
+            ("$.potentialAction", "potentialAction is not a property of WebSite"),
+            ("$.potentialAction.@type", "unknown type SearchAction"),
+        ])
+        strict = SchemaValidator(cache_dir=self.tmp.name, strict=True)
+        self.assertEqual(strict.validate({"@context": "https://schema.org", "@type": "Book", "name": "Dune"}),
+                         [{"path": "$.@type", "message": "unknown type Book"}])
+
+    def test_generated_markup_is_valid(self):
+        generator = SchemaGenerator()
+        schemas = [
+            generator.generate_service("Cleaning", "Offices", "Test Co", price="99", currency="SEK"),
+            generator.generate_product("Chair", brand="Acme", price="10.00", availability="InStock"),
+            generator.generate_faq([{"question": "Why?", "answer": "Because."}]),
+            generator.generate_review_aggregate("Test Co", 4.5, 100),
+            generator.generate_local_business("Test Co", {"city": "Malmö"}, {"latitude": 55.6, "longitude": 13.0},
+                                              "+46 40 123", business_type="Plumber"),
+        ]
+
+        for schema in schemas:
+            self.assertEqual(self.validator.validate(schema), [], schema["@type"])
+
+
+if __name__ == '__main__':
+    unittest.main()
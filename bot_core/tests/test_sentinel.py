@@ -0,0 +1,70 @@
+"""
+Tests for SEOSentinel's row-by-row and columnar page analysis.
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from bot_core.seo import columnar
+from bot_core.seo.sentinel import SEOSentinel
+
+
+class TestSentinelAnalysis(unittest.TestCase):
+    def setUp(self):
+        # The sentinel logs to logs/ relative to the working directory
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "logs"))
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        today = datetime.now()
+        self.search = {"pages": [
+            {"url": "/a/", "ctr": 2},
+            {"url": "/b/", "ctr": 5.5},
+            {"url": "/c/", "ctr": 9.25},
+            {"url": "/d/"},
+        ]}
+        self.content = {"pages": [
+            {"url": "/a/", "last_updated": (today - timedelta(days=10)).date().isoformat(),
+             "word_count": 1500, "keyword_density": 1.0},
+            {"url": "/b/", "last_updated": (today - timedelta(days=91, minutes=1)).isoformat(),
+             "word_count": 300, "keyword_density": 1.5},
+            {"url": "/c/", "word_count": 2000, "keyword_density": 0.5},
+            {"url": "/d/", "last_updated": (today - timedelta(days=90, hours=23)).isoformat()},
+        ]}
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_row_analysis(self):
+        sentinel = SEOSentinel("missing.json", columnar_mode=False)
+
+        self.assertEqual(sentinel._analyze_ctr(self.search),
+                         ["Low CTR on /a/: 2%", "Suspicious CTR on /c/: 9.25%", "Low CTR on /d/: 0%"])
+        self.assertEqual(sentinel._analyze_content(self.content), [
+            "Stale content on /b/", "Thin content on /b/", "High keyword density on /b/",
+            "Stale content on /c/", "Low keyword density on /c/",
+            "Thin content on /d/", "Low keyword density on /d/",
+        ])
+
+    @unittest.skipUnless(columnar.available(), "numpy is not installed")
+    def test_columnar_analysis_matches_rows(self):
+        rows = SEOSentinel("missing.json", columnar_mode=False)
+        columns = SEOSentinel("missing.json", columnar_mode=True)
+
+        self.assertEqual(columns._analyze_ctr(self.search), rows._analyze_ctr(self.search))
+        self.assertEqual(columns._analyze_content(self.content), rows._analyze_content(self.content))
+
+        table = columnar.PageColumns.from_rows(self.search["pages"], columnar.CTR_FIELDS)
+        self.assertEqual(rows._analyze_ctr({"pages": table}), rows._analyze_ctr(self.search))
+
+    @unittest.skipIf(columnar.available(), "numpy is installed")
+    def test_columnar_mode_requires_numpy(self):
+        with self.assertRaisesRegex(ValueError, "numpy"):
+            SEOSentinel("missing.json", columnar_mode=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Tests for transactional site config editing.
+"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from bot_core.build.site_config import SiteConfigSession
+from bot_core.builder import WebsiteBuilder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _increment(path, times):
+    for _ in range(times):
+        with SiteConfigSession(path) as session:
+            session.config["counter"] = session.config.get("counter", 0) + 1
+
+
+class TestSiteConfigSession(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "config", "site_config.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _load(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_commit_skips_unchanged_config(self):
+        with SiteConfigSession(self.path) as session:
+            session.set_content({"hero_title": "Hi"})
+        self.assertTrue(session.committed)
+        inode = os.stat(self.path).st_ino
+
+        with SiteConfigSession(self.path) as session:
+            session.set_content({"hero_title": "Hi"})
+
+        self.assertFalse(session.committed)
+        self.assertEqual(os.stat(self.path).st_ino, inode)
+
+    def test_invalid_or_failed_session_leaves_file_untouched(self):
+        with SiteConfigSession(self.path) as session:
+            session.update_theme({"primary": "#000000"})
+
+        with self.assertRaises(ValueError):
+            with SiteConfigSession(self.path) as session:
+                session.update_theme({"primary": 42})
+        with self.assertRaises(RuntimeError):
+            with SiteConfigSession(self.path) as session:
+                session.set_content({"hero_title": "lost"})
+                raise RuntimeError("crash mid-edit")
+
+        self.assertEqual(self._load(), {"theme": {"colors": {"primary": "#000000"}, "fonts": {}}})
+
+    def test_sessions_serialize_across_processes(self):
+        ctx = multiprocessing.get_context("fork")
+        workers = [ctx.Process(target=_increment, args=(self.path, 20)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(self._load()["counter"], 80)
+
+
+class TestBuilderEditConfig(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+        self.builder = WebsiteBuilder(self.tmp.name)
+        self.site_path = self.builder.create_website("test.example", {"title": "Test Co", "theme": "light"})
+        self.config_path = os.path.join(self.site_path, "config", "site_config.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_batched_edits_write_once(self):
+        inode = os.stat(self.config_path).st_ino
+        with self.builder.edit_config():
+            self.builder.customize_theme({"primary": "#4F46E5"}, {"body": "Inter"})
+            self.builder.set_content({"hero_title": "Batched"})
+            # Nothing is written until the block ends
+            self.assertEqual(os.stat(self.config_path).st_ino, inode)
+
+        with open(self.config_path) as f:
+            config = json.load(f)
+        self.assertEqual(config["theme"]["mode"], "light")
+        self.assertEqual(config["theme"]["colors"]["primary"], "#4F46E5")
+        self.assertEqual(config["variables"]["hero_title"], "Batched")
+
+        self.builder.build()
+        with open(os.path.join(self.site_path, "public_html", "index.html")) as f:
+            html = f.read()
+        self.assertIn('data-theme="light"', html)
+        self.assertIn("Batched", html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests for sitemap.xml and robots.txt generation.
+"""
+
+import gzip
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from bot_core.build.manifest import BuildManifest
+from bot_core.build.sitemap import SitemapPipeline
+from bot_core.builder import WebsiteBuilder
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class TestSitemapSharding(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = os.path.join(self.tmp.name, "public_html")
+        self.manifest = BuildManifest(os.path.join(self.tmp.name, "manifest.json"), self.public)
+        for i in range(25):
+            self.manifest.write_output(f"page-{i:02d}/index.html", f"<p>{i}</p>".encode(), template="pages/x.html")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _pipeline(self):
+        return SitemapPipeline(self.manifest, os.path.join(self.tmp.name, "sitemap.json"),
+                               "https://example.com", max_urls=12)
+
+    def _shards(self):
+        """Shard name -> page URLs in it, for the shards in the index."""
+        with open(os.path.join(self.public, "sitemap.xml")) as f:
+            names = re.findall(r"<loc>https://example.com/(sitemap-\d+\.xml\.gz)</loc>", f.read())
+        shards = {}
+        for name in names:
+            with gzip.open(os.path.join(self.public, name), "rt") as f:
+                shards[name] = re.findall(r"<loc>(.*?)</loc>", f.read())
+        return shards
+
+    def _shard_of(self, url):
+        return next(name for name, urls in self._shards().items() if url in urls)
+
+    def test_large_sitemap_becomes_index_of_gzip_shards(self):
+        written = self._pipeline().write()
+
+        shards = self._shards()
+        self.assertEqual(sorted(written), sorted(list(shards) + ["sitemap.xml"]))
+        self.assertGreaterEqual(len(shards), 3)
+        self.assertTrue(all(len(urls) <= 12 for urls in shards.values()))
+        urls = sorted(url for shard in shards.values() for url in shard)
+        self.assertEqual(urls, [f"https://example.com/page-{i:02d}/" for i in range(25)])
+
+    def test_unchanged_shards_are_not_rewritten(self):
+        first = self._pipeline()
+        # Pages last changed long ago
+        first.pages = {key: [entry["hash"], "2020-01-01"] for key, entry in self.manifest.files.items()}
+        first.write()
+        self.assertEqual(self._pipeline().write(), [])
+
+        self.manifest.write_output("page-24/index.html", b"<p>changed</p>", template="pages/x.html")
+
+        self.assertEqual(self._pipeline().write(), [self._shard_of("https://example.com/page-24/"), "sitemap.xml"])
+
+    def test_new_page_only_rewrites_its_shard(self):
+        first = self._pipeline()
+        first.pages = {key: [entry["hash"], "2020-01-01"] for key, entry in self.manifest.files.items()}
+        first.write()
+        before = self._shards()
+
+        self.manifest.write_output("page-00a/index.html", b"<p>new</p>", template="pages/x.html")
+        written = self._pipeline().write()
+
+        shard = self._shard_of("https://example.com/page-00a/")
+        self.assertEqual(written, [shard, "sitemap.xml"])
+        after = self._shards()
+        self.assertEqual(set(after), set(before))
+        self.assertEqual({name: urls for name, urls in after.items() if name != shard},
+                         {name: urls for name, urls in before.items() if name != shard})
+
+
+class TestBuilderSitemap(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+        self.builder = WebsiteBuilder(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _read(self, name):
+        with open(os.path.join(self.site_path, "public_html", name)) as f:
+            return f.read()
+
+    def test_build_writes_sitemap_with_hreflang_and_robots(self):
+        self.site_path = self.builder.create_website("test.example", {
+            "title": "Test Co", "languages": ["sv", "en"], "default_language": "sv"
+        })
+        self.builder.build()
+
+        sitemap = self._read("sitemap.xml")
+        self.assertEqual(sitemap.count("<url>"), 12)
+        self.assertIn("<loc>https://test.example/en/about/</loc>", sitemap)
+        self.assertIn('<xhtml:link rel="alternate" hreflang="x-default" href="https://test.example/about/"/>', sitemap)
+        self.assertIn("Sitemap: https://test.example/sitemap.xml", self._read("robots.txt"))
+
+        # Rebuilding unchanged pages keeps their dates and the file
+        lastmods = re.findall(r"<lastmod>(.*?)</lastmod>", sitemap)
+        self.builder.build()
+        self.assertNotIn("sitemap.xml", self.builder.last_build_report["written"])
+        self.assertEqual(re.findall(r"<lastmod>(.*?)</lastmod>", self._read("sitemap.xml")), lastmods)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Tests for build span tracing and the builder's profile() block.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from bot_core.builder import WebsiteBuilder
+from bot_core.monitoring import tracing as tracing_module
+from bot_core.monitoring.tracing import Tracer, active_tracer, span, traced, tracing
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@traced("work")
+def _work(path):
+    with open(path, 'w') as f:
+        f.write("x" * 4096)
+    with open(path) as f:
+        return len(f.read())
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "data.txt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_off_by_default(self):
+        self.assertIsNone(active_tracer())
+        self.assertIs(span("anything"), tracing_module._NOOP)
+        self.assertEqual(_work(self.path), 4096)
+
+    def test_spans_nest_and_record_resources(self):
+        with tracing() as tracer:
+            with span("outer", stage="test") as outer:
+                _work(self.path)
+                outer.set(items=3)
+        self.assertIsNone(active_tracer())
+
+        spans = {s.name: s for s in tracer.spans}
+        self.assertEqual(set(spans), {"outer", "work"})
+        self.assertEqual(spans["work"].depth, 1)
+        self.assertGreaterEqual(spans["work"].written_bytes, 4096)
+        self.assertGreaterEqual(spans["work"].read_bytes, 4096)
+        self.assertGreater(spans["outer"].peak_rss, 0)
+        self.assertLessEqual(spans["work"].wall_ns, spans["outer"].wall_ns)
+        self.assertEqual(spans["outer"].args, {"stage": "test", "items": 3})
+
+    def test_chrome_trace_and_summary(self):
+        tracer = Tracer()
+        with tracing(tracer):
+            with span("outer"):
+                _work(self.path)
+                _work(self.path)
+        trace_path = tracer.write_chrome_trace(os.path.join(self.tmp.name, "out", "trace.json"))
+
+        with open(trace_path) as f:
+            events = [e for e in json.load(f)["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual([e["name"] for e in events], ["outer", "work", "work"])
+        for key in ("cpu_ms", "worker_cpu_ms", "read_bytes", "written_bytes", "peak_rss_mb"):
+            self.assertIn(key, events[0]["args"])
+        self.assertGreaterEqual(events[1]["ts"], events[0]["ts"])
+
+        lines = tracer.summary(top=1).splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith("outer"))
+        work = next(line for line in tracer.summary().splitlines() if line.startswith("work"))
+        self.assertEqual(work.split()[1], "2")
+
+
+    def test_peak_reset_is_opt_in(self):
+        clear_refs = os.path.join(self.tmp.name, "clear_refs")
+        open(clear_refs, 'w').close()
+        original, tracing_module._CLEAR_REFS = tracing_module._CLEAR_REFS, clear_refs
+        try:
+            with tracing() as tracer:
+                _work(self.path)
+            self.assertEqual(os.path.getsize(clear_refs), 0)
+            self.assertGreater(tracer.spans[0].peak_rss, 0)
+
+            with tracing(Tracer(reset_peak=True)):
+                _work(self.path)
+            with open(clear_refs) as f:
+                self.assertEqual(f.read(), "5")
+        finally:
+            tracing_module._CLEAR_REFS = original
+
+class TestBuilderProfile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        shutil.copytree(os.path.join(REPO_ROOT, "shared"), os.path.join(self.tmp.name, "shared"))
+        self.builder = WebsiteBuilder(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_profile_records_build_stages(self):
+        self.builder.create_website("test.example", {"title": "Test Co"})
+        trace_path = os.path.join(self.tmp.name, "build.trace.json")
+        with self.builder.profile(trace_path=trace_path) as tracer:
+            self.builder.build()
+
+        names = {s.name for s in tracer.spans}
+        for stage in ("WebsiteBuilder.build", "WebsiteBuilder._process_templates",
+                      "AssetPipeline.precompress", "SitemapPipeline.write"):
+            self.assertIn(stage, names)
+        self.assertIn("WebsiteBuilder.build", self.builder.last_profile)
+        self.assertTrue(os.path.exists(trace_path))
+        self.assertIsNone(active_tracer())
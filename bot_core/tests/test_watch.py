@@ -0,0 +1,50 @@
+"""
+Tests for watch mode file watching and debouncing.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from bot_core.build.watch import PollingWatcher, create_watcher, debounced_changes
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        os.makedirs(os.path.join(self.tmp.name, "components"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _first_batch(self, watcher):
+        stop = threading.Event()
+        timer = threading.Timer(5, stop.set)
+        timer.start()
+
+        def edit():
+            time.sleep(0.2)
+            for name in ("header.html", "footer.html", ".header.html.swp"):
+                with open(os.path.join(self.tmp.name, "components", name), 'w') as f:
+                    f.write("<div></div>")
+
+        threading.Thread(target=edit).start()
+        try:
+            return next(debounced_changes(watcher, debounce=0.1, stop=stop), set())
+        finally:
+            timer.cancel()
+            watcher.close()
+
+    def test_burst_is_coalesced_into_one_batch(self):
+        batch = self._first_batch(create_watcher([self.tmp.name]))
+
+        self.assertEqual({os.path.basename(p) for p in batch}, {"header.html", "footer.html"})
+
+    def test_polling_fallback(self):
+        batch = self._first_batch(PollingWatcher([self.tmp.name], interval=0.05))
+
+        self.assertEqual({os.path.basename(p) for p in batch}, {"header.html", "footer.html"})
+
+if __name__ == '__main__':
+    unittest.main()
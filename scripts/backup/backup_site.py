@@ -0,0 +1,87 @@
+"""
+Script to take, restore, verify and prune deduplicating backups of a site.
+
+Usage:
+    python scripts/backup/backup_site.py create /var/backups/websites/example.com \
+        --source files=/var/www/websites/example.com --source nginx=/etc/nginx/sites-available/example.com.conf
+    python scripts/backup/backup_site.py list /var/backups/websites/example.com
+    python scripts/backup/backup_site.py restore /var/backups/websites/example.com /tmp/restore --path files/public_html/
+    python scripts/backup/backup_site.py verify /var/backups/websites/example.com --full
+    python scripts/backup/backup_site.py prune /var/backups/websites/example.com --keep-daily 7 --keep-weekly 4
+"""
+
+import argparse
+import json
+import sys
+
+from bot_core.ops import BackupRepository
+from bot_core.ops.backup import format_report
+
+def parse_source(value):
+    name, sep, path = value.partition("=")
+    if not sep or not name or not path:
+        raise argparse.ArgumentTypeError(f"expected NAME=PATH, got {value!r}")
+    return name, path
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplicating incremental site backups.")
+    parser.add_argument("--workers", type=int, default=None, help="Maximum chunking processes")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    create = commands.add_parser("create", help="Take a snapshot")
+    create.add_argument("repo", help="Backup repository directory")
+    create.add_argument("--source", type=parse_source, action="append", required=True,
+                        metavar="NAME=PATH", help="Directory or file to back up (repeatable)")
+    create.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="Glob of paths or names to skip (repeatable)")
+
+    listing = commands.add_parser("list", help="List snapshots")
+    listing.add_argument("repo", help="Backup repository directory")
+
+    restore = commands.add_parser("restore", help="Restore a snapshot into a directory")
+    restore.add_argument("repo", help="Backup repository directory")
+    restore.add_argument("dest", help="Directory to restore into")
+    restore.add_argument("--snapshot", help="Snapshot name (latest by default)")
+    restore.add_argument("--path", action="append", default=[], help="Restore only this path prefix (repeatable)")
+
+    verify = commands.add_parser("verify", help="Check snapshots can be restored")
+    verify.add_argument("repo", help="Backup repository directory")
+    verify.add_argument("--snapshot", help="Snapshot name (all by default)")
+    verify.add_argument("--full", action="store_true", help="Read back and hash every chunk")
+
+    prune = commands.add_parser("prune", help="Apply retention and delete unreferenced chunks")
+    prune.add_argument("repo", help="Backup repository directory")
+    prune.add_argument("--keep-daily", type=int, default=7)
+    prune.add_argument("--keep-weekly", type=int, default=0)
+    prune.add_argument("--keep-monthly", type=int, default=0)
+    prune.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+
+    args = parser.parse_args()
+    repo = BackupRepository(args.repo, max_workers=args.workers)
+
+    if args.command == "create":
+        report = repo.backup(dict(args.source), exclude=args.exclude)
+        summary = format_report(report)
+    elif args.command == "list":
+        report = repo.list_snapshots()
+        summary = "\n".join(f"{s['name']}  {s['created']}  {s['files']} files  {s['size'] / 1024 / 1024:.1f} MB"
+                            for s in report) or "No snapshots"
+    elif args.command == "restore":
+        report = repo.restore(args.dest, snapshot=args.snapshot, paths=args.path)
+        summary = f"Restored {report['files']} files from {report['snapshot']} into {args.dest}"
+    elif args.command == "verify":
+        report = repo.verify(snapshot=args.snapshot, full=args.full)
+        summary = "\n".join([f"Checked {report['snapshots']} snapshots, {report['chunks']} chunks: "
+                             f"{len(report['problems'])} problems"] + report["problems"][:50])
+    else:
+        report = repo.prune(args.keep_daily, args.keep_weekly, args.keep_monthly, dry_run=args.dry_run)
+        summary = (f"Kept {len(report['kept'])} snapshots, removed {len(report['removed'])}; "
+                   f"removed {report['chunks']['removed']} chunks ({report['chunks']['freed_bytes'] / 1024 / 1024:.1f} MB)")
+
+    print(json.dumps(report, indent=4) if args.json else summary)
+    if args.command == "verify" and report["problems"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -28,55 +28,40 @@ fi
 # Configuration
 BACKUP_ROOT="/var/backups/websites"
 SITE_ROOT="/var/www/websites/$SITE"
-DATE=$(date +%Y%m%d)
-BACKUP_DIR="$BACKUP_ROOT/$SITE/$DATE"
+REPO="$BACKUP_ROOT/$SITE"
 RETENTION_DAYS=7
+PROJECT_ROOT="$(cd "$(dirname "$0")/../.." && pwd)"
+BACKUP=(env PYTHONPATH="$PROJECT_ROOT" nice -n 10 ionice -c 3 python3 "$PROJECT_ROOT/scripts/backup/backup_site.py")
 
 echo "🚀 Starting backup for $SITE..."
 
-# Create backup directory
-echo "📁 Creating backup directory..."
-mkdir -p "$BACKUP_DIR"
-
-# Backup website files
-echo "📦 Backing up website files..."
-tar -czf "$BACKUP_DIR/files.tar.gz" -C "$SITE_ROOT" .
-
-# Backup Nginx configuration
-echo "🌐 Backing up Nginx configuration..."
-cp "/etc/nginx/sites-available/$SITE.conf" "$BACKUP_DIR/nginx.conf"
+# Website files and Nginx configuration go into one deduplicating snapshot;
+# files unchanged since the last snapshot are not read again
+SOURCES=(--source "files=$SITE_ROOT" --source "nginx=/etc/nginx/sites-available/$SITE.conf")
 
 # Backup SSL certificates if they exist
 if [ -d "/etc/letsencrypt/live/$SITE" ]; then
-    echo "🔒 Backing up SSL certificates..."
-    cp -r "/etc/letsencrypt/live/$SITE" "$BACKUP_DIR/ssl"
+    echo "🔒 Including SSL certificates..."
+    SOURCES+=(--source "ssl=/etc/letsencrypt/live/$SITE" --source "ssl-archive=/etc/letsencrypt/archive/$SITE")
 fi
 
-# Create backup manifest
-echo "📝 Creating backup manifest..."
-cat > "$BACKUP_DIR/manifest.json" <<EOL
-{
-    "site": "$SITE",
-    "date": "$(date -u +"%Y-%m-%dT%H:%M:%SZ")",
-    "contents": {
-        "files": "files.tar.gz",
-        "nginx": "nginx.conf",
-        "ssl": "ssl/"
-    }
-}
-EOL
+echo "📦 Taking snapshot..."
+"${BACKUP[@]}" create "$REPO" "${SOURCES[@]}" --exclude "venv" --exclude "__pycache__"
+
+# Quick check that every chunk the snapshots reference is present
+echo "🔍 Verifying..."
+"${BACKUP[@]}" verify "$REPO"
 
-# Set permissions
-echo "🔑 Setting permissions..."
-chmod -R 600 "$BACKUP_DIR"
+# Cleanup old snapshots and the chunks only they used
+echo "🧹 Pruning old snapshots..."
+"${BACKUP[@]}" prune "$REPO" --keep-daily "$RETENTION_DAYS"
 
-# Cleanup old backups
-echo "🧹 Cleaning up old backups..."
-find "$BACKUP_ROOT/$SITE" -type d -mtime +$RETENTION_DAYS -exec rm -rf {} \;
+# Dated tar.gz backups from before the switch age out as they used to
+find "$REPO" -maxdepth 1 -type d -name '20[0-9]*' -mtime +$RETENTION_DAYS -exec rm -rf {} +
+rm -f "$REPO/latest"
 
-# Create symlink to latest backup
-ln -sf "$BACKUP_DIR" "$BACKUP_ROOT/$SITE/latest"
+chmod 700 "$REPO"
 
 echo "✅ Backup complete!"
-echo "Backup location: $BACKUP_DIR"
-echo "Latest backup symlink: $BACKUP_ROOT/$SITE/latest" 
\ No newline at end of file
+echo "Backup repository: $REPO"
+echo "Restore with: ${BACKUP[*]} restore $REPO <dir>"
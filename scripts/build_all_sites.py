@@ -0,0 +1,34 @@
+"""
+Script to rebuild many websites in parallel.
+
+Usage:
+    python scripts/build_all_sites.py                 # every websites/*/config/site_config.json
+    python scripts/build_all_sites.py a.json b.json   # explicit site configs or build jobs
+    python scripts/build_all_sites.py --workers 4 --json
+"""
+
+import argparse
+import json
+import sys
+
+from bot_core.build.batch import build_sites, format_report
+
+def main():
+    parser = argparse.ArgumentParser(description="Build several websites across a process pool.")
+    parser.add_argument("configs", nargs="*", help="Site config or build job files (default: discover all sites)")
+    parser.add_argument("--workers", type=int, default=None, help="Maximum worker processes")
+    parser.add_argument("--root", default=None, help="Project root containing websites/ and shared/")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    report = build_sites(args.configs or None, max_workers=args.workers, root_dir=args.root)
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(format_report(report))
+
+    sys.exit(1 if report["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
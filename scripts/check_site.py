@@ -0,0 +1,36 @@
+"""
+Script to verify a built website: broken links, orphaned pages, duplicate
+ids, unclosed tags and invalid JSON-LD.
+
+Usage:
+    python scripts/check_site.py my-portfolio
+    python scripts/check_site.py my-portfolio --workers 8 --json
+"""
+
+import argparse
+import json
+import sys
+
+from bot_core.build.linkcheck import format_report
+from bot_core.builder import WebsiteBuilder
+
+def main():
+    parser = argparse.ArgumentParser(description="Check a built website's HTML and links.")
+    parser.add_argument("domain", help="Website directory name under websites/")
+    parser.add_argument("--workers", type=int, default=None, help="Maximum scanner processes")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    builder = WebsiteBuilder()
+    builder.open_website(args.domain)
+    report = builder.check_links(max_workers=args.workers)
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(format_report(report))
+
+    sys.exit(1 if report["problems"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Script to deploy a built website's public_html to its host directory as a
+new release, sending only what changed since the live release.
+
+Usage:
+    python scripts/deploy_site.py my-portfolio --target /var/www/websites/my-portfolio
+    python scripts/deploy_site.py my-portfolio --target /var/www/websites/my-portfolio --dry-run
+    python scripts/deploy_site.py my-portfolio --target /var/www/websites/my-portfolio --rollback
+"""
+
+import argparse
+import json
+
+from bot_core.builder import WebsiteBuilder
+from bot_core.ops import LocalTarget, deploy, rollback
+from bot_core.ops.deploy import KEEP_RELEASES, format_report
+
+def main():
+    parser = argparse.ArgumentParser(description="Deploy a built website as a delta release.")
+    parser.add_argument("domain", help="Website directory name under websites/")
+    parser.add_argument("--target", required=True, help="Site directory on the host")
+    parser.add_argument("--keep", type=int, default=KEEP_RELEASES, help="Releases to keep")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be sent")
+    parser.add_argument("--rollback", nargs="?", const="", metavar="RELEASE",
+                        help="Make an earlier release live (the previous one by default)")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    target = LocalTarget(args.target)
+    if args.rollback is not None:
+        release = rollback(target, args.rollback or None)
+        print(f"Release {release} is live")
+        return
+
+    builder = WebsiteBuilder()
+    site_path = builder.open_website(args.domain)
+    report = deploy(site_path, target, keep=args.keep, dry_run=args.dry_run)
+
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(format_report(report))
+
+if __name__ == "__main__":
+    main()
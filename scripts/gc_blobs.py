@@ -0,0 +1,29 @@
+"""
+Script to garbage-collect the shared blob store under websites/.blobstore.
+
+Removes stored files that no site's build manifest references any more.
+
+Usage:
+    python scripts/gc_blobs.py [--dry-run] [--grace SECONDS]
+"""
+
+import argparse
+
+from bot_core.builder import WebsiteBuilder
+
+def main():
+    parser = argparse.ArgumentParser(description="Remove unreferenced blobs from the shared blob store.")
+    parser.add_argument("--root", default=None, help="Project root containing websites/")
+    parser.add_argument("--grace", type=float, default=300,
+                        help="Keep blobs touched within this many seconds (default: 300)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    args = parser.parse_args()
+
+    builder = WebsiteBuilder(args.root)
+    result = builder.collect_garbage(grace_seconds=args.grace, dry_run=args.dry_run)
+
+    action = "Would remove" if args.dry_run else "Removed"
+    print(f"{action} {result['removed']} blobs ({result['freed_bytes']} bytes), kept {result['kept']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Script to profile a website build stage by stage.
+
+Usage:
+    python scripts/profile_site.py my-portfolio
+    python scripts/profile_site.py my-portfolio --trace build.trace.json --top 30
+    python scripts/profile_site.py my-portfolio --rebuild websites/my-portfolio/content/blog/post.md
+"""
+
+import argparse
+
+from bot_core.builder import WebsiteBuilder
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a website and report where the time and memory went.")
+    parser.add_argument("domain", help="Website directory name under websites/")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (open in ui.perfetto.dev)")
+    parser.add_argument("--top", type=int, default=20, help="Number of spans in the summary")
+    parser.add_argument("--rebuild", nargs="*", default=None, metavar="PATH",
+                        help="Profile an incremental rebuild of these changed files instead of a full build")
+    args = parser.parse_args()
+
+    builder = WebsiteBuilder()
+    builder.open_website(args.domain)
+    with builder.profile(trace_path=args.trace, top=args.top):
+        if args.rebuild is None:
+            builder.build()
+        else:
+            builder.rebuild(args.rebuild)
+
+    print(builder.last_profile)
+    if args.trace:
+        print(f"\nTrace written to {args.trace}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""
+Script to develop a website with incremental rebuilds and live reload.
+
+Usage:
+    python scripts/watch_site.py my-portfolio [--port 8000] [--polling]
+"""
+
+import argparse
+import logging
+
+from bot_core.builder import WebsiteBuilder
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a website and rebuild it on changes.")
+    parser.add_argument("domain", help="Website directory name under websites/")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--debounce", type=float, default=0.05, help="Seconds to coalesce file events")
+    parser.add_argument("--polling", action="store_true", help="Poll for changes instead of using inotify")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+
+    builder = WebsiteBuilder()
+    builder.open_website(args.domain)
+    builder.watch(host=args.host, port=args.port, debounce=args.debounce, polling=args.polling)
+
+if __name__ == "__main__":
+    main()